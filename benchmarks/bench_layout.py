@@ -0,0 +1,84 @@
+"""
+Time to serve the editor layout of a big workflow.
+
+Seeds a workflow like bench_node_records does, then reports the best time of
+each way a layout is served:
+- full: computed from every node, with no cached layout.
+- incremental: one message edited since the cached layout.
+- cached: the revision is unchanged.
+
+Usage:
+    python -m benchmarks.bench_layout [--nodes 5000] [--repeat 5]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.bench_node_records import seed
+from database.config import Base
+from database.models import MessageNode
+from database.revisions import bump_node_revisions
+from services.cache import LRUCache
+from services.layout import WorkflowLayoutService
+
+
+def edit(db, node_id: int) -> None:
+    db.execute(
+        update(MessageNode.__table__)
+        .where(MessageNode.__table__.c.id == node_id)
+        .values(message=f"Edited at {time.perf_counter()}")
+    )
+    bump_node_revisions(db, [node_id])
+    db.commit()
+
+
+def best_of(repeat: int, prepare, serve) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        prepare()
+        started = time.perf_counter()
+        serve()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(nodes: int, repeat: int) -> None:
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    with session_factory() as db:
+        workflow_id = seed(db, nodes)
+    layouts = WorkflowLayoutService(layouts=LRUCache())
+
+    with session_factory() as db:
+        timings = {
+            "full": best_of(
+                repeat,
+                layouts.layouts.clear,
+                lambda: layouts.get_layout(workflow_id, db),
+            ),
+            "incremental": best_of(
+                repeat,
+                lambda: edit(db, 2),
+                lambda: layouts.get_layout(workflow_id, db),
+            ),
+            "cached": best_of(
+                repeat, lambda: None, lambda: layouts.get_layout(workflow_id, db)
+            ),
+        }
+    for name, seconds in timings.items():
+        print(f"{name:<12}{nodes:>7} nodes {seconds * 1000:>9.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--nodes", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.nodes, args.repeat)
@@ -0,0 +1,168 @@
+"""
+Memory and construction time of node read models.
+
+Loads every node of a big workflow three ways and reports the time to build
+them and the memory they hold per node (measured with tracemalloc while the
+objects and their session are alive):
+- orm: polymorphic ORM entities, identity map included.
+- orm+schema: the same entities converted to response schemas, as the node
+  read endpoint used to do.
+- records: NodeRecord instances from one core SELECT.
+
+Usage:
+    python -m benchmarks.bench_node_records [--nodes 100000] [--repeat 3]
+"""
+
+import argparse
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import sessionmaker, with_polymorphic
+
+from database.config import Base
+from database.models import (
+    Workflow,
+    Node,
+    StartNode,
+    MessageNode,
+    ConditionNode,
+    EndNode,
+)
+from database.records import load_node_records
+from schemas.node import (
+    NodeStatus,
+    NodeType,
+    StartNodeResponseSchema,
+    MessageNodeResponseSchema,
+    ConditionNodeResponseSchema,
+    EndNodeResponseSchema,
+)
+
+RESPONSE_SCHEMAS = {
+    NodeType.start: StartNodeResponseSchema,
+    NodeType.message: MessageNodeResponseSchema,
+    NodeType.condition: ConditionNodeResponseSchema,
+    NodeType.end: EndNodeResponseSchema,
+}
+
+
+def seed(db, nodes: int) -> int:
+    """start -> message... -> condition every 10 messages -> end, in bulk."""
+    workflow = Workflow(name="Benchmark")
+    db.add(workflow)
+    db.flush()
+    start_id, end_id = 1, nodes
+    kinds = {start_id: NodeType.start, end_id: NodeType.end}
+    for node_id in range(2, end_id):
+        kinds[node_id] = NodeType.condition if node_id % 10 == 0 else NodeType.message
+    db.execute(
+        insert(Node),
+        [
+            {"id": node_id, "workflow_id": workflow.id, "node_type": kind}
+            for node_id, kind in kinds.items()
+        ],
+    )
+    db.execute(insert(StartNode.__table__), [{"id": start_id, "next_node_id": 2}])
+    db.execute(insert(EndNode.__table__), [{"id": end_id}])
+    db.execute(
+        insert(MessageNode.__table__),
+        [
+            {
+                "id": node_id,
+                "message": f"Message {node_id}",
+                "status": NodeStatus.pending,
+                "next_node_id": node_id + 1,
+            }
+            for node_id, kind in kinds.items()
+            if kind == NodeType.message
+        ],
+    )
+    db.execute(
+        insert(ConditionNode.__table__),
+        [
+            {
+                "id": node_id,
+                "condition": "Sent",
+                "yes_node_id": node_id + 1,
+                "no_node_id": end_id,
+            }
+            for node_id, kind in kinds.items()
+            if kind == NodeType.condition
+        ],
+    )
+    db.commit()
+    return workflow.id
+
+
+def load_orm(db, workflow_id: int) -> list:
+    nodes = with_polymorphic(Node, "*")
+    return db.scalars(select(nodes).where(nodes.workflow_id == workflow_id)).all()
+
+
+def load_orm_schemas(db, workflow_id: int) -> list:
+    return [
+        RESPONSE_SCHEMAS[node.node_type].model_validate(node)
+        for node in load_orm(db, workflow_id)
+    ]
+
+
+def load_records(db, workflow_id: int) -> list:
+    return load_node_records(db, Node.workflow_id == workflow_id)
+
+
+LOADERS = {
+    "orm": load_orm,
+    "orm+schema": load_orm_schemas,
+    "records": load_records,
+}
+
+
+def measure(session_factory, loader, workflow_id: int, repeat: int) -> tuple:
+    """
+    :return: Best construction time in seconds and bytes held by the result.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        with session_factory() as db:
+            started = time.perf_counter()
+            loaded = loader(db, workflow_id)
+            best = min(best, time.perf_counter() - started)
+            del loaded
+    gc.collect()
+    with session_factory() as db:
+        tracemalloc.start()
+        loaded = loader(db, workflow_id)
+        held = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        count = len(loaded)
+        del loaded
+    return best, held, count
+
+
+def main(nodes: int, repeat: int) -> None:
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    with session_factory() as db:
+        workflow_id = seed(db, nodes)
+
+    print(f"{'loader':<12}{'nodes':>9}{'seconds':>10}{'us/node':>10}{'bytes/node':>12}")
+    for name, loader in LOADERS.items():
+        seconds, held, count = measure(session_factory, loader, workflow_id, repeat)
+        print(
+            f"{name:<12}{count:>9}{seconds:>10.3f}"
+            f"{seconds / count * 1e6:>10.2f}{held / count:>12.0f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--nodes", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    main(args.nodes, args.repeat)
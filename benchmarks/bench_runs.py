@@ -0,0 +1,119 @@
+"""
+Throughput of the run scheduler draining many concurrent runs.
+
+Seeds a published workflow and N pending runs in a temporary SQLite file,
+then lets RunScheduler advance them to completion.
+
+Usage:
+    python -m benchmarks.bench_runs [--runs 20000] [--workers 4] [--batch-size 500]
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine, func, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from database.config import Base
+from database.models import (
+    Workflow,
+    WorkflowRun,
+    StartNode,
+    MessageNode,
+    ConditionNode,
+    EndNode,
+)
+from schemas.node import NodeStatus
+from schemas.run import RunStatus
+from services.run import RunScheduler
+from services.version import WorkflowVersionService
+
+
+def seed(db, versions: WorkflowVersionService, runs: int) -> int:
+    """Publish start -> message -> condition(paid) -> end and queue runs."""
+    workflow = Workflow(name="Benchmark")
+    db.add(workflow)
+    db.flush()
+    start = StartNode(workflow_id=workflow.id)
+    message = MessageNode(
+        workflow_id=workflow.id, message="Hello", status=NodeStatus.pending
+    )
+    condition = ConditionNode(workflow_id=workflow.id, condition="paid")
+    end = EndNode(workflow_id=workflow.id)
+    db.add_all([start, message, condition, end])
+    db.flush()
+    start.next_node_id = message.id
+    message.next_node_id = condition.id
+    condition.yes_node_id = end.id
+    condition.no_node_id = message.id
+    db.commit()
+    published = versions.publish(workflow.id, db)
+    db.execute(
+        insert(WorkflowRun),
+        [
+            {
+                "workflow_id": workflow.id,
+                "version": published.version,
+                "current_node_id": start.id,
+                "status": RunStatus.pending,
+                "context": {"paid": True},
+            }
+            for _ in range(runs)
+        ],
+    )
+    db.commit()
+    return workflow.id
+
+
+async def drain(scheduler: RunScheduler, session_factory) -> None:
+    scheduler.start()
+    while True:
+        await asyncio.sleep(0.05)
+        with session_factory() as db:
+            remaining = db.scalar(
+                select(func.count(WorkflowRun.id)).where(
+                    WorkflowRun.status != RunStatus.completed
+                )
+            )
+        if not remaining:
+            break
+    await scheduler.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "runs.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"timeout": 30})
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    versions = WorkflowVersionService()
+    with session_factory() as db:
+        seed(db, versions, args.runs)
+
+    scheduler = RunScheduler(
+        session_factory,
+        versions=versions,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        poll_interval=0.01,
+    )
+    started = time.perf_counter()
+    asyncio.run(drain(scheduler, session_factory))
+    elapsed = time.perf_counter() - started
+    print(
+        f"{args.runs} runs completed in {elapsed:.2f}s "
+        f"({args.runs / elapsed:,.0f} runs/s, {args.workers} workers, "
+        f"batch {args.batch_size})"
+    )
+
+
+if __name__ == "__main__":
+    main()
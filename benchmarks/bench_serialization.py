@@ -0,0 +1,115 @@
+"""
+Per-endpoint response serialization cost.
+
+Compares the generic FastAPI path (``jsonable_encoder`` over the returned
+object followed by ``JSONResponse``) with the compiled pydantic path used by
+the routers (``routers.responses.model_response``).
+
+Usage:
+    python -m benchmarks.bench_serialization [--nodes 2000] [--repeat 5]
+"""
+
+import argparse
+import timeit
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.config import Base
+from database.models import Workflow, StartNode, MessageNode, ConditionNode, EndNode
+from routers.responses import model_response
+from schemas.node import (
+    NodeStatus,
+    StartNodeResponseSchema,
+    MessageNodeResponseSchema,
+    ConditionNodeResponseSchema,
+    EndNodeResponseSchema,
+)
+from schemas.workflow import Workflow as WorkflowSchema, WorkflowSequenceSchema
+from services.node import NodeService
+from services.workflow import WorkflowService
+
+
+def seed(db, nodes: int) -> int:
+    """Create a linear workflow with the given number of message nodes."""
+    workflow = Workflow(name="Benchmark")
+    db.add(workflow)
+    db.flush()
+    start = StartNode(workflow_id=workflow.id)
+    db.add(start)
+    db.flush()
+    previous = start
+    for index in range(nodes):
+        message = MessageNode(
+            workflow_id=workflow.id, message=f"Message {index}", status=NodeStatus.open
+        )
+        db.add(message)
+        db.flush()
+        previous.next_node_id = message.id
+        previous = message
+    condition = ConditionNode(workflow_id=workflow.id, condition="Condition")
+    end = EndNode(workflow_id=workflow.id)
+    db.add_all([condition, end])
+    db.flush()
+    previous.next_node_id = condition.id
+    condition.yes_node_id = end.id
+    condition.no_node_id = end.id
+    db.commit()
+    return workflow.id
+
+
+def measure(function, repeat: int) -> float:
+    """Best per-call time in microseconds."""
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    db = session_factory()
+    workflow_id = seed(db, args.nodes)
+    node_id = db.query(MessageNode.id).filter_by(workflow_id=workflow_id).first()[0]
+    node = NodeService().get_node(node_id=node_id, db=db)
+    sequence = WorkflowService().create_and_run_sequence(workflow_id, db)
+    db.close()
+
+    # Fresh session: objects carry only their column state, as they do when
+    # a route returns them right after save_object() refreshed them.
+    db = session_factory()
+    workflow = db.get(Workflow, workflow_id)
+    start = db.query(StartNode).filter_by(workflow_id=workflow_id).one()
+    message = db.query(MessageNode).filter_by(workflow_id=workflow_id).first()
+    condition = db.query(ConditionNode).filter_by(workflow_id=workflow_id).one()
+    end = db.query(EndNode).filter_by(workflow_id=workflow_id).one()
+
+    cases = [
+        ("GET /workflow/get/{id}/", WorkflowSchema, workflow),
+        ("GET /node/{id}/", MessageNodeResponseSchema, node),
+        ("POST|PUT start node", StartNodeResponseSchema, start),
+        ("POST|PUT message node", MessageNodeResponseSchema, message),
+        ("POST|PUT condition node", ConditionNodeResponseSchema, condition),
+        ("POST|PUT end node", EndNodeResponseSchema, end),
+        ("GET /workflow/get-sequence/{id}", WorkflowSequenceSchema, sequence),
+    ]
+
+    print(f"{'endpoint':<34}{'before (us)':>14}{'after (us)':>14}{'speedup':>10}")
+    for name, schema, content in cases:
+        before = measure(
+            lambda: JSONResponse(jsonable_encoder(content)).body, args.repeat
+        )
+        after = measure(lambda: model_response(schema, content).body, args.repeat)
+        print(f"{name:<34}{before:>14.2f}{after:>14.2f}{before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
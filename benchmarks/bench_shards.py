@@ -0,0 +1,114 @@
+"""
+Write throughput of concurrent edits to independent workflows, by number of
+SQLite shards.
+
+For each shard count, creates one workflow with a message node per writer
+in temporary files, then lets the writers, each a process of its own like a
+server worker, edit their own node at once, one committed transaction per
+edit. With one file the writers wait for SQLite's write lock; the gain of
+more shards is bounded by the CPU cores available.
+
+Usage:
+    python -m benchmarks.bench_shards [--shards 1,2,4] [--writers 8] [--edits 200]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from database.migrations import migrate_databases
+from database.sharding import ShardRouter
+from schemas.node import MessageNodeSchema, NodeStatus, NodeType
+from schemas.workflow import WorkflowCreateSchema
+from services.node import NodeService
+from services.workflow import WorkflowService
+
+
+def seed(router: ShardRouter, writers: int) -> list[tuple[int, int]]:
+    """One workflow with one message node per writer; placed by their IDs."""
+    workflows, nodes = WorkflowService(), NodeService()
+    targets = []
+    for writer in range(writers):
+        with router.session(None) as db:
+            workflow = workflows.create_workflow(
+                WorkflowCreateSchema(name=f"Tenant {writer}"), db
+            )
+            node = nodes.create_node(
+                NodeType.message,
+                MessageNodeSchema(
+                    workflow_id=workflow.id,
+                    message="Hello",
+                    status=NodeStatus.pending,
+                    next_node_id=0,
+                ),
+                db,
+            )
+            targets.append((workflow.id, node.id))
+    return targets
+
+
+def edit(router_args: tuple, workflow_id: int, node_id: int, edits: int) -> None:
+    """Runs in a writer process, like a request worker of its own."""
+    router = ShardRouter(*router_args)
+    nodes = NodeService()
+    shard = router.shard_of_workflow(workflow_id)
+    for edit_number in range(edits):
+        with router.session(shard) as db:
+            nodes.update_node(
+                node_id,
+                MessageNodeSchema(
+                    workflow_id=workflow_id,
+                    message=f"Edit {edit_number}",
+                    status=NodeStatus.pending,
+                    next_node_id=0,
+                ),
+                db,
+            )
+
+
+def measure(shards: int, writers: int, edits: int) -> float:
+    """
+    :return: Committed edits per second.
+    """
+    directory = tempfile.mkdtemp()
+    router_args = (
+        shards,
+        f"sqlite:///{os.path.join(directory, 'shard_{shard}.db')}",
+        f"sqlite:///{os.path.join(directory, 'directory.db')}",
+    )
+    router = ShardRouter(*router_args)
+    migrate_databases(router)
+    targets = seed(router, writers)
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=writers) as executor:
+        futures = [
+            executor.submit(edit, router_args, workflow_id, node_id, edits)
+            for workflow_id, node_id in targets
+        ]
+        for future in futures:
+            future.result()
+    return writers * edits / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--shards", default="1,2,4")
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--edits", type=int, default=200)
+    args = parser.parse_args()
+
+    baseline = None
+    for shards in (int(count) for count in args.shards.split(",")):
+        throughput = measure(shards, args.writers, args.edits)
+        baseline = baseline or throughput
+        print(
+            f"{shards} shard(s): {throughput:,.0f} edits/s "
+            f"({throughput / baseline:.1f}x, {args.writers} writers)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Monte-Carlo throughput of the dry-run simulation.
+
+Builds a workflow of message nodes where every tenth node is a condition
+whose no branch loops back ten nodes, and samples runs through it with
+NumPy (when installed) and in pure Python.
+
+Usage:
+    python -m benchmarks.bench_simulation [--nodes 100] [--runs 1000000]
+"""
+
+import argparse
+import time
+
+import services.simulation
+from database.records import NodeRecord
+from schemas.node import NodeType
+from services.simulation import sample, transition_table
+
+
+def build(nodes: int) -> list[NodeRecord]:
+    """start -> message... -> condition every 10 nodes (yes: on, no: back) -> end."""
+    records = [NodeRecord(1, NodeType.start, 1, next_node_id=2)]
+    for node_id in range(2, nodes):
+        if node_id % 10 == 0:
+            records.append(
+                NodeRecord(
+                    node_id,
+                    NodeType.condition,
+                    1,
+                    yes_node_id=node_id + 1,
+                    no_node_id=max(node_id - 9, 2),
+                )
+            )
+        else:
+            records.append(
+                NodeRecord(node_id, NodeType.message, 1, next_node_id=node_id + 1)
+            )
+    records.append(NodeRecord(nodes, NodeType.end, 1))
+    return records
+
+
+def main(nodes: int, runs: int, probability: float) -> None:
+    records = build(nodes)
+    table = transition_table(
+        records,
+        {
+            record.id: probability
+            for record in records
+            if record.node_type == NodeType.condition
+        },
+    )
+    load_numpy = services.simulation.load_numpy
+    for name in ("numpy", "python"):
+        if name == "numpy" and load_numpy() is None:
+            print("numpy    not installed")
+            continue
+        services.simulation.load_numpy = load_numpy if name == "numpy" else lambda: None
+        started = time.perf_counter()
+        result = sample(table, 0, runs, 100000, seed=1)
+        seconds = time.perf_counter() - started
+        steps = sum(result["visits"])
+        print(
+            f"{name:<8} {runs:,} runs, {steps / runs:.1f} nodes/run: "
+            f"{seconds:.2f} s ({runs / seconds:,.0f} runs/s)"
+        )
+    services.simulation.load_numpy = load_numpy
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--nodes", type=int, default=100)
+    parser.add_argument("--runs", type=int, default=1000000)
+    parser.add_argument("--probability", type=float, default=0.9)
+    args = parser.parse_args()
+    main(args.nodes, args.runs, args.probability)
@@ -0,0 +1,394 @@
+"""
+Load test replaying a realistic traffic mix against the HTTP API.
+
+Runs scripted scenarios with concurrent virtual users and reports
+throughput, latency percentiles, error rates and, in-process, the number of
+database queries per request. All data is seeded through the routers.
+
+The target is the app itself, served in-process over the ASGI transport on
+a temporary SQLite file (or DATABASE_URL when set), or a running server with
+--url. Comparing configurations (SQLite or another DATABASE_URL, admission
+on or off, one or several uvicorn workers) is done by saving each run with
+--output and passing it as --baseline to the next one.
+
+Scenarios:
+- node-reads: single node gets.
+- node-edits: bursts of back-to-back message node updates.
+- sequence-small / sequence-huge: draft sequences of a small and a huge
+  workflow, which also see the cache invalidations of node-edits in mix.
+- bulk-import: a whole workflow created node by node.
+- mix: all of the above, weighted like production traffic.
+
+Usage:
+    python -m benchmarks.load_test [--scenario mix|all|...] [--users 16] [--duration 10]
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --output sqlite.json
+    DATABASE_URL=... python -m benchmarks.load_test --baseline sqlite.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+import httpx
+
+MIX_WEIGHTS = {
+    "node-reads": 70,
+    "sequence-small": 15,
+    "node-edits": 8,
+    "sequence-huge": 5,
+    "bulk-import": 2,
+}
+EDIT_BURST = 10
+
+
+@dataclass
+class Workload:
+    """
+    Workflows seeded before the scenarios run.
+
+    Attributes:
+    - small (int): ID of the small workflow.
+    - huge (int): ID of the huge workflow.
+    - node_ids (list[int]): Every seeded node, for reads.
+    - messages (list[dict]): Message nodes of the small workflow, for edits.
+    - import_nodes (int): Size of the workflows created by bulk-import.
+    """
+
+    small: int = 0
+    huge: int = 0
+    node_ids: list[int] = field(default_factory=list)
+    messages: list[dict] = field(default_factory=list)
+    import_nodes: int = 100
+
+
+@dataclass
+class Recorder:
+    """
+    Latencies and outcomes of the requests of one scenario.
+    """
+
+    latencies: list[float] = field(default_factory=list)
+    statuses: Counter = field(default_factory=Counter)
+    errors: int = 0
+
+    async def call(
+        self, client: httpx.AsyncClient, method: str, url: str, body: dict = None
+    ) -> httpx.Response | None:
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, json=body)
+        except httpx.HTTPError:
+            self.latencies.append(time.perf_counter() - started)
+            self.statuses["connection_error"] += 1
+            self.errors += 1
+            return None
+        self.latencies.append(time.perf_counter() - started)
+        self.statuses[response.status_code] += 1
+        if response.status_code >= 400:
+            self.errors += 1
+            return None
+        return response
+
+
+async def import_workflow(
+    client: httpx.AsyncClient, recorder: Recorder, nodes: int, name: str
+) -> tuple[int, list[int], list[dict]]:
+    """
+    Create start -> message -> condition(yes: messages..., no: end) -> end.
+
+    Nodes must point to existing nodes when created, so the chain is built
+    from the end node backwards.
+    :return: The workflow ID, every node ID and the message nodes.
+    """
+    response = await recorder.call(client, "POST", "/workflow/create/", {"name": name})
+    workflow_id = response.json()["id"]
+
+    async def create(kind: str, **fields) -> dict:
+        response = await recorder.call(
+            client,
+            "POST",
+            f"/node/create-{kind}-node/",
+            {"workflow_id": workflow_id, **fields},
+        )
+        return response.json()
+
+    end = await create("end")
+    node_ids = [end["id"]]
+    messages = []
+    next_node_id = end["id"]
+    for index in range(max(1, nodes - 4)):
+        message = await create(
+            "message",
+            message=f"Step {index}",
+            status="Pending",
+            next_node_id=next_node_id,
+        )
+        messages.append(message)
+        next_node_id = message["id"]
+    condition = await create(
+        "condition", condition="Sent", yes_node_id=next_node_id, no_node_id=end["id"]
+    )
+    first = await create(
+        "message", message="Hello", status="Sent", next_node_id=condition["id"]
+    )
+    start = await create("start", next_node_id=first["id"])
+    node_ids += [m["id"] for m in messages] + [
+        condition["id"],
+        first["id"],
+        start["id"],
+    ]
+    return workflow_id, node_ids, messages
+
+
+async def node_read(client, recorder, workload, rng) -> None:
+    await recorder.call(client, "GET", f"/node/{rng.choice(workload.node_ids)}/")
+
+
+async def node_edit_burst(client, recorder, workload, rng) -> None:
+    message = rng.choice(workload.messages)
+    for index in range(EDIT_BURST):
+        await recorder.call(
+            client,
+            "PUT",
+            f"/node/update-message-node/{message['id']}/",
+            {
+                "workflow_id": message["workflow_id"],
+                "message": f"Edited {index}",
+                "status": rng.choice(["Pending", "Sent", "Open"]),
+                "next_node_id": message["next_node_id"],
+            },
+        )
+
+
+async def sequence_small(client, recorder, workload, rng) -> None:
+    await recorder.call(
+        client, "GET", f"/workflow/get-sequence/{workload.small}?draft=true"
+    )
+
+
+async def sequence_huge(client, recorder, workload, rng) -> None:
+    await recorder.call(
+        client, "GET", f"/workflow/get-sequence/{workload.huge}?draft=true"
+    )
+
+
+async def bulk_import(client, recorder, workload, rng) -> None:
+    await import_workflow(client, recorder, workload.import_nodes, "Imported")
+
+
+Operation = Callable[[httpx.AsyncClient, Recorder, Workload, random.Random], Awaitable]
+
+OPERATIONS: dict[str, Operation] = {
+    "node-reads": node_read,
+    "node-edits": node_edit_burst,
+    "sequence-small": sequence_small,
+    "sequence-huge": sequence_huge,
+    "bulk-import": bulk_import,
+}
+SCENARIOS = [*OPERATIONS, "mix"]
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    name: str,
+    workload: Workload,
+    users: int,
+    duration: float,
+    seed: int,
+    queries: Counter | None,
+) -> dict:
+    """
+    Let users virtual users run the scenario's operations back to back for
+    duration seconds.
+    """
+    weights = MIX_WEIGHTS if name == "mix" else {name: 1}
+    operations = [OPERATIONS[operation] for operation in weights]
+    recorder = Recorder()
+    deadline = time.perf_counter() + duration
+
+    async def user(index: int) -> None:
+        rng = random.Random(seed * 1000 + index)
+        while time.perf_counter() < deadline:
+            operation = rng.choices(operations, weights=list(weights.values()))[0]
+            await operation(client, recorder, workload, rng)
+
+    if queries is not None:
+        queries.clear()
+    started = time.perf_counter()
+    await asyncio.gather(*(user(index) for index in range(users)))
+    elapsed = time.perf_counter() - started
+    return summarize(name, users, elapsed, recorder, queries)
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(
+    name: str, users: int, elapsed: float, recorder: Recorder, queries: Counter | None
+) -> dict:
+    ordered = sorted(recorder.latencies)
+    requests = len(ordered)
+    return {
+        "scenario": name,
+        "users": users,
+        "seconds": round(elapsed, 2),
+        "requests": requests,
+        "throughput": round(requests / elapsed, 1) if elapsed else 0.0,
+        "error_rate": round(recorder.errors / requests, 4) if requests else 0.0,
+        "statuses": {str(code): count for code, count in recorder.statuses.items()},
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 2),
+        "p90_ms": round(percentile(ordered, 0.90) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+        "max_ms": round((ordered[-1] if ordered else 0.0) * 1000, 2),
+        "queries_per_request": (
+            round(queries["total"] / requests, 2)
+            if queries is not None and requests
+            else None
+        ),
+    }
+
+
+def print_report(results: list[dict], baseline: dict[str, dict]) -> None:
+    header = (
+        f"{'scenario':<16}{'requests':>10}{'req/s':>10}{'errors':>9}"
+        f"{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}{'queries':>9}"
+    )
+    print(header)
+    for result in results:
+        queries = result["queries_per_request"]
+        print(
+            f"{result['scenario']:<16}{result['requests']:>10}"
+            f"{result['throughput']:>10.1f}{result['error_rate']:>9.2%}"
+            f"{result['p50_ms']:>10.2f}{result['p90_ms']:>10.2f}"
+            f"{result['p99_ms']:>10.2f}{result['max_ms']:>10.2f}"
+            f"{'-' if queries is None else f'{queries:.1f}':>9}"
+        )
+        previous = baseline.get(result["scenario"])
+        if previous:
+            print(
+                f"{'  vs baseline':<16}{'':>10}"
+                f"{change(result['throughput'], previous['throughput']):>10}"
+                f"{'':>9}"
+                f"{change(result['p50_ms'], previous['p50_ms']):>10}"
+                f"{change(result['p90_ms'], previous['p90_ms']):>10}"
+                f"{change(result['p99_ms'], previous['p99_ms']):>10}"
+                f"{change(result['max_ms'], previous['max_ms']):>10}"
+            )
+
+
+def change(current: float, previous: float) -> str:
+    if not previous:
+        return "-"
+    return f"{(current - previous) / previous:+.0%}"
+
+
+def in_process_target(admission: bool) -> tuple[httpx.AsyncBaseTransport, Counter]:
+    """
+    Serve the app over the ASGI transport and count its database queries.
+
+    Settings are read at import time, so the environment is prepared before
+    the app is imported.
+    """
+    if "DATABASE_URL" not in os.environ:
+        path = os.path.join(tempfile.mkdtemp(), "load_test.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ["ADMISSION_ENABLED"] = "true" if admission else "false"
+    os.environ.setdefault("RUN_SCHEDULER_ENABLED", "false")
+
+    from sqlalchemy import event
+
+    from database.config import engine
+    from database.migrations import migrate
+    from main import app
+
+    migrate(bind=engine)
+    queries = Counter()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_query(*args) -> None:
+        queries["total"] += 1
+
+    return httpx.ASGITransport(app=app), queries
+
+
+async def main(args: argparse.Namespace) -> list[dict]:
+    queries = None
+    if args.url:
+        transport, base_url = None, args.url
+    else:
+        transport, queries = in_process_target(args.admission)
+        base_url = "http://load-test"
+    names = (
+        [name for name in SCENARIOS if name != "mix"]
+        if args.scenario == "all"
+        else [args.scenario]
+    )
+
+    async with httpx.AsyncClient(
+        transport=transport, base_url=base_url, timeout=args.timeout
+    ) as client:
+        seeding = Recorder()
+        workload = Workload(import_nodes=args.import_nodes)
+        workload.small, small_ids, workload.messages = await import_workflow(
+            client, seeding, args.small_nodes, "Small"
+        )
+        workload.huge, huge_ids, _ = await import_workflow(
+            client, seeding, args.huge_nodes, "Huge"
+        )
+        workload.node_ids = small_ids + huge_ids
+        if seeding.errors:
+            raise SystemExit(f"Seeding failed: {dict(seeding.statuses)}")
+
+        results = []
+        for name in names:
+            results.append(
+                await run_scenario(
+                    client,
+                    name,
+                    workload,
+                    args.users,
+                    args.duration,
+                    args.seed,
+                    queries,
+                )
+            )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scenario", choices=[*SCENARIOS, "all"], default="mix")
+    parser.add_argument("--users", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--url", help="Running server; in-process when omitted")
+    parser.add_argument(
+        "--admission", action="store_true", help="Keep admission control on in-process"
+    )
+    parser.add_argument("--small-nodes", type=int, default=20)
+    parser.add_argument("--huge-nodes", type=int, default=2000)
+    parser.add_argument("--import-nodes", type=int, default=100)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Save the results as JSON")
+    parser.add_argument("--baseline", help="Results of a previous run to compare with")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = {result["scenario"]: result for result in json.load(file)}
+    results = asyncio.run(main(args))
+    print_report(results, baseline)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
@@ -1,11 +1,26 @@
+from fastapi import Request
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from starlette.concurrency import run_in_threadpool
 
-SQLALCHEMY_URL = "sqlite:///./main.db"
+import settings
+from database.sharding import ShardRouter
+
+SQLALCHEMY_URL = settings.DATABASE_URL
 engine = create_engine(SQLALCHEMY_URL)
+# Runs, dispatch, status transitions and sharding use UPDATE ... RETURNING.
+SQLITE_MIN_VERSION = (3, 35)
+if engine.dialect.name == "sqlite":
+    sqlite_version = engine.dialect.dbapi.sqlite_version
+    if engine.dialect.dbapi.sqlite_version_info < SQLITE_MIN_VERSION:
+        raise RuntimeError(f"SQLite 3.35 or later is required, found {sqlite_version}")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Routes workflows to their shard; None when everything is in one database.
+shard_router = ShardRouter() if settings.SHARD_COUNT > 1 else None
+
+
 def get_db():
     db = SessionLocal()
     try:
@@ -14,3 +29,48 @@ def get_db():
         db.close()
 
 
+async def get_shard_db(request: Request):
+    """
+    Session on the shard of the workflow, node or run a request names; the
+    JSON body FastAPI has already read is looked at for creates.
+    """
+    body = None
+    if request.headers.get("content-type", "").startswith("application/json"):
+        try:
+            body = await request.json()
+        except ValueError:
+            pass
+    shard = await run_in_threadpool(
+        shard_router.request_shard,
+        request.path_params,
+        request.query_params,
+        body if isinstance(body, dict) else None,
+    )
+    db = shard_router.session(shard)
+    try:
+        yield db
+    finally:
+        await run_in_threadpool(db.close)
+
+
+if shard_router is not None:
+    get_db = get_shard_db  # noqa: F811
+
+
+def session_factories() -> list[sessionmaker]:
+    """
+    One session factory per database holding workflows, for background jobs.
+    """
+    if shard_router is None:
+        return [SessionLocal]
+    return shard_router.session_factories
+
+
+def workflow_session(workflow_id: int, session_factory: sessionmaker) -> Session:
+    """
+    Session on the database holding a workflow: a new one of session_factory,
+    or one on the workflow's shard when sharded.
+    """
+    if shard_router is None:
+        return session_factory()
+    return shard_router.session(shard_router.shard_of_workflow(workflow_id))
@@ -0,0 +1,77 @@
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateColumn
+
+from database.config import Base, engine, shard_router
+from database import models  # noqa: F401  Registers the tables on Base.metadata.
+from database.search import create_search_index
+from database.sharding import ShardRouter, directory_metadata
+
+
+def migrate(bind: Engine = engine) -> list[str]:
+    """
+    Bring the database schema up to date with the models.
+
+    Creates missing tables, then adds the columns and indexes that were
+    introduced after an existing table was created, and the full-text
+    search index of node texts. Safe to run repeatedly;
+    run it once per deploy (``python manage.py migrate``) instead of on
+    every application start.
+    :param bind: The engine of the database to migrate.
+    :return: The applied changes, empty when the schema was up to date.
+    """
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    applied = [
+        f"create table {table.name}"
+        for table in Base.metadata.sorted_tables
+        if table.name not in existing_tables
+    ]
+    Base.metadata.create_all(bind=bind)
+
+    with bind.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in columns:
+                    continue
+                definition = CreateColumn(column).compile(dialect=bind.dialect)
+                connection.exec_driver_sql(
+                    f"ALTER TABLE {table.name} ADD COLUMN {definition}"
+                )
+                applied.append(f"add column {table.name}.{column.name}")
+            indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(connection)
+                    applied.append(f"create index {index.name}")
+        # Tables created above already got the search index with the nodes
+        # table; older databases get it here, filled from the stored nodes.
+        if "nodes" in existing_tables and "node_search" not in existing_tables:
+            if create_search_index(connection):
+                applied.append("create search index")
+    return applied
+
+
+def migrate_databases(router: ShardRouter | None = shard_router) -> list[str]:
+    """
+    Migrate the database, or with sharding the directory and every shard,
+    whose node and run IDs are then started at the shard's range.
+    :param router: The shards, None for the single database.
+    :return: The applied changes, each prefixed by its shard.
+    """
+    if router is None:
+        return migrate()
+    inspector = inspect(router.directory)
+    applied = [
+        f"create table {table.name}"
+        for table in directory_metadata.sorted_tables
+        if not inspector.has_table(table.name)
+    ]
+    directory_metadata.create_all(bind=router.directory)
+    for shard, bind in enumerate(router.engines):
+        applied.extend(f"shard {shard}: {change}" for change in migrate(bind))
+    applied.extend(router.seed_id_ranges())
+    return applied
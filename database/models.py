@@ -1,26 +1,89 @@
-from sqlalchemy import Enum, Column, Integer, String, ForeignKey
+from datetime import datetime
+
+from sqlalchemy import (
+    Enum,
+    Column,
+    Integer,
+    String,
+    ForeignKey,
+    Text,
+    DateTime,
+    UniqueConstraint,
+    JSON,
+    Index,
+)
 from sqlalchemy.orm import relationship
 
 from database.config import Base
 from schemas.node import NodeType, NodeStatus
+from schemas.run import RunStatus
 
 
 class Workflow(Base):
     """Workflow model configuration."""
 
     __tablename__ = "workflows"
+    # IDs are never reused, so archived workflows can be restored with theirs.
+    __table_args__ = {"sqlite_autoincrement": True}
+
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String)
+    # Bumped in the same transaction as every change to the workflow or its
+    # nodes; processes compare it to decide whether a local cache is fresh.
+    revision = Column(Integer, nullable=False, default=0, server_default="0")
+    # Set with every revision bump; archival picks workflows untouched since.
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     nodes = relationship("Node", back_populates="workflow", cascade="all, delete")
+    versions = relationship(
+        "WorkflowVersion", back_populates="workflow", cascade="all, delete"
+    )
+    runs = relationship("WorkflowRun", back_populates="workflow", cascade="all, delete")
+
+
+class WorkflowVersion(Base):
+    """Immutable published snapshot of a workflow graph."""
+
+    __tablename__ = "workflow_versions"
+    __table_args__ = (
+        UniqueConstraint("workflow_id", "version"),
+        # Row ids are never reused, so they are safe as permanent cache keys.
+        {"sqlite_autoincrement": True},
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    workflow_id = Column(Integer, ForeignKey("workflows.id"), index=True)
+    version = Column(Integer, nullable=False)
+    snapshot = Column(Text, nullable=False)
+    # Highest NodeChange ID of the workflow when it was published; changes
+    # after it are the edits since this version. NULL for versions published
+    # before the change log existed.
+    change_id = Column(Integer)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    workflow = relationship("Workflow", back_populates="versions")
+
+
+class NodeChange(Base):
+    """Entry of the change log: a node of a workflow was written."""
+
+    __tablename__ = "node_changes"
+    __table_args__ = (
+        Index("ix_node_changes_workflow", "workflow_id", "id"),
+        {"sqlite_autoincrement": True},
+    )
+
+    id = Column(Integer, primary_key=True)
+    workflow_id = Column(Integer, nullable=False)
+    node_id = Column(Integer, nullable=False)
 
 
 class Node(Base):
     __tablename__ = "nodes"
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
     node_type = Column(Enum(NodeType))
-    workflow_id = Column(Integer, ForeignKey("workflows.id"))
-    workflow = relationship("Workflow", back_populates="nodes", cascade="all, delete")
+    workflow_id = Column(Integer, ForeignKey("workflows.id"), index=True)
+    workflow = relationship("Workflow", back_populates="nodes")
 
     __mapper_args__ = {"polymorphic_on": node_type}
 
@@ -77,3 +140,108 @@ class EndNode(Node):
         "inherit_condition": id == Node.id,
         "polymorphic_identity": "end",
     }
+
+
+""" Workflow runs """
+
+
+class WorkflowRun(Base):
+    """Durable state of one execution of a published workflow version."""
+
+    __tablename__ = "workflow_runs"
+    __table_args__ = (
+        # Claim query: runnable statuses, least recently advanced first.
+        Index("ix_workflow_runs_claim", "status", "updated_at", "id"),
+        # Shards allocate run IDs from their own range, see database.sharding.
+        {"sqlite_autoincrement": True},
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    workflow_id = Column(Integer, ForeignKey("workflows.id"), index=True)
+    version = Column(Integer, nullable=False)
+    # Node the run executes next.
+    current_node_id = Column(Integer)
+    status = Column(Enum(RunStatus), nullable=False, default=RunStatus.pending)
+    context = Column(JSON, nullable=False, default=dict)
+    error = Column(String)
+    claimed_by = Column(String)
+    lease_expires_at = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    workflow = relationship("Workflow", back_populates="runs")
+    transitions = relationship(
+        "RunTransition",
+        back_populates="run",
+        cascade="all, delete",
+        order_by="RunTransition.id",
+    )
+
+
+class RunTransition(Base):
+    """Status change of a workflow run."""
+
+    __tablename__ = "run_transitions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    run_id = Column(Integer, ForeignKey("workflow_runs.id"), index=True)
+    node_id = Column(Integer)
+    from_status = Column(Enum(RunStatus))
+    to_status = Column(Enum(RunStatus), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    run = relationship("WorkflowRun", back_populates="transitions")
+
+
+""" Archive """
+
+
+class ArchivedWorkflow(Base):
+    """Workflow moved out of the hot tables into the archive store."""
+
+    __tablename__ = "archived_workflows"
+    __table_args__ = (
+        Index("ix_archived_workflows_nodes", "min_node_id", "max_node_id"),
+    )
+
+    workflow_id = Column(Integer, primary_key=True)
+    name = Column(String)
+    revision = Column(Integer, nullable=False)
+    node_count = Column(Integer, nullable=False)
+    # Range of the archived node IDs, to restore a workflow when one of its
+    # nodes is requested.
+    min_node_id = Column(Integer)
+    max_node_id = Column(Integer)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+
+""" Analytics """
+
+
+class NodeVisitStats(Base):
+    """How often paths passed through a node."""
+
+    __tablename__ = "node_visit_stats"
+    # Counters only: the primary key is the whole index, no rowid needed.
+    __table_args__ = {"sqlite_with_rowid": False}
+
+    workflow_id = Column(Integer, primary_key=True)
+    node_id = Column(Integer, primary_key=True)
+    visits = Column(Integer, nullable=False, default=0)
+
+
+class EdgeTraversalStats(Base):
+    """How often paths followed an edge, e.g. a condition's yes or no branch."""
+
+    __tablename__ = "edge_traversal_stats"
+    __table_args__ = {"sqlite_with_rowid": False}
+
+    workflow_id = Column(Integer, primary_key=True)
+    source_id = Column(Integer, primary_key=True)
+    target_id = Column(Integer, primary_key=True)
+    traversals = Column(Integer, nullable=False, default=0)
+
+
+# Registers the flush listener keeping Workflow.revision up to date.
+from database import revisions  # noqa: E402,F401
+
+# Registers the flush listener keeping the node search index up to date.
+from database import search  # noqa: E402,F401
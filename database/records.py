@@ -0,0 +1,103 @@
+from sqlalchemy import Select, func, select
+from sqlalchemy.orm import Session
+
+from database.models import Node, StartNode, MessageNode, ConditionNode
+
+
+class NodeRecord:
+    """
+    Read-only row of a node of any type, built straight from a core SELECT.
+
+    Slots instead of an ORM instance: no identity map entry, instance state
+    or per-attribute instrumentation, so holding many nodes for graph work,
+    exports and batch reads takes a fraction of the memory and time. Columns
+    of other node types are None. Pydantic schemas read it with
+    ``from_attributes`` like an ORM object.
+    """
+
+    __slots__ = (
+        "id",
+        "node_type",
+        "workflow_id",
+        "next_node_id",
+        "message",
+        "status",
+        "condition",
+        "yes_node_id",
+        "no_node_id",
+    )
+
+    def __init__(
+        self,
+        id,
+        node_type,
+        workflow_id,
+        next_node_id=None,
+        message=None,
+        status=None,
+        condition=None,
+        yes_node_id=None,
+        no_node_id=None,
+    ):
+        self.id = id
+        self.node_type = node_type
+        self.workflow_id = workflow_id
+        self.next_node_id = next_node_id
+        self.message = message
+        self.status = status
+        self.condition = condition
+        self.yes_node_id = yes_node_id
+        self.no_node_id = no_node_id
+
+    def __repr__(self) -> str:
+        return f"NodeRecord(id={self.id!r}, node_type={self.node_type!r})"
+
+
+def select_node_records() -> Select:
+    """
+    One query over the node tables returning the columns of NodeRecord in
+    slot order.
+    """
+    nodes = Node.__table__
+    start = StartNode.__table__
+    message = MessageNode.__table__
+    condition = ConditionNode.__table__
+    return (
+        select(
+            nodes.c.id,
+            nodes.c.node_type,
+            nodes.c.workflow_id,
+            func.coalesce(start.c.next_node_id, message.c.next_node_id),
+            message.c.message,
+            message.c.status,
+            condition.c.condition,
+            condition.c.yes_node_id,
+            condition.c.no_node_id,
+        )
+        .select_from(
+            nodes.outerjoin(start, start.c.id == nodes.c.id)
+            .outerjoin(message, message.c.id == nodes.c.id)
+            .outerjoin(condition, condition.c.id == nodes.c.id)
+        )
+        .order_by(nodes.c.id)
+    )
+
+
+def load_node_records(db: Session, *criteria) -> list[NodeRecord]:
+    """
+    Read nodes as records.
+    :param db: Database session for the operation.
+    :param criteria: WHERE clauses over the Node columns,
+        e.g. ``Node.workflow_id == 1``.
+    :return: The matching nodes ordered by ID.
+    """
+    rows = db.execute(select_node_records().where(*criteria))
+    return [NodeRecord(*row) for row in rows]
+
+
+def get_node_record(db: Session, node_id: int) -> NodeRecord | None:
+    """
+    Read one node as a record, or None when it does not exist.
+    """
+    row = db.execute(select_node_records().where(Node.id == node_id)).first()
+    return NodeRecord(*row) if row is not None else None
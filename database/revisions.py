@@ -0,0 +1,106 @@
+from typing import Iterable
+
+from sqlalchemy import event, insert, inspect, select, update
+from sqlalchemy.orm import Session
+
+from database.models import Workflow, Node, NodeChange
+
+
+def bump_revisions(db: Session, workflow_ids: Iterable[int]) -> None:
+    """
+    Increment the revision of workflows changed outside of the ORM.
+    """
+    workflow_ids = {workflow_id for workflow_id in workflow_ids if workflow_id}
+    if workflow_ids:
+        table = Workflow.__table__
+        db.execute(
+            update(table)
+            .where(table.c.id.in_(workflow_ids))
+            .values(revision=table.c.revision + 1)
+        )
+
+
+def log_node_changes(db: Session, node_ids: Iterable[int]) -> None:
+    """
+    Add nodes changed outside of the ORM to the change log.
+    """
+    node_ids = set(node_ids)
+    if node_ids:
+        nodes = Node.__table__
+        db.execute(
+            insert(NodeChange).from_select(
+                ["workflow_id", "node_id"],
+                select(nodes.c.workflow_id, nodes.c.id).where(nodes.c.id.in_(node_ids)),
+            )
+        )
+
+
+def bump_node_revisions(db: Session, node_ids: Iterable[int]) -> None:
+    """
+    Increment the revision of the workflows owning the given nodes and log
+    the nodes as changed.
+    """
+    node_ids = set(node_ids)
+    if node_ids:
+        log_node_changes(db, node_ids)
+        table = Workflow.__table__
+        nodes = Node.__table__
+        db.execute(
+            update(table)
+            .where(
+                table.c.id.in_(
+                    select(nodes.c.workflow_id).where(nodes.c.id.in_(node_ids))
+                )
+            )
+            .values(revision=table.c.revision + 1)
+        )
+
+
+@event.listens_for(Session, "before_flush")
+def _bump_changed_workflows(session: Session, flush_context, instances) -> None:
+    """
+    Bump the revision of every workflow whose nodes are written in this flush.
+    """
+    workflow_ids = set()
+    for obj in session.new:
+        if isinstance(obj, Node):
+            workflow_ids.add(obj.workflow_id)
+    for obj in session.deleted:
+        if isinstance(obj, Node):
+            workflow_ids.add(obj.workflow_id)
+    for obj in session.dirty:
+        if isinstance(obj, Node) and session.is_modified(obj):
+            history = inspect(obj).attrs.workflow_id.history
+            workflow_ids.update(history.deleted or ())
+            workflow_ids.add(obj.workflow_id)
+        elif isinstance(obj, Workflow) and session.is_modified(obj):
+            obj.revision = Workflow.revision + 1
+    bump_revisions(session, workflow_ids)
+
+
+@event.listens_for(Session, "after_flush")
+def _log_changed_nodes(session: Session, flush_context) -> None:
+    """
+    Log every node written in this flush, once per workflow it belongs or
+    belonged to. Nodes deleted together with their workflow are not logged.
+    """
+    deleted_workflows = {obj.id for obj in session.deleted if isinstance(obj, Workflow)}
+    changes = set()
+    for obj in session.new:
+        if isinstance(obj, Node):
+            changes.add((obj.workflow_id, obj.id))
+    for obj in session.deleted:
+        if isinstance(obj, Node) and obj.workflow_id not in deleted_workflows:
+            changes.add((obj.workflow_id, obj.id))
+    for obj in session.dirty:
+        if isinstance(obj, Node) and session.is_modified(obj):
+            history = inspect(obj).attrs.workflow_id.history
+            for workflow_id in (*(history.deleted or ()), obj.workflow_id):
+                changes.add((workflow_id, obj.id))
+    changes = [
+        {"workflow_id": workflow_id, "node_id": node_id}
+        for workflow_id, node_id in changes
+        if workflow_id
+    ]
+    if changes:
+        session.connection().execute(insert(NodeChange.__table__), changes)
@@ -0,0 +1,163 @@
+import weakref
+from typing import Iterable
+
+from sqlalchemy import (
+    Column,
+    Integer,
+    MetaData,
+    Table,
+    Text,
+    delete,
+    event,
+    insert,
+    select,
+    union_all,
+)
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from database.models import Node, MessageNode, ConditionNode
+
+# FTS5 table indexing the text of message and condition nodes; the rowid is
+# the node ID. Kept out of Base.metadata: it is a virtual table that
+# create_all() cannot describe, and is created by create_search_index().
+search_metadata = MetaData()
+node_search = Table(
+    "node_search",
+    search_metadata,
+    Column("rowid", Integer, primary_key=True),
+    Column("text", Text),
+)
+
+# Whether an engine's database has the index, checked once per engine.
+_available: "weakref.WeakKeyDictionary[Engine, bool]" = weakref.WeakKeyDictionary()
+
+
+def search_index_available(connection: Connection) -> bool:
+    """
+    Whether the database has the full-text index; without it (another
+    backend, or SQLite built without FTS5) searches fall back to LIKE.
+    """
+    engine = connection.engine
+    if engine not in _available:
+        _available[engine] = connection.dialect.name == "sqlite" and (
+            connection.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE name = 'node_search'"
+            ).first()
+            is not None
+        )
+    return _available[engine]
+
+
+def _indexed_text(workflow_id: int | None = None):
+    """
+    (node ID, text) of every message and condition node, optionally of one
+    workflow.
+    """
+    nodes = Node.__table__
+    message = MessageNode.__table__
+    condition = ConditionNode.__table__
+    selects = []
+    for table, text in (
+        (message, message.c.message),
+        (condition, condition.c.condition),
+    ):
+        statement = select(table.c.id, text)
+        if workflow_id is not None:
+            statement = statement.join(nodes, nodes.c.id == table.c.id).where(
+                nodes.c.workflow_id == workflow_id
+            )
+        selects.append(statement)
+    return union_all(*selects)
+
+
+def create_search_index(connection: Connection, backfill: bool = True) -> bool:
+    """
+    Create the full-text index if SQLite supports FTS5.
+    :param connection: Connection to the database.
+    :param backfill: Index the nodes already stored.
+    :return: True when the index was created.
+    """
+    if connection.dialect.name != "sqlite":
+        return False
+    try:
+        connection.exec_driver_sql(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS node_search "
+            "USING fts5(text, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+    except OperationalError:  # SQLite built without the FTS5 module.
+        return False
+    if backfill:
+        connection.execute(
+            insert(node_search).from_select(["rowid", "text"], _indexed_text())
+        )
+    _available[connection.engine] = True
+    return True
+
+
+@event.listens_for(Node.__table__, "after_create")
+def _create_with_nodes(target, connection: Connection, **kw) -> None:
+    """New databases get the index together with the nodes table."""
+    create_search_index(connection, backfill=False)
+
+
+def index_workflow(db: Session, workflow_id: int) -> None:
+    """
+    Index every node of a workflow written outside of the ORM, e.g. by a
+    bulk copy. The caller commits.
+    """
+    if search_index_available(db.connection()):
+        db.execute(
+            insert(node_search).from_select(
+                ["rowid", "text"], _indexed_text(workflow_id)
+            )
+        )
+
+
+def unindex_workflow(db: Session, workflow_id: int) -> None:
+    """
+    Drop the index entries of a workflow's nodes before they are deleted
+    outside of the ORM. The caller commits.
+    """
+    if search_index_available(db.connection()):
+        nodes = Node.__table__
+        db.execute(
+            delete(node_search).where(
+                node_search.c.rowid.in_(
+                    select(nodes.c.id).where(nodes.c.workflow_id == workflow_id)
+                )
+            )
+        )
+
+
+def _reindex(connection: Connection, removed: Iterable[int], added: dict) -> None:
+    removed = set(removed) | set(added)
+    if removed:
+        connection.execute(delete(node_search).where(node_search.c.rowid.in_(removed)))
+    if added:
+        connection.execute(
+            insert(node_search),
+            [{"rowid": node_id, "text": text} for node_id, text in added.items()],
+        )
+
+
+@event.listens_for(Session, "after_flush")
+def _sync_search_index(session: Session, flush_context) -> None:
+    """
+    Index the text of the message and condition nodes written in this flush,
+    in the same transaction.
+    """
+    added, removed = {}, []
+    for obj in (*session.new, *session.dirty):
+        if isinstance(obj, MessageNode):
+            added[obj.id] = obj.message
+        elif isinstance(obj, ConditionNode):
+            added[obj.id] = obj.condition
+    for obj in session.deleted:
+        if isinstance(obj, (MessageNode, ConditionNode)):
+            removed.append(obj.id)
+    if added or removed:
+        connection = session.connection()
+        if search_index_available(connection):
+            _reindex(connection, removed, added)
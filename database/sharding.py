@@ -0,0 +1,223 @@
+import threading
+
+from fastapi import HTTPException, status
+from sqlalchemy import (
+    Column,
+    Integer,
+    MetaData,
+    Table,
+    create_engine,
+    event,
+    insert,
+    select,
+    update,
+)
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+import settings
+
+# Each shard allocates node and run IDs from its own range, starting at
+# shard << SHARD_ID_BITS, so an ID alone tells which shard holds the row and
+# IDs stay unique across shards.
+SHARD_ID_BITS = 40
+# Tables whose IDs are routed by range; created with AUTOINCREMENT, so the
+# range start seeded into sqlite_sequence is where new IDs continue from.
+RANGED_TABLES = ("nodes", "workflow_runs")
+
+# The directory, kept in DATABASE_URL: one row per workflow naming the shard
+# that holds it and its nodes, runs and versions. Its autoincrement key is
+# also where workflow IDs come from. Kept out of Base.metadata, which
+# describes the shard databases.
+directory_metadata = MetaData()
+workflow_shards = Table(
+    "workflow_shards",
+    directory_metadata,
+    Column("workflow_id", Integer, primary_key=True),
+    Column("shard", Integer, nullable=False),
+    sqlite_autoincrement=True,
+)
+
+
+class ShardSession(Session):
+    """
+    Session on one shard, chosen when it is created or, for a request that
+    names no workflow, by the first workflow it creates.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs) -> Engine:
+        shard = self.info.get("shard")
+        if shard is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="A workflow, node or run ID is needed to choose the shard",
+            )
+        return self.info["router"].engines[shard]
+
+
+@event.listens_for(ShardSession, "before_flush")
+def _place_new_workflows(session: ShardSession, flush_context, instances) -> None:
+    """
+    Give every new workflow an ID from the directory before it is inserted,
+    on the session's shard, or on the shard its ID picks when the session has
+    none yet.
+    """
+    # Imported here: the models import this module through database.config.
+    from database.models import Workflow
+
+    router = session.info["router"]
+    for obj in session.new:
+        if isinstance(obj, Workflow) and obj.id is None:
+            obj.id, session.info["shard"] = router.place_workflow(
+                session.info.get("shard")
+            )
+
+
+class ShardRouter:
+    """
+    A class to spread workflows over several SQLite databases.
+
+    SQLite takes one writer at a time per file; with every workflow, its
+    nodes, versions and runs in one of count shard files, writes to
+    workflows on different shards never wait for each other. A request is
+    routed to a single shard: by the workflow ID, looked up in the directory
+    (and cached, placements never change), or by a node or run ID, whose
+    range names the shard.
+
+    Attributes:
+    - count (int): Number of shards.
+    - engines (list[Engine]): Engine of each shard.
+    - directory (Engine): Engine of the directory database.
+    """
+
+    def __init__(
+        self,
+        count: int = settings.SHARD_COUNT,
+        url_template: str = settings.SHARD_URL_TEMPLATE,
+        directory_url: str = settings.DATABASE_URL,
+    ):
+        self.count = count
+        self.engines = [
+            create_engine(url_template.format(shard=shard)) for shard in range(count)
+        ]
+        self.directory = create_engine(directory_url)
+        self._placements: dict[int, int] = {}
+        self._lock = threading.Lock()
+        self.session_factories = [
+            sessionmaker(
+                autocommit=False,
+                autoflush=False,
+                class_=ShardSession,
+                info={"shard": shard, "router": self},
+            )
+            for shard in range(count)
+        ]
+
+    def session(self, shard: int | None) -> ShardSession:
+        """
+        A session on a shard, or one placed by the first workflow it creates.
+        """
+        if shard is None:
+            return ShardSession(
+                autocommit=False, autoflush=False, info={"shard": None, "router": self}
+            )
+        return self.session_factories[shard]()
+
+    def shard_of_id(self, row_id: int) -> int:
+        """
+        Shard holding a node or run; shard 0 for IDs outside every range,
+        where the row is reported missing.
+        """
+        shard = row_id >> SHARD_ID_BITS
+        return shard if 0 <= shard < self.count else 0
+
+    def shard_of_workflow(self, workflow_id: int) -> int:
+        """
+        Shard holding a workflow; shard 0 for unknown workflows, where the
+        workflow is reported missing.
+        """
+        shard = self._placements.get(workflow_id)
+        if shard is None:
+            with self.directory.connect() as connection:
+                shard = connection.scalar(
+                    select(workflow_shards.c.shard).where(
+                        workflow_shards.c.workflow_id == workflow_id
+                    )
+                )
+            if shard is None:
+                return 0
+            self._placements[workflow_id] = shard
+        return shard
+
+    def place_workflow(self, shard: int | None = None) -> tuple[int, int]:
+        """
+        Allocate the ID of a new workflow and record its shard.
+        :param shard: Shard to place it on, by default the one its ID picks.
+        :return: The workflow ID and its shard.
+        """
+        with self._lock, self.directory.begin() as connection:
+            workflow_id = connection.scalar(
+                insert(workflow_shards)
+                .values(shard=shard or 0)
+                .returning(workflow_shards.c.workflow_id)
+            )
+            if shard is None:
+                shard = workflow_id % self.count
+                connection.execute(
+                    update(workflow_shards)
+                    .where(workflow_shards.c.workflow_id == workflow_id)
+                    .values(shard=shard)
+                )
+        self._placements[workflow_id] = shard
+        return workflow_id, shard
+
+    def request_shard(
+        self, path_params: dict, query_params, body: dict | None
+    ) -> int | None:
+        """
+        Shard a request is routed to, from the workflow, node or run ID in
+        its path, query or JSON body; None when it names none.
+        """
+        for params in (path_params, query_params, body or {}):
+            workflow_id = params.get("workflow_id")
+            if workflow_id is not None and str(workflow_id).isdigit():
+                return self.shard_of_workflow(int(workflow_id))
+            for name in ("node_id", "run_id"):
+                row_id = params.get(name)
+                if row_id is not None and str(row_id).isdigit():
+                    return self.shard_of_id(int(row_id))
+        node_ids = (body or {}).get("node_ids")
+        if isinstance(node_ids, list) and node_ids:
+            shards = {
+                self.shard_of_id(node_id)
+                for node_id in node_ids
+                if isinstance(node_id, int)
+            }
+            if len(shards) > 1:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="The nodes are on different shards",
+                )
+            return shards.pop() if shards else None
+        return None
+
+    def seed_id_ranges(self) -> list[str]:
+        """
+        Start each shard's node and run IDs at its range.
+        :return: The seeded ranges.
+        """
+        applied = []
+        for shard, engine in enumerate(self.engines):
+            if not shard:
+                continue
+            with engine.begin() as connection:
+                for table in RANGED_TABLES:
+                    seeded = connection.exec_driver_sql(
+                        "INSERT INTO sqlite_sequence (name, seq) SELECT ?, ? "
+                        "WHERE NOT EXISTS "
+                        "(SELECT 1 FROM sqlite_sequence WHERE name = ?)",
+                        (table, (shard << SHARD_ID_BITS) - 1, table),
+                    ).rowcount
+                    if seeded:
+                        applied.append(f"seed shard {shard} {table} IDs")
+        return applied
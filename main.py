@@ -1,15 +1,62 @@
-import uvicorn
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
 
-from database.config import Base, engine
-from routers import workflow, node
+from fastapi import Depends, FastAPI
+from fastapi.responses import ORJSONResponse
 
-Base.metadata.create_all(bind=engine)
+import settings
+from database.config import SessionLocal, session_factories
+from routers import workflow, node, run
+from services.admission import AdmissionController, AdmissionMiddleware
+from services.analytics import path_analytics
+from services.archive import restore_archived, workflow_archive
+from services.compression import CompressionMiddleware
+from services.events import event_bus
+from services.tracing import run_tracer
 
-app = FastAPI()
 
-app.include_router(workflow.router, prefix="/workflow")
-app.include_router(node.router, prefix="/node")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    event_bus.bind()
+    path_analytics.start(SessionLocal)
+    run_tracer.start()
+    for queue in run.dispatch_queues:
+        queue.start()
+    if settings.RUN_SCHEDULER_ENABLED:
+        for scheduler in run.run_schedulers:
+            scheduler.start()
+    workflow_archive.start(*session_factories())
+    yield
+    await workflow_archive.stop()
+    for scheduler in run.run_schedulers:
+        await scheduler.stop()
+    for queue in run.dispatch_queues:
+        await queue.stop()
+    await run_tracer.stop()
+    await path_analytics.stop(SessionLocal)
+    event_bus.unbind()
+
+
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
+
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+# Added last, so it runs first and rejects requests before any other work.
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(
+        AdmissionMiddleware, controller=AdmissionController(SessionLocal)
+    )
+
+# Archived workflows are restored on first access, before any route runs.
+archived = [Depends(restore_archived)]
+app.include_router(workflow.router, prefix="/workflow", dependencies=archived)
+app.include_router(node.router, prefix="/node", dependencies=archived)
+app.include_router(run.router, prefix="/run", dependencies=archived)
 
 if __name__ == "__main__":
+    import uvicorn
+
+    from database.migrations import migrate_databases
+
+    migrate_databases()
     uvicorn.run("main:app", reload=True)
@@ -0,0 +1,91 @@
+"""
+Management commands.
+
+Usage:
+    python manage.py migrate
+    python manage.py import-time [--module main] [--limit 25]
+    python manage.py archive [--after-days 90]
+"""
+
+import argparse
+import subprocess
+import sys
+
+
+def migrate(args: argparse.Namespace) -> None:
+    """Create or update the database schema."""
+    from database.migrations import migrate_databases
+
+    applied = migrate_databases()
+    for change in applied:
+        print(change)
+    print(f"{len(applied)} change(s) applied" if applied else "Schema is up to date")
+
+
+def archive(args: argparse.Namespace) -> None:
+    """Archive the workflows unchanged for longer than --after-days."""
+    import settings
+    from database.config import session_factories
+    from services.archive import WorkflowArchive
+
+    after_days = args.after_days
+    if after_days is None:
+        after_days = settings.ARCHIVE_AFTER_DAYS
+    workflow_archive = WorkflowArchive(after_days=after_days)
+    archived = sum(
+        workflow_archive.archive_inactive(session_factory)
+        for session_factory in session_factories()
+    )
+    print(f"{archived} workflow(s) archived")
+
+
+def parse_import_times(output: str) -> list[tuple[str, int, int]]:
+    """
+    Parse ``python -X importtime`` output.
+    :return: (module, self us, cumulative us) per imported module.
+    """
+    timings = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        own, cumulative, module = line[len("import time:") :].split("|")
+        timings.append((module.strip(), int(own), int(cumulative)))
+    return timings
+
+
+def import_time(args: argparse.Namespace) -> None:
+    """Report per-module import timings of a fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {args.module}"],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode:
+        sys.exit(result.stderr)
+    timings = parse_import_times(result.stderr)
+    total = next(
+        (cumulative for module, _, cumulative in timings if module == args.module), 0
+    )
+    print(f"{'cumulative ms':>13}  {'self ms':>8}  module")
+    for module, own, cumulative in sorted(timings, key=lambda t: -t[2])[: args.limit]:
+        print(f"{cumulative / 1000:>13.1f}  {own / 1000:>8.1f}  {module}")
+    print(f"\nimport {args.module}: {total / 1000:.1f} ms, {len(timings)} modules")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Workflow service management")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("migrate", help=migrate.__doc__).set_defaults(handler=migrate)
+    report = commands.add_parser("import-time", help=import_time.__doc__)
+    report.add_argument("--module", default="main")
+    report.add_argument("--limit", type=int, default=25)
+    report.set_defaults(handler=import_time)
+    archiving = commands.add_parser("archive", help=archive.__doc__)
+    archiving.add_argument("--after-days", type=float, default=None)
+    archiving.set_defaults(handler=archive)
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,109 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, Request, Response, status
 from sqlalchemy.orm import Session
 
+import settings
 from database.config import get_db
+from routers.responses import make_etag, model_response, not_modified
 from schemas.node import (
     StartNodeSchema,
     MessageNodeSchema,
     ConditionNodeSchema,
     EndNodeSchema,
     NodeType,
+    StartNodeResponseSchema,
+    MessageNodeResponseSchema,
+    ConditionNodeResponseSchema,
+    EndNodeResponseSchema,
+    NodeResponseSchema,
+    NodeStatus,
+    MessageNodeStatusTransitionSchema,
+    MessageNodeStatusTransitionResponseSchema,
 )
+from schemas.search import NodeSearchPageSchema
 from services.node import NodeService
+from services.search import NodeSearchService
+from services.workflow import WorkflowService
 
 router = APIRouter()
 node_service = NodeService()
+search_service = NodeSearchService()
+workflow_service = WorkflowService()
+
+"""
+Search nodes (registered before /{node_id}/, which would match "search")
+"""
+
+
+@router.get(
+    "/search/",
+    tags=["nodes"],
+    status_code=status.HTTP_200_OK,
+    response_model=NodeSearchPageSchema,
+)
+def search_nodes(
+    q: str = Query(min_length=1, max_length=200),
+    workflow_id: int | None = None,
+    node_type: NodeType | None = None,
+    node_status: NodeStatus | None = Query(None, alias="status"),
+    after: int | None = None,
+    limit: int = Query(
+        settings.SEARCH_PAGE_SIZE, ge=1, le=settings.SEARCH_MAX_PAGE_SIZE
+    ),
+    db: Session = Depends(get_db),
+):
+    """
+    Message and condition nodes whose text contains the phrase q, one page at
+    a time: pass the returned next_after as after for the next page.
+    """
+    page = search_service.search(
+        query=q,
+        db=db,
+        workflow_id=workflow_id,
+        node_type=node_type,
+        node_status=node_status,
+        after=after,
+        limit=limit,
+    )
+    return model_response(NodeSearchPageSchema, page)
+
 
 """
 Get exist node
 """
 
 
-@router.get("/{node_id}/", tags=["nodes"], status_code=status.HTTP_200_OK)
-async def get_node(node_id: int, db: Session = Depends(get_db)):
-    return node_service.get_node(db=db, node_id=node_id)
+@router.get(
+    "/{node_id}/",
+    tags=["nodes"],
+    status_code=status.HTTP_200_OK,
+    response_model=NodeResponseSchema,
+)
+def get_node(node_id: int, request: Request, db: Session = Depends(get_db)):
+    workflow_id, revision = node_service.get_revision(node_id=node_id, db=db)
+    etag = None
+    if revision is not None:
+        etag = make_etag("node", node_id, workflow_id, revision)
+        if (response := not_modified(request, etag)) is not None:
+            return response
+    node = node_service.get_node(db=db, node_id=node_id)
+    return model_response(type(node), node, etag=etag)
+
+
+@router.get(
+    "/workflow/{workflow_id}/",
+    tags=["nodes"],
+    status_code=status.HTTP_200_OK,
+    response_model=list[NodeResponseSchema],
+)
+def list_workflow_nodes(
+    workflow_id: int, request: Request, db: Session = Depends(get_db)
+):
+    revision = workflow_service.get_revision(workflow_id=workflow_id, db=db)
+    etag = make_etag("nodes", workflow_id, revision)
+    if (response := not_modified(request, etag)) is not None:
+        return response
+    nodes = node_service.list_nodes(workflow_id=workflow_id, db=db)
+    return model_response(list[NodeResponseSchema], nodes, etag=etag)
 
 
 """
@@ -33,38 +115,62 @@ Create a new nodes
     "/create-start-node/",
     tags=["nodes"],
     status_code=status.HTTP_201_CREATED,
+    response_model=StartNodeResponseSchema,
 )
 def create_start_node(node_data: StartNodeSchema, db: Session = Depends(get_db)):
-    return node_service.create_node(
+    node = node_service.create_node(
         node_type=NodeType.start.value, db=db, node_data=node_data
     )
+    return model_response(
+        StartNodeResponseSchema, node, status_code=status.HTTP_201_CREATED
+    )
 
 
 @router.post(
-    "/create-message-node/", tags=["nodes"], status_code=status.HTTP_201_CREATED
+    "/create-message-node/",
+    tags=["nodes"],
+    status_code=status.HTTP_201_CREATED,
+    response_model=MessageNodeResponseSchema,
 )
 def create_message_node(node_data: MessageNodeSchema, db: Session = Depends(get_db)):
-    return node_service.create_node(
+    node = node_service.create_node(
         node_type=NodeType.message.value, db=db, node_data=node_data
     )
+    return model_response(
+        MessageNodeResponseSchema, node, status_code=status.HTTP_201_CREATED
+    )
 
 
 @router.post(
-    "/create-condition-node/", tags=["nodes"], status_code=status.HTTP_201_CREATED
+    "/create-condition-node/",
+    tags=["nodes"],
+    status_code=status.HTTP_201_CREATED,
+    response_model=ConditionNodeResponseSchema,
 )
 def create_condition_node(
     node_data: ConditionNodeSchema, db: Session = Depends(get_db)
 ):
-    return node_service.create_node(
+    node = node_service.create_node(
         node_type=NodeType.condition.value, db=db, node_data=node_data
     )
+    return model_response(
+        ConditionNodeResponseSchema, node, status_code=status.HTTP_201_CREATED
+    )
 
 
-@router.post("/create-end-node/", tags=["nodes"], status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/create-end-node/",
+    tags=["nodes"],
+    status_code=status.HTTP_201_CREATED,
+    response_model=EndNodeResponseSchema,
+)
 def create_end_node(node_data: EndNodeSchema, db: Session = Depends(get_db)):
-    return node_service.create_node(
+    node = node_service.create_node(
         node_type=NodeType.end.value, db=db, node_data=node_data
     )
+    return model_response(
+        EndNodeResponseSchema, node, status_code=status.HTTP_201_CREATED
+    )
 
 
 """
@@ -73,39 +179,72 @@ Edit an existing node
 
 
 @router.put(
-    "/update-start-node/{node_id}/", tags=["nodes"], status_code=status.HTTP_200_OK
+    "/update-start-node/{node_id}/",
+    tags=["nodes"],
+    status_code=status.HTTP_200_OK,
+    response_model=StartNodeResponseSchema,
 )
 def update_start_node(
     node_id: int, node_data: StartNodeSchema, db: Session = Depends(get_db)
 ):
-    return node_service.update_node(node_id=node_id, data=node_data, db=db)
+    node = node_service.update_node(node_id=node_id, data=node_data, db=db)
+    return model_response(StartNodeResponseSchema, node)
 
 
 @router.put(
-    "/update-message-node/{node_id}/", tags=["nodes"], status_code=status.HTTP_200_OK
+    "/update-message-node/{node_id}/",
+    tags=["nodes"],
+    status_code=status.HTTP_200_OK,
+    response_model=MessageNodeResponseSchema,
 )
 def update_message_node(
     node_id: int, node_data: MessageNodeSchema, db: Session = Depends(get_db)
 ):
-    return node_service.update_node(node_id=node_id, data=node_data, db=db)
+    node = node_service.update_node(node_id=node_id, data=node_data, db=db)
+    return model_response(MessageNodeResponseSchema, node)
 
 
 @router.put(
-    "/update-condition-node/{node_id}/", tags=["nodes"], status_code=status.HTTP_200_OK
+    "/update-condition-node/{node_id}/",
+    tags=["nodes"],
+    status_code=status.HTTP_200_OK,
+    response_model=ConditionNodeResponseSchema,
 )
 def update_condition_node(
     node_id: int, node_data: ConditionNodeSchema, db: Session = Depends(get_db)
 ):
-    return node_service.update_node(node_id=node_id, data=node_data, db=db)
+    node = node_service.update_node(node_id=node_id, data=node_data, db=db)
+    return model_response(ConditionNodeResponseSchema, node)
 
 
 @router.put(
-    "/update-end-node/{node_id}/", tags=["nodes"], status_code=status.HTTP_200_OK
+    "/update-end-node/{node_id}/",
+    tags=["nodes"],
+    status_code=status.HTTP_200_OK,
+    response_model=EndNodeResponseSchema,
 )
 def update_end_node(
     node_id: int, node_data: EndNodeSchema, db: Session = Depends(get_db)
 ):
-    return node_service.update_node(node_id=node_id, data=node_data, db=db)
+    node = node_service.update_node(node_id=node_id, data=node_data, db=db)
+    return model_response(EndNodeResponseSchema, node)
+
+
+@router.post(
+    "/message/status/",
+    tags=["nodes"],
+    status_code=status.HTTP_200_OK,
+    response_model=MessageNodeStatusTransitionResponseSchema,
+)
+def transition_message_node_status(
+    data: MessageNodeStatusTransitionSchema, db: Session = Depends(get_db)
+):
+    """
+    Move the message nodes matching the filters to to_status at once, e.g.
+    Pending -> Sent after an external batch send.
+    """
+    counts = node_service.transition_message_status(data=data, db=db)
+    return model_response(MessageNodeStatusTransitionResponseSchema, counts)
 
 
 """
@@ -114,7 +253,11 @@ Drop node
 
 
 @router.delete(
-    "/node/{node_id}", tags=["nodes"], status_code=status.HTTP_204_NO_CONTENT
+    "/node/{node_id}",
+    tags=["nodes"],
+    status_code=status.HTTP_204_NO_CONTENT,
+    response_class=Response,
 )
 def delete_node(node_id: int, db: Session = Depends(get_db)):
-    return node_service.delete_node(node_id=node_id, db=db)
+    node_service.delete_node(node_id=node_id, db=db)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,80 @@
+from functools import lru_cache
+from typing import Any
+
+from fastapi import Request, Response, status
+from pydantic import TypeAdapter
+
+from services.compression import decoded_etag
+
+
+class PydanticResponse(Response):
+    """
+    JSON response whose body was already rendered by pydantic.
+
+    FastAPI skips ``jsonable_encoder`` and response validation for any
+    ``Response`` returned from a route, so the body is produced exactly once
+    by the schema's compiled serializer.
+    """
+
+    media_type = "application/json"
+
+
+@lru_cache(maxsize=None)
+def get_adapter(schema: Any) -> TypeAdapter:
+    """
+    Get a cached TypeAdapter for a schema (model, union or container type).
+    """
+    return TypeAdapter(schema)
+
+
+def model_response(
+    schema: Any,
+    content: Any,
+    status_code: int = status.HTTP_200_OK,
+    etag: str | None = None,
+) -> PydanticResponse:
+    """
+    Validate content against schema and serialize it straight to JSON bytes.
+
+    Must be called while the database session is still open: ORM objects are
+    read here (via ``from_attributes``) and never touched again afterwards.
+    :param schema: response schema the content is validated against
+    :param content: ORM object, schema instance or plain data
+    :param status_code: response status code
+    :param etag: entity tag of the content, see make_etag()
+    :return: response with the rendered body
+    """
+    adapter = get_adapter(schema)
+    body = adapter.dump_json(adapter.validate_python(content, from_attributes=True))
+    headers = {"ETag": etag} if etag is not None else None
+    return PydanticResponse(content=body, status_code=status_code, headers=headers)
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Strong entity tag built from values that change whenever the resource
+    does, e.g. its ID and revision, so no body has to be hashed.
+    """
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+
+def not_modified(request: Request, etag: str) -> Response | None:
+    """
+    A 304 response when the request's If-None-Match holds the current tag.
+
+    Tags of compressed representations carry a suffix (see
+    CompressionMiddleware) and match the tag they were derived from; the
+    304 repeats the tag the client sent.
+    :return: The 304 response, None when the resource has to be sent.
+    """
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return None
+    for candidate in header.split(","):
+        candidate = candidate.strip().removeprefix("W/")
+        if candidate == "*" or decoded_etag(candidate) == etag:
+            return Response(
+                status_code=status.HTTP_304_NOT_MODIFIED,
+                headers={"ETag": etag if candidate == "*" else candidate},
+            )
+    return None
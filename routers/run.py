@@ -0,0 +1,91 @@
+from collections import Counter
+
+from fastapi import APIRouter, Depends, status
+from sqlalchemy.orm import Session
+
+from database.config import get_db, session_factories
+from routers.responses import model_response
+from schemas.run import RunCreateSchema, RunSchema, RunStatus, RunTransitionSchema
+from services.dispatch import DispatchQueue, create_sender
+from services.run import RunService, RunScheduler
+from services.tracing import run_tracer
+
+router = APIRouter()
+
+runs_services = RunService()
+sender = create_sender()
+# One dispatch queue and scheduler per database, i.e. per shard when sharded.
+dispatch_queues = [
+    DispatchQueue(sender, session_factory, runs=runs_services)
+    for session_factory in session_factories()
+]
+run_schedulers = [
+    RunScheduler(session_factory, dispatcher=queue.submit_threadsafe)
+    for session_factory, queue in zip(session_factories(), dispatch_queues)
+]
+
+
+@router.post(
+    "/start/{workflow_id}/",
+    tags=["runs"],
+    status_code=status.HTTP_201_CREATED,
+    response_model=RunSchema,
+)
+def start_run(workflow_id: int, data: RunCreateSchema, db: Session = Depends(get_db)):
+    run = runs_services.create_run(workflow_id=workflow_id, data=data, db=db)
+    return model_response(RunSchema, run, status_code=status.HTTP_201_CREATED)
+
+
+@router.get(
+    "/workflow/{workflow_id}/",
+    tags=["runs"],
+    status_code=status.HTTP_200_OK,
+    response_model=list[RunSchema],
+)
+def list_runs(
+    workflow_id: int,
+    run_status: RunStatus | None = None,
+    db: Session = Depends(get_db),
+):
+    runs = runs_services.list_runs(
+        workflow_id=workflow_id, run_status=run_status, db=db
+    )
+    return model_response(list[RunSchema], runs)
+
+
+@router.get("/dispatch/stats/", tags=["runs"], status_code=status.HTTP_200_OK)
+def get_dispatch_stats():
+    stats = Counter()
+    for queue in dispatch_queues:
+        stats.update({**queue.stats, "size": queue.size})
+    return dict(stats)
+
+
+@router.get("/traces/", tags=["runs"], status_code=status.HTTP_200_OK)
+def get_run_traces(run_id: int | None = None):
+    """
+    Recently recorded spans of sampled runs, or of one run, as OTLP JSON.
+    """
+    return run_tracer.traces(run_id=run_id)
+
+
+@router.get(
+    "/{run_id}/",
+    tags=["runs"],
+    status_code=status.HTTP_200_OK,
+    response_model=RunSchema,
+)
+def get_run(run_id: int, db: Session = Depends(get_db)):
+    run = runs_services.get_run(run_id=run_id, db=db)
+    return model_response(RunSchema, run)
+
+
+@router.get(
+    "/{run_id}/transitions/",
+    tags=["runs"],
+    status_code=status.HTTP_200_OK,
+    response_model=list[RunTransitionSchema],
+)
+def get_run_transitions(run_id: int, db: Session = Depends(get_db)):
+    transitions = runs_services.get_transitions(run_id=run_id, db=db)
+    return model_response(list[RunTransitionSchema], transitions)
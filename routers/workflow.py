@@ -1,47 +1,422 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+
+import orjson
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
+import settings
+
 from database.config import get_db
-from schemas.workflow import WorkflowCreateSchema, WorkflowUpdateSchema
+from routers.responses import make_etag, model_response, not_modified
+from schemas.analysis import WorkflowAnalysisSchema
+from schemas.analytics import WorkflowStatsSchema
+from schemas.diff import WorkflowDiffSchema
+from schemas.layout import WorkflowLayoutSchema
+from schemas.simulation import SimulationRequestSchema, WorkflowSimulationSchema
+from schemas.workflow import (
+    Workflow,
+    WorkflowCreateSchema,
+    WorkflowCloneSchema,
+    WorkflowUpdateSchema,
+    WorkflowSequenceSchema,
+    WorkflowVersionSchema,
+    WorkflowSnapshotSchema,
+    ArchivedWorkflowSchema,
+)
+from services.analysis import WorkflowAnalysisService
+from services.analytics import path_analytics
+from services.archive import workflow_archive
+from services.diff import WorkflowDiffService
+from services.events import event_bus
+from services.layout import WorkflowLayoutService
+from services.paths import WorkflowPathService
+from services.simulation import WorkflowSimulationService
+from services.version import WorkflowVersionService
 from services.workflow import WorkflowService
 
 router = APIRouter()
 
 workflows_services = WorkflowService()
+versions_services = WorkflowVersionService()
+analysis_services = WorkflowAnalysisService()
+paths_services = WorkflowPathService(versions=versions_services)
+diff_services = WorkflowDiffService(versions=versions_services)
+layout_services = WorkflowLayoutService(workflows=workflows_services)
+simulation_services = WorkflowSimulationService(workflows=workflows_services)
+
+# Streamed responses are sent in chunks of about this many bytes.
+STREAM_CHUNK_SIZE = 16 * 1024
 
 
-@router.post("/create/", status_code=status.HTTP_201_CREATED, tags=["workflows"])
+@router.post(
+    "/create/",
+    status_code=status.HTTP_201_CREATED,
+    tags=["workflows"],
+    response_model=Workflow,
+)
 def create_workflow(workflow_data: WorkflowCreateSchema, db: Session = Depends(get_db)):
-    return workflows_services.create_workflow(workflow_data=workflow_data, db=db)
+    workflow = workflows_services.create_workflow(workflow_data=workflow_data, db=db)
+    return model_response(Workflow, workflow, status_code=status.HTTP_201_CREATED)
 
 
-@router.get("/get/{workflow_id}/", status_code=status.HTTP_200_OK, tags=["workflows"])
-def get_workflow(workflow_id: int, db: Session = Depends(get_db)):
+@router.get(
+    "/get/{workflow_id}/",
+    status_code=status.HTTP_200_OK,
+    tags=["workflows"],
+    response_model=Workflow,
+)
+def get_workflow(workflow_id: int, request: Request, db: Session = Depends(get_db)):
+    revision = workflows_services.get_revision(workflow_id=workflow_id, db=db)
+    etag = make_etag("workflow", workflow_id, revision)
+    if (response := not_modified(request, etag)) is not None:
+        return response
     workflow = workflows_services.get_workflow(workflow_id=workflow_id, db=db)
     if workflow:
-        return workflow
+        return model_response(Workflow, workflow, etag=etag)
     raise HTTPException(status_code=404, detail="Workflow not found")
 
 
 @router.put(
-    "/update/{workflow_id}/", status_code=status.HTTP_200_OK, tags=["workflows"]
+    "/update/{workflow_id}/",
+    status_code=status.HTTP_200_OK,
+    tags=["workflows"],
+    response_model=Workflow,
 )
 def update_workflow(
     workflow_id: int, data: WorkflowUpdateSchema, db: Session = Depends(get_db)
 ):
-    return workflows_services.update_workflow(workflow_id=workflow_id, data=data, db=db)
+    workflow = workflows_services.update_workflow(
+        workflow_id=workflow_id, data=data, db=db
+    )
+    return model_response(Workflow, workflow)
 
 
 @router.delete(
-    "/delete/{workflow_id}/", status_code=status.HTTP_204_NO_CONTENT, tags=["workflows"]
+    "/delete/{workflow_id}/",
+    status_code=status.HTTP_204_NO_CONTENT,
+    tags=["workflows"],
+    response_class=Response,
 )
 def delete_workflow(workflow_id: int, db: Session = Depends(get_db)):
     workflows_services.delete_workflow(workflow_id=workflow_id, db=db)
-    return {"message": "Workflow deleted"}, status.HTTP_204_NO_CONTENT
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.post(
+    "/clone/{workflow_id}/",
+    status_code=status.HTTP_201_CREATED,
+    tags=["workflows"],
+    response_model=Workflow,
+)
+def clone_workflow(
+    workflow_id: int,
+    clone_data: WorkflowCloneSchema,
+    db: Session = Depends(get_db),
+):
+    """
+    Copy a workflow with all its nodes, e.g. a template for a customer.
+    """
+    workflow = workflows_services.clone_workflow(
+        workflow_id=workflow_id, data=clone_data, db=db
+    )
+    return model_response(Workflow, workflow, status_code=status.HTTP_201_CREATED)
+
+
+@router.post(
+    "/archive/{workflow_id}/",
+    status_code=status.HTTP_201_CREATED,
+    tags=["workflows"],
+    response_model=ArchivedWorkflowSchema,
+)
+def archive_workflow(workflow_id: int, db: Session = Depends(get_db)):
+    """
+    Move a workflow to the archive store now; the next request naming it
+    restores it.
+    """
+    archived = workflow_archive.archive(workflow_id=workflow_id, db=db)
+    return model_response(
+        ArchivedWorkflowSchema, archived, status_code=status.HTTP_201_CREATED
+    )
+
+
+@router.get(
+    "/get-sequence/{workflow_id}",
+    tags=["workflows"],
+    status_code=status.HTTP_200_OK,
+    response_model=WorkflowSequenceSchema,
+)
+def get_sequence(
+    workflow_id: int,
+    request: Request,
+    version: int | None = None,
+    draft: bool = False,
+    db: Session = Depends(get_db),
+):
+    """
+    Sequence of the latest published version, a given version, or the draft.
+
+    Tagged with the draft revision or the version row ID, so an unchanged
+    sequence is answered with 304 before any graph is loaded.
+    """
+    if draft:
+        revision = workflows_services.get_revision(workflow_id=workflow_id, db=db)
+        etag = make_etag("draft", workflow_id, revision)
+    else:
+        version_id = versions_services.get_version_id(
+            workflow_id=workflow_id, version=version, db=db
+        )
+        etag = make_etag("version", version_id)
+    if (response := not_modified(request, etag)) is not None:
+        return response
+    if draft:
+        sequence = workflows_services.create_and_run_sequence(
+            db=db, workflow_id=workflow_id
+        )
+    else:
+        sequence = versions_services.get_sequence(
+            workflow_id=workflow_id, version=version, db=db
+        )
+    path_analytics.record(workflow_id, sequence["path"])
+    return model_response(WorkflowSequenceSchema, sequence, etag=etag)
+
+
+@router.get(
+    "/layout/{workflow_id}/",
+    tags=["workflows"],
+    status_code=status.HTTP_200_OK,
+    response_model=WorkflowLayoutSchema,
+)
+def get_workflow_layout(
+    workflow_id: int, request: Request, db: Session = Depends(get_db)
+):
+    """
+    Nodes of the draft with their coordinates in a layered drawing and the
+    routes of the edges, for the visual editor.
+
+    Tagged with the draft revision, so an unchanged layout is answered with
+    304 before any node is read.
+    """
+    revision = workflows_services.get_revision(workflow_id=workflow_id, db=db)
+    etag = make_etag("layout", workflow_id, revision)
+    if (response := not_modified(request, etag)) is not None:
+        return response
+    layout = layout_services.get_layout(workflow_id=workflow_id, db=db)
+    return model_response(WorkflowLayoutSchema, layout, etag=etag)
+
+
+@router.get(
+    "/analyze/{workflow_id}/",
+    tags=["workflows"],
+    status_code=status.HTTP_200_OK,
+    response_model=WorkflowAnalysisSchema,
+)
+def analyze_workflow(workflow_id: int, db: Session = Depends(get_db)):
+    """
+    Report every structural problem of the draft graph at once.
+    """
+    report = analysis_services.analyze(workflow_id=workflow_id, db=db)
+    return model_response(WorkflowAnalysisSchema, report)
+
+
+@router.post(
+    "/simulate/{workflow_id}/",
+    tags=["workflows"],
+    status_code=status.HTTP_200_OK,
+    response_model=WorkflowSimulationSchema,
+)
+def simulate_workflow(
+    workflow_id: int, data: SimulationRequestSchema, db: Session = Depends(get_db)
+):
+    """
+    Dry run of the draft: expected visits of every node, and so messages
+    sent, over many runs with the given branch probabilities or the
+    contexts of past runs.
+    """
+    simulation = simulation_services.simulate(workflow_id=workflow_id, data=data, db=db)
+    return model_response(WorkflowSimulationSchema, simulation)
+
+
+def _ndjson_stream(items):
+    """
+    Encode items as newline-delimited JSON, grouped into chunks.
+    """
+    chunk = bytearray()
+    for item in items:
+        chunk += orjson.dumps(item)
+        chunk += b"\n"
+        if len(chunk) >= STREAM_CHUNK_SIZE:
+            yield bytes(chunk)
+            chunk.clear()
+    if chunk:
+        yield bytes(chunk)
+
+
+@router.get(
+    "/paths/{workflow_id}/",
+    tags=["workflows"],
+    status_code=status.HTTP_200_OK,
+    response_class=StreamingResponse,
+)
+def stream_workflow_paths(
+    workflow_id: int,
+    version: int | None = None,
+    draft: bool = False,
+    max_paths: int = Query(settings.PATHS_MAX_PATHS, ge=1, le=settings.PATHS_MAX_PATHS),
+    max_depth: int = Query(settings.PATHS_MAX_DEPTH, ge=1, le=settings.PATHS_MAX_DEPTH),
+    timeout: float = Query(settings.PATHS_TIMEOUT, gt=0, le=settings.PATHS_TIMEOUT),
+    db: Session = Depends(get_db),
+):
+    """
+    Every simple start-to-end path as NDJSON, one {"path": [...]} per line,
+    ending with a {"summary": {...}} line telling whether the list is complete.
+    """
+    structure = paths_services.load_structure(
+        workflow_id=workflow_id, version=version, draft=draft, db=db
+    )
+    items = paths_services.iter_paths(
+        structure, max_paths=max_paths, max_depth=max_depth, timeout=timeout
+    )
+    return StreamingResponse(_ndjson_stream(items), media_type="application/x-ndjson")
+
+
+@router.get(
+    "/stats/{workflow_id}/",
+    tags=["workflows"],
+    status_code=status.HTTP_200_OK,
+    response_model=WorkflowStatsSchema,
+)
+def get_workflow_stats(workflow_id: int, db: Session = Depends(get_db)):
+    """
+    Node visits, edge traversals and condition branches taken by sequence
+    requests and runs.
+    """
+    stats = path_analytics.get_stats(workflow_id=workflow_id, db=db)
+    return model_response(WorkflowStatsSchema, stats)
+
+
+@router.get("/coalescing/stats/", tags=["workflows"], status_code=status.HTTP_200_OK)
+def get_coalescing_stats():
+    """
+    Builds executed and concurrent requests coalesced into them.
+    """
+    return {
+        "sequences": workflows_services.flights.stats,
+        "snapshots": versions_services.flights.stats,
+    }
+
+
+@router.post(
+    "/publish/{workflow_id}/",
+    tags=["workflows"],
+    status_code=status.HTTP_201_CREATED,
+    response_model=WorkflowVersionSchema,
+)
+def publish_workflow(workflow_id: int, db: Session = Depends(get_db)):
+    workflow_version = versions_services.publish(workflow_id=workflow_id, db=db)
+    return model_response(
+        WorkflowVersionSchema, workflow_version, status_code=status.HTTP_201_CREATED
+    )
 
 
 @router.get(
-    "/get-sequence/{workflow_id}", tags=["workflows"], status_code=status.HTTP_200_OK
+    "/versions/{workflow_id}/",
+    tags=["workflows"],
+    status_code=status.HTTP_200_OK,
+    response_model=list[WorkflowVersionSchema],
 )
-def get_sequence(workflow_id: int, db: Session = Depends(get_db)):
-    return workflows_services.create_and_run_sequence(db=db, workflow_id=workflow_id)
+def list_workflow_versions(workflow_id: int, db: Session = Depends(get_db)):
+    workflow_versions = versions_services.list_versions(workflow_id=workflow_id, db=db)
+    return model_response(list[WorkflowVersionSchema], workflow_versions)
+
+
+@router.get(
+    "/versions/{workflow_id}/{version}/",
+    tags=["workflows"],
+    status_code=status.HTTP_200_OK,
+    response_model=WorkflowSnapshotSchema,
+)
+def get_workflow_version(
+    workflow_id: int, version: int, request: Request, db: Session = Depends(get_db)
+):
+    version_id = versions_services.get_version_id(
+        workflow_id=workflow_id, version=version, db=db
+    )
+    etag = make_etag("snapshot", version_id)
+    if (response := not_modified(request, etag)) is not None:
+        return response
+    snapshot = versions_services.get_snapshot(
+        workflow_id=workflow_id, version=version, db=db
+    )
+    return model_response(WorkflowSnapshotSchema, snapshot, etag=etag)
+
+
+@router.get(
+    "/diff/{workflow_id}/",
+    tags=["workflows"],
+    status_code=status.HTTP_200_OK,
+    response_model=WorkflowDiffSchema,
+)
+def diff_workflow(
+    workflow_id: int,
+    base: int | None = None,
+    target: int | None = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Nodes, edges and start-to-end paths added, removed or changed from a
+    published version (the latest by default) to another one or the draft.
+    """
+    diff = diff_services.diff(workflow_id=workflow_id, base=base, target=target, db=db)
+    return model_response(WorkflowDiffSchema, diff)
+
+
+async def _event_stream(workflow_id: int, request: Request):
+    """
+    Server-Sent Events of coalesced change batches for one workflow.
+    """
+    subscription = event_bus.subscribe(workflow_id)
+    try:
+        yield b"retry: 3000\n\n"
+        while not await request.is_disconnected():
+            try:
+                batch = await asyncio.wait_for(
+                    subscription.get(), settings.EVENTS_KEEPALIVE
+                )
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            yield b"id: %d\nevent: change\ndata: %s\n\n" % (
+                batch["id"],
+                orjson.dumps(batch),
+            )
+    finally:
+        event_bus.unsubscribe(subscription)
+
+
+@router.get(
+    "/events/{workflow_id}/",
+    tags=["workflows"],
+    status_code=status.HTTP_200_OK,
+    response_class=StreamingResponse,
+)
+def stream_workflow_events(
+    workflow_id: int, request: Request, db: Session = Depends(get_db)
+):
+    """
+    Stream changes of a workflow and its nodes instead of polling for them.
+    """
+    workflows_services.get_workflow(workflow_id=workflow_id, db=db)
+    return StreamingResponse(
+        _event_stream(workflow_id, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,58 @@
+from enum import Enum
+
+from pydantic import BaseModel
+
+
+class IssueSeverity(str, Enum):
+    error = "error"
+    warning = "warning"
+
+
+class AnalysisIssueSchema(BaseModel):
+    """
+    Schema for one problem found in a workflow graph.
+    """
+
+    severity: IssueSeverity
+    code: str
+    message: str
+    node_ids: list[int] = []
+
+
+class DanglingReferenceSchema(BaseModel):
+    """
+    Schema for an edge that is missing or points outside the workflow.
+    """
+
+    node_id: int
+    field: str
+    target_id: int | None
+
+
+class CycleSchema(BaseModel):
+    """
+    Schema for a strongly connected group of nodes.
+    """
+
+    node_ids: list[int]
+    has_exit: bool
+
+
+class WorkflowAnalysisSchema(BaseModel):
+    """
+    Schema for the structural report of a workflow graph.
+    """
+
+    workflow_id: int
+    revision: int
+    valid: bool
+    node_count: int
+    edge_count: int
+    start_node: int | None
+    end_nodes: list[int]
+    unreachable_nodes: list[int]
+    dead_end_nodes: list[int]
+    cycles: list[CycleSchema]
+    converging_conditions: list[int]
+    dangling_references: list[DanglingReferenceSchema]
+    issues: list[AnalysisIssueSchema]
@@ -0,0 +1,52 @@
+from pydantic import BaseModel
+
+from schemas.node import NodeType
+
+
+class NodeVisitsSchema(BaseModel):
+    """
+    Schema for the number of paths that passed through a node.
+    """
+
+    node_id: int
+    node_type: NodeType
+    visits: int
+
+    class Config:
+        from_attributes = True
+
+
+class EdgeTraversalsSchema(BaseModel):
+    """
+    Schema for the number of times an edge was followed.
+    """
+
+    source_id: int
+    target_id: int
+    traversals: int
+
+    class Config:
+        from_attributes = True
+
+
+class BranchStatsSchema(BaseModel):
+    """
+    Schema for how often each branch of a condition node was taken.
+    """
+
+    node_id: int
+    yes: int
+    no: int
+
+
+class WorkflowStatsSchema(BaseModel):
+    """
+    Schema for the aggregated path statistics of a workflow.
+    """
+
+    workflow_id: int
+    paths: int
+    average_path_length: float | None
+    nodes: list[NodeVisitsSchema]
+    edges: list[EdgeTraversalsSchema]
+    branches: list[BranchStatsSchema]
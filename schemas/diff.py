@@ -0,0 +1,35 @@
+from pydantic import BaseModel
+
+
+class ChangedNodeSchema(BaseModel):
+    """
+    Schema for a node present in both states whose fields differ.
+    """
+
+    id: int
+    fields: list[str]
+
+
+class WorkflowDiffSchema(BaseModel):
+    """
+    Schema for the structural difference between two states of a workflow.
+    """
+
+    workflow_id: int
+    base_version: int
+    # None when the target is the current draft.
+    target_version: int | None
+    # False when the base predates the change log and every node was compared.
+    incremental: bool
+    added_nodes: list[int]
+    removed_nodes: list[int]
+    changed_nodes: list[ChangedNodeSchema]
+    added_edges: list[tuple[int, int]]
+    removed_edges: list[tuple[int, int]]
+    base_path: list[int]
+    # None when the target has no path from its start to an end node.
+    target_path: list[int] | None
+    added_paths: list[list[int]]
+    removed_paths: list[list[int]]
+    # False when added_paths or removed_paths were cut by the PATHS_* limits.
+    paths_complete: bool
@@ -0,0 +1,47 @@
+from pydantic import BaseModel
+
+from schemas.node import NodeResponseSchema
+
+
+class NodePositionSchema(BaseModel):
+    """
+    Schema for where a node is drawn: x grows to the right, y (the layer)
+    downwards, both in grid units.
+    """
+
+    id: int
+    layer: int
+    # Position among the nodes of its layer, from the left.
+    order: int
+    x: float
+    y: float
+
+
+class LayoutEdgeSchema(BaseModel):
+    """
+    Schema for an edge and the points of its polyline, from source to target.
+    """
+
+    source: int
+    target: int
+    field: str
+    points: list[tuple[float, float]]
+    # True when the edge closes a cycle and points upwards.
+    reversed: bool
+
+
+class WorkflowLayoutSchema(BaseModel):
+    """
+    Schema for a layered drawing of a workflow with its nodes.
+    """
+
+    workflow_id: int
+    revision: int
+    # True when only the nodes edited since the cached layout were reloaded
+    # and the others kept their order.
+    incremental: bool
+    width: float
+    height: int
+    nodes: list[NodeResponseSchema]
+    positions: list[NodePositionSchema]
+    edges: list[LayoutEdgeSchema]
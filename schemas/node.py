@@ -1,6 +1,8 @@
 from enum import Enum
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+import settings
 
 
 class NodeType(str, Enum):
@@ -41,3 +43,53 @@ class ConditionNodeSchema(NodeBaseSchema):
 
 class EndNodeSchema(NodeBaseSchema):
     pass
+
+
+class MessageNodeStatusTransitionSchema(BaseModel):
+    """
+    Message nodes to move to to_status: those matching every filter given.
+    """
+
+    workflow_id: int | None = None
+    from_status: NodeStatus | None = None
+    node_ids: list[int] | None = Field(
+        None, min_length=1, max_length=settings.NODE_STATUS_TRANSITION_MAX_IDS
+    )
+    to_status: NodeStatus
+
+
+""" Response schemas """
+
+
+class StartNodeResponseSchema(StartNodeSchema):
+    id: int
+    node_type: NodeType
+
+
+class MessageNodeResponseSchema(MessageNodeSchema):
+    id: int
+    node_type: NodeType
+
+
+class ConditionNodeResponseSchema(ConditionNodeSchema):
+    id: int
+    node_type: NodeType
+
+
+class EndNodeResponseSchema(EndNodeSchema):
+    id: int
+    node_type: NodeType
+
+
+NodeResponseSchema = (
+    StartNodeResponseSchema
+    | MessageNodeResponseSchema
+    | ConditionNodeResponseSchema
+    | EndNodeResponseSchema
+)
+
+
+class MessageNodeStatusTransitionResponseSchema(BaseModel):
+    matched: int
+    updated: int
+    skipped: int
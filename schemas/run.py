@@ -0,0 +1,55 @@
+from datetime import datetime
+from enum import Enum
+from typing import Any
+
+from pydantic import BaseModel
+
+
+class RunStatus(str, Enum):
+    pending = "pending"
+    running = "running"
+    waiting = "waiting"
+    completed = "completed"
+    failed = "failed"
+
+
+class RunCreateSchema(BaseModel):
+    """
+    Schema for starting a workflow run.
+    """
+
+    context: dict[str, Any] = {}
+    version: int | None = None
+
+
+class RunSchema(BaseModel):
+    """
+    Schema representing the persisted state of a workflow run.
+    """
+
+    id: int
+    workflow_id: int
+    version: int
+    current_node_id: int | None
+    status: RunStatus
+    context: dict[str, Any]
+    error: str | None
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class RunTransitionSchema(BaseModel):
+    """
+    Schema representing a status transition of a workflow run.
+    """
+
+    node_id: int | None
+    from_status: RunStatus | None
+    to_status: RunStatus
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
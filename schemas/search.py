@@ -0,0 +1,29 @@
+from pydantic import BaseModel
+
+from schemas.node import NodeType, NodeStatus
+
+
+class NodeSearchResultSchema(BaseModel):
+    """
+    Schema for a node whose text matches a search.
+    """
+
+    node_id: int
+    workflow_id: int
+    node_type: NodeType
+    status: NodeStatus | None = None
+    text: str | None
+
+    class Config:
+        from_attributes = True
+
+
+class NodeSearchPageSchema(BaseModel):
+    """
+    Schema for one page of search results, ordered by node ID.
+    """
+
+    items: list[NodeSearchResultSchema]
+    # Pass as ``after`` to get the next page; None on the last page.
+    next_after: int | None
+    full_text: bool
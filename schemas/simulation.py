@@ -0,0 +1,85 @@
+from enum import Enum
+
+from pydantic import BaseModel, Field, model_validator
+
+import settings
+from schemas.node import NodeType
+
+
+class SimulationSource(str, Enum):
+    # Each condition takes its yes branch with a given probability.
+    probabilities = "probabilities"
+    # Each condition is evaluated against the contexts of past runs.
+    history = "history"
+
+
+class SimulationMethod(str, Enum):
+    exact = "exact"
+    monte_carlo = "monte_carlo"
+
+
+class SimulationRequestSchema(BaseModel):
+    """
+    Schema for a dry run of the draft of a workflow.
+    """
+
+    source: SimulationSource = SimulationSource.probabilities
+    # Probability of the yes branch of every condition node, by node ID.
+    probabilities: dict[int, float] = {}
+    runs: int = Field(settings.SIMULATION_RUNS, ge=1, le=settings.SIMULATION_MAX_RUNS)
+    # Nodes a simulated run may visit before it is counted as truncated.
+    max_steps: int = Field(
+        settings.SIMULATION_MAX_STEPS, ge=1, le=settings.SIMULATION_MAX_STEPS
+    )
+    # Seed of the Monte-Carlo sampling, for repeatable results.
+    seed: int | None = None
+
+    @model_validator(mode="after")
+    def check_probabilities(self) -> "SimulationRequestSchema":
+        if self.source == SimulationSource.history and self.probabilities:
+            raise ValueError("Probabilities are not used with the history source")
+        for node_id, probability in self.probabilities.items():
+            if not 0 <= probability <= 1:
+                raise ValueError(f"Probability of node {node_id} is not in [0, 1]")
+        return self
+
+
+class SimulatedNodeSchema(BaseModel):
+    """
+    Schema for how often a node is expected to be visited.
+    """
+
+    node_id: int
+    node_type: NodeType
+    visits_per_run: float
+    # Visits over all simulated runs; for message nodes, the messages sent.
+    expected_visits: float
+
+
+class WorkflowSimulationSchema(BaseModel):
+    """
+    Schema for the expected outcome of many runs of the draft of a workflow.
+    """
+
+    workflow_id: int
+    revision: int
+    source: SimulationSource
+    method: SimulationMethod
+    runs: int
+    # Runs actually walked: the Monte-Carlo sample, the distinct historical
+    # contexts, or 0 when the expectation was propagated exactly.
+    simulated_runs: int
+    # False when sampling ran out of time (or, without NumPy, of node visits)
+    # before all runs; the estimate then rests on simulated_runs runs.
+    complete: bool
+    # Past runs whose contexts were evaluated; None for given probabilities.
+    contexts: int | None
+    # Shares of the runs reaching an end node, a missing node or failing a
+    # condition, and still going after max_steps nodes.
+    completed: float
+    failed: float
+    truncated: float
+    expected_messages: float
+    # Standard error of the messages per run of a Monte-Carlo estimate.
+    messages_per_run_error: float | None
+    nodes: list[SimulatedNodeSchema]
@@ -1,4 +1,9 @@
-from pydantic import BaseModel
+from datetime import datetime
+from functools import cached_property
+
+from pydantic import BaseModel, Field
+
+from schemas.node import NodeType, NodeStatus
 
 
 class Workflow(BaseModel):
@@ -8,6 +13,7 @@ class Workflow(BaseModel):
 
     id: int
     name: str
+    revision: int = 0
 
     class Config:
         from_attributes = True
@@ -30,3 +36,93 @@ class WorkflowUpdateSchema(WorkflowCreateSchema):
     """
 
     pass
+
+
+class WorkflowCloneSchema(BaseModel):
+    """
+    Schema for cloning a workflow.
+
+    Every ``{{key}}`` in the message texts is replaced by params[key].
+    """
+
+    name: str | None = None
+    params: dict[str, str] = Field(default_factory=dict, max_length=100)
+
+
+class ArchivedWorkflowSchema(BaseModel):
+    """
+    Schema for a workflow moved to the archive store.
+    """
+
+    workflow_id: int
+    name: str | None
+    revision: int
+    node_count: int
+    archived_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class WorkflowSequenceSchema(BaseModel):
+    """
+    Schema for the path found from the start node to the end node.
+    """
+
+    path: list[int]
+    edges: list[tuple[int, int]]
+    revision: int | None = None
+
+
+class WorkflowVersionSchema(BaseModel):
+    """
+    Schema describing a published workflow version.
+    """
+
+    workflow_id: int
+    version: int
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class WorkflowNodeSnapshotSchema(BaseModel):
+    """
+    Schema for a node frozen inside a published workflow snapshot.
+    """
+
+    id: int
+    node_type: NodeType
+    next_node_id: int | None = None
+    message: str | None = None
+    status: NodeStatus | None = None
+    condition: str | None = None
+    yes_node_id: int | None = None
+    no_node_id: int | None = None
+
+    class Config:
+        from_attributes = True
+        frozen = True
+
+
+class WorkflowSnapshotSchema(BaseModel):
+    """
+    Schema for the compiled, validated graph of a published workflow version.
+    """
+
+    workflow_id: int
+    version: int
+    start_node: int
+    end_node: int
+    nodes: tuple[WorkflowNodeSnapshotSchema, ...]
+    edges: tuple[tuple[int, int], ...]
+    path: tuple[int, ...]
+
+    class Config:
+        frozen = True
+
+    @cached_property
+    def nodes_by_id(self) -> dict[int, WorkflowNodeSnapshotSchema]:
+        """Nodes indexed by id, built once per (immutable) snapshot."""
+        return {node.id: node for node in self.nodes}
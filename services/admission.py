@@ -0,0 +1,270 @@
+import asyncio
+import math
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass
+
+from fastapi import status
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import func, select
+from sqlalchemy.orm import sessionmaker
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+import settings
+from database.config import workflow_session
+from database.models import Node
+from services.cache import LRUCache
+
+
+@dataclass(frozen=True)
+class EndpointClass:
+    """
+    Requests sharing a concurrency limit and per-client rate limits.
+
+    Attributes:
+    - name (str): Name used in stats and error messages.
+    - pattern (re.Pattern): Matched against the request path; a
+      ``workflow_id`` group makes the cost depend on the workflow size.
+    - concurrency (int): Requests of the class served at the same time.
+    - rate (float): Tokens per second refilled in each client's bucket.
+    - burst (float): Bucket capacity.
+    - nodes_per_token (int | None): Workflow nodes adding one token to the
+      cost of a request; None for a flat cost of one token.
+    """
+
+    name: str
+    pattern: re.Pattern
+    concurrency: int
+    rate: float
+    burst: float
+    nodes_per_token: int | None = None
+
+
+def default_endpoint_classes() -> list[EndpointClass]:
+    """
+    Graph endpoints, event streams and everything else, configured by the
+    ``ADMISSION_*`` settings. The first matching class applies.
+    """
+    return [
+        EndpointClass(
+            name="graph",
+            pattern=re.compile(
+                r"^/workflow/(?:get-sequence|paths|analyze|publish|layout|simulate)"
+                r"/(?P<workflow_id>\d+)"
+            ),
+            concurrency=settings.ADMISSION_GRAPH_CONCURRENCY,
+            rate=settings.ADMISSION_GRAPH_RATE,
+            burst=settings.ADMISSION_GRAPH_BURST,
+            nodes_per_token=settings.ADMISSION_NODES_PER_TOKEN,
+        ),
+        EndpointClass(
+            name="stream",
+            pattern=re.compile(r"^/workflow/events/"),
+            concurrency=settings.ADMISSION_STREAM_CONCURRENCY,
+            rate=settings.ADMISSION_DEFAULT_RATE,
+            burst=settings.ADMISSION_DEFAULT_BURST,
+        ),
+        EndpointClass(
+            name="default",
+            pattern=re.compile(""),
+            concurrency=settings.ADMISSION_DEFAULT_CONCURRENCY,
+            rate=settings.ADMISSION_DEFAULT_RATE,
+            burst=settings.ADMISSION_DEFAULT_BURST,
+        ),
+    ]
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at rate tokens per second.
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def wait(self, cost: float, now: float) -> float:
+        """
+        Seconds until cost tokens are available, without taking them.
+        """
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return max(0.0, (cost - self.tokens) / self.rate)
+
+    def take(self, cost: float, now: float) -> float:
+        """
+        Take cost tokens if available.
+        :return: 0 when taken, otherwise seconds until enough tokens refill.
+        """
+        wait = self.wait(cost, now)
+        if not wait:
+            self.tokens -= cost
+        return wait
+
+
+class AdmissionController:
+    """
+    A class to decide whether a request is served or rejected up front.
+
+    Each request is classified by path; the client's token bucket for that
+    class must hold the request's cost (otherwise 429), and the class must be
+    below its concurrency limit (otherwise 503). Graph requests cost more for
+    bigger workflows; node counts are cached for count_ttl seconds so most
+    estimates do not touch the database, and are only read for requests
+    that pass the in-memory checks. Decisions run on the event loop, before
+    a worker thread is taken, so rejections stay fast under overload.
+
+    Clients are told apart by peer address. A client_header is only trusted
+    when configured, e.g. behind a proxy setting it: clients choose its value,
+    and a new value would get them a fresh bucket.
+
+    Attributes:
+    - session_factory: Factory creating sessions for node counts.
+    - classes (list[EndpointClass]): Endpoint classes, first match applies.
+    - active (Counter): Requests currently served per class.
+    - stats (Counter): Admitted and rejected requests per class.
+    """
+
+    def __init__(
+        self,
+        session_factory: sessionmaker,
+        classes: list[EndpointClass] | None = None,
+        client_header: str = settings.ADMISSION_CLIENT_HEADER,
+        count_ttl: float = settings.ADMISSION_COUNT_TTL,
+        retry_after: int = settings.ADMISSION_RETRY_AFTER,
+        max_clients: int = 10000,
+    ):
+        self.session_factory = session_factory
+        self.classes = classes or default_endpoint_classes()
+        self.client_header = client_header.lower().encode() or None
+        self.count_ttl = count_ttl
+        self.retry_after = retry_after
+        self.active: Counter = Counter()
+        self.stats: Counter = Counter()
+        self._buckets = LRUCache(maxsize=max_clients)
+        self._node_counts = LRUCache(maxsize=4096)
+
+    def classify(self, path: str) -> tuple[EndpointClass, int | None]:
+        """
+        Find the class of a request path.
+        :return: The class and the workflow ID in the path, if any.
+        """
+        for endpoint in self.classes:
+            match = endpoint.pattern.match(path)
+            if match is not None:
+                workflow_id = match.groupdict().get("workflow_id")
+                return endpoint, int(workflow_id) if workflow_id else None
+        raise LookupError(f"No endpoint class matches {path}")
+
+    def client(self, scope: Scope) -> str:
+        if self.client_header is not None:
+            for name, value in scope.get("headers", ()):
+                if name == self.client_header:
+                    return value.decode("latin-1")
+        peer = scope.get("client")
+        return peer[0] if peer else "unknown"
+
+    def count_nodes(self, workflow_id: int) -> int:
+        with workflow_session(workflow_id, self.session_factory) as db:
+            return db.scalar(
+                select(func.count(Node.id)).where(Node.workflow_id == workflow_id)
+            )
+
+    async def estimate_cost(
+        self, endpoint: EndpointClass, workflow_id: int | None
+    ) -> float:
+        """
+        Tokens a request takes: one, plus one per nodes_per_token nodes.
+        """
+        if endpoint.nodes_per_token is None or workflow_id is None:
+            return 1.0
+        now = time.monotonic()
+        cached = self._node_counts.get(workflow_id)
+        if cached is None or cached[1] < now:
+            count = await asyncio.to_thread(self.count_nodes, workflow_id)
+            cached = (count, now + self.count_ttl)
+            self._node_counts.set(workflow_id, cached)
+        # A request must fit in a full bucket, or it could never be admitted.
+        return min(endpoint.burst, 1.0 + cached[0] / endpoint.nodes_per_token)
+
+    def _reject(self, code: int, retry_after: float, detail: str) -> ORJSONResponse:
+        return ORJSONResponse(
+            {"detail": detail},
+            status_code=code,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+    async def admit(self, scope: Scope) -> tuple[EndpointClass, ORJSONResponse | None]:
+        """
+        Decide on a request; when admitted the caller must release() it.
+        :return: The request's class and the rejection response, if rejected.
+        """
+        endpoint, workflow_id = self.classify(scope["path"])
+        if self.active[endpoint.name] >= endpoint.concurrency:
+            self.stats[f"{endpoint.name}_overloaded"] += 1
+            return endpoint, self._reject(
+                status.HTTP_503_SERVICE_UNAVAILABLE,
+                self.retry_after,
+                f"Too many concurrent {endpoint.name} requests",
+            )
+        key = (self.client(scope), endpoint.name)
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(endpoint.rate, endpoint.burst, now)
+            self._buckets.set(key, bucket)
+        # Every request costs at least one token; only requests that could
+        # be admitted have their cost estimated, which may count nodes.
+        wait = bucket.wait(1.0, now)
+        if not wait:
+            # The slot is held while the cost is estimated.
+            self.active[endpoint.name] += 1
+            try:
+                cost = await self.estimate_cost(endpoint, workflow_id)
+            except BaseException:
+                self.active[endpoint.name] -= 1
+                raise
+            wait = bucket.take(cost, time.monotonic())
+            if wait:
+                self.active[endpoint.name] -= 1
+        if wait:
+            self.stats[f"{endpoint.name}_rate_limited"] += 1
+            return endpoint, self._reject(
+                status.HTTP_429_TOO_MANY_REQUESTS, wait, "Rate limit exceeded"
+            )
+        self.stats[f"{endpoint.name}_admitted"] += 1
+        return endpoint, None
+
+    def release(self, endpoint: EndpointClass) -> None:
+        self.active[endpoint.name] -= 1
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying an AdmissionController to HTTP requests.
+
+    A slot is held until the response body is fully sent, so streamed
+    responses count against their class for as long as they run.
+    """
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        endpoint, rejection = await self.controller.admit(scope)
+        if rejection is not None:
+            await rejection(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(endpoint)
@@ -0,0 +1,350 @@
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Iterable
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from starlette import status
+
+from database.models import Workflow, Node, StartNode, MessageNode, ConditionNode
+from schemas.analysis import IssueSeverity, WorkflowAnalysisSchema
+from schemas.node import NodeType
+from schemas.workflow import WorkflowSnapshotSchema
+
+
+def node_references(
+    node_type: NodeType,
+    next_node_id: int | None = None,
+    yes_node_id: int | None = None,
+    no_node_id: int | None = None,
+) -> list[tuple[str, int | None]]:
+    """
+    Outgoing edge fields of a node type with their targets.
+    """
+    if node_type in (NodeType.start, NodeType.message):
+        return [("next_node_id", next_node_id)]
+    if node_type == NodeType.condition:
+        return [("yes_node_id", yes_node_id), ("no_node_id", no_node_id)]
+    return []
+
+
+@dataclass
+class GraphStructure:
+    """
+    Node types and outgoing references of a workflow, without node payloads.
+
+    Attributes:
+    - node_types (dict): Type of every node, keyed by node ID.
+    - references (dict): (field, target ID) pairs of every node's outgoing
+      edges, in field order; the target is None when the field is unset.
+    """
+
+    node_types: dict[int, NodeType] = field(default_factory=dict)
+    references: dict[int, list[tuple[str, int | None]]] = field(default_factory=dict)
+
+    @classmethod
+    def from_snapshot(cls, snapshot: WorkflowSnapshotSchema) -> "GraphStructure":
+        """Structure of a published version."""
+        return cls(
+            node_types={node.id: node.node_type for node in snapshot.nodes},
+            references={
+                node.id: node_references(
+                    node.node_type, node.next_node_id, node.yes_node_id, node.no_node_id
+                )
+                for node in snapshot.nodes
+            },
+        )
+
+    def successors(self, node_id: int) -> list[int]:
+        """Distinct targets of a node's edges that exist in the workflow."""
+        return list(
+            dict.fromkeys(
+                target
+                for _, target in self.references.get(node_id, ())
+                if target in self.node_types
+            )
+        )
+
+
+def load_structure(workflow_id: int, db: Session) -> GraphStructure:
+    """
+    Read the edges of a workflow with one query over the node tables.
+    :param workflow_id: ID of the workflow.
+    :param db: Database session for the operation.
+    :return: The structure of the workflow graph.
+    """
+    nodes = Node.__table__
+    start = StartNode.__table__
+    message = MessageNode.__table__
+    condition = ConditionNode.__table__
+    rows = db.execute(
+        select(
+            nodes.c.id,
+            nodes.c.node_type,
+            start.c.next_node_id.label("start_next_node_id"),
+            message.c.next_node_id.label("message_next_node_id"),
+            condition.c.yes_node_id,
+            condition.c.no_node_id,
+        )
+        .select_from(
+            nodes.outerjoin(start, start.c.id == nodes.c.id)
+            .outerjoin(message, message.c.id == nodes.c.id)
+            .outerjoin(condition, condition.c.id == nodes.c.id)
+        )
+        .where(nodes.c.workflow_id == workflow_id)
+        .order_by(nodes.c.id)
+    ).all()
+
+    structure = GraphStructure()
+    for row in rows:
+        structure.node_types[row.id] = row.node_type
+        structure.references[row.id] = node_references(
+            row.node_type,
+            row.start_next_node_id or row.message_next_node_id,
+            row.yes_node_id,
+            row.no_node_id,
+        )
+    return structure
+
+
+def reachable(sources: Iterable[int], neighbours: dict[int, list[int]]) -> set[int]:
+    """
+    Nodes reachable from the sources (inclusive), by breadth-first search.
+    """
+    seen = set(sources)
+    queue = deque(seen)
+    while queue:
+        for neighbour in neighbours.get(queue.popleft(), ()):
+            if neighbour not in seen:
+                seen.add(neighbour)
+                queue.append(neighbour)
+    return seen
+
+
+def strongly_connected_components(
+    nodes: Iterable[int], successors: dict[int, list[int]]
+) -> list[list[int]]:
+    """
+    Tarjan's algorithm with an explicit stack, so deep graphs cannot hit the
+    recursion limit.
+    :return: The components in reverse topological order.
+    """
+    index: dict[int, int] = {}
+    low: dict[int, int] = {}
+    stack: list[int] = []
+    on_stack: set[int] = set()
+    components = []
+
+    def visit(node: int) -> None:
+        index[node] = low[node] = len(index)
+        stack.append(node)
+        on_stack.add(node)
+
+    for root in nodes:
+        if root in index:
+            continue
+        visit(root)
+        work = [(root, iter(successors.get(root, ())))]
+        while work:
+            node, children = work[-1]
+            for child in children:
+                if child not in index:
+                    visit(child)
+                    work.append((child, iter(successors.get(child, ()))))
+                    break
+                if child in on_stack:
+                    low[node] = min(low[node], index[child])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+    return components
+
+
+def analyze_structure(structure: GraphStructure) -> dict:
+    """
+    Find every structural problem of a workflow graph in one linear pass.
+
+    Builds successor and predecessor lists once, then runs Tarjan's SCC,
+    breadth-first reachability from the start node and reverse reachability
+    from the end nodes, so the cost is O(nodes + edges).
+    :param structure: The graph to analyze.
+    :return: The report fields of WorkflowAnalysisSchema except the
+        workflow ID and revision.
+    """
+    node_types = structure.node_types
+    issues = []
+
+    def issue(severity: IssueSeverity, code: str, message: str, node_ids=()):
+        issues.append(
+            {
+                "severity": severity,
+                "code": code,
+                "message": message,
+                "node_ids": sorted(node_ids),
+            }
+        )
+
+    successors = {node_id: structure.successors(node_id) for node_id in node_types}
+    predecessors: dict[int, list[int]] = {node_id: [] for node_id in node_types}
+    for node_id, targets in successors.items():
+        for target in targets:
+            predecessors[target].append(node_id)
+
+    dangling = [
+        {"node_id": node_id, "field": name, "target_id": target}
+        for node_id, references in structure.references.items()
+        for name, target in references
+        if target not in node_types
+    ]
+    if dangling:
+        issue(
+            IssueSeverity.error,
+            "dangling_reference",
+            "Edges are missing or point to nodes outside the workflow",
+            {reference["node_id"] for reference in dangling},
+        )
+
+    starts = [n for n, node_type in node_types.items() if node_type == NodeType.start]
+    ends = sorted(n for n, node_type in node_types.items() if node_type == NodeType.end)
+    if not starts:
+        issue(IssueSeverity.error, "missing_start", "Workflow has no start node")
+    elif len(starts) > 1:
+        issue(
+            IssueSeverity.error,
+            "multiple_starts",
+            "Workflow has more than one start node",
+            starts,
+        )
+    if not ends:
+        issue(IssueSeverity.error, "missing_end", "Workflow has no end node")
+
+    for start in starts:
+        if predecessors[start]:
+            issue(
+                IssueSeverity.error,
+                "start_has_incoming",
+                "Start node could not have any previous nodes",
+                [start, *predecessors[start]],
+            )
+        conditions = [
+            target
+            for target in successors[start]
+            if node_types[target] == NodeType.condition
+        ]
+        if conditions:
+            issue(
+                IssueSeverity.error,
+                "start_to_condition",
+                "Condition node could be reached only through message node or "
+                "condition node",
+                [start, *conditions],
+            )
+
+    forward = reachable(starts, successors)
+    backward = reachable(ends, predecessors)
+    unreachable = sorted(set(node_types) - forward)
+    dead_ends = sorted(forward - backward)
+    if unreachable:
+        issue(
+            IssueSeverity.warning,
+            "unreachable",
+            "Nodes cannot be reached from the start node",
+            unreachable,
+        )
+    if starts and ends and not any(start in backward for start in starts):
+        issue(
+            IssueSeverity.error,
+            "end_unreachable",
+            "No end node can be reached from the start node",
+            starts,
+        )
+    if dead_ends:
+        issue(
+            IssueSeverity.error,
+            "dead_end",
+            "Nodes reachable from the start node can never reach an end node",
+            dead_ends,
+        )
+
+    cycles = []
+    for component in strongly_connected_components(node_types, successors):
+        members = set(component)
+        if len(component) == 1 and component[0] not in successors[component[0]]:
+            continue
+        has_exit = any(
+            target not in members for node in component for target in successors[node]
+        )
+        cycles.append({"node_ids": sorted(component), "has_exit": has_exit})
+        if not has_exit:
+            issue(
+                IssueSeverity.error,
+                "cycle_without_exit",
+                "Nodes loop forever: no edge leaves the cycle",
+                component,
+            )
+    cycles.sort(key=lambda cycle: cycle["node_ids"])
+
+    converging = sorted(
+        node_id
+        for node_id, references in structure.references.items()
+        if node_types[node_id] == NodeType.condition
+        and len(references) == 2
+        and references[0][1] is not None
+        and references[0][1] == references[1][1]
+    )
+    if converging:
+        issue(
+            IssueSeverity.warning,
+            "converging_condition",
+            "Both branches of the condition lead to the same node",
+            converging,
+        )
+
+    return {
+        "valid": not any(i["severity"] == IssueSeverity.error for i in issues),
+        "node_count": len(node_types),
+        "edge_count": sum(len(targets) for targets in successors.values()),
+        "start_node": starts[0] if len(starts) == 1 else None,
+        "end_nodes": ends,
+        "unreachable_nodes": unreachable,
+        "dead_end_nodes": dead_ends,
+        "cycles": cycles,
+        "converging_conditions": converging,
+        "dangling_references": dangling,
+        "issues": issues,
+    }
+
+
+class WorkflowAnalysisService:
+    """
+    A class to report structural problems of workflow graphs.
+    """
+
+    def analyze(self, workflow_id: int, db: Session) -> WorkflowAnalysisSchema:
+        """
+        Analyze the current (draft) nodes of a workflow.
+        :param workflow_id: ID of the workflow to analyze.
+        :param db: Database session for the operation.
+        :return: Every problem found, not only the first one.
+        """
+        revision = db.scalar(
+            select(Workflow.revision).where(Workflow.id == workflow_id)
+        )
+        if revision is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+        report = analyze_structure(load_structure(workflow_id, db))
+        return WorkflowAnalysisSchema(
+            workflow_id=workflow_id, revision=revision, **report
+        )
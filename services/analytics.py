@@ -0,0 +1,323 @@
+import asyncio
+import logging
+from collections import Counter, deque
+from typing import Sequence
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session, sessionmaker
+
+import settings
+from database.config import shard_router
+from database.sharding import ShardRouter
+from database.models import (
+    Workflow,
+    Node,
+    ConditionNode,
+    NodeVisitStats,
+    EdgeTraversalStats,
+)
+from schemas.analytics import WorkflowStatsSchema
+from schemas.node import NodeType
+from services.utils import get_object_by_id
+
+logger = logging.getLogger(__name__)
+
+
+class PathAnalytics:
+    """
+    A class to count node visits and edge traversals of workflow paths.
+
+    Recording a path is a single ``deque.append`` (atomic under the GIL), so
+    sequence requests and run workers pay no locking and no database write.
+    A background task drains the buffer every flush_interval seconds, sums the
+    paths in memory and adds the totals to the stats tables with one batched
+    upsert per table.
+
+    Paths that will continue later (a run waiting for its message or yielding
+    after max_steps) end with the node they continue from; that node is not
+    counted as visited until the path reaches it, so every visit and edge is
+    counted exactly once.
+
+    Attributes:
+    - enabled (bool): When False, record() is a no-op.
+    - flush_interval (float): Seconds between flushes.
+    - pending (deque): Recorded (workflow_id, path, finished) entries; the
+      oldest are dropped past max_pending when flushes fall behind.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = settings.ANALYTICS_ENABLED,
+        flush_interval: float = settings.ANALYTICS_FLUSH_INTERVAL,
+        max_pending: int = settings.ANALYTICS_MAX_PENDING,
+    ):
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.pending: deque[tuple[int, Sequence[int], bool]] = deque(maxlen=max_pending)
+        self._task: asyncio.Task | None = None
+
+    def record(
+        self, workflow_id: int, path: Sequence[int], finished: bool = True
+    ) -> None:
+        """
+        Record a path taken through a workflow; safe to call from any thread.
+        :param workflow_id: ID of the workflow the path belongs to.
+        :param path: IDs of the visited nodes in order.
+        :param finished: False when the last node is where the path continues.
+        """
+        if self.enabled:
+            self.pending.append((workflow_id, path, finished))
+
+    @staticmethod
+    def _count(
+        entries: Sequence[tuple[int, Sequence[int], bool]]
+    ) -> tuple[Counter, Counter]:
+        """
+        Sum recorded paths into visit and traversal counts.
+        """
+        visits, traversals = Counter(), Counter()
+        for workflow_id, path, finished in entries:
+            visited = path if finished else path[:-1]
+            for node_id in visited:
+                visits[workflow_id, node_id] += 1
+            for source_id, target_id in zip(path, path[1:]):
+                traversals[workflow_id, source_id, target_id] += 1
+        return visits, traversals
+
+    def _drain(self) -> tuple[Counter, Counter]:
+        """
+        Take the recorded paths and sum them into visit and traversal counts.
+        """
+        entries = []
+        for _ in range(len(self.pending)):
+            try:
+                entries.append(self.pending.popleft())
+            except IndexError:
+                break
+        return self._count(entries)
+
+    def buffered(self, workflow_id: int) -> tuple[Counter, Counter]:
+        """
+        Visit and traversal counts of a workflow's paths not flushed yet,
+        keyed by node ID and (source ID, target ID); the buffer is left as
+        it is.
+        """
+        # deque.copy() is atomic under the GIL, unlike iterating the deque.
+        visits, traversals = self._count(
+            [entry for entry in self.pending.copy() if entry[0] == workflow_id]
+        )
+        return (
+            Counter({node_id: count for (_, node_id), count in visits.items()}),
+            Counter(
+                {
+                    (source_id, target_id): count
+                    for (_, source_id, target_id), count in traversals.items()
+                }
+            ),
+        )
+
+    def flush(self, db: Session) -> int:
+        """
+        Add the recorded paths to the stats tables; with sharding, to those
+        of the shards holding their workflows instead.
+        :param db: Database session for the operation.
+        :return: Number of counters written.
+        """
+        if shard_router is not None:
+            return self.flush_shards(shard_router)
+        return self._write(db, *self._drain())
+
+    def flush_shards(self, router: ShardRouter) -> int:
+        """
+        Add the recorded paths to the stats tables of the shards holding
+        their workflows, which the node IDs' ranges tell.
+        :param router: The shards.
+        :return: Number of counters written.
+        """
+        visits, traversals = self._drain()
+        written = 0
+        for shard, session_factory in enumerate(router.session_factories):
+            shard_visits = Counter(
+                {
+                    key: count
+                    for key, count in visits.items()
+                    if router.shard_of_id(key[1]) == shard
+                }
+            )
+            shard_traversals = Counter(
+                {
+                    key: count
+                    for key, count in traversals.items()
+                    if router.shard_of_id(key[1]) == shard
+                }
+            )
+            if shard_visits or shard_traversals:
+                with session_factory() as db:
+                    written += self._write(db, shard_visits, shard_traversals)
+        return written
+
+    def _write(self, db: Session, visits: Counter, traversals: Counter) -> int:
+        if visits:
+            statement = insert(NodeVisitStats)
+            db.execute(
+                statement.on_conflict_do_update(
+                    index_elements=["workflow_id", "node_id"],
+                    set_={"visits": NodeVisitStats.visits + statement.excluded.visits},
+                ),
+                [
+                    {"workflow_id": workflow_id, "node_id": node_id, "visits": count}
+                    for (workflow_id, node_id), count in visits.items()
+                ],
+            )
+        if traversals:
+            statement = insert(EdgeTraversalStats)
+            db.execute(
+                statement.on_conflict_do_update(
+                    index_elements=["workflow_id", "source_id", "target_id"],
+                    set_={
+                        "traversals": EdgeTraversalStats.traversals
+                        + statement.excluded.traversals
+                    },
+                ),
+                [
+                    {
+                        "workflow_id": workflow_id,
+                        "source_id": source_id,
+                        "target_id": target_id,
+                        "traversals": count,
+                    }
+                    for (workflow_id, source_id, target_id), count in traversals.items()
+                ],
+            )
+        db.commit()
+        return len(visits) + len(traversals)
+
+    def get_stats(self, workflow_id: int, db: Session) -> WorkflowStatsSchema:
+        """
+        Get the path statistics of a workflow.
+
+        Every path enters the start node exactly once, so its visits are the
+        number of paths. Runs still in progress count with the nodes they
+        reached so far. Paths not flushed yet are added from the buffer
+        without writing; a path being flushed meanwhile may be left out
+        until the next request.
+        :param workflow_id: ID of the workflow.
+        :param db: Database session for the operation.
+        :return: Node visits, edge traversals and condition branch counts.
+        """
+        get_object_by_id(model=Workflow, object_id=workflow_id, db_session=db)
+        rows = db.execute(
+            select(Node.id.label("node_id"), Node.node_type, NodeVisitStats.visits)
+            .outerjoin(
+                NodeVisitStats,
+                (NodeVisitStats.workflow_id == Node.workflow_id)
+                & (NodeVisitStats.node_id == Node.id),
+            )
+            .where(Node.workflow_id == workflow_id)
+        ).all()
+        edge_rows = db.execute(
+            select(
+                EdgeTraversalStats.source_id,
+                EdgeTraversalStats.target_id,
+                EdgeTraversalStats.traversals,
+            )
+            .where(EdgeTraversalStats.workflow_id == workflow_id)
+            .order_by(EdgeTraversalStats.traversals.desc())
+        ).all()
+        conditions = db.execute(
+            select(
+                ConditionNode.id, ConditionNode.yes_node_id, ConditionNode.no_node_id
+            )
+            .where(ConditionNode.workflow_id == workflow_id)
+            .order_by(ConditionNode.id)
+        ).all()
+
+        buffered_visits, traversed = self.buffered(workflow_id)
+        nodes = [
+            {"node_id": row.node_id, "node_type": row.node_type, "visits": visits}
+            for row in rows
+            if (visits := (row.visits or 0) + buffered_visits[row.node_id])
+        ]
+        nodes.sort(key=lambda node: (-node["visits"], node["node_id"]))
+        traversed.update(
+            {(edge.source_id, edge.target_id): edge.traversals for edge in edge_rows}
+        )
+        edges = [
+            {"source_id": source_id, "target_id": target_id, "traversals": count}
+            for (source_id, target_id), count in traversed.items()
+        ]
+        edges.sort(key=lambda edge: -edge["traversals"])
+        paths = sum(
+            node["visits"] for node in nodes if node["node_type"] == NodeType.start
+        )
+        return WorkflowStatsSchema.model_validate(
+            {
+                "workflow_id": workflow_id,
+                "paths": paths,
+                "average_path_length": (
+                    sum(node["visits"] for node in nodes) / paths if paths else None
+                ),
+                "nodes": nodes,
+                "edges": edges,
+                "branches": [
+                    {
+                        "node_id": condition.id,
+                        "yes": traversed.get((condition.id, condition.yes_node_id), 0),
+                        "no": traversed.get((condition.id, condition.no_node_id), 0),
+                    }
+                    for condition in conditions
+                ],
+            },
+            from_attributes=True,
+        )
+
+    def delete_stats(self, workflow_id: int, db: Session) -> None:
+        """
+        Drop the counters of a workflow; the caller commits.
+        """
+        db.execute(
+            delete(NodeVisitStats).where(NodeVisitStats.workflow_id == workflow_id)
+        )
+        db.execute(
+            delete(EdgeTraversalStats).where(
+                EdgeTraversalStats.workflow_id == workflow_id
+            )
+        )
+
+    def _flush_with(self, session_factory: sessionmaker) -> None:
+        with session_factory() as db:
+            self.flush(db)
+
+    async def _flush_forever(self, session_factory: sessionmaker) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await asyncio.to_thread(self._flush_with, session_factory)
+            except Exception:
+                logger.exception("Failed to flush path analytics")
+
+    def start(self, session_factory: sessionmaker) -> None:
+        """
+        Flush periodically on the running event loop.
+        """
+        if self._task is None and self.enabled:
+            self._task = asyncio.get_running_loop().create_task(
+                self._flush_forever(session_factory)
+            )
+
+    async def stop(self, session_factory: sessionmaker) -> None:
+        """
+        Stop flushing periodically and flush what is left.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.to_thread(self._flush_with, session_factory)
+
+
+path_analytics = PathAnalytics()
@@ -0,0 +1,426 @@
+import asyncio
+import gzip
+import logging
+import os
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+import orjson
+from fastapi import Depends, HTTPException, Request
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, sessionmaker
+from starlette import status
+
+import settings
+from database.config import get_db
+from database.models import (
+    Workflow,
+    WorkflowVersion,
+    WorkflowRun,
+    ArchivedWorkflow,
+    Node,
+    StartNode,
+    MessageNode,
+    ConditionNode,
+    EndNode,
+)
+from database.records import load_node_records
+from database.search import index_workflow, unindex_workflow
+from schemas.node import NodeType, NodeStatus
+from schemas.run import RunStatus
+from services.cache import LRUCache, SingleFlight
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FORMAT = 1
+ACTIVE_RUN_STATUSES = (RunStatus.pending, RunStatus.running, RunStatus.waiting)
+# Columns of each node type table besides the ID, as stored in archive files.
+NODE_COLUMNS = {
+    NodeType.start: (StartNode, ("next_node_id",)),
+    NodeType.message: (MessageNode, ("status", "message", "next_node_id")),
+    NodeType.condition: (ConditionNode, ("condition", "yes_node_id", "no_node_id")),
+    NodeType.end: (EndNode, ()),
+}
+
+
+def ids_never_reused(db: Session) -> bool:
+    """
+    Whether new workflows and nodes can never take the ID of an archived
+    one. SQLite reuses the highest deleted rowid unless the table was
+    created with AUTOINCREMENT, as migrate() does for new databases.
+    """
+    if db.get_bind().dialect.name != "sqlite":
+        return True
+    rows = db.connection().exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE name IN ('workflows', 'nodes')"
+    )
+    return all("AUTOINCREMENT" in sql.upper() for (sql,) in rows)
+
+
+class WorkflowArchive:
+    """
+    A class to move inactive workflows out of the hot tables and back.
+
+    Archiving writes a workflow, its nodes and its published versions to one
+    gzip-compressed JSON file, then deletes the rows and leaves a small
+    ArchivedWorkflow row. The first request naming the workflow, or one of
+    its nodes, restores the rows with their original IDs (restore_archived).
+    IDs found not archived are remembered for lookup_ttl seconds, so most
+    requests do not look the archive up at all. Runs and path statistics stay in
+    their tables; workflows with unfinished runs are never archived.
+
+    Every workflow is archived in its own short transaction, and batches are
+    separated by a pause, so other writers never wait long.
+
+    Attributes:
+    - directory (str): Where the archive files are stored.
+    - after (timedelta): Workflows unchanged for longer are archived.
+    - batch_size (int): Workflows archived per batch.
+    - stats (Counter): Archived and restored workflows.
+    - lookup_ttl (float): Seconds an ID found not archived is trusted.
+    """
+
+    def __init__(
+        self,
+        directory: str = settings.ARCHIVE_DIR,
+        after_days: float = settings.ARCHIVE_AFTER_DAYS,
+        batch_size: int = settings.ARCHIVE_BATCH_SIZE,
+        interval: float = settings.ARCHIVE_INTERVAL,
+        pause: float = settings.ARCHIVE_BATCH_PAUSE,
+        enabled: bool = settings.ARCHIVE_ENABLED,
+        lookup_ttl: float = settings.ARCHIVE_LOOKUP_TTL,
+    ):
+        self.directory = directory
+        self.after = timedelta(days=after_days)
+        self.batch_size = batch_size
+        self.interval = interval
+        self.pause = pause
+        self.enabled = enabled
+        self.stats: Counter = Counter()
+        self.lookup_ttl = lookup_ttl
+        # Expiry, by (database URL, "workflow" or "node", ID), of IDs known
+        # not to be archived.
+        self._not_archived = LRUCache(maxsize=65536)
+        self._flights = SingleFlight()
+        self._task: asyncio.Task | None = None
+
+    def _known_not_archived(self, key: tuple) -> bool:
+        expires = self._not_archived.get(key)
+        return expires is not None and expires > time.monotonic()
+
+    def _remember_not_archived(self, key: tuple) -> None:
+        self._not_archived.set(key, time.monotonic() + self.lookup_ttl)
+
+    def path(self, workflow_id: int) -> str:
+        return os.path.join(self.directory, f"workflow-{workflow_id}.json.gz")
+
+    def _write(self, workflow_id: int, payload: dict) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(workflow_id)
+        with open(f"{path}.tmp", "wb") as file:
+            file.write(gzip.compress(orjson.dumps(payload), compresslevel=6))
+        # Atomic: a crash never leaves a truncated archive behind.
+        os.replace(f"{path}.tmp", path)
+
+    def _read(self, workflow_id: int) -> dict:
+        try:
+            with open(self.path(workflow_id), "rb") as file:
+                return orjson.loads(gzip.decompress(file.read()))
+        except FileNotFoundError:
+            logger.error("Archive file of workflow %s is missing", workflow_id)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Archived workflow could not be restored",
+            )
+
+    def candidates(self, db: Session, now: datetime, limit: int) -> list[int]:
+        """
+        IDs of the workflows unchanged for longer than after, oldest first,
+        without unfinished runs.
+        """
+        workflows = Workflow.__table__
+        # Rows from before updated_at existed start ageing now.
+        db.execute(
+            update(workflows)
+            .where(workflows.c.updated_at.is_(None))
+            .values(updated_at=now)
+        )
+        db.commit()
+        active = select(WorkflowRun.workflow_id).where(
+            WorkflowRun.status.in_(ACTIVE_RUN_STATUSES)
+        )
+        return db.scalars(
+            select(workflows.c.id)
+            .where(workflows.c.updated_at < now - self.after)
+            .where(workflows.c.id.not_in(active))
+            .order_by(workflows.c.updated_at)
+            .limit(limit)
+        ).all()
+
+    def archive(self, workflow_id: int, db: Session) -> ArchivedWorkflow:
+        """
+        Move a workflow to the archive store.
+        :param workflow_id: ID of the workflow to archive.
+        :param db: Database session for the operation.
+        :return: The row standing for the archived workflow.
+        """
+        if not ids_never_reused(db):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Archiving needs a database created by migrate, "
+                "whose IDs are never reused",
+            )
+        workflows = Workflow.__table__
+        workflow = db.execute(
+            select(workflows).where(workflows.c.id == workflow_id)
+        ).first()
+        if workflow is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+        if db.scalar(
+            select(WorkflowRun.id)
+            .where(WorkflowRun.workflow_id == workflow_id)
+            .where(WorkflowRun.status.in_(ACTIVE_RUN_STATUSES))
+            .limit(1)
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Workflow has unfinished runs",
+            )
+        nodes = load_node_records(db, Node.workflow_id == workflow_id)
+        versions = db.execute(
+            select(WorkflowVersion.__table__).where(
+                WorkflowVersion.workflow_id == workflow_id
+            )
+        ).all()
+        self._write(
+            workflow_id,
+            {
+                "format": ARCHIVE_FORMAT,
+                "workflow": {"id": workflow.id, "name": workflow.name},
+                "nodes": [
+                    {name: getattr(node, name) for name in node.__slots__}
+                    for node in nodes
+                ],
+                "versions": [version._asdict() for version in versions],
+            },
+        )
+
+        # Deleting the workflow row first, only if it is still at the revision
+        # that was written, makes a concurrent change abort the archiving.
+        deleted = db.execute(
+            delete(workflows)
+            .where(workflows.c.id == workflow_id)
+            .where(workflows.c.revision == workflow.revision)
+        )
+        if deleted.rowcount != 1:
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Workflow changed while it was archived",
+            )
+        unindex_workflow(db, workflow_id)
+        node_ids = select(Node.id).where(Node.workflow_id == workflow_id)
+        for model, _ in NODE_COLUMNS.values():
+            table = model.__table__
+            db.execute(delete(table).where(table.c.id.in_(node_ids)))
+        db.execute(delete(Node.__table__).where(Node.workflow_id == workflow_id))
+        db.execute(
+            delete(WorkflowVersion.__table__).where(
+                WorkflowVersion.workflow_id == workflow_id
+            )
+        )
+        archived = ArchivedWorkflow(
+            workflow_id=workflow_id,
+            name=workflow.name,
+            revision=workflow.revision,
+            node_count=len(nodes),
+            min_node_id=nodes[0].id if nodes else None,
+            max_node_id=nodes[-1].id if nodes else None,
+        )
+        db.add(archived)
+        db.commit()
+        db.refresh(archived)
+        url = str(db.get_bind().url)
+        self._not_archived.pop((url, "workflow", workflow_id))
+        for node in nodes:
+            self._not_archived.pop((url, "node", node.id))
+        self.stats["archived"] += 1
+        return archived
+
+    def restore(self, workflow_id: int, db: Session) -> bool:
+        """
+        Put an archived workflow back into the hot tables with its original
+        IDs; concurrent calls for one workflow restore it once.
+        :return: True when the workflow was archived.
+        """
+        lookup = (str(db.get_bind().url), "workflow", workflow_id)
+        if self._known_not_archived(lookup):
+            return False
+        archived = db.scalar(
+            select(ArchivedWorkflow.workflow_id).where(
+                ArchivedWorkflow.workflow_id == workflow_id
+            )
+        )
+        if archived is None:
+            self._remember_not_archived(lookup)
+            return False
+        key = (str(db.get_bind().url), workflow_id)
+        return self._flights.do(key, lambda: self._restore(workflow_id, db))
+
+    def _restore(self, workflow_id: int, db: Session) -> bool:
+        archived = db.get(ArchivedWorkflow, workflow_id)
+        if archived is None:
+            return True
+        payload = self._read(workflow_id)
+        db.execute(
+            insert(Workflow.__table__).values(
+                id=workflow_id,
+                name=payload["workflow"]["name"],
+                revision=archived.revision,
+                updated_at=datetime.utcnow(),
+            )
+        )
+        nodes = payload["nodes"]
+        if nodes:
+            db.execute(
+                insert(Node.__table__),
+                [
+                    {
+                        "id": node["id"],
+                        "node_type": NodeType(node["node_type"]),
+                        "workflow_id": workflow_id,
+                    }
+                    for node in nodes
+                ],
+            )
+        for node_type, (model, columns) in NODE_COLUMNS.items():
+            rows = [
+                {"id": node["id"], **{name: node[name] for name in columns}}
+                for node in nodes
+                if node["node_type"] == node_type
+            ]
+            for row in rows:
+                if row.get("status") is not None:
+                    row["status"] = NodeStatus(row["status"])
+            if rows:
+                db.execute(insert(model.__table__), rows)
+        if payload["versions"]:
+            db.execute(
+                insert(WorkflowVersion.__table__),
+                [
+                    {
+                        **version,
+                        "created_at": version["created_at"]
+                        and datetime.fromisoformat(version["created_at"]),
+                    }
+                    for version in payload["versions"]
+                ],
+            )
+        index_workflow(db, workflow_id)
+        db.delete(archived)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another process restored it first.
+            db.rollback()
+            return True
+        os.remove(self.path(workflow_id))
+        self.stats["restored"] += 1
+        return True
+
+    def restore_node(self, node_id: int, db: Session) -> bool:
+        """
+        Restore the archived workflow a node belonged to, if any.
+        :return: True when a workflow was restored.
+        """
+        lookup = (str(db.get_bind().url), "node", node_id)
+        if self._known_not_archived(lookup):
+            return False
+        if db.scalar(select(Node.id).where(Node.id == node_id)) is not None:
+            self._remember_not_archived(lookup)
+            return False
+        candidates = db.scalars(
+            select(ArchivedWorkflow.workflow_id)
+            .where(ArchivedWorkflow.min_node_id <= node_id)
+            .where(ArchivedWorkflow.max_node_id >= node_id)
+        ).all()
+        restored = False
+        for workflow_id in candidates:
+            restored = self.restore(workflow_id, db) or restored
+        if not restored:
+            self._remember_not_archived(lookup)
+        return restored
+
+    def archive_inactive(self, session_factory: sessionmaker) -> int:
+        """
+        Archive every workflow unchanged for longer than after, in batches;
+        runs in a worker thread.
+        :return: Number of workflows archived.
+        """
+        archived = 0
+        while True:
+            with session_factory() as db:
+                if not ids_never_reused(db):
+                    logger.warning(
+                        "Archiving skipped: IDs of this database can be reused"
+                    )
+                    return archived
+                batch = self.candidates(db, datetime.utcnow(), self.batch_size)
+                for workflow_id in batch:
+                    try:
+                        self.archive(workflow_id, db)
+                        archived += 1
+                    except HTTPException as error:
+                        logger.info(
+                            "Workflow %s not archived: %s", workflow_id, error.detail
+                        )
+            if len(batch) < self.batch_size:
+                return archived
+            time.sleep(self.pause)
+
+    async def _archive_forever(self, session_factories: list[sessionmaker]) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            for session_factory in session_factories:
+                try:
+                    await asyncio.to_thread(self.archive_inactive, session_factory)
+                except Exception:
+                    logger.exception("Failed to archive inactive workflows")
+
+    def start(self, *session_factories: sessionmaker) -> None:
+        """
+        Archive periodically on the running event loop, in each database
+        (one per shard) in turn.
+        """
+        if self._task is None and self.enabled:
+            self._task = asyncio.get_running_loop().create_task(
+                self._archive_forever(list(session_factories))
+            )
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+workflow_archive = WorkflowArchive()
+
+
+def restore_archived(request: Request, db: Session = Depends(get_db)) -> None:
+    """
+    Router dependency restoring the archived workflow a request names by
+    ``workflow_id``, or owning its ``node_id``, before the route runs.
+    """
+    params = request.path_params
+    workflow_id = params.get("workflow_id", "")
+    node_id = params.get("node_id", "")
+    if workflow_id.isdigit():
+        workflow_archive.restore(int(workflow_id), db)
+    elif node_id.isdigit():
+        workflow_archive.restore_node(int(node_id), db)
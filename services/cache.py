@@ -0,0 +1,132 @@
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class LRUCache:
+    """
+    Thread-safe in-process least-recently-used cache.
+
+    Attributes:
+    - maxsize (int): Maximum number of entries kept before evicting the oldest.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get a cached value and mark it as recently used.
+        """
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Store a value, evicting the least recently used entry when full.
+        """
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Remove a value from the cache.
+        """
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self) -> None:
+        """
+        Remove every entry.
+        """
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls with the same key into one execution.
+
+    The first caller of a key runs the function; callers arriving while it
+    runs wait for its result (or exception) instead of repeating the work.
+    Threads block on a shared future, coroutines await it without taking a
+    thread, and both kinds of caller share the same in-flight calls.
+
+    Attributes:
+    - stats (dict): Number of executed and of coalesced calls.
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.stats = {"executed": 0, "coalesced": 0}
+
+    def _join(self, key: Hashable) -> tuple[Future, bool]:
+        """
+        Find the in-flight call of a key or register a new one.
+        :return: The call's future and whether the caller has to run it.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.stats["coalesced"] += 1
+                return future, False
+            future = self._calls[key] = Future()
+            self.stats["executed"] += 1
+            return future, True
+
+    def _settle(
+        self, key: Hashable, future: Future, result: Any, error: BaseException | None
+    ) -> None:
+        with self._lock:
+            del self._calls[key]
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+
+    def do(self, key: Hashable, function: Callable[[], Any]) -> Any:
+        """
+        Run function, or wait for the call of the same key already running.
+        """
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+        try:
+            result = function()
+        except BaseException as error:
+            self._settle(key, future, None, error)
+            raise
+        self._settle(key, future, result, None)
+        return result
+
+    async def do_async(
+        self, key: Hashable, function: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """
+        Await function(), or the call of the same key already running.
+        """
+        future, leader = self._join(key)
+        if not leader:
+            return await asyncio.wrap_future(future)
+        try:
+            result = await function()
+        except BaseException as error:
+            self._settle(key, future, None, error)
+            raise
+        self._settle(key, future, result, None)
+        return result
@@ -0,0 +1,241 @@
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import settings
+
+# Optional codecs, used when their libraries are installed.
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Media types worth compressing; event streams are left alone so every
+# event reaches the client as soon as it is sent.
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "text/plain",
+    "text/html",
+    "text/csv",
+)
+
+
+class GzipCompressor:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        """Everything compressed so far, decodable by the client right away."""
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class ZstdCompressor:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+class BrotliCompressor:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+def available_codecs() -> dict:
+    """
+    Factories of the compressors that can be used, in order of preference,
+    keyed by content coding.
+    """
+    codecs = {}
+    if zstandard is not None:
+        codecs["zstd"] = lambda: ZstdCompressor(settings.COMPRESSION_ZSTD_LEVEL)
+    if brotli is not None:
+        codecs["br"] = lambda: BrotliCompressor(settings.COMPRESSION_BROTLI_QUALITY)
+    codecs["gzip"] = lambda: GzipCompressor(settings.COMPRESSION_GZIP_LEVEL)
+    return codecs
+
+
+def negotiate(accept_encoding: str, codecs) -> str | None:
+    """
+    The content coding to answer an Accept-Encoding header with: the one the
+    client weighs highest, the server's preference on ties.
+    :return: A key of codecs, None when the response stays uncompressed.
+    """
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding] = weight
+    best, best_weight = None, 0.0
+    for coding in codecs:
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def encoded_etag(etag: str, coding: str) -> str:
+    """
+    Tag of the compressed representation of a tagged response: each coding
+    is a different representation and needs a different strong tag.
+    """
+    if etag.endswith('"'):
+        return f'{etag[:-1]}-{coding}"'
+    return etag
+
+
+def decoded_etag(etag: str) -> str:
+    """
+    The tag a compressed representation's tag was derived from.
+    """
+    for coding in ("gzip", "zstd", "br"):
+        suffix = f'-{coding}"'
+        if etag.endswith(suffix):
+            return etag[: -len(suffix)] + '"'
+    return etag
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing responses with the coding the client
+    prefers: zstd or brotli when their libraries are installed, else gzip.
+
+    A body sent in one piece is compressed whole if it has at least
+    minimum_size bytes. Streamed bodies (e.g. NDJSON exports) are compressed
+    chunk by chunk, each chunk flushed so the client can decode it as it
+    arrives. Event streams, bodies already encoded and 204/304 responses
+    pass through untouched.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = settings.COMPRESSION_MIN_SIZE,
+        codecs: dict | None = None,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.codecs = available_codecs() if codecs is None else codecs
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        coding = negotiate(Headers(scope=scope).get("accept-encoding", ""), self.codecs)
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = CompressionResponder(
+            send, coding, self.codecs[coding], self.minimum_size
+        )
+        await self.app(scope, receive, responder.send)
+
+
+class CompressionResponder:
+    """
+    Compresses the messages of one response on their way to the client.
+    """
+
+    def __init__(self, send: Send, coding: str, factory, minimum_size: int):
+        self._send = send
+        self.coding = coding
+        self.factory = factory
+        self.minimum_size = minimum_size
+        self._start: Message | None = None
+        self._compressor = None
+        self._passthrough = False
+
+    def _compressible(self, status: int, headers: MutableHeaders) -> bool:
+        media_type = headers.get("content-type", "").split(";")[0].strip()
+        return (
+            status not in (204, 304)
+            and "content-encoding" not in headers
+            and media_type in COMPRESSIBLE_TYPES
+        )
+
+    def _encode_headers(self, headers: MutableHeaders) -> None:
+        headers["Content-Encoding"] = self.coding
+        if "etag" in headers:
+            headers["ETag"] = encoded_etag(headers["etag"], self.coding)
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Held back until the first body message tells how to encode.
+            self._start = message
+            return
+        if message["type"] != "http.response.body" or self._passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self._start is not None:
+            start, self._start = self._start, None
+            headers = MutableHeaders(raw=start["headers"])
+            if not self._compressible(start["status"], headers):
+                self._passthrough = True
+                await self._send(start)
+                await self._send(message)
+                return
+            headers.add_vary_header("Accept-Encoding")
+            if not more_body and len(body) < self.minimum_size:
+                self._passthrough = True
+                await self._send(start)
+                await self._send(message)
+                return
+            self._compressor = self.factory()
+            self._encode_headers(headers)
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                body = self._compressor.compress(body) + self._compressor.finish()
+                headers["Content-Length"] = str(len(body))
+                await self._send(start)
+                await self._send({"type": "http.response.body", "body": body})
+                return
+            await self._send(start)
+
+        compressor = self._compressor
+        chunk = compressor.compress(body)
+        chunk += compressor.flush() if more_body else compressor.finish()
+        await self._send(
+            {"type": "http.response.body", "body": chunk, "more_body": more_body}
+        )
@@ -0,0 +1,88 @@
+import ast
+import operator
+from functools import lru_cache
+from typing import Any, Callable
+
+_COMPARISONS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.In: lambda left, right: left in right,
+    ast.NotIn: lambda left, right: left not in right,
+}
+
+
+def _compile(node: ast.AST) -> Callable[[dict], Any]:
+    """
+    Turn a whitelisted expression tree into a closure over the run context.
+    """
+    if isinstance(node, ast.Expression):
+        return _compile(node.body)
+    if isinstance(node, ast.Constant):
+        value = node.value
+        return lambda context: value
+    if isinstance(node, ast.Name):
+        name = node.id
+        return lambda context: context.get(name)
+    if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+        items = [_compile(item) for item in node.elts]
+        return lambda context: [item(context) for item in items]
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        operand = _compile(node.operand)
+        return lambda context: not operand(context)
+    if isinstance(node, ast.BoolOp):
+        values = [_compile(value) for value in node.values]
+        if isinstance(node.op, ast.And):
+            return lambda context: all(value(context) for value in values)
+        return lambda context: any(value(context) for value in values)
+    if isinstance(node, ast.Compare) and all(
+        type(op) in _COMPARISONS for op in node.ops
+    ):
+        left = _compile(node.left)
+        pairs = [
+            (_COMPARISONS[type(op)], _compile(comparator))
+            for op, comparator in zip(node.ops, node.comparators)
+        ]
+
+        def compare(context: dict) -> bool:
+            current = left(context)
+            for function, comparator in pairs:
+                right = comparator(context)
+                try:
+                    if not function(current, right):
+                        return False
+                except TypeError:
+                    return False
+                current = right
+            return True
+
+        return compare
+    raise ValueError(f"Unsupported condition syntax: {ast.dump(node)}")
+
+
+@lru_cache(maxsize=4096)
+def compile_condition(condition: str) -> Callable[[dict], Any]:
+    """
+    Compile a condition string into an evaluator.
+
+    Conditions are small expressions over run context fields, e.g.
+    ``opened``, ``not clicked``, ``country == "UA"`` or ``score >= 10 and vip``.
+    Text that is not such an expression is treated as the name of a single
+    context field, so free-form conditions like ``Has paid`` keep working.
+    :param condition: condition text stored on a ConditionNode
+    :return: function taking the run context and returning the result
+    """
+    try:
+        return _compile(ast.parse(condition.strip(), mode="eval"))
+    except (SyntaxError, ValueError):
+        return lambda context: context.get(condition)
+
+
+def evaluate_condition(condition: str, context: dict) -> bool:
+    """
+    Evaluate a ConditionNode condition against a run context.
+    """
+    return bool(compile_condition(condition)(context))
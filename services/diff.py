@@ -0,0 +1,285 @@
+import time
+from collections import deque
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import settings
+from database.models import Node, NodeChange, WorkflowVersion
+from database.records import load_node_records
+from schemas.node import NodeType
+from schemas.workflow import WorkflowNodeSnapshotSchema, WorkflowSnapshotSchema
+from services.analysis import GraphStructure, node_references
+from services.paths import iter_paths
+from services.version import WorkflowVersionService
+
+# Node fields compared between the two states.
+NODE_FIELDS = tuple(
+    name for name in WorkflowNodeSnapshotSchema.model_fields if name != "id"
+)
+
+
+def node_edges(node) -> list[tuple[int, int]]:
+    """
+    Edges leaving a node record or snapshot node, without unset targets.
+    """
+    if node is None:
+        return []
+    return [
+        (node.id, target)
+        for _, target in node_references(
+            node.node_type, node.next_node_id, node.yes_node_id, node.no_node_id
+        )
+        if target is not None
+    ]
+
+
+def find_start(structure: GraphStructure) -> int | None:
+    """
+    The start node, or None unless there is exactly one.
+    """
+    starts = [
+        node_id
+        for node_id, node_type in structure.node_types.items()
+        if node_type == NodeType.start
+    ]
+    return starts[0] if len(starts) == 1 else None
+
+
+def shortest_path(
+    structure: GraphStructure, preferred: tuple[int, ...] = ()
+) -> list[int] | None:
+    """
+    A shortest path from the start to the end node with the highest ID, the
+    one WorkflowGraph runs to.
+    :param structure: The graph to search.
+    :param preferred: Path returned when it is still valid and as short, so
+        ties are not reported as changes.
+    :return: The node IDs of the path, None when there is none.
+    """
+    start = find_start(structure)
+    ends = [
+        node_id
+        for node_id, node_type in structure.node_types.items()
+        if node_type == NodeType.end
+    ]
+    if start is None or not ends:
+        return None
+    end = max(ends)
+    parents = {start: None}
+    queue = deque([start])
+    while queue and end not in parents:
+        node_id = queue.popleft()
+        for child in structure.successors(node_id):
+            if child not in parents:
+                parents[child] = node_id
+                queue.append(child)
+    if end not in parents:
+        return None
+    path = [end]
+    while parents[path[-1]] is not None:
+        path.append(parents[path[-1]])
+    path.reverse()
+    if (
+        len(preferred) == len(path)
+        and preferred[0] == start
+        and preferred[-1] == end
+        and all(
+            target in structure.successors(source)
+            for source, target in zip(preferred, preferred[1:])
+        )
+    ):
+        return list(preferred)
+    return path
+
+
+class WorkflowDiffService:
+    """
+    A class to compare two states of a workflow.
+
+    The base is a published version; the target is another version or the
+    current draft. Only the nodes logged in the change log between the two
+    states are compared: the draft rows of just those nodes are read, and the
+    base snapshot's structure is patched with them to get the target's, so
+    the cost follows the size of the edit rather than of the workflow.
+    Changed paths are found by walking only the paths through nodes whose
+    type or edges changed; every other path is the same in both states.
+
+    Attributes:
+    - versions (WorkflowVersionService): Source of published snapshots.
+    """
+
+    def __init__(self, versions: WorkflowVersionService | None = None):
+        self.versions = versions or WorkflowVersionService()
+
+    def _change_id(self, workflow_id: int, version: int, db: Session) -> int | None:
+        return db.scalar(
+            select(WorkflowVersion.change_id)
+            .where(WorkflowVersion.workflow_id == workflow_id)
+            .where(WorkflowVersion.version == version)
+        )
+
+    def _changes(self, workflow_id: int, low: int, high: int | None):
+        changes = select(NodeChange.node_id).where(
+            NodeChange.workflow_id == workflow_id, NodeChange.id > low
+        )
+        if high is not None:
+            changes = changes.where(NodeChange.id <= high)
+        return changes.distinct()
+
+    def diff(
+        self,
+        workflow_id: int,
+        db: Session,
+        base: int | None = None,
+        target: int | None = None,
+    ) -> dict:
+        """
+        Structural diff from one state of a workflow to another.
+        :param workflow_id: ID of the workflow.
+        :param db: Database session for the operation.
+        :param base: Version to compare from, the latest published if omitted.
+        :param target: Version to compare to, the draft if omitted.
+        :return: Added, removed and changed nodes, edges and paths.
+        """
+        base_snapshot = self.versions.get_snapshot(workflow_id, db, base)
+        base_change = self._change_id(workflow_id, base_snapshot.version, db)
+        target_snapshot = target_change = None
+        if target is not None:
+            target_snapshot = self.versions.get_snapshot(workflow_id, db, target)
+            target_change = self._change_id(workflow_id, target_snapshot.version, db)
+        incremental = base_change is not None and (
+            target_snapshot is None or target_change is not None
+        )
+
+        if target_snapshot is not None:
+            target_nodes = target_snapshot.nodes_by_id
+            if incremental:
+                low, high = sorted((base_change, target_change))
+                changed = set(db.scalars(self._changes(workflow_id, low, high)))
+            else:
+                changed = set(base_snapshot.nodes_by_id) | set(target_nodes)
+        else:
+            criteria = [Node.workflow_id == workflow_id]
+            if incremental:
+                changes = self._changes(workflow_id, base_change, None)
+                changed = set(db.scalars(changes))
+                criteria.append(Node.id.in_(changes))
+            records = load_node_records(db, *criteria)
+            target_nodes = {record.id: record for record in records}
+            if not incremental:
+                changed = set(base_snapshot.nodes_by_id) | set(target_nodes)
+
+        return self._compare(
+            base_snapshot, target_snapshot, target_nodes, changed, incremental
+        )
+
+    def _compare(
+        self,
+        base_snapshot: WorkflowSnapshotSchema,
+        target_snapshot: WorkflowSnapshotSchema | None,
+        target_nodes: dict,
+        changed: set[int],
+        incremental: bool,
+    ) -> dict:
+        base_nodes = base_snapshot.nodes_by_id
+        base_structure = GraphStructure.from_snapshot(base_snapshot)
+        target_structure = GraphStructure(
+            node_types=dict(base_structure.node_types),
+            references=dict(base_structure.references),
+        )
+        added_nodes, removed_nodes, changed_nodes = [], [], []
+        added_edges, removed_edges = [], []
+        # Nodes whose type or edges differ: every path that changed visits one.
+        rewired = set()
+        for node_id in sorted(changed):
+            old = base_nodes.get(node_id)
+            new = target_nodes.get(node_id)
+            if old is None and new is None:
+                continue
+            if old is None:
+                added_nodes.append(node_id)
+            elif new is None:
+                removed_nodes.append(node_id)
+            else:
+                fields = [
+                    name
+                    for name in NODE_FIELDS
+                    if getattr(old, name) != getattr(new, name)
+                ]
+                if not fields:
+                    continue
+                changed_nodes.append({"id": node_id, "fields": fields})
+            old_edges, new_edges = node_edges(old), node_edges(new)
+            removed_edges.extend(edge for edge in old_edges if edge not in new_edges)
+            added_edges.extend(edge for edge in new_edges if edge not in old_edges)
+            if (
+                old is None
+                or new is None
+                or old.node_type != new.node_type
+                or old_edges != new_edges
+            ):
+                rewired.add(node_id)
+            target_structure.node_types.pop(node_id, None)
+            target_structure.references.pop(node_id, None)
+            if new is not None:
+                target_structure.node_types[node_id] = new.node_type
+                target_structure.references[node_id] = node_references(
+                    new.node_type, new.next_node_id, new.yes_node_id, new.no_node_id
+                )
+
+        if target_snapshot is not None:
+            target_path = list(target_snapshot.path)
+        else:
+            target_path = shortest_path(target_structure, base_snapshot.path)
+        removed_paths, added_paths, paths_complete = [], [], True
+        if rewired:
+            deadline = time.monotonic() + settings.PATHS_TIMEOUT
+            base_paths, base_complete = self._paths_through(
+                base_structure, rewired, deadline
+            )
+            target_paths, target_complete = self._paths_through(
+                target_structure, rewired, deadline
+            )
+            removed_paths = [list(path) for path in base_paths - target_paths]
+            added_paths = [list(path) for path in target_paths - base_paths]
+            removed_paths.sort()
+            added_paths.sort()
+            paths_complete = base_complete and target_complete
+
+        return {
+            "workflow_id": base_snapshot.workflow_id,
+            "base_version": base_snapshot.version,
+            "target_version": target_snapshot and target_snapshot.version,
+            "incremental": incremental,
+            "added_nodes": added_nodes,
+            "removed_nodes": removed_nodes,
+            "changed_nodes": changed_nodes,
+            "added_edges": added_edges,
+            "removed_edges": removed_edges,
+            "base_path": list(base_snapshot.path),
+            "target_path": target_path,
+            "added_paths": added_paths,
+            "removed_paths": removed_paths,
+            "paths_complete": paths_complete,
+        }
+
+    def _paths_through(
+        self, structure: GraphStructure, through: set[int], deadline: float
+    ) -> tuple[set[tuple[int, ...]], bool]:
+        """
+        Start-to-end paths visiting one of the given nodes, within the
+        PATHS_* limits, and whether the set is complete.
+        """
+        start = find_start(structure)
+        if start is None:
+            return set(), True
+        stats = {}
+        paths = set()
+        for path in iter_paths(
+            structure, start, settings.PATHS_MAX_DEPTH, stats, deadline, through
+        ):
+            paths.add(path)
+            if len(paths) >= settings.PATHS_MAX_PATHS:
+                return paths, False
+        return paths, not stats["timed_out"] and not stats["depth_limited"]
@@ -0,0 +1,342 @@
+import asyncio
+import concurrent.futures
+import importlib
+import logging
+import random
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass
+from typing import Sequence
+
+from sqlalchemy import literal_column, select, update
+from sqlalchemy.orm import sessionmaker
+
+import settings
+from database.models import MessageNode, Node
+from database.revisions import bump_node_revisions
+from schemas.node import NodeStatus
+from schemas.workflow import WorkflowNodeSnapshotSchema
+from services.events import event_bus, ChangeAction
+from services.run import RunService
+from services.tracing import RunTrace, Tracer, run_tracer
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class OutgoingMessage:
+    """A message a run has to send before it can continue."""
+
+    run_id: int
+    node_id: int
+    next_node_id: int | None
+    message: str
+    # time.time_ns() when queued, set only for traced runs.
+    queued_at: int | None = None
+
+
+class MessageSender(ABC):
+    """
+    Interface of the transport delivering messages.
+    """
+
+    @abstractmethod
+    async def send(self, messages: Sequence[OutgoingMessage]) -> None:
+        """
+        Deliver a batch of messages; raise to have the whole batch retried.
+        """
+
+
+class LocalStubSender(MessageSender):
+    """
+    Sender that only logs and remembers the messages it was given.
+
+    Attributes:
+    - sent (deque): The most recently sent messages.
+    - fail_times (int): Number of upcoming send() calls that will fail.
+    """
+
+    def __init__(self, fail_times: int = 0, history: int = 10000):
+        self.sent: deque[OutgoingMessage] = deque(maxlen=history)
+        self.fail_times = fail_times
+        self.calls = 0
+
+    async def send(self, messages: Sequence[OutgoingMessage]) -> None:
+        self.calls += 1
+        if self.fail_times > 0:
+            self.fail_times -= 1
+            raise ConnectionError("Stub sender failure")
+        for message in messages:
+            logger.info("Message for run %s: %s", message.run_id, message.message)
+        self.sent.extend(messages)
+
+
+def create_sender(path: str = settings.DISPATCH_SENDER) -> MessageSender:
+    """
+    Instantiate a sender from its ``module.ClassName`` import path.
+    """
+    module_name, _, class_name = path.rpartition(".")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+class DispatchQueue:
+    """
+    A class to send run messages in the background.
+
+    Messages wait in a bounded asyncio queue: when it is full, producers block
+    (put / submit_threadsafe) or get ``asyncio.QueueFull`` (put_nowait), which
+    in turn stops the run scheduler from claiming more work. Worker tasks take
+    up to batch_size messages at a time, send them with retries and
+    exponential backoff, then mark the message nodes Pending -> Sent and
+    resume the runs with one batched transaction per batch.
+
+    Attributes:
+    - sender (MessageSender): Transport used to deliver messages.
+    - session_factory: Factory creating database sessions for status updates.
+    - runs (RunService): Service resuming or failing the waiting runs.
+    - stats (dict): Counters of queued, sent, failed and retried messages.
+    - tracer (Tracer): Records the dispatch latency of sampled runs.
+    """
+
+    def __init__(
+        self,
+        sender: MessageSender,
+        session_factory: sessionmaker,
+        runs: RunService | None = None,
+        concurrency: int = settings.DISPATCH_CONCURRENCY,
+        batch_size: int = settings.DISPATCH_BATCH_SIZE,
+        linger: float = settings.DISPATCH_LINGER,
+        max_queue: int = settings.DISPATCH_QUEUE_SIZE,
+        max_retries: int = settings.DISPATCH_MAX_RETRIES,
+        backoff_base: float = settings.DISPATCH_BACKOFF_BASE,
+        backoff_max: float = settings.DISPATCH_BACKOFF_MAX,
+        submit_timeout: float = settings.DISPATCH_SUBMIT_TIMEOUT,
+        tracer: Tracer = run_tracer,
+    ):
+        self.sender = sender
+        self.session_factory = session_factory
+        self.runs = runs or RunService()
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.linger = linger
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.submit_timeout = submit_timeout
+        self.tracer = tracer
+        self.stats = {"queued": 0, "sent": 0, "failed": 0, "retried": 0, "batches": 0}
+        self._queue: asyncio.Queue | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._workers: list[asyncio.Task] = []
+
+    @property
+    def size(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def put(self, message: OutgoingMessage) -> None:
+        """
+        Queue a message, waiting while the queue is full.
+        """
+        await self._queue.put(message)
+        self.stats["queued"] += 1
+
+    def put_nowait(self, message: OutgoingMessage) -> None:
+        """
+        Queue a message or raise asyncio.QueueFull.
+        """
+        self._queue.put_nowait(message)
+        self.stats["queued"] += 1
+
+    def submit_threadsafe(self, run_id: int, node: WorkflowNodeSnapshotSchema) -> None:
+        """
+        Queue the message of a node for a run from a worker thread.
+
+        Used as the RunScheduler dispatcher; blocks the calling thread while
+        the queue is full, for up to submit_timeout seconds.
+        :raises concurrent.futures.TimeoutError: The queue stayed full, or is
+            no longer served.
+        """
+        if self._loop is None:
+            raise RuntimeError("Dispatch queue is not running")
+        message = OutgoingMessage(
+            run_id=run_id,
+            node_id=node.id,
+            next_node_id=node.next_node_id,
+            message=node.message,
+            queued_at=time.time_ns() if self.tracer.sampled(run_id) else None,
+        )
+        future = asyncio.run_coroutine_threadsafe(self.put(message), self._loop)
+        try:
+            future.result(timeout=self.submit_timeout)
+        except concurrent.futures.TimeoutError:  # Not TimeoutError before 3.11.
+            future.cancel()
+            raise
+
+    async def _next_batch(self) -> list[OutgoingMessage]:
+        """
+        Wait for a message, then collect more until the batch is full or the
+        linger time is over.
+        """
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.linger
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Delay before a retry: exponential with jitter, capped at backoff_max.
+        """
+        delay = min(self.backoff_max, self.backoff_base * 2**attempt)
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _send(self, batch: list[OutgoingMessage]) -> Exception | None:
+        """
+        Send a batch, retrying with backoff.
+        :return: The last error if every attempt failed.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self.sender.send(batch)
+                return None
+            except Exception as error:
+                if attempt == self.max_retries:
+                    return error
+                self.stats["retried"] += len(batch)
+                logger.warning("Dispatch attempt %s failed: %r", attempt + 1, error)
+                await asyncio.sleep(self.backoff(attempt))
+
+    def _complete(self, batch: list[OutgoingMessage], error: Exception | None) -> None:
+        """
+        Write the outcome of a batch back in one transaction.
+        """
+        with self.session_factory() as db:
+            if error is not None:
+                self.runs.fail_runs(
+                    {
+                        message.run_id: f"Dispatch failed: {error!r}"
+                        for message in batch
+                    },
+                    db,
+                )
+                return
+            table = MessageNode.__table__
+            nodes = Node.__table__
+            # Qualified by hand, as in NodeService.transition_message_status.
+            workflow_id = (
+                select(nodes.c.workflow_id)
+                .where(nodes.c.id == literal_column(f"{table.name}.id"))
+                .scalar_subquery()
+                .label("workflow_id")
+            )
+            sent = db.execute(
+                update(table)
+                .where(
+                    table.c.id.in_({message.node_id for message in batch}),
+                    table.c.status == NodeStatus.pending,
+                )
+                .values(status=NodeStatus.sent)
+                .returning(table.c.id, workflow_id)
+            ).all()
+            bump_node_revisions(db, [row.id for row in sent])
+            # Commits the status update together with the resumed runs.
+            self.runs.resume_runs(
+                {message.run_id: message.next_node_id for message in batch}, db
+            )
+        for row in sent:
+            event_bus.publish(row.workflow_id, "node", row.id, ChangeAction.updated)
+
+    def _trace(
+        self,
+        traced: list[OutgoingMessage],
+        batch_size: int,
+        send_started: int,
+        send_ended: int,
+        error: Exception | None,
+    ) -> None:
+        """
+        Record queueing, sending and completion of traced runs' messages.
+        """
+        completed = time.time_ns()
+        error = repr(error) if error is not None else None
+        for message in traced:
+            trace = RunTrace(
+                self.tracer,
+                message.run_id,
+                message.queued_at,
+                name="dispatch",
+                **{"node.id": message.node_id, "batch.size": batch_size},
+            )
+            trace.span("dispatch.queue", message.queued_at, send_started)
+            trace.span("dispatch.send", send_started, send_ended, error)
+            trace.span("db.complete", send_ended, completed)
+            trace.finish(completed, error)
+
+    async def _worker(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            traced = [message for message in batch if message.queued_at is not None]
+            try:
+                if traced:
+                    send_started = time.time_ns()
+                error = await self._send(batch)
+                if traced:
+                    send_ended = time.time_ns()
+                await asyncio.to_thread(self._complete, batch, error)
+                self.stats["batches"] += 1
+                self.stats["failed" if error else "sent"] += len(batch)
+                if traced:
+                    self._trace(traced, len(batch), send_started, send_ended, error)
+            except Exception:
+                # Runs stay waiting and are re-dispatched when their lease ends.
+                logger.exception("Failed to complete dispatch batch")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def start(self) -> None:
+        """
+        Start the worker tasks on the running event loop.
+        """
+        if self._workers:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._workers = [
+            self._loop.create_task(self._worker()) for _ in range(self.concurrency)
+        ]
+
+    async def join(self) -> None:
+        """
+        Wait until every queued message has been handled.
+        """
+        await self._queue.join()
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """
+        Drain the queue for up to timeout seconds, then stop the workers.
+        """
+        if not self._workers:
+            return
+        try:
+            await asyncio.wait_for(self.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Stopping with %s undispatched messages", self.size)
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._loop = None
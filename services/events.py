@@ -0,0 +1,175 @@
+import asyncio
+import itertools
+import time
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+from enum import Enum
+
+import settings
+
+
+class ChangeAction(str, Enum):
+    created = "created"
+    updated = "updated"
+    deleted = "deleted"
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    """A create, update or delete of a workflow or one of its nodes."""
+
+    workflow_id: int
+    entity: str
+    entity_id: int
+    action: ChangeAction
+    at: float
+
+
+def coalesce(events: list[ChangeEvent]) -> list[ChangeEvent]:
+    """
+    Merge events about the same entity into its net change.
+
+    created + updated -> created, anything + deleted -> deleted (or nothing
+    when the entity was also created in the window), deleted + created ->
+    updated. The order of first appearance is kept.
+    """
+    merged: dict[tuple[str, int], ChangeEvent] = {}
+    for event in events:
+        key = (event.entity, event.entity_id)
+        previous = merged.get(key)
+        if previous is None:
+            merged[key] = event
+            continue
+        action = event.action
+        if previous.action == ChangeAction.created:
+            if action == ChangeAction.deleted:
+                del merged[key]
+                continue
+            action = ChangeAction.created
+        elif previous.action == ChangeAction.deleted and action == ChangeAction.created:
+            action = ChangeAction.updated
+        merged[key] = ChangeEvent(
+            event.workflow_id, event.entity, event.entity_id, action, event.at
+        )
+    return list(merged.values())
+
+
+class Subscription:
+    """
+    Bounded buffer of coalesced event batches for one consumer.
+
+    When the consumer falls behind, the oldest batch is dropped and the next
+    one is flagged with ``overflow`` so the client knows to re-read the
+    workflow instead of trusting the stream.
+    """
+
+    def __init__(self, workflow_id: int, buffer_size: int):
+        self.workflow_id = workflow_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=buffer_size)
+        self.overflowed = False
+
+    def push(self, batch: dict) -> None:
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.overflowed = True
+        if self.overflowed:
+            batch = {**batch, "overflow": True}
+            self.overflowed = False
+        self.queue.put_nowait(batch)
+
+    async def get(self) -> dict:
+        return await self.queue.get()
+
+
+class ChangeEventBus:
+    """
+    A class to fan workflow and node changes out to stream subscribers.
+
+    publish() may be called from any thread (services run in the threadpool);
+    events are handed to the bound event loop, collected per workflow for
+    coalesce_window seconds and delivered to that workflow's subscribers as
+    one batch. Until bind() is called, or when nobody listens to a workflow,
+    publishing costs a dictionary lookup.
+
+    Attributes:
+    - coalesce_window (float): Seconds edits to one workflow are collected.
+    - buffer_size (int): Batches buffered per subscriber.
+    """
+
+    def __init__(
+        self,
+        coalesce_window: float = settings.EVENTS_COALESCE_WINDOW,
+        buffer_size: int = settings.EVENTS_BUFFER_SIZE,
+    ):
+        self.coalesce_window = coalesce_window
+        self.buffer_size = buffer_size
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._subscribers: dict[int, set[Subscription]] = defaultdict(set)
+        self._pending: dict[int, list[ChangeEvent]] = {}
+        self._sequence = itertools.count(1)
+
+    def bind(self, loop: asyncio.AbstractEventLoop | None = None) -> None:
+        """
+        Deliver events on the given (or running) event loop.
+        """
+        self._loop = loop or asyncio.get_running_loop()
+
+    def unbind(self) -> None:
+        self._loop = None
+        self._pending.clear()
+
+    def publish(
+        self, workflow_id: int, entity: str, entity_id: int, action: ChangeAction
+    ) -> None:
+        """
+        Record a change; safe to call from any thread.
+        """
+        loop = self._loop
+        if loop is None or not self._subscribers.get(workflow_id):
+            return
+        event = ChangeEvent(workflow_id, entity, entity_id, action, time.time())
+        try:
+            loop.call_soon_threadsafe(self._collect, event)
+        except RuntimeError:
+            # Loop already closed during shutdown.
+            pass
+
+    def _collect(self, event: ChangeEvent) -> None:
+        if self._loop is None:
+            return
+        pending = self._pending.get(event.workflow_id)
+        if pending is None:
+            self._pending[event.workflow_id] = [event]
+            self._loop.call_later(self.coalesce_window, self._flush, event.workflow_id)
+        else:
+            pending.append(event)
+
+    def _flush(self, workflow_id: int) -> None:
+        events = coalesce(self._pending.pop(workflow_id, []))
+        if not events:
+            return
+        batch = {
+            "id": next(self._sequence),
+            "workflow_id": workflow_id,
+            "events": [asdict(event) for event in events],
+        }
+        for subscription in list(self._subscribers.get(workflow_id, ())):
+            subscription.push(batch)
+
+    def subscribe(self, workflow_id: int) -> Subscription:
+        """
+        Start buffering batches of a workflow for a new consumer.
+        """
+        subscription = Subscription(workflow_id, self.buffer_size)
+        self._subscribers[workflow_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._subscribers.get(subscription.workflow_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.workflow_id]
+
+
+event_bus = ChangeEventBus()
@@ -0,0 +1,480 @@
+from dataclasses import dataclass, field
+from itertools import chain
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+import settings
+from database.models import Node, NodeChange
+from database.records import load_node_records
+from schemas.layout import (
+    LayoutEdgeSchema,
+    NodePositionSchema,
+    WorkflowLayoutSchema,
+)
+from schemas.node import NodeType
+from services.analysis import GraphStructure, node_references
+from services.cache import LRUCache, SingleFlight
+from services.node import NodeService
+from services.workflow import WorkflowService
+
+
+@dataclass
+class LayeredLayout:
+    """
+    Positions of the nodes of a workflow graph and the routes of its edges.
+
+    Attributes:
+    - layers (dict): Layer of every node, keyed by node ID.
+    - orders (dict): Position of every node among the nodes of its layer.
+    - x (dict): Horizontal coordinate of every node.
+    - edges (list): (source, target, field, points, reversed) of every edge
+      between two nodes of the graph, in the order of the references.
+    - width (float): Span of the x coordinates plus one.
+    - height (int): Number of layers.
+    """
+
+    layers: dict[int, int] = field(default_factory=dict)
+    orders: dict[int, int] = field(default_factory=dict)
+    x: dict[int, float] = field(default_factory=dict)
+    edges: list[tuple[int, int, str, list[tuple[float, float]], bool]] = field(
+        default_factory=list
+    )
+    width: float = 0
+    height: int = 0
+
+
+def break_cycles(
+    node_ids: list[int], successors: dict[int, list[int]]
+) -> set[tuple[int, int]]:
+    """
+    Edges to reverse to make a graph acyclic: the back edges of a depth-first
+    search starting from the nodes in the given order.
+    """
+    state = {}
+    back_edges = set()
+    for root in node_ids:
+        if root in state:
+            continue
+        state[root] = "open"
+        stack = [(root, iter(successors[root]))]
+        while stack:
+            node, children = stack[-1]
+            for child in children:
+                child_state = state.get(child)
+                if child_state is None:
+                    state[child] = "open"
+                    stack.append((child, iter(successors[child])))
+                    break
+                if child_state == "open":
+                    back_edges.add((node, child))
+            else:
+                state[node] = "done"
+                stack.pop()
+    return back_edges
+
+
+def assign_layers(
+    node_ids: list[int], successors: dict[int, list[int]]
+) -> dict[int, int]:
+    """
+    Layer of every node of an acyclic graph: one below its lowest
+    predecessor, and sources right above their highest successor.
+    """
+    indegree = dict.fromkeys(node_ids, 0)
+    for node in node_ids:
+        for child in successors[node]:
+            indegree[child] += 1
+    sources = {node for node, degree in indegree.items() if not degree}
+    layers = dict.fromkeys(node_ids, 0)
+    topological = [node for node in node_ids if node in sources]
+    for node in topological:
+        for child in successors[node]:
+            layers[child] = max(layers[child], layers[node] + 1)
+            indegree[child] -= 1
+            if not indegree[child]:
+                topological.append(child)
+    for node in reversed(topological):
+        if node in sources and successors[node]:
+            layers[node] = min(layers[child] for child in successors[node]) - 1
+    return layers
+
+
+def _initial_order(
+    layers: list[list[int]],
+    upper: dict[int, list[int]],
+    previous: dict[int, float],
+) -> None:
+    """
+    Order each layer by the previous x of its nodes; new nodes go under the
+    mean of their upper neighbours, or to the right end.
+    """
+    keys = {}
+    for layer in layers:
+        for node in layer:
+            if node in previous:
+                keys[node] = previous[node]
+            elif upper[node]:
+                keys[node] = sum(keys[u] for u in upper[node]) / len(upper[node])
+            else:
+                keys[node] = float("inf")
+        layer.sort(key=keys.__getitem__)
+        last = None
+        for node in layer:
+            if keys[node] == float("inf"):
+                keys[node] = 0 if last is None else last + 1
+            last = keys[node]
+
+
+def _reorder(layer: list[int], neighbours: dict[int, list[int]], pos: dict) -> bool:
+    """
+    Sort a layer by the barycenters of its nodes' neighbours in the adjacent
+    layer. :return: Whether the order changed.
+    """
+    barycenters = {
+        node: (
+            sum(pos[n] for n in neighbours[node]) / len(neighbours[node])
+            if neighbours[node]
+            else pos[node]
+        )
+        for node in layer
+    }
+    order = sorted(layer, key=barycenters.__getitem__)
+    if order == layer:
+        return False
+    layer[:] = order
+    for index, node in enumerate(layer):
+        pos[node] = index
+    return True
+
+
+def _place(desired: list[float | None]) -> list[float]:
+    """
+    Coordinates at least one apart, in the given order, as close as possible
+    to the desired ones: the mean of the leftmost and rightmost placements.
+    """
+    known = [index for index, value in enumerate(desired) if value is not None]
+    if not known:
+        return [float(index) for index in range(len(desired))]
+    filled = list(desired)
+    first = known[0]
+    for index in range(first):
+        filled[index] = desired[first] - (first - index)
+    for index in range(first + 1, len(filled)):
+        if filled[index] is None:
+            filled[index] = filled[index - 1] + 1
+    left = []
+    for value in filled:
+        left.append(value if not left else max(value, left[-1] + 1))
+    right = [0.0] * len(filled)
+    for index in range(len(filled) - 1, -1, -1):
+        value = filled[index]
+        right[index] = (
+            value if index == len(filled) - 1 else min(value, right[index + 1] - 1)
+        )
+    return [(low + high) / 2 for low, high in zip(left, right)]
+
+
+def layered_layout(
+    structure: GraphStructure,
+    previous: dict[int, float] | None = None,
+    sweeps: int = settings.LAYOUT_SWEEPS,
+    max_span: int = settings.LAYOUT_MAX_EDGE_SPAN,
+) -> LayeredLayout:
+    """
+    Draw a workflow graph in layers, Sugiyama-style: cycles are broken by
+    reversing back edges, nodes are layered by longest path, edges spanning
+    several layers are routed through dummy nodes, layers are ordered by
+    barycenter sweeps, and each node is centred under its upper neighbours.
+    :param structure: Nodes and edges of the graph.
+    :param previous: x of the nodes of an earlier layout. Nodes found there
+        keep their order and coordinate where the layers allow it; no
+        sweeps run, so a small edit moves only the nodes it touches.
+    :param sweeps: Maximum number of down-and-up barycenter sweeps.
+    :param max_span: Edges spanning more layers are drawn straight, without
+        dummy nodes, and left out of the ordering.
+    """
+    node_types = structure.node_types
+    starts = sorted(
+        node_id
+        for node_id, node_type in node_types.items()
+        if node_type == NodeType.start
+    )
+    node_ids = list(dict.fromkeys(chain(starts, sorted(node_types))))
+    references = {
+        node_id: [
+            (name, target)
+            for name, target in structure.references.get(node_id, ())
+            if target in node_types
+        ]
+        for node_id in node_ids
+    }
+    successors = {
+        node_id: list(
+            dict.fromkeys(
+                target for _, target in references[node_id] if target != node_id
+            )
+        )
+        for node_id in node_ids
+    }
+    reversed_edges = break_cycles(node_ids, successors)
+    acyclic = {node_id: [] for node_id in node_ids}
+    for node_id in node_ids:
+        for target in successors[node_id]:
+            if (node_id, target) in reversed_edges:
+                acyclic[target].append(node_id)
+            else:
+                acyclic[node_id].append(target)
+    for node_id in node_ids:
+        acyclic[node_id] = list(dict.fromkeys(acyclic[node_id]))
+    layer_of = assign_layers(node_ids, acyclic)
+
+    # Edges spanning several layers pass through dummy nodes, one per layer
+    # crossed, with negative IDs. Very long edges (e.g. from every branch of
+    # a long chain back to its end) would need as many dummies as the rest
+    # of the drawing together and are left straight instead.
+    upper = {node_id: [] for node_id in node_ids}
+    lower = {node_id: [] for node_id in node_ids}
+    routes = {}
+    dummy = 0
+    for node_id in node_ids:
+        for target in acyclic[node_id]:
+            if layer_of[target] - layer_of[node_id] > max_span:
+                routes[node_id, target] = [node_id, target]
+                continue
+            route = [node_id]
+            for layer in range(layer_of[node_id] + 1, layer_of[target]):
+                dummy -= 1
+                layer_of[dummy] = layer
+                upper[dummy], lower[dummy] = [], []
+                route.append(dummy)
+            route.append(target)
+            for above, below in zip(route, route[1:]):
+                lower[above].append(below)
+                upper[below].append(above)
+            routes[node_id, target] = route
+
+    height = max(layer_of.values(), default=-1) + 1
+    layers = [[] for _ in range(height)]
+    for node in chain(node_ids, range(-1, dummy - 1, -1)):
+        layers[layer_of[node]].append(node)
+    _initial_order(layers, upper, previous or {})
+    if not previous:
+        pos = {node: index for layer in layers for index, node in enumerate(layer)}
+        for _ in range(sweeps):
+            changed = False
+            for layer in layers[1:]:
+                changed |= _reorder(layer, upper, pos)
+            for layer in reversed(layers[:-1]):
+                changed |= _reorder(layer, lower, pos)
+            if not changed:
+                break
+
+    x = {}
+    for layer in layers:
+        desired = []
+        for node in layer:
+            if previous and node in previous:
+                desired.append(previous[node])
+            elif upper[node]:
+                desired.append(sum(x[u] for u in upper[node]) / len(upper[node]))
+            else:
+                desired.append(None)
+        x.update(zip(layer, _place(desired)))
+    shift = min(x.values(), default=0)
+    for node in x:
+        x[node] -= shift
+
+    layout = LayeredLayout(
+        width=max(x.values(), default=-1) + 1,
+        height=height,
+    )
+    for layer in layers:
+        order = 0
+        for node in layer:
+            if node >= 0:
+                layout.layers[node] = layer_of[node]
+                layout.orders[node] = order
+                layout.x[node] = x[node]
+                order += 1
+    for node_id in node_ids:
+        for name, target in references[node_id]:
+            if target == node_id:
+                route, flipped = [node_id, node_id], False
+            elif (node_id, target) in reversed_edges:
+                route, flipped = routes[target, node_id][::-1], True
+            else:
+                route, flipped = routes[node_id, target], False
+            points = [(x[node], float(layer_of[node])) for node in route]
+            layout.edges.append((node_id, target, name, points, flipped))
+    return layout
+
+
+def records_structure(records) -> GraphStructure:
+    """Structure of a workflow read as node records."""
+    return GraphStructure(
+        node_types={record.id: record.node_type for record in records},
+        references={
+            record.id: node_references(
+                record.node_type,
+                record.next_node_id,
+                record.yes_node_id,
+                record.no_node_id,
+            )
+            for record in records
+        },
+    )
+
+
+# Layouts keyed by (database, workflow id); each entry remembers the
+# revision and change log position it was computed at.
+layout_cache = LRUCache(maxsize=settings.LAYOUT_CACHE_SIZE)
+# In-flight layout computations keyed by (database, workflow id, revision).
+layout_flights = SingleFlight()
+
+
+class WorkflowLayoutService:
+    """
+    A class to lay out workflows for the visual editor.
+
+    A layout is computed from the same next/yes/no edges WorkflowGraph
+    builds, but without its validation, so drafts that do not run yet can
+    still be drawn. It is cached with the nodes it was computed from; when
+    the revision changes, only the nodes logged in the change log since
+    then are read again, and the previous coordinates seed the new layout.
+    Edits of more than LAYOUT_INCREMENTAL_MAX_CHANGES nodes are laid out
+    from scratch.
+
+    Attributes:
+    - layouts (LRUCache): Process-local cache of layouts. An entry is only
+      served while its revision matches the one stored in the database.
+    - flights (SingleFlight): Coalesces concurrent computations of one
+      revision.
+    """
+
+    def __init__(
+        self,
+        layouts: LRUCache = layout_cache,
+        flights: SingleFlight = layout_flights,
+        workflows: WorkflowService | None = None,
+        nodes: NodeService | None = None,
+    ):
+        self.layouts = layouts
+        self.flights = flights
+        self.workflows = workflows or WorkflowService()
+        self.nodes = nodes or NodeService()
+
+    def get_layout(self, workflow_id: int, db: Session) -> WorkflowLayoutSchema:
+        """
+        Layout of the draft of a workflow with its nodes and edges.
+        :param workflow_id: ID of the workflow.
+        :param db: Database session for the operation.
+        :return: The layout, cached until the workflow changes.
+        """
+        revision = self.workflows.get_revision(workflow_id, db)
+        key = (str(db.get_bind().url), workflow_id)
+        cached = self.layouts.get(key)
+        if cached is not None and cached["revision"] == revision:
+            return cached["layout"]
+        return self.flights.do(
+            (*key, revision),
+            lambda: self._compute(workflow_id, revision, cached, db),
+        )
+
+    def _changed_nodes(
+        self, workflow_id: int, change_id: int, db: Session
+    ) -> list[int] | None:
+        """
+        Nodes logged as changed since a change log position; None when there
+        are too many to patch a layout with.
+        """
+        changed = db.scalars(
+            select(NodeChange.node_id)
+            .where(NodeChange.workflow_id == workflow_id, NodeChange.id > change_id)
+            .distinct()
+            .limit(settings.LAYOUT_INCREMENTAL_MAX_CHANGES + 1)
+        ).all()
+        if len(changed) > settings.LAYOUT_INCREMENTAL_MAX_CHANGES:
+            return None
+        return changed
+
+    def _compute(
+        self, workflow_id: int, revision: int, cached: dict | None, db: Session
+    ) -> WorkflowLayoutSchema:
+        # Read before the nodes: changes logged meanwhile are read again by
+        # the next computation, never missed.
+        change_id = db.scalar(
+            select(func.coalesce(func.max(NodeChange.id), 0)).where(
+                NodeChange.workflow_id == workflow_id
+            )
+        )
+        changed = None
+        if cached is not None:
+            changed = self._changed_nodes(workflow_id, cached["change_id"], db)
+        if changed is None:
+            records = {
+                record.id: record
+                for record in load_node_records(db, Node.workflow_id == workflow_id)
+            }
+            responses = {}
+            previous = None
+        else:
+            records = dict(cached["records"])
+            responses = dict(cached["responses"])
+            for node_id in changed:
+                records.pop(node_id, None)
+                responses.pop(node_id, None)
+            if changed:
+                records.update(
+                    (record.id, record)
+                    for record in load_node_records(
+                        db, Node.id.in_(changed), Node.workflow_id == workflow_id
+                    )
+                )
+            records = dict(sorted(records.items()))
+            previous = cached["x"]
+
+        drawing = layered_layout(records_structure(records.values()), previous)
+        for node_id, record in records.items():
+            if node_id not in responses:
+                responses[node_id] = self.nodes.to_response(record)
+        layout = WorkflowLayoutSchema(
+            workflow_id=workflow_id,
+            revision=revision,
+            incremental=previous is not None,
+            width=drawing.width,
+            height=drawing.height,
+            nodes=[responses[node_id] for node_id in records],
+            positions=[
+                NodePositionSchema(
+                    id=node_id,
+                    layer=drawing.layers[node_id],
+                    order=drawing.orders[node_id],
+                    x=drawing.x[node_id],
+                    y=drawing.layers[node_id],
+                )
+                for node_id in records
+            ],
+            edges=[
+                LayoutEdgeSchema(
+                    source=source,
+                    target=target,
+                    field=name,
+                    points=points,
+                    reversed=flipped,
+                )
+                for source, target, name, points, flipped in drawing.edges
+            ],
+        )
+        self.layouts.set(
+            (str(db.get_bind().url), workflow_id),
+            {
+                "revision": revision,
+                "change_id": change_id,
+                "records": records,
+                "responses": responses,
+                "x": drawing.x,
+                "layout": layout,
+            },
+        )
+        return layout
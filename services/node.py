@@ -1,9 +1,14 @@
 from fastapi import Depends, status, Response, HTTPException
+from sqlalchemy import func, insert, literal_column, select, update
 from sqlalchemy.orm import Session
 
 from database.config import get_db
+from database.revisions import bump_revisions
+from database.records import NodeRecord, get_node_record, load_node_records
 from database.models import (
+    Workflow,
     Node,
+    NodeChange,
     ConditionNode,
     MessageNode,
     StartNode,
@@ -15,13 +20,29 @@ from schemas.node import (
     EndNodeSchema,
     MessageNodeSchema,
     ConditionNodeSchema,
+    StartNodeResponseSchema,
+    EndNodeResponseSchema,
+    MessageNodeResponseSchema,
+    ConditionNodeResponseSchema,
+    NodeResponseSchema,
+    NodeStatus,
+    MessageNodeStatusTransitionSchema,
 )
+from services.archive import workflow_archive
+from services.events import event_bus, ChangeAction
 from services.utils import (
     get_object_by_id,
     save_object,
     delete_object,
 )
 
+# Statuses a message node may move to from each status.
+MESSAGE_STATUS_TRANSITIONS = {
+    NodeStatus.pending: {NodeStatus.sent},
+    NodeStatus.sent: {NodeStatus.open},
+    NodeStatus.open: set(),
+}
+
 
 class BaseNodeService:
     """
@@ -30,6 +51,7 @@ class BaseNodeService:
     Attributes:
     - node_model: Model class representing the node.
     - node_schema: Schema class representing the node data structure.
+    - response_schema: Schema class used to serialize the node in responses.
     """
 
     def __init__(
@@ -38,9 +60,16 @@ class BaseNodeService:
         node_schema: [
             StartNodeSchema | EndNodeSchema | MessageNodeSchema | ConditionNodeSchema
         ],
+        response_schema: [
+            StartNodeResponseSchema
+            | EndNodeResponseSchema
+            | MessageNodeResponseSchema
+            | ConditionNodeResponseSchema
+        ],
     ):
         self.node_model = node_model
         self.node_schema = node_schema
+        self.response_schema = response_schema
 
     def create_node(
         self,
@@ -61,7 +90,9 @@ class BaseNodeService:
                     detail=f"{self.node_model.__name__} already exists for this workflow",
                 )
         node = self.node_model(**node_data.dict())
-        return save_object(object=node, db_session=db)
+        save_object(object=node, db_session=db)
+        event_bus.publish(node.workflow_id, "node", node.id, ChangeAction.created)
+        return node
 
     def get_node(self, node_id: int, db: Session): ...
 
@@ -75,14 +106,25 @@ class BaseNodeService:
     ) -> Node:
         node = get_object_by_id(model=self.node_model, object_id=node_id, db_session=db)
 
+        previous_workflow_id = node.workflow_id
         for attr, value in node_data.dict().items():
             setattr(node, attr, value)  # Update node properties
 
-        return save_object(object=node, db_session=db)
+        save_object(object=node, db_session=db)
+        if previous_workflow_id != node.workflow_id:
+            event_bus.publish(
+                previous_workflow_id, "node", node.id, ChangeAction.deleted
+            )
+            event_bus.publish(node.workflow_id, "node", node.id, ChangeAction.created)
+        else:
+            event_bus.publish(node.workflow_id, "node", node.id, ChangeAction.updated)
+        return node
 
     def delete_node(self, node_id: int, db: Session = Depends(get_db)):
         node = get_object_by_id(model=self.node_model, object_id=node_id, db_session=db)
+        workflow_id = node.workflow_id
         delete_object(object=node, db_session=db)
+        event_bus.publish(workflow_id, "node", node_id, ChangeAction.deleted)
         return status.HTTP_204_NO_CONTENT
 
 
@@ -91,10 +133,18 @@ class NodeService:
     def __init__(self):
         # Create a factory for different types of nodes
         self.node_services = {
-            NodeType.start: BaseNodeService(StartNode, StartNodeSchema),
-            NodeType.message: BaseNodeService(MessageNode, MessageNodeSchema),
-            NodeType.condition: BaseNodeService(ConditionNode, ConditionNodeSchema),
-            NodeType.end: BaseNodeService(EndNode, EndNodeSchema),
+            NodeType.start: BaseNodeService(
+                StartNode, StartNodeSchema, StartNodeResponseSchema
+            ),
+            NodeType.message: BaseNodeService(
+                MessageNode, MessageNodeSchema, MessageNodeResponseSchema
+            ),
+            NodeType.condition: BaseNodeService(
+                ConditionNode, ConditionNodeSchema, ConditionNodeResponseSchema
+            ),
+            NodeType.end: BaseNodeService(
+                EndNode, EndNodeSchema, EndNodeResponseSchema
+            ),
         }
 
     def create_node(
@@ -108,10 +158,51 @@ class NodeService:
         node_service = self.node_services.get(node_type)
         return node_service.create_node(node_data, db)
 
+    def get_revision(self, node_id: int, db: Session) -> tuple[int | None, int | None]:
+        """
+        Read only the workflow owning a node and its revision, which changes
+        with every write to the node, with one indexed core query.
+        :param node_id: ID of the node.
+        :param db: Database session for the operation.
+        :return: The workflow ID and revision, None for a node outside of
+            any workflow. Both are needed to tag the node: a node moved to
+            another workflow may find it at the revision of the old one.
+        """
+        row = db.execute(
+            select(Node.workflow_id, Workflow.revision)
+            .select_from(Node)
+            .outerjoin(Workflow, Workflow.id == Node.workflow_id)
+            .where(Node.id == node_id)
+        ).first()
+        if row is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+        return row.workflow_id, row.revision
+
     def get_node(self, node_id: int, db: Session = Depends(get_db)) -> Node:
-        node = get_object_by_id(model=Node, object_id=node_id, db_session=db)
+        node = get_node_record(db, node_id)
+        if node is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+        return self.to_response(node)
+
+    def list_nodes(self, workflow_id: int, db: Session) -> list[NodeResponseSchema]:
+        """
+        Get every node of a workflow, read as records rather than ORM objects.
+        :param workflow_id: ID of the workflow.
+        :param db: Database session for the operation.
+        :return: Response schemas of the nodes ordered by ID.
+        """
+        get_object_by_id(model=Workflow, object_id=workflow_id, db_session=db)
+        return [
+            self.to_response(node)
+            for node in load_node_records(db, Node.workflow_id == workflow_id)
+        ]
+
+    def to_response(self, node: NodeRecord):
+        """
+        Response schema of a node record, by its type.
+        """
         node_service = self.node_services.get(node.node_type)
-        return node_service.node_schema.from_orm(node)
+        return node_service.response_schema.model_validate(node)
 
     def update_node(
         self,
@@ -129,3 +220,85 @@ class NodeService:
         node = get_object_by_id(model=Node, object_id=node_id, db_session=db)
         node_service = self.node_services.get(node.node_type)
         return node_service.delete_node(node_id, db)
+
+    def transition_message_status(
+        self, data: MessageNodeStatusTransitionSchema, db: Session
+    ) -> dict:
+        """
+        Move every message node matching the filters to a new status with one
+        set-based UPDATE. Nodes whose current status may not move to the
+        target are matched but left as they are.
+        :param data: Filters and the target status.
+        :param db: Database session for the operation.
+        :return: Counts of matched, updated and skipped nodes.
+        """
+        if data.workflow_id is None and data.from_status is None and not data.node_ids:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Give workflow_id, from_status or node_ids",
+            )
+        sources = {
+            source
+            for source, targets in MESSAGE_STATUS_TRANSITIONS.items()
+            if data.to_status in targets
+        }
+        if data.from_status is not None:
+            sources &= {data.from_status}
+        if not sources:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Message nodes can't move "
+                f"from {data.from_status.value if data.from_status else 'any status'} "
+                f"to {data.to_status.value}",
+            )
+        if data.workflow_id is not None:
+            workflow_archive.restore(data.workflow_id, db)
+
+        table = MessageNode.__table__
+        nodes = Node.__table__
+        criteria = []
+        if data.workflow_id is not None:
+            criteria.append(
+                table.c.id.in_(
+                    select(nodes.c.id).where(nodes.c.workflow_id == data.workflow_id)
+                )
+            )
+        if data.from_status is not None:
+            criteria.append(table.c.status == data.from_status)
+        if data.node_ids:
+            criteria.append(table.c.id.in_(set(data.node_ids)))
+        matched = db.scalar(select(func.count()).select_from(table).where(*criteria))
+        # Qualified by hand: RETURNING renders the updated table's columns bare,
+        # which inside the subquery would name the nodes table's.
+        workflow_id = (
+            select(nodes.c.workflow_id)
+            .where(nodes.c.id == literal_column(f"{table.name}.id"))
+            .scalar_subquery()
+            .label("workflow_id")
+        )
+        updated = []
+        if matched:
+            updated = db.execute(
+                update(table)
+                .where(*criteria, table.c.status.in_(sources))
+                .values(status=data.to_status)
+                .returning(table.c.id, workflow_id)
+            ).all()
+        if updated:
+            # Logged from the returned rows: the IDs may be too many to filter by.
+            db.execute(
+                insert(NodeChange),
+                [
+                    {"workflow_id": row.workflow_id, "node_id": row.id}
+                    for row in updated
+                ],
+            )
+            bump_revisions(db, {row.workflow_id for row in updated})
+        db.commit()
+        for row in updated:
+            event_bus.publish(row.workflow_id, "node", row.id, ChangeAction.updated)
+        return {
+            "matched": matched,
+            "updated": len(updated),
+            "skipped": matched - len(updated),
+        }
@@ -0,0 +1,187 @@
+import time
+from typing import Collection, Iterator
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from starlette import status
+
+import settings
+from database.models import Workflow
+from schemas.node import NodeType
+from services.analysis import GraphStructure, load_structure, reachable
+from services.version import WorkflowVersionService
+
+# How many DFS steps run between two checks of the time limit.
+DEADLINE_CHECK_INTERVAL = 1024
+
+
+def iter_paths(
+    structure: GraphStructure,
+    start: int,
+    max_depth: int,
+    stats: dict,
+    deadline: float | None = None,
+    through: Collection[int] | None = None,
+) -> Iterator[tuple[int, ...]]:
+    """
+    Yield every simple path from start to an end node, depth first.
+
+    The DFS keeps only the current path and one successor iterator per node
+    on it, so memory is proportional to the path depth however many paths
+    there are. A node never repeats within a path: edges back into the path
+    (loops) are skipped and counted in stats["skipped_cycles"]; branches
+    longer than max_depth nodes are cut and counted in stats["depth_limited"].
+    :param structure: The graph to walk.
+    :param start: ID of the start node.
+    :param max_depth: Maximum number of nodes in a path.
+    :param stats: Counters updated while walking.
+    :param deadline: time.monotonic() value after which the walk stops and
+        stats["timed_out"] is set.
+    :param through: Only yield the paths visiting at least one of these
+        nodes; branches that can no longer reach one are not walked.
+    """
+    stats.setdefault("skipped_cycles", 0)
+    stats.setdefault("depth_limited", 0)
+    stats.setdefault("timed_out", False)
+    node_types = structure.node_types
+    if through is not None:
+        through = set(through)
+        predecessors = {}
+        for node_id in node_types:
+            for target in structure.successors(node_id):
+                predecessors.setdefault(target, []).append(node_id)
+        leads_through = reachable(through, predecessors)
+    if node_types.get(start) == NodeType.end:
+        if through is None or start in through:
+            yield (start,)
+        return
+
+    path = [start]
+    on_path = {start}
+    # Nodes of `through` on the current path.
+    hits = int(through is not None and start in through)
+    stack = [iter(structure.successors(start))]
+    steps = 0
+    while stack:
+        steps += 1
+        if (
+            deadline is not None
+            and steps % DEADLINE_CHECK_INTERVAL == 0
+            and time.monotonic() > deadline
+        ):
+            stats["timed_out"] = True
+            return
+        child = next(stack[-1], None)
+        if child is None:
+            stack.pop()
+            node_id = path.pop()
+            on_path.discard(node_id)
+            if through is not None and node_id in through:
+                hits -= 1
+            continue
+        if child in on_path:
+            stats["skipped_cycles"] += 1
+        elif through is not None and not hits and child not in leads_through:
+            continue
+        elif node_types[child] == NodeType.end:
+            yield (*path, child)
+        elif len(path) + 1 >= max_depth:
+            stats["depth_limited"] += 1
+        else:
+            path.append(child)
+            on_path.add(child)
+            if through is not None and child in through:
+                hits += 1
+            stack.append(iter(structure.successors(child)))
+
+
+class WorkflowPathService:
+    """
+    A class to enumerate every start-to-end path of a workflow.
+
+    Attributes:
+    - versions (WorkflowVersionService): Source of published snapshots.
+    """
+
+    def __init__(self, versions: WorkflowVersionService | None = None):
+        self.versions = versions or WorkflowVersionService()
+
+    def load_structure(
+        self,
+        workflow_id: int,
+        db: Session,
+        version: int | None = None,
+        draft: bool = False,
+    ) -> GraphStructure:
+        """
+        Load the graph of the latest published version, a given version, or
+        the draft.
+        """
+        if not draft:
+            snapshot = self.versions.get_snapshot(
+                workflow_id=workflow_id, db=db, version=version
+            )
+            return GraphStructure.from_snapshot(snapshot)
+        exists = db.scalar(select(Workflow.id).where(Workflow.id == workflow_id))
+        if exists is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+        return load_structure(workflow_id, db)
+
+    def iter_paths(
+        self,
+        structure: GraphStructure,
+        max_paths: int = settings.PATHS_MAX_PATHS,
+        max_depth: int = settings.PATHS_MAX_DEPTH,
+        timeout: float = settings.PATHS_TIMEOUT,
+    ) -> Iterator[dict]:
+        """
+        Stream the paths of a graph, then a summary of the walk.
+        :param structure: The graph, see load_structure().
+        :param max_paths: Stop after this many paths.
+        :param max_depth: Maximum number of nodes in a path.
+        :param timeout: Seconds after which the walk stops.
+        :return: {"path": [...]} items followed by one {"summary": {...}}.
+        """
+        starts = [
+            node_id
+            for node_id, node_type in structure.node_types.items()
+            if node_type == NodeType.start
+        ]
+        if len(starts) != 1:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Workflow must have exactly one start node",
+            )
+        return self._walk(structure, starts[0], max_paths, max_depth, timeout)
+
+    def _walk(
+        self,
+        structure: GraphStructure,
+        start: int,
+        max_paths: int,
+        max_depth: int,
+        timeout: float,
+    ) -> Iterator[dict]:
+        stats = {}
+        paths = 0
+        truncated = None
+        for path in iter_paths(
+            structure, start, max_depth, stats, time.monotonic() + timeout
+        ):
+            yield {"path": path}
+            paths += 1
+            if paths >= max_paths:
+                truncated = "max_paths"
+                break
+        if stats.get("timed_out"):
+            truncated = "timeout"
+        yield {
+            "summary": {
+                "paths": paths,
+                "complete": truncated is None and not stats["depth_limited"],
+                "truncated": truncated,
+                "skipped_cycles": stats["skipped_cycles"],
+                "depth_limited": stats["depth_limited"],
+            }
+        }
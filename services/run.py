@@ -0,0 +1,541 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable
+
+from sqlalchemy import and_, bindparam, insert, or_, select, update
+from sqlalchemy.orm import Session, sessionmaker
+
+import settings
+from database.models import Workflow, WorkflowRun, RunTransition
+from schemas.node import NodeType
+from schemas.run import RunStatus, RunCreateSchema
+from schemas.workflow import WorkflowNodeSnapshotSchema
+from services.analytics import PathAnalytics, path_analytics
+from services.conditions import evaluate_condition
+from services.tracing import RunTrace, Tracer, run_tracer
+from services.utils import get_object_by_id, save_object
+from services.version import WorkflowVersionService
+
+logger = logging.getLogger(__name__)
+
+# Called with a run id and the message node the run reached. The dispatcher
+# must eventually resume the run (RunService.resume_runs) once the message
+# has been sent; until then the run stays waiting.
+MessageDispatcher = Callable[[int, WorkflowNodeSnapshotSchema], None]
+
+
+@dataclass
+class RunStep:
+    """Outcome of advancing one run as far as it can go."""
+
+    status: RunStatus
+    node_id: int | None
+    error: str | None = None
+    dispatch: WorkflowNodeSnapshotSchema | None = None
+    # Nodes visited in this step, then the node the run continues with unless
+    # the run finished.
+    path: tuple[int, ...] = ()
+
+
+class RunService:
+    """
+    A class to create and inspect workflow runs.
+    """
+
+    def __init__(self, versions: WorkflowVersionService | None = None):
+        self.versions = versions or WorkflowVersionService()
+
+    def create_run(
+        self, workflow_id: int, data: RunCreateSchema, db: Session
+    ) -> WorkflowRun:
+        """
+        Start a run of a published workflow version.
+        :param workflow_id: ID of the workflow to run.
+        :param data: Run context and version, the latest published by default.
+        :param db: Database session for the operation.
+        :return: The created run, pending until a scheduler claims it.
+        """
+        snapshot = self.versions.get_snapshot(
+            workflow_id=workflow_id, db=db, version=data.version
+        )
+        run = WorkflowRun(
+            workflow_id=workflow_id,
+            version=snapshot.version,
+            current_node_id=snapshot.start_node,
+            status=RunStatus.pending,
+            context=data.context,
+        )
+        run.transitions.append(
+            RunTransition(node_id=snapshot.start_node, to_status=RunStatus.pending)
+        )
+        return save_object(run, db)
+
+    def get_run(self, run_id: int, db: Session) -> WorkflowRun:
+        """
+        Get a run by its ID.
+        """
+        return get_object_by_id(model=WorkflowRun, object_id=run_id, db_session=db)
+
+    def list_runs(
+        self, workflow_id: int, db: Session, run_status: RunStatus | None = None
+    ) -> list[WorkflowRun]:
+        """
+        List the runs of a workflow, optionally filtered by status.
+        """
+        get_object_by_id(model=Workflow, object_id=workflow_id, db_session=db)
+        query = db.query(WorkflowRun).filter(WorkflowRun.workflow_id == workflow_id)
+        if run_status is not None:
+            query = query.filter(WorkflowRun.status == run_status)
+        return query.order_by(WorkflowRun.id).all()
+
+    def get_transitions(self, run_id: int, db: Session) -> list[RunTransition]:
+        """
+        Get the status transitions of a run, oldest first.
+        """
+        return self.get_run(run_id=run_id, db=db).transitions
+
+    def resume_runs(self, next_nodes: dict[int, int | None], db: Session) -> int:
+        """
+        Move waiting runs on to the node after their message.
+        :param next_nodes: Node each run continues with, keyed by run ID.
+        :param db: Database session for the operation.
+        :return: Number of runs resumed.
+        """
+        if not next_nodes:
+            return 0
+        now = datetime.utcnow()
+        resumed = db.scalars(
+            update(WorkflowRun)
+            .where(
+                WorkflowRun.id.in_(next_nodes),
+                WorkflowRun.status == RunStatus.waiting,
+            )
+            .values(status=RunStatus.pending, lease_expires_at=None, updated_at=now)
+            .returning(WorkflowRun.id)
+            .execution_options(synchronize_session=False)
+        ).all()
+        if resumed:
+            table = WorkflowRun.__table__
+            db.execute(
+                update(table)
+                .where(table.c.id == bindparam("run_id"))
+                .values(current_node_id=bindparam("node_id")),
+                [
+                    {"run_id": run_id, "node_id": next_nodes[run_id]}
+                    for run_id in resumed
+                ],
+            )
+            db.execute(
+                insert(RunTransition),
+                [
+                    {
+                        "run_id": run_id,
+                        "node_id": next_nodes[run_id],
+                        "from_status": RunStatus.waiting,
+                        "to_status": RunStatus.pending,
+                        "created_at": now,
+                    }
+                    for run_id in resumed
+                ],
+            )
+        db.commit()
+        return len(resumed)
+
+    def fail_runs(self, errors: dict[int, str], db: Session) -> int:
+        """
+        Fail waiting runs whose message could not be dispatched.
+        :param errors: Error message for each run, keyed by run ID.
+        :param db: Database session for the operation.
+        :return: Number of runs failed.
+        """
+        if not errors:
+            return 0
+        now = datetime.utcnow()
+        table = WorkflowRun.__table__
+        failed = db.execute(
+            select(table.c.id, table.c.current_node_id).where(
+                table.c.id.in_(errors), table.c.status == RunStatus.waiting
+            )
+        ).all()
+        if failed:
+            db.execute(
+                update(table)
+                .where(
+                    table.c.id == bindparam("run_id"),
+                    table.c.status == RunStatus.waiting,
+                )
+                .values(
+                    status=RunStatus.failed,
+                    error=bindparam("run_error"),
+                    lease_expires_at=None,
+                    updated_at=now,
+                ),
+                [{"run_id": run.id, "run_error": errors[run.id]} for run in failed],
+            )
+            db.execute(
+                insert(RunTransition),
+                [
+                    {
+                        "run_id": run.id,
+                        "node_id": run.current_node_id,
+                        "from_status": RunStatus.waiting,
+                        "to_status": RunStatus.failed,
+                        "created_at": now,
+                    }
+                    for run in failed
+                ],
+            )
+        db.commit()
+        return len(failed)
+
+
+class RunScheduler:
+    """
+    A class to advance workflow runs in the background.
+
+    Runs are claimed in batches with a single indexed ``UPDATE ... WHERE id IN
+    (SELECT ... LIMIT n FOR UPDATE SKIP LOCKED) RETURNING id`` (the lock clause
+    is dropped on SQLite, where the statement is atomic anyway). A claim is a
+    lease: if the process dies, the lease expires and another scheduler, or
+    this one after a restart, picks the runs up from their persisted node.
+    Each batch is advanced in memory against the cached published snapshot and
+    written back in one transaction.
+
+    Attributes:
+    - session_factory: Factory creating database sessions for the workers.
+    - dispatcher: Callback for runs reaching a message node; messages count as
+      delivered immediately when it is None.
+    - workers (int): Size of the worker pool advancing batches concurrently.
+    - batch_size (int): Maximum number of runs claimed per batch.
+    - max_steps (int): Nodes a run may pass per claim before yielding.
+    - analytics (PathAnalytics): Receives the path every run step took.
+    - tracer (Tracer): Records the steps of sampled runs.
+    """
+
+    def __init__(
+        self,
+        session_factory: sessionmaker,
+        versions: WorkflowVersionService | None = None,
+        dispatcher: MessageDispatcher | None = None,
+        workers: int = settings.RUN_WORKERS,
+        batch_size: int = settings.RUN_BATCH_SIZE,
+        poll_interval: float = settings.RUN_POLL_INTERVAL,
+        lease_seconds: float = settings.RUN_LEASE_SECONDS,
+        dispatch_timeout: float = settings.RUN_DISPATCH_TIMEOUT,
+        max_steps: int = settings.RUN_MAX_STEPS,
+        analytics: PathAnalytics = path_analytics,
+        tracer: Tracer = run_tracer,
+    ):
+        self.session_factory = session_factory
+        self.versions = versions or WorkflowVersionService()
+        self.dispatcher = dispatcher
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease = timedelta(seconds=lease_seconds)
+        self.dispatch_timeout = timedelta(seconds=dispatch_timeout)
+        self.max_steps = max_steps
+        self.analytics = analytics
+        self.tracer = tracer
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._executor: ThreadPoolExecutor | None = None
+        self._task: asyncio.Task | None = None
+
+    def _runnable(self, now: datetime):
+        """Runs that may be claimed: pending, or holding an expired lease."""
+        return or_(
+            WorkflowRun.status == RunStatus.pending,
+            and_(
+                WorkflowRun.status.in_([RunStatus.running, RunStatus.waiting]),
+                WorkflowRun.lease_expires_at < now,
+            ),
+        )
+
+    def claim(self, db: Session, limit: int) -> tuple[str, list[int]]:
+        """
+        Claim up to limit runnable runs.
+        :return: The claim token and the IDs of the claimed runs.
+        """
+        now = datetime.utcnow()
+        token = f"{self.worker_id}:{uuid.uuid4().hex}"
+        candidates = (
+            select(WorkflowRun.id)
+            .where(self._runnable(now))
+            # Least recently advanced first, so looping runs cannot starve others.
+            .order_by(WorkflowRun.updated_at, WorkflowRun.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        run_ids = db.scalars(
+            update(WorkflowRun)
+            .where(WorkflowRun.id.in_(candidates), self._runnable(now))
+            .values(
+                status=RunStatus.running,
+                claimed_by=token,
+                lease_expires_at=now + self.lease,
+            )
+            .returning(WorkflowRun.id)
+            .execution_options(synchronize_session=False)
+        ).all()
+        db.commit()
+        return token, list(run_ids)
+
+    def advance(
+        self,
+        node_id: int | None,
+        context: dict,
+        nodes: dict[int, WorkflowNodeSnapshotSchema],
+        trace: RunTrace | None = None,
+    ) -> RunStep:
+        """
+        Walk a run through the graph until it finishes, waits or yields.
+        :param trace: Receives a span per visited node when the run is traced.
+        """
+        path = []
+        for _ in range(self.max_steps):
+            node = nodes.get(node_id)
+            if node is None:
+                return RunStep(
+                    RunStatus.failed,
+                    node_id,
+                    f"Node {node_id} is not in the workflow",
+                    path=tuple(path),
+                )
+            path.append(node_id)
+            if trace is not None:
+                started = time.time_ns()
+            step = None
+            if node.node_type == NodeType.end:
+                step = RunStep(RunStatus.completed, node_id)
+            elif node.node_type == NodeType.message:
+                if self.dispatcher is not None:
+                    path.append(node.next_node_id)
+                    step = RunStep(RunStatus.waiting, node_id, dispatch=node)
+                else:
+                    node_id = node.next_node_id
+            elif node.node_type == NodeType.condition:
+                try:
+                    result = evaluate_condition(node.condition, context)
+                except Exception as error:
+                    step = RunStep(RunStatus.failed, node_id, repr(error))
+                else:
+                    node_id = node.yes_node_id if result else node.no_node_id
+            else:
+                node_id = node.next_node_id
+            if trace is not None:
+                trace.node(node, started, node_id, step and step.error)
+            if step is not None:
+                step.path = tuple(path)
+                return step
+        path.append(node_id)
+        return RunStep(RunStatus.pending, node_id, path=tuple(path))
+
+    def advance_batch(self) -> int:
+        """
+        Claim one batch of runs, advance it and persist the results.
+        :return: Number of runs processed.
+        """
+        dispatches, paths = [], []
+        # Batch timestamps are only taken while tracing is on.
+        tracing = self.tracer.enabled
+        traces = []
+        if tracing:
+            claim_started = time.time_ns()
+        with self.session_factory() as db:
+            token, run_ids = self.claim(db, self.batch_size)
+            if not run_ids:
+                return 0
+            if tracing:
+                claim_ended = time.time_ns()
+            runs = db.execute(
+                select(
+                    WorkflowRun.id,
+                    WorkflowRun.workflow_id,
+                    WorkflowRun.version,
+                    WorkflowRun.current_node_id,
+                    WorkflowRun.context,
+                ).where(WorkflowRun.id.in_(run_ids))
+            ).all()
+            if tracing:
+                load_ended = time.time_ns()
+
+            now = datetime.utcnow()
+            updates, transitions, snapshots = [], [], {}
+            for run in runs:
+                trace = None
+                if tracing:
+                    trace = self.tracer.start_run(
+                        run.id,
+                        claim_started,
+                        **{
+                            "workflow.id": run.workflow_id,
+                            "workflow.version": run.version,
+                            "batch.size": len(run_ids),
+                        },
+                    )
+                    if trace is not None:
+                        trace.span("db.claim", claim_started, claim_ended)
+                        trace.span("db.load", claim_ended, load_ended)
+                        traces.append(trace)
+                try:
+                    key = (run.workflow_id, run.version)
+                    if key not in snapshots:
+                        if trace is not None:
+                            started = time.time_ns()
+                        snapshots[key] = self.versions.get_snapshot(
+                            workflow_id=run.workflow_id, db=db, version=run.version
+                        )
+                        if trace is not None:
+                            trace.span("db.snapshot", started, time.time_ns())
+                    step = self.advance(
+                        run.current_node_id,
+                        run.context,
+                        snapshots[key].nodes_by_id,
+                        trace,
+                    )
+                except Exception as error:
+                    logger.exception("Failed to advance run %s", run.id)
+                    step = RunStep(RunStatus.failed, run.current_node_id, repr(error))
+                paths.append(
+                    (
+                        run.id,
+                        run.workflow_id,
+                        step.path,
+                        step.status in (RunStatus.completed, RunStatus.failed),
+                    )
+                )
+                updates.append(
+                    {
+                        "run_id": run.id,
+                        "token": token,
+                        "status": step.status,
+                        "current_node_id": step.node_id,
+                        "error": step.error,
+                        "lease_expires_at": (
+                            now + self.dispatch_timeout
+                            if step.status == RunStatus.waiting
+                            else None
+                        ),
+                        "updated_at": now,
+                    }
+                )
+                if step.status != RunStatus.pending:
+                    transitions.append(
+                        {
+                            "run_id": run.id,
+                            "node_id": step.node_id,
+                            "from_status": RunStatus.running,
+                            "to_status": step.status,
+                            "created_at": now,
+                        }
+                    )
+                if step.dispatch is not None:
+                    dispatches.append((run.id, step.dispatch))
+                if trace is not None:
+                    trace.root.attributes["run.status"] = step.status.value
+                    trace.root.error = step.error
+
+            if tracing:
+                persist_started = time.time_ns()
+            table = WorkflowRun.__table__
+            db.execute(
+                update(table)
+                .where(
+                    table.c.id == bindparam("run_id"),
+                    table.c.claimed_by == bindparam("token"),
+                )
+                .values(
+                    status=bindparam("status"),
+                    current_node_id=bindparam("current_node_id"),
+                    error=bindparam("error"),
+                    lease_expires_at=bindparam("lease_expires_at"),
+                    updated_at=bindparam("updated_at"),
+                ),
+                updates,
+            )
+            # Runs whose lease expired meanwhile were claimed by another
+            # scheduler and left untouched; their steps are dropped. The write
+            # lock is held since the update, so the claims cannot change.
+            owned = set(
+                db.scalars(
+                    select(table.c.id).where(
+                        table.c.id.in_(run_ids), table.c.claimed_by == token
+                    )
+                )
+            )
+            if len(owned) < len(run_ids):
+                logger.warning(
+                    "Lost the lease of %s runs while advancing them",
+                    len(run_ids) - len(owned),
+                )
+                transitions = [t for t in transitions if t["run_id"] in owned]
+                dispatches = [d for d in dispatches if d[0] in owned]
+            if transitions:
+                db.execute(insert(RunTransition), transitions)
+            db.commit()
+        for run_id, workflow_id, path, finished in paths:
+            if run_id in owned:
+                self.analytics.record(workflow_id, path, finished=finished)
+        if traces:
+            persist_ended = time.time_ns()
+            for trace in traces:
+                trace.span("db.persist", persist_started, persist_ended)
+                trace.finish(persist_ended, trace.root.error)
+
+        # Only hand messages over once the waiting state is durable.
+        for run_id, node in dispatches:
+            self.dispatcher(run_id, node)
+        return len(run_ids)
+
+    async def run_forever(self) -> None:
+        """
+        Keep every worker busy with batches, polling when there is no work.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            processed = await asyncio.gather(
+                *(
+                    loop.run_in_executor(self._executor, self.advance_batch)
+                    for _ in range(self.workers)
+                ),
+                return_exceptions=True,
+            )
+            for result in processed:
+                if isinstance(result, Exception):
+                    logger.error("Run batch failed", exc_info=result)
+            if not any(isinstance(result, int) and result for result in processed):
+                await asyncio.sleep(self.poll_interval)
+
+    def start(self) -> asyncio.Task:
+        """
+        Start advancing runs on the running event loop.
+        """
+        if self._task is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="run-worker"
+            )
+            self._task = asyncio.get_running_loop().create_task(self.run_forever())
+        return self._task
+
+    async def stop(self) -> None:
+        """
+        Stop the scheduler; claimed runs are released by their lease.
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        # Off the loop: a worker may be waiting on the loop to queue a message.
+        await asyncio.to_thread(self._executor.shutdown, True)
+        self._task = None
+        self._executor = None
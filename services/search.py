@@ -0,0 +1,113 @@
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+import settings
+from database.models import Node, MessageNode, ConditionNode
+from database.search import node_search, search_index_available
+from schemas.node import NodeType, NodeStatus
+from schemas.search import NodeSearchPageSchema
+
+
+def fts_phrase(query: str) -> str:
+    """
+    Quote user input as one FTS5 phrase, so operators and punctuation in it
+    are matched as text instead of parsed as query syntax.
+    """
+    return '"' + query.replace('"', '""') + '"'
+
+
+def like_pattern(query: str) -> str:
+    """Substring LIKE pattern for user input, with wildcards escaped."""
+    escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+class NodeSearchService:
+    """
+    A class to search the text of message and condition nodes.
+
+    Uses the FTS5 index kept in sync by the node writes (database.search)
+    when the database has it, and a LIKE scan otherwise. Pages are ordered by
+    node ID and continue after the last ID of the previous page, so a page
+    costs the same however deep it is.
+    """
+
+    def search(
+        self,
+        query: str,
+        db: Session,
+        workflow_id: int | None = None,
+        node_type: NodeType | None = None,
+        node_status: NodeStatus | None = None,
+        after: int | None = None,
+        limit: int = settings.SEARCH_PAGE_SIZE,
+    ) -> NodeSearchPageSchema:
+        """
+        Find message and condition nodes whose text contains a phrase.
+        :param query: Phrase to look for; whole words with the index,
+            any substring with the LIKE fallback.
+        :param db: Database session for the operation.
+        :param workflow_id: Only nodes of this workflow.
+        :param node_type: Only message or only condition nodes.
+        :param node_status: Only message nodes with this status.
+        :param after: Only nodes with a higher ID (the previous page's
+            next_after).
+        :param limit: Maximum number of results.
+        :return: The page of results.
+        """
+        nodes = Node.__table__
+        message = MessageNode.__table__
+        condition = ConditionNode.__table__
+        text = func.coalesce(message.c.message, condition.c.condition)
+        full_text = search_index_available(db.connection())
+
+        statement = select(
+            nodes.c.id.label("node_id"),
+            nodes.c.workflow_id,
+            nodes.c.node_type,
+            message.c.status,
+            text.label("text"),
+        )
+        joined = nodes.outerjoin(message, message.c.id == nodes.c.id).outerjoin(
+            condition, condition.c.id == nodes.c.id
+        )
+        if full_text:
+            # The index drives the query, in rowid order, and stops at limit.
+            statement = statement.select_from(
+                node_search.join(joined, nodes.c.id == node_search.c.rowid)
+            ).where(node_search.c.text.match(fts_phrase(query)))
+            order = node_search.c.rowid
+        else:
+            statement = statement.select_from(joined).where(
+                nodes.c.node_type.in_([NodeType.message, NodeType.condition]),
+                text.like(like_pattern(query), escape="\\"),
+            )
+            order = nodes.c.id
+        if workflow_id is not None:
+            statement = statement.where(nodes.c.workflow_id == workflow_id)
+            if full_text:
+                # Nodes of a workflow mostly have neighbouring IDs: bounding
+                # the rowids lets the index skip other workflows' matches.
+                ids = select(nodes.c.id).where(nodes.c.workflow_id == workflow_id)
+                statement = statement.where(
+                    node_search.c.rowid.between(
+                        ids.with_only_columns(func.min(nodes.c.id)).scalar_subquery(),
+                        ids.with_only_columns(func.max(nodes.c.id)).scalar_subquery(),
+                    )
+                )
+        if node_type is not None:
+            statement = statement.where(nodes.c.node_type == node_type)
+        if node_status is not None:
+            statement = statement.where(message.c.status == node_status)
+        if after is not None:
+            statement = statement.where(order > after)
+
+        rows = db.execute(statement.order_by(order).limit(limit + 1)).all()
+        return NodeSearchPageSchema.model_validate(
+            {
+                "items": rows[:limit],
+                "next_after": rows[limit - 1].node_id if len(rows) > limit else None,
+                "full_text": full_text,
+            },
+            from_attributes=True,
+        )
@@ -0,0 +1,518 @@
+import math
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass
+
+import orjson
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from starlette import status
+
+import settings
+from database.models import Node, WorkflowRun
+from database.records import NodeRecord, load_node_records
+from schemas.node import NodeType
+from schemas.simulation import (
+    SimulationMethod,
+    SimulationRequestSchema,
+    SimulationSource,
+)
+from services.conditions import evaluate_condition
+from services.workflow import WorkflowService
+
+# How many pure-Python runs are sampled between two checks of the time limit.
+DEADLINE_CHECK_INTERVAL = 1024
+
+
+def load_numpy():
+    """
+    NumPy, which vectorizes Monte-Carlo sampling, or None when it is not
+    installed. Imported on first use to keep application startup fast.
+    """
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+@dataclass
+class TransitionTable:
+    """
+    Where a run goes from every node of a workflow, by table index.
+
+    A run at node i moves to yes[i] with probability p_yes[i], else to no[i];
+    nodes with a single edge have it in both with p_yes 1. Index END (the
+    number of nodes) stands for a finished run, FAILED for a reference to a
+    node that does not exist.
+
+    Attributes:
+    - node_ids (list): Node ID of every index.
+    - yes (list): Target index of the yes branch (or the only edge).
+    - no (list): Target index of the no branch.
+    - p_yes (list): Probability of the yes branch.
+    - messages (list): 1 for message nodes, 0 for the others.
+    """
+
+    node_ids: list[int]
+    yes: list[int]
+    no: list[int]
+    p_yes: list[float]
+    messages: list[int]
+
+    @property
+    def end(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def failed(self) -> int:
+        return len(self.node_ids) + 1
+
+
+def transition_table(
+    records: list[NodeRecord], probabilities: dict[int, float]
+) -> TransitionTable:
+    """
+    Transition table of a workflow read as node records.
+    :param probabilities: Probability of the yes branch of condition nodes;
+        conditions left out are given 1 and have to be decided otherwise.
+    """
+    index = {record.id: position for position, record in enumerate(records)}
+    table = TransitionTable(node_ids=list(index), yes=[], no=[], p_yes=[], messages=[])
+
+    def target(node_id: int | None) -> int:
+        return index.get(node_id, table.failed)
+
+    for record in records:
+        if record.node_type == NodeType.condition:
+            table.yes.append(target(record.yes_node_id))
+            table.no.append(target(record.no_node_id))
+            table.p_yes.append(probabilities.get(record.id, 1.0))
+        else:
+            following = (
+                table.end
+                if record.node_type == NodeType.end
+                else target(record.next_node_id)
+            )
+            table.yes.append(following)
+            table.no.append(following)
+            table.p_yes.append(1.0)
+        table.messages.append(int(record.node_type == NodeType.message))
+    return table
+
+
+def reachable_indexes(table: TransitionTable, start: int) -> list[int]:
+    """Indexes of the nodes reachable from start, in discovery order."""
+    seen = {start}
+    order = [start]
+    for position in order:
+        for following in (table.yes[position], table.no[position]):
+            if following < table.end and following not in seen:
+                seen.add(following)
+                order.append(following)
+    return order
+
+
+def propagate(table: TransitionTable, start: int) -> tuple | None:
+    """
+    Expected visits per run of every node, propagated exactly in topological
+    order through an acyclic graph.
+    :return: The visits and the shares of completed and failed runs; None
+        when a cycle is reachable from start.
+    """
+    nodes = reachable_indexes(table, start)
+    indegree = dict.fromkeys(nodes, 0)
+    for position in nodes:
+        for following in set((table.yes[position], table.no[position])):
+            if following < table.end:
+                indegree[following] += 1
+    order = [position for position in nodes if not indegree[position]]
+    for position in order:
+        for following in set((table.yes[position], table.no[position])):
+            if following < table.end:
+                indegree[following] -= 1
+                if not indegree[following]:
+                    order.append(following)
+    if len(order) < len(nodes):
+        return None
+
+    visits = [0.0] * table.end
+    visits[start] = 1.0
+    outcomes = {table.end: 0.0, table.failed: 0.0}
+    for position in order:
+        mass = visits[position]
+        p_yes = table.p_yes[position]
+        for following, share in (
+            (table.yes[position], p_yes),
+            (table.no[position], 1 - p_yes),
+        ):
+            if not share:
+                continue
+            if following < table.end:
+                visits[following] += mass * share
+            else:
+                outcomes[following] += mass * share
+    return visits, outcomes[table.end], outcomes[table.failed]
+
+
+def _sample_vectorized(
+    numpy,
+    table: TransitionTable,
+    start: int,
+    runs: int,
+    max_steps: int,
+    seed: int | None,
+    batch_size: int,
+    deadline: float | None,
+) -> dict:
+    """
+    Monte-Carlo sampling with NumPy: all runs of a batch take one step at a
+    time, as arrays of their current nodes. The deadline is checked between
+    batches.
+    """
+    end, failed = table.end, table.failed
+    yes = numpy.asarray(table.yes, dtype=numpy.int64)
+    no = numpy.asarray(table.no, dtype=numpy.int64)
+    p_yes = numpy.asarray(table.p_yes, dtype=numpy.float64)
+    is_message = numpy.asarray(table.messages, dtype=numpy.int64)
+    generator = numpy.random.default_rng(seed)
+    visits = numpy.zeros(end, dtype=numpy.int64)
+    result = {"completed": 0, "failed": 0, "truncated": 0, "messages": 0.0}
+    squares = 0.0
+    sampled = 0
+    while sampled < runs:
+        if sampled and deadline is not None and time.monotonic() > deadline:
+            break
+        current = numpy.full(min(batch_size, runs - sampled), start)
+        sampled += current.size
+        messages = numpy.zeros(current.size, dtype=numpy.int64)
+        for _ in range(max_steps):
+            visits += numpy.bincount(current, minlength=end)
+            messages += is_message[current]
+            following = numpy.where(
+                generator.random(current.size) < p_yes[current],
+                yes[current],
+                no[current],
+            )
+            finished = following >= end
+            if finished.any():
+                result["completed"] += int(numpy.count_nonzero(following == end))
+                result["failed"] += int(numpy.count_nonzero(following == failed))
+                done = messages[finished].astype(numpy.float64)
+                result["messages"] += float(done.sum())
+                squares += float(done @ done)
+                running = ~finished
+                current, messages = following[running], messages[running]
+            else:
+                current = following
+            if not current.size:
+                break
+        result["truncated"] += int(current.size)
+        left = messages.astype(numpy.float64)
+        result["messages"] += float(left.sum())
+        squares += float(left @ left)
+    result["visits"] = visits.tolist()
+    result["squares"] = squares
+    result["runs"] = sampled
+    return result
+
+
+def _sample_python(
+    table: TransitionTable,
+    start: int,
+    runs: int,
+    max_steps: int,
+    seed: int | None,
+    deadline: float | None,
+    max_visits: int | None,
+) -> dict:
+    """
+    Monte-Carlo sampling without NumPy, one run after another, until the
+    deadline or once max_visits nodes have been visited.
+    """
+    end, yes, no, p_yes = table.end, table.yes, table.no, table.p_yes
+    is_message = table.messages
+    draw = random.Random(seed).random
+    visits = [0] * end
+    outcomes = Counter()
+    total = squares = visited = sampled = 0
+    while sampled < runs:
+        if max_visits is not None and visited >= max_visits:
+            break
+        if (
+            deadline is not None
+            and sampled
+            and sampled % DEADLINE_CHECK_INTERVAL == 0
+            and time.monotonic() > deadline
+        ):
+            break
+        sampled += 1
+        position, messages = start, 0
+        for steps in range(1, max_steps + 1):
+            visits[position] += 1
+            messages += is_message[position]
+            probability = p_yes[position]
+            position = (
+                yes[position]
+                if probability >= 1 or draw() < probability
+                else no[position]
+            )
+            if position >= end:
+                outcomes[position] += 1
+                break
+        else:
+            outcomes["truncated"] += 1
+        visited += steps
+        total += messages
+        squares += messages * messages
+    return {
+        "completed": outcomes[end],
+        "failed": outcomes[table.failed],
+        "truncated": outcomes["truncated"],
+        "messages": float(total),
+        "squares": float(squares),
+        "visits": visits,
+        "runs": sampled,
+    }
+
+
+def sample(
+    table: TransitionTable,
+    start: int,
+    runs: int,
+    max_steps: int,
+    seed: int | None = None,
+    batch_size: int = settings.SIMULATION_BATCH_SIZE,
+    deadline: float | None = None,
+    python_max_visits: int | None = None,
+) -> dict:
+    """
+    Walk runs through the graph, drawing every condition's branch at random.
+    :param deadline: time.monotonic() value after which no more runs are
+        started; at least one run (or batch) is always sampled.
+    :param python_max_visits: Node visits after which the pure-Python
+        fallback stops starting runs.
+    :return: Number of runs sampled, visits of every node, numbers of
+        completed, failed and truncated runs, and the sum and sum of squares
+        of the messages per run.
+    """
+    numpy = load_numpy()
+    if numpy is not None:
+        return _sample_vectorized(
+            numpy, table, start, runs, max_steps, seed, batch_size, deadline
+        )
+    return _sample_python(
+        table, start, runs, max_steps, seed, deadline, python_max_visits
+    )
+
+
+def walk_contexts(
+    records: list[NodeRecord],
+    table: TransitionTable,
+    start: int,
+    contexts: Counter,
+    max_steps: int,
+) -> dict:
+    """
+    Walk each distinct context once, weighted by how often it occurred,
+    evaluating the conditions as runs do.
+    :param contexts: Occurrences of every context, keyed by its JSON.
+    :return: Visits of every node and the weights of completed, failed
+        and truncated walks.
+    """
+    visits = [0] * table.end
+    outcomes = Counter()
+    for encoded, weight in contexts.items():
+        context = orjson.loads(encoded)
+        position = start
+        for _ in range(max_steps):
+            visits[position] += weight
+            record = records[position]
+            if record.node_type == NodeType.condition:
+                try:
+                    result = evaluate_condition(record.condition, context)
+                except Exception:
+                    position = table.failed
+                else:
+                    position = table.yes[position] if result else table.no[position]
+            else:
+                position = table.yes[position]
+            if position >= table.end:
+                outcomes[position] += weight
+                break
+        else:
+            outcomes["truncated"] += weight
+    return {
+        "visits": visits,
+        "completed": outcomes[table.end],
+        "failed": outcomes[table.failed],
+        "truncated": outcomes["truncated"],
+    }
+
+
+class WorkflowSimulationService:
+    """
+    A class to estimate what runs of a draft would do before it is published.
+
+    With given branch probabilities, the expected visits of every node are
+    propagated exactly when no cycle is reachable from the start node, and
+    estimated by Monte-Carlo sampling otherwise (vectorized when NumPy is
+    installed), for at most SIMULATION_TIMEOUT seconds. With the history
+    source, every distinct context of the workflow's recent runs is walked
+    once, weighted by how often it occurred.
+
+    Attributes:
+    - workflows (WorkflowService): Source of workflow revisions.
+    """
+
+    def __init__(self, workflows: WorkflowService | None = None):
+        self.workflows = workflows or WorkflowService()
+
+    def _start(self, records: list[NodeRecord]) -> int:
+        starts = [
+            position
+            for position, record in enumerate(records)
+            if record.node_type == NodeType.start
+        ]
+        if len(starts) != 1:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Workflow must have exactly one start node",
+            )
+        return starts[0]
+
+    def _check_probabilities(
+        self,
+        records: list[NodeRecord],
+        table: TransitionTable,
+        start: int,
+        probabilities: dict[int, float],
+    ) -> None:
+        conditions = {
+            record.id for record in records if record.node_type == NodeType.condition
+        }
+        unknown = sorted(set(probabilities) - conditions)
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Not condition nodes of the workflow: {unknown}",
+            )
+        missing = sorted(
+            table.node_ids[position]
+            for position in reachable_indexes(table, start)
+            if table.node_ids[position] in conditions
+            and table.node_ids[position] not in probabilities
+        )
+        if missing:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Missing branch probabilities of condition nodes: {missing}",
+            )
+
+    def _contexts(self, workflow_id: int, db: Session) -> Counter:
+        contexts = db.scalars(
+            select(WorkflowRun.context)
+            .where(WorkflowRun.workflow_id == workflow_id)
+            .order_by(WorkflowRun.id.desc())
+            .limit(settings.SIMULATION_HISTORY_RUNS)
+        ).all()
+        if not contexts:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Workflow has no runs to take contexts from",
+            )
+        return Counter(
+            orjson.dumps(context or {}, option=orjson.OPT_SORT_KEYS)
+            for context in contexts
+        )
+
+    def simulate(
+        self, workflow_id: int, data: SimulationRequestSchema, db: Session
+    ) -> dict:
+        """
+        Expected visits of every node of the draft over many runs.
+        :param workflow_id: ID of the workflow.
+        :param data: Source of the branch decisions and number of runs.
+        :param db: Database session for the operation.
+        :return: The expected visits and outcomes, see WorkflowSimulationSchema.
+        """
+        revision = self.workflows.get_revision(workflow_id, db)
+        records = load_node_records(db, Node.workflow_id == workflow_id)
+        start = self._start(records)
+        table = transition_table(records, data.probabilities)
+        runs = data.runs
+        result = {
+            "workflow_id": workflow_id,
+            "revision": revision,
+            "source": data.source,
+            "runs": runs,
+            "contexts": None,
+            "complete": True,
+            "truncated": 0.0,
+            "messages_per_run_error": None,
+        }
+
+        if data.source == SimulationSource.history:
+            contexts = self._contexts(workflow_id, db)
+            walked = walk_contexts(records, table, start, contexts, data.max_steps)
+            weight = sum(contexts.values())
+            visits = [count / weight for count in walked["visits"]]
+            result.update(
+                method=SimulationMethod.exact,
+                simulated_runs=len(contexts),
+                contexts=weight,
+                completed=walked["completed"] / weight,
+                failed=walked["failed"] / weight,
+                truncated=walked["truncated"] / weight,
+            )
+        else:
+            self._check_probabilities(records, table, start, data.probabilities)
+            propagated = propagate(table, start)
+            if propagated is not None:
+                visits, completed, failed = propagated
+                result.update(
+                    method=SimulationMethod.exact,
+                    simulated_runs=0,
+                    completed=completed,
+                    failed=failed,
+                )
+            else:
+                sampled = sample(
+                    table,
+                    start,
+                    runs,
+                    data.max_steps,
+                    data.seed,
+                    deadline=time.monotonic() + settings.SIMULATION_TIMEOUT,
+                    python_max_visits=settings.SIMULATION_PYTHON_MAX_VISITS,
+                )
+                # Scaled up to all runs when the budget ran out before.
+                walked = sampled["runs"]
+                visits = [count / walked for count in sampled["visits"]]
+                mean = sampled["messages"] / walked
+                variance = max(sampled["squares"] / walked - mean * mean, 0.0)
+                result.update(
+                    method=SimulationMethod.monte_carlo,
+                    simulated_runs=walked,
+                    complete=walked == runs,
+                    completed=sampled["completed"] / walked,
+                    failed=sampled["failed"] / walked,
+                    truncated=sampled["truncated"] / walked,
+                    messages_per_run_error=math.sqrt(variance / walked),
+                )
+
+        result["nodes"] = [
+            {
+                "node_id": record.id,
+                "node_type": record.node_type,
+                "visits_per_run": per_run,
+                "expected_visits": per_run * runs,
+            }
+            for record, per_run in zip(records, visits)
+        ]
+        result["expected_messages"] = runs * sum(
+            per_run for per_run, is_message in zip(visits, table.messages) if is_message
+        )
+        return result
@@ -0,0 +1,369 @@
+import asyncio
+import logging
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass, field
+
+import orjson
+
+import settings
+from schemas.node import NodeType
+
+logger = logging.getLogger(__name__)
+
+# OTLP span kind and status codes.
+SPAN_KIND_INTERNAL = 1
+STATUS_CODE_ERROR = 2
+
+
+def trace_id(run_id: int) -> str:
+    """
+    Trace ID of a run: every span of the run, whichever worker or process
+    records it, lands in the same trace.
+    """
+    return f"{run_id:032x}"
+
+
+def span_id() -> str:
+    return os.urandom(8).hex()
+
+
+def otlp_value(value) -> dict:
+    """
+    An attribute value in the OTLP JSON encoding.
+    """
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+@dataclass(slots=True)
+class Span:
+    """A timed operation of a run, in nanoseconds since the epoch."""
+
+    trace_id: str
+    name: str
+    start_ns: int
+    end_ns: int
+    parent_id: str | None = None
+    span_id: str = field(default_factory=span_id)
+    attributes: dict = field(default_factory=dict)
+    error: str | None = None
+
+    def to_otlp(self) -> dict:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "kind": SPAN_KIND_INTERNAL,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [
+                {"key": key, "value": otlp_value(value)}
+                for key, value in self.attributes.items()
+                if value is not None
+            ],
+            "status": (
+                {"code": STATUS_CODE_ERROR, "message": self.error}
+                if self.error is not None
+                else {}
+            ),
+        }
+
+
+class RunTrace:
+    """
+    Spans of one piece of work on a sampled run, e.g. a scheduler advancing
+    it or its message being dispatched: a root span with DB, dispatch and
+    per-node spans under it.
+    """
+
+    def __init__(
+        self,
+        tracer: "Tracer",
+        run_id: int,
+        start_ns: int,
+        name: str = "run.advance",
+        **attributes,
+    ):
+        self.tracer = tracer
+        self.root = Span(
+            trace_id(run_id),
+            name,
+            start_ns,
+            start_ns,
+            attributes={"run.id": run_id, **attributes},
+        )
+        self.spans = [self.root]
+
+    def span(
+        self,
+        name: str,
+        start_ns: int,
+        end_ns: int,
+        error: str | None = None,
+        **attributes,
+    ) -> Span:
+        """
+        Add a finished child span of the root.
+        """
+        child = Span(
+            self.root.trace_id,
+            name,
+            start_ns,
+            end_ns,
+            parent_id=self.root.span_id,
+            attributes=attributes,
+            error=error,
+        )
+        self.spans.append(child)
+        return child
+
+    def node(
+        self, node, start_ns: int, next_node_id: int | None, error: str | None
+    ) -> None:
+        """
+        Add the span of a visited node; for a condition it times the
+        evaluation and tells which branch was taken.
+        """
+        attributes = {"node.id": node.id, "node.type": node.node_type.value}
+        if node.node_type == NodeType.condition:
+            attributes["condition.expression"] = node.condition
+            if error is None:
+                attributes["condition.branch"] = (
+                    "yes" if next_node_id == node.yes_node_id else "no"
+                )
+        self.span(
+            f"node.{node.node_type.value}",
+            start_ns,
+            time.time_ns(),
+            error,
+            **attributes,
+        )
+
+    def finish(self, end_ns: int, error: str | None = None, **attributes) -> None:
+        """
+        Close the root span and hand the trace to the tracer.
+        """
+        self.root.end_ns = end_ns
+        self.root.error = error
+        self.root.attributes.update(attributes)
+        self.tracer.collect(self.spans)
+
+
+class SpanExporter(ABC):
+    """
+    Interface of the destination of exported traces.
+    """
+
+    @abstractmethod
+    def export(self, document: dict) -> None:
+        """
+        Deliver one OTLP JSON ``ExportTraceServiceRequest``.
+        """
+
+
+class FileSpanExporter(SpanExporter):
+    """
+    Exporter appending one OTLP JSON document per line to a local file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, document: dict) -> None:
+        with open(self.path, "ab") as file:
+            file.write(orjson.dumps(document) + b"\n")
+
+
+class HttpSpanExporter(SpanExporter):
+    """
+    Exporter posting OTLP JSON to a collector, e.g. ``.../v1/traces``.
+    """
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+
+    def export(self, document: dict) -> None:
+        # Imported on first use to keep application startup fast.
+        import urllib.request
+
+        request = urllib.request.Request(
+            self.url,
+            data=orjson.dumps(document),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+def create_exporter(
+    path: str = settings.TRACE_EXPORT_FILE, url: str = settings.TRACE_EXPORT_URL
+) -> SpanExporter | None:
+    """
+    The exporter configured by the settings, None when traces stay in memory.
+    """
+    if url:
+        return HttpSpanExporter(url)
+    if path:
+        return FileSpanExporter(path)
+    return None
+
+
+class Tracer:
+    """
+    A class to record sampled execution traces of workflow runs.
+
+    Whether a run is traced is decided from its ID alone, so all of a run's
+    spans are kept or dropped together, across batches, the dispatch queue
+    and processes. With a sample rate of zero ``enabled`` is False and the
+    scheduler and dispatch queue skip every tracing call, taking no
+    timestamps at all.
+
+    Finished spans go to a bounded ring buffer served by the API; the oldest
+    are dropped first. With an exporter they are also queued (bounded as
+    well) and written every export_interval seconds as OTLP JSON.
+
+    Attributes:
+    - sample_rate (float): Share of runs traced, from 0 to 1.
+    - spans (deque): The most recent finished spans.
+    - exporter (SpanExporter): Destination of exported spans, if any.
+    - stats (dict): Counters of recorded, exported and unexportable spans.
+    """
+
+    def __init__(
+        self,
+        sample_rate: float = settings.TRACE_SAMPLE_RATE,
+        buffer_size: int = settings.TRACE_BUFFER_SIZE,
+        exporter: SpanExporter | None = None,
+        export_interval: float = settings.TRACE_EXPORT_INTERVAL,
+        service_name: str = settings.TRACE_SERVICE_NAME,
+    ):
+        self.sample_rate = sample_rate
+        self.spans: deque[Span] = deque(maxlen=buffer_size)
+        self.exporter = exporter
+        self.export_interval = export_interval
+        self.service_name = service_name
+        self.stats = {"recorded": 0, "exported": 0, "export_failed": 0}
+        self._unexported: deque[Span] = deque(maxlen=buffer_size)
+        self._task: asyncio.Task | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0
+
+    def sampled(self, run_id: int) -> bool:
+        """
+        Whether a run is traced; spread evenly over consecutive IDs.
+        """
+        if self.sample_rate <= 0:
+            return False
+        fraction = (run_id * 0x9E3779B97F4A7C15 & 0xFFFFFFFFFFFFFFFF) / 2**64
+        return fraction < self.sample_rate
+
+    def start_run(self, run_id: int, start_ns: int, **attributes) -> RunTrace | None:
+        """
+        Begin the trace of a run step, None when the run is not sampled.
+        """
+        if not self.sampled(run_id):
+            return None
+        return RunTrace(self, run_id, start_ns, **attributes)
+
+    def collect(self, spans: list[Span]) -> None:
+        """
+        Keep finished spans; appending to a deque needs no lock.
+        """
+        self.spans.extend(spans)
+        if self.exporter is not None:
+            self._unexported.extend(spans)
+        self.stats["recorded"] += len(spans)
+
+    def document(self, spans) -> dict:
+        """
+        Spans as an OTLP JSON ``ExportTraceServiceRequest``.
+        """
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            {
+                                "key": "service.name",
+                                "value": otlp_value(self.service_name),
+                            }
+                        ]
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": __name__},
+                            "spans": [span.to_otlp() for span in spans],
+                        }
+                    ],
+                }
+            ]
+        }
+
+    def traces(self, run_id: int | None = None) -> dict:
+        """
+        The buffered spans, or those of one run, as OTLP JSON.
+        """
+        spans = list(self.spans)
+        if run_id is not None:
+            spans = [span for span in spans if span.trace_id == trace_id(run_id)]
+        return self.document(spans)
+
+    def export(self) -> int:
+        """
+        Send the spans finished since the last export.
+        :return: Number of spans exported.
+        """
+        spans = []
+        while self._unexported:
+            spans.append(self._unexported.popleft())
+        if not spans or self.exporter is None:
+            return 0
+        try:
+            self.exporter.export(self.document(spans))
+        except Exception:
+            self.stats["export_failed"] += len(spans)
+            logger.exception("Failed to export %s spans", len(spans))
+            return 0
+        self.stats["exported"] += len(spans)
+        return len(spans)
+
+    async def _export_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.export_interval)
+            await asyncio.to_thread(self.export)
+
+    def start(self) -> None:
+        """
+        Export periodically on the running event loop.
+        """
+        if self._task is None and self.enabled and self.exporter is not None:
+            self._task = asyncio.get_running_loop().create_task(self._export_forever())
+
+    async def stop(self) -> None:
+        """
+        Stop exporting periodically and export what is left.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.to_thread(self.export)
+
+
+run_tracer = Tracer(exporter=create_exporter())
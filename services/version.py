@@ -0,0 +1,168 @@
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette import status
+
+from database.models import Workflow, WorkflowVersion, NodeChange
+from schemas.workflow import WorkflowSnapshotSchema
+from services.cache import LRUCache, SingleFlight
+from services.utils import get_object_by_id
+from services.workflow import WorkflowGraph
+
+# Shared by every service instance: entries are immutable and keyed by
+# database and version row id, which is never reused.
+snapshot_cache = LRUCache(maxsize=1024)
+# In-flight snapshot loads keyed like the cache.
+snapshot_flights = SingleFlight()
+
+
+def snapshot_key(db: Session, version_id: int) -> tuple[str, int]:
+    """
+    Cache key of a published snapshot.
+    """
+    return str(db.get_bind().url), version_id
+
+
+class WorkflowVersionService:
+    """
+    A class to publish and serve immutable workflow versions.
+
+    Published snapshots never change, so they are cached by their version row
+    id without any invalidation. Serving a snapshot reads at most one indexed
+    row of ``workflow_versions`` and never touches the node tables.
+
+    Attributes:
+    - snapshots (LRUCache): Parsed snapshots keyed by snapshot_key().
+    - flights (SingleFlight): Coalesces concurrent loads of one snapshot.
+    """
+
+    def __init__(
+        self,
+        snapshots: LRUCache = snapshot_cache,
+        flights: SingleFlight = snapshot_flights,
+    ):
+        self.snapshots = snapshots
+        self.flights = flights
+
+    def publish(self, workflow_id: int, db: Session) -> WorkflowVersion:
+        """
+        Validate the current draft and freeze it as the next version.
+        :param workflow_id: ID of the workflow to publish.
+        :param db: Database session for the operation.
+        :return: The created version row.
+        :raises HTTPException: 409 when another publish of the workflow took
+            the version number first.
+        """
+        # Read before the nodes: a change logged in between is at worst
+        # reported again by a diff, never missed.
+        change_id = db.scalar(
+            select(func.coalesce(func.max(NodeChange.id), 0)).where(
+                NodeChange.workflow_id == workflow_id
+            )
+        )
+        workflow_graph = WorkflowGraph(workflow_id, db)
+        workflow_graph.create_graph()
+        latest = db.scalar(
+            select(func.max(WorkflowVersion.version)).where(
+                WorkflowVersion.workflow_id == workflow_id
+            )
+        )
+        snapshot = workflow_graph.snapshot(version=(latest or 0) + 1)
+        workflow_version = WorkflowVersion(
+            workflow_id=workflow_id,
+            version=snapshot.version,
+            snapshot=snapshot.model_dump_json(),
+            change_id=change_id,
+        )
+        db.add(workflow_version)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another publish read the same latest version and committed first.
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Workflow was published concurrently",
+            )
+        db.refresh(workflow_version)
+        self.snapshots.set(snapshot_key(db, workflow_version.id), snapshot)
+        return workflow_version
+
+    def list_versions(self, workflow_id: int, db: Session) -> list[WorkflowVersion]:
+        """
+        List the published versions of a workflow, oldest first.
+        """
+        get_object_by_id(model=Workflow, object_id=workflow_id, db_session=db)
+        return (
+            db.query(WorkflowVersion)
+            .filter(WorkflowVersion.workflow_id == workflow_id)
+            .order_by(WorkflowVersion.version)
+            .all()
+        )
+
+    def get_snapshot(
+        self, workflow_id: int, db: Session, version: int | None = None
+    ) -> WorkflowSnapshotSchema:
+        """
+        Get a published snapshot.
+        :param workflow_id: ID of the workflow.
+        :param db: Database session for the operation.
+        :param version: Version number, the latest published one if omitted.
+        :return: The immutable snapshot.
+        """
+        version_id = self.get_version_id(
+            workflow_id=workflow_id, db=db, version=version
+        )
+        key = snapshot_key(db, version_id)
+        snapshot = self.snapshots.get(key)
+        if snapshot is None:
+            snapshot = self.flights.do(
+                key, lambda: self._load_snapshot(key, version_id, db)
+            )
+        return snapshot
+
+    def get_version_id(
+        self, workflow_id: int, db: Session, version: int | None = None
+    ) -> int:
+        """
+        Get the row ID of a published version, which never changes and is
+        never reused, with one indexed query.
+        :param workflow_id: ID of the workflow.
+        :param db: Database session for the operation.
+        :param version: Version number, the latest published one if omitted.
+        """
+        query = select(WorkflowVersion.id).where(
+            WorkflowVersion.workflow_id == workflow_id
+        )
+        if version is None:
+            query = query.order_by(WorkflowVersion.version.desc()).limit(1)
+        else:
+            query = query.where(WorkflowVersion.version == version)
+        version_id = db.scalar(query)
+        if version_id is None:
+            get_object_by_id(model=Workflow, object_id=workflow_id, db_session=db)
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Workflow has no published version",
+            )
+        return version_id
+
+    def _load_snapshot(
+        self, key: tuple[str, int], version_id: int, db: Session
+    ) -> WorkflowSnapshotSchema:
+        raw_snapshot = db.scalar(
+            select(WorkflowVersion.snapshot).where(WorkflowVersion.id == version_id)
+        )
+        snapshot = WorkflowSnapshotSchema.model_validate_json(raw_snapshot)
+        self.snapshots.set(key, snapshot)
+        return snapshot
+
+    def get_sequence(
+        self, workflow_id: int, db: Session, version: int | None = None
+    ) -> dict:
+        """
+        Get the precomputed sequence of a published version.
+        """
+        snapshot = self.get_snapshot(workflow_id=workflow_id, db=db, version=version)
+        return {"path": snapshot.path, "edges": snapshot.edges}
@@ -1,17 +1,29 @@
-import networkx as nx
+import asyncio
+
 from fastapi import HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import case, delete, func, insert, literal, select
+from sqlalchemy.orm import Session, sessionmaker
 from starlette import status
 
 from database.models import (
     Workflow,
+    ArchivedWorkflow,
+    Node,
+    NodeChange,
     StartNode,
     MessageNode,
     ConditionNode,
     EndNode,
     NodeType,
 )
+from database.records import NodeRecord, load_node_records
+from database.revisions import bump_revisions
+from database.search import index_workflow
 from schemas import workflow
+from schemas.workflow import WorkflowNodeSnapshotSchema, WorkflowSnapshotSchema
+from services.analytics import path_analytics
+from services.cache import LRUCache, SingleFlight
+from services.events import event_bus, ChangeAction
 from services.utils import get_object_by_id, save_object, delete_object
 
 
@@ -24,19 +36,25 @@ class WorkflowGraph:
     - db (Session): The database session.
     - G (nx.DiGraph): The graph representing the workflow.
     - start_node: The starting node of the workflow.
-    - end_node: The ending node of the workflow.
+    - last_node: The ending node of the workflow.
+    - nodes (list[NodeRecord]): The nodes the graph was built from.
     """
 
     def __init__(self, workflow_id: int, db: Session):
         self.workflow_id = workflow_id
         self.db: Session = db
+        # networkx is imported on first use to keep application startup fast.
+        import networkx as nx
+
         self.G = nx.DiGraph()
         self.start_node = None
-        self.end_node = None
+        self.last_node = None
+        self.nodes = []
 
-    def _add_node(self, node: StartNode | EndNode | MessageNode | ConditionNode):
+    def _add_node(self, node: NodeRecord):
         """Add a node to the graph."""
-        self.G.add_node(node)
+        self.nodes.append(node)
+        self.G.add_node(node.id)
 
     def _add_edge(self, source_node_id: int, target_node_id: int):
         """
@@ -56,22 +74,31 @@ class WorkflowGraph:
         Validate the existence of the last node.
         """
         if not self.last_node:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Workflow has no end node",
+            )
 
     def _validate_reachable_nodes(self):
         """
         Validate reachable nodes in the graph.
         """
+        import networkx as nx
+
         reachable_nodes = nx.bfs_tree(self.G, source=self.start_node).nodes()
         if self.last_node not in reachable_nodes:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
+                detail="End node is not reachable from the start node",
             )
 
     def _validate_edges(self):
         """Validate the existence of edges in the graph."""
         if not self.G.edges:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Workflow has no edges",
+            )
 
     def create_graph(self) -> None:
         """
@@ -81,10 +108,12 @@ class WorkflowGraph:
             model=Workflow, object_id=self.workflow_id, db_session=self.db
         )
         self._validate_workflow(workflow)
-        for node in workflow.nodes:
+        records = load_node_records(self.db, Node.workflow_id == self.workflow_id)
+        node_types = {node.id: node.node_type for node in records}
+        for node in records:
             self._add_node(node)
-            if isinstance(node, StartNode):
-                if node.next_node.node_type != NodeType.condition.value:
+            if node.node_type == NodeType.start:
+                if node_types.get(node.next_node_id) != NodeType.condition:
                     self._add_edge(node.id, node.next_node_id)
                     self.start_node = node.id
                 else:
@@ -92,18 +121,18 @@ class WorkflowGraph:
                         status_code=status.HTTP_400_BAD_REQUEST,
                         detail="Condition node could be reached only through message node or condition node",
                     )
-            elif isinstance(node, MessageNode):
-                if node.next_node.node_type != NodeType.start.value:
+            elif node.node_type == NodeType.message:
+                if node_types.get(node.next_node_id) != NodeType.start:
                     self._add_edge(node.id, node.next_node_id)
                 else:
                     raise HTTPException(
                         status_code=status.HTTP_400_BAD_REQUEST,
                         detail="Start node could not have any previous nodes",
                     )
-            elif isinstance(node, ConditionNode):
+            elif node.node_type == NodeType.condition:
                 self._add_edge(node.id, node.yes_node_id)
                 self._add_edge(node.id, node.no_node_id)
-            elif isinstance(node, EndNode):
+            elif node.node_type == NodeType.end:
                 self.last_node = node.id
 
         self._validate_last_node()
@@ -118,6 +147,8 @@ class WorkflowGraph:
         - dict: A dictionary containing the path and edges of the graph.
         """
         """Run the workflow graph."""
+        import networkx as nx
+
         sequence = nx.shortest_path(self.G, target=self.last_node)[self.start_node]
         edges = list(self.G.edges)
         response_data = {
@@ -126,12 +157,54 @@ class WorkflowGraph:
         }
         return response_data
 
+    def snapshot(self, version: int) -> WorkflowSnapshotSchema:
+        """
+        Freeze the built graph into an immutable snapshot.
+
+        Must be called after create_graph(), which validates the graph.
+        :param version: Version number assigned to the snapshot.
+        :return: The compiled snapshot including the precomputed sequence.
+        """
+        sequence = self.run_graph()
+        return WorkflowSnapshotSchema(
+            workflow_id=self.workflow_id,
+            version=version,
+            start_node=self.start_node,
+            end_node=self.last_node,
+            nodes=tuple(
+                WorkflowNodeSnapshotSchema.model_validate(node) for node in self.nodes
+            ),
+            edges=tuple(sequence["edges"]),
+            path=tuple(sequence["path"]),
+        )
+
+
+# Draft sequences keyed by (database, workflow id); each entry remembers the
+# workflow revision it was built from.
+sequence_cache = LRUCache(maxsize=1024)
+# In-flight sequence builds keyed by (database, workflow id, revision).
+sequence_flights = SingleFlight()
+
 
 class WorkflowService:
     """
     A class to provide workflow services.
+
+    Attributes:
+    - sequences (LRUCache): Process-local cache of draft sequences. An entry
+      is only served while its revision matches the one stored in the
+      database, so every worker process sees writes made by any other.
+    - flights (SingleFlight): Coalesces concurrent builds of one revision.
     """
 
+    def __init__(
+        self,
+        sequences: LRUCache = sequence_cache,
+        flights: SingleFlight = sequence_flights,
+    ):
+        self.sequences = sequences
+        self.flights = flights
+
     def create_workflow(
         self, workflow_data: workflow.WorkflowCreateSchema, db: Session
     ) -> Workflow:
@@ -143,6 +216,9 @@ class WorkflowService:
         """
         new_workflow = Workflow(name=workflow_data.name)
         save_object(new_workflow, db)
+        event_bus.publish(
+            new_workflow.id, "workflow", new_workflow.id, ChangeAction.created
+        )
         return new_workflow
 
     def get_workflow(self, workflow_id: int, db: Session) -> Workflow:
@@ -175,6 +251,7 @@ class WorkflowService:
         )
         workflow.name = data.name
         save_object(workflow, db)
+        event_bus.publish(workflow.id, "workflow", workflow.id, ChangeAction.updated)
         return workflow
 
     def delete_workflow(self, workflow_id: int, db: Session) -> bool:
@@ -187,11 +264,164 @@ class WorkflowService:
         workflow = get_object_by_id(
             model=Workflow, object_id=workflow_id, db_session=db
         )
+        path_analytics.delete_stats(workflow_id, db)
+        db.execute(delete(NodeChange).where(NodeChange.workflow_id == workflow_id))
         delete_object(workflow, db)
+        event_bus.publish(workflow_id, "workflow", workflow_id, ChangeAction.deleted)
         return True
 
-    def create_and_run_sequence(self, workflow_id: int, db: Session):
-        """Create and run the workflow sequence."""
+    def clone_workflow(
+        self, workflow_id: int, data: workflow.WorkflowCloneSchema, db: Session
+    ) -> Workflow:
+        """
+        Copy a workflow and its nodes in one transaction.
+
+        Node rows are copied table by table with INSERT ... SELECT. Every
+        copied node gets its source ID plus one offset, chosen so the new IDs
+        lie above all existing and archived ones, which remaps the edges with the same
+        addition; edges pointing outside the source workflow keep their target.
+        Versions, runs and statistics are not copied.
+        :param workflow_id: ID of the workflow to copy.
+        :param data: Name of the copy and message parameters.
+        :param db: Database session for the operation.
+        :return: The new workflow.
+        """
+        source = get_object_by_id(model=Workflow, object_id=workflow_id, db_session=db)
+        clone = Workflow(name=data.name or f"{source.name} (copy)")
+        db.add(clone)
+        # The insert takes the write lock first, so no other writer can add
+        # nodes between reading the highest ID and copying.
+        db.flush()
+
+        nodes = Node.__table__
+        source_ids = select(nodes.c.id).where(nodes.c.workflow_id == workflow_id)
+        lowest = db.scalar(
+            select(func.min(nodes.c.id)).where(nodes.c.workflow_id == workflow_id)
+        )
+        if lowest is not None:
+            # Archived nodes keep their IDs for when they are restored.
+            highest = max(
+                db.scalar(select(func.max(nodes.c.id))),
+                db.scalar(select(func.max(ArchivedWorkflow.max_node_id))) or 0,
+            )
+            offset = highest + 1 - lowest
+
+            def remap(column):
+                return case((column.in_(source_ids), column + offset), else_=column)
+
+            db.execute(
+                insert(nodes).from_select(
+                    ["id", "node_type", "workflow_id"],
+                    select(
+                        nodes.c.id + offset, nodes.c.node_type, literal(clone.id)
+                    ).where(nodes.c.workflow_id == workflow_id),
+                )
+            )
+
+            def copy(table, **columns) -> None:
+                db.execute(
+                    insert(table).from_select(
+                        ["id", *columns],
+                        select(table.c.id + offset, *columns.values()).where(
+                            table.c.id.in_(source_ids)
+                        ),
+                    )
+                )
+
+            start = StartNode.__table__
+            message = MessageNode.__table__
+            condition = ConditionNode.__table__
+            text = message.c.message
+            for key, value in data.params.items():
+                text = func.replace(text, f"{{{{{key}}}}}", value)
+            copy(start, next_node_id=remap(start.c.next_node_id))
+            copy(
+                message,
+                status=message.c.status,
+                message=text,
+                next_node_id=remap(message.c.next_node_id),
+            )
+            copy(
+                condition,
+                condition=condition.c.condition,
+                yes_node_id=remap(condition.c.yes_node_id),
+                no_node_id=remap(condition.c.no_node_id),
+            )
+            copy(EndNode.__table__)
+            index_workflow(db, clone.id)
+            bump_revisions(db, [clone.id])
+        db.commit()
+        db.refresh(clone)
+        event_bus.publish(clone.id, "workflow", clone.id, ChangeAction.created)
+        return clone
+
+    def get_revision(self, workflow_id: int, db: Session) -> int:
+        """
+        Read only the revision of a workflow, with one indexed core query.
+        :param workflow_id: ID of the workflow.
+        :param db: Database session for the operation.
+        :return: The current revision; it changes with every write to the
+            workflow or its nodes.
+        """
+        revision = db.scalar(
+            select(Workflow.revision).where(Workflow.id == workflow_id)
+        )
+        if revision is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+        return revision
+
+    def _build_sequence(self, workflow_id: int, revision: int, db: Session) -> dict:
         workflow_graph = WorkflowGraph(workflow_id, db)
         workflow_graph.create_graph()
-        return workflow_graph.run_graph()
+        sequence = {**workflow_graph.run_graph(), "revision": revision}
+        self.sequences.set((str(db.get_bind().url), workflow_id), sequence)
+        return sequence
+
+    def create_and_run_sequence(self, workflow_id: int, db: Session) -> dict:
+        """
+        Create and run the workflow sequence.
+
+        The revision is read before the nodes, so a cached sequence can only
+        be newer than the revision it is stored under, never older. On a cache
+        miss only one caller per workflow revision builds the graph; callers
+        arriving meanwhile wait for its result.
+        """
+        revision = self.get_revision(workflow_id, db)
+        key = (str(db.get_bind().url), workflow_id)
+        cached = self.sequences.get(key)
+        if cached is not None and cached["revision"] == revision:
+            return cached
+        return self.flights.do(
+            (*key, revision),
+            lambda: self._build_sequence(workflow_id, revision, db),
+        )
+
+    async def create_and_run_sequence_async(
+        self, workflow_id: int, session_factory: sessionmaker
+    ) -> dict:
+        """
+        create_and_run_sequence() for the event loop.
+
+        Database work runs in worker threads with sessions of their own;
+        coalesced callers await the running build without taking a thread.
+        :param workflow_id: ID of the workflow.
+        :param session_factory: Factory creating database sessions.
+        """
+
+        def read_revision() -> tuple[str, int]:
+            with session_factory() as db:
+                url = str(db.get_bind().url)
+                return url, self.get_revision(workflow_id, db)
+
+        def build(revision: int) -> dict:
+            with session_factory() as db:
+                return self._build_sequence(workflow_id, revision, db)
+
+        url, revision = await asyncio.to_thread(read_revision)
+        cached = self.sequences.get((url, workflow_id))
+        if cached is not None and cached["revision"] == revision:
+            return cached
+        return await self.flights.do_async(
+            (url, workflow_id, revision),
+            lambda: asyncio.to_thread(build, revision),
+        )
@@ -0,0 +1,176 @@
+import os
+
+
+def env_flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+""" Database """
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./main.db")
+# With more than one shard, workflows are spread over SHARD_COUNT SQLite
+# files ({shard} is replaced by the shard number) and DATABASE_URL only
+# holds the directory of which shard has which workflow.
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "1"))
+SHARD_URL_TEMPLATE = os.getenv("SHARD_URL_TEMPLATE", "sqlite:///./shard_{shard}.db")
+
+
+""" Workflow runs """
+
+RUN_SCHEDULER_ENABLED = env_flag("RUN_SCHEDULER_ENABLED", True)
+RUN_WORKERS = int(os.getenv("RUN_WORKERS", "4"))
+RUN_BATCH_SIZE = int(os.getenv("RUN_BATCH_SIZE", "500"))
+RUN_POLL_INTERVAL = float(os.getenv("RUN_POLL_INTERVAL", "0.5"))
+RUN_LEASE_SECONDS = float(os.getenv("RUN_LEASE_SECONDS", "30"))
+RUN_MAX_STEPS = int(os.getenv("RUN_MAX_STEPS", "100"))
+# How long a run may wait for its message to be dispatched before it is
+# claimed again and the message re-sent.
+RUN_DISPATCH_TIMEOUT = float(os.getenv("RUN_DISPATCH_TIMEOUT", "300"))
+
+
+""" Message dispatch """
+
+# Import path of the MessageSender implementation.
+DISPATCH_SENDER = os.getenv("DISPATCH_SENDER", "services.dispatch.LocalStubSender")
+DISPATCH_CONCURRENCY = int(os.getenv("DISPATCH_CONCURRENCY", "4"))
+DISPATCH_BATCH_SIZE = int(os.getenv("DISPATCH_BATCH_SIZE", "100"))
+DISPATCH_LINGER = float(os.getenv("DISPATCH_LINGER", "0.05"))
+DISPATCH_QUEUE_SIZE = int(os.getenv("DISPATCH_QUEUE_SIZE", "10000"))
+DISPATCH_MAX_RETRIES = int(os.getenv("DISPATCH_MAX_RETRIES", "5"))
+DISPATCH_BACKOFF_BASE = float(os.getenv("DISPATCH_BACKOFF_BASE", "0.5"))
+DISPATCH_BACKOFF_MAX = float(os.getenv("DISPATCH_BACKOFF_MAX", "30"))
+# How long a run worker waits for room in a full queue before giving up; the
+# run stays waiting and its message is re-sent after RUN_DISPATCH_TIMEOUT.
+DISPATCH_SUBMIT_TIMEOUT = float(os.getenv("DISPATCH_SUBMIT_TIMEOUT", "10"))
+
+
+""" Run tracing """
+
+# Share of runs traced, from 0 (off) to 1; a run is traced as a whole or not.
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+# Finished spans kept in memory for /run/traces/; the oldest are dropped.
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "10000"))
+# Spans are also exported as OTLP JSON to this collector URL (e.g.
+# http://localhost:4318/v1/traces) or, without one, appended to this file.
+TRACE_EXPORT_URL = os.getenv("TRACE_EXPORT_URL", "")
+TRACE_EXPORT_FILE = os.getenv("TRACE_EXPORT_FILE", "")
+TRACE_EXPORT_INTERVAL = float(os.getenv("TRACE_EXPORT_INTERVAL", "5"))
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "workflow-service")
+
+
+""" Change events """
+
+EVENTS_COALESCE_WINDOW = float(os.getenv("EVENTS_COALESCE_WINDOW", "0.1"))
+EVENTS_BUFFER_SIZE = int(os.getenv("EVENTS_BUFFER_SIZE", "100"))
+EVENTS_KEEPALIVE = float(os.getenv("EVENTS_KEEPALIVE", "15"))
+
+
+""" Path analytics """
+
+ANALYTICS_ENABLED = env_flag("ANALYTICS_ENABLED", True)
+ANALYTICS_FLUSH_INTERVAL = float(os.getenv("ANALYTICS_FLUSH_INTERVAL", "10"))
+# Recorded paths kept in memory between flushes; the oldest are dropped beyond.
+ANALYTICS_MAX_PENDING = int(os.getenv("ANALYTICS_MAX_PENDING", "100000"))
+
+
+""" All-paths enumeration """
+
+# Upper bounds of one /workflow/paths/ request; clients may ask for less.
+PATHS_MAX_PATHS = int(os.getenv("PATHS_MAX_PATHS", "10000"))
+PATHS_MAX_DEPTH = int(os.getenv("PATHS_MAX_DEPTH", "1000"))
+PATHS_TIMEOUT = float(os.getenv("PATHS_TIMEOUT", "10"))
+
+
+""" Editor layout """
+
+# Workflow layouts kept in memory, each with the nodes it was computed from.
+LAYOUT_CACHE_SIZE = int(os.getenv("LAYOUT_CACHE_SIZE", "64"))
+# Crossing-reduction sweeps (down and up) of a layout computed from scratch.
+LAYOUT_SWEEPS = int(os.getenv("LAYOUT_SWEEPS", "4"))
+# Edges spanning more layers are drawn straight instead of routed around nodes.
+LAYOUT_MAX_EDGE_SPAN = int(os.getenv("LAYOUT_MAX_EDGE_SPAN", "8"))
+# Edits of more nodes than this since the cached layout are laid out anew.
+LAYOUT_INCREMENTAL_MAX_CHANGES = int(os.getenv("LAYOUT_INCREMENTAL_MAX_CHANGES", "200"))
+
+
+""" Dry-run simulation """
+
+SIMULATION_RUNS = int(os.getenv("SIMULATION_RUNS", "1000000"))
+SIMULATION_MAX_RUNS = int(os.getenv("SIMULATION_MAX_RUNS", "10000000"))
+SIMULATION_MAX_STEPS = int(os.getenv("SIMULATION_MAX_STEPS", "1000"))
+# Monte-Carlo runs sampled at once; bounds the memory of one simulation.
+SIMULATION_BATCH_SIZE = int(os.getenv("SIMULATION_BATCH_SIZE", "262144"))
+# Seconds after which Monte-Carlo sampling stops starting runs.
+SIMULATION_TIMEOUT = float(os.getenv("SIMULATION_TIMEOUT", "10"))
+# Node visits the pure-Python sampler takes at most, when NumPy is missing.
+SIMULATION_PYTHON_MAX_VISITS = int(os.getenv("SIMULATION_PYTHON_MAX_VISITS", "5000000"))
+# Most recent runs whose contexts the history source evaluates.
+SIMULATION_HISTORY_RUNS = int(os.getenv("SIMULATION_HISTORY_RUNS", "10000"))
+
+
+""" Archive """
+
+# Off by default: archiving moves rows out of the database into ARCHIVE_DIR.
+ARCHIVE_ENABLED = env_flag("ARCHIVE_ENABLED", False)
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "./archive")
+# Workflows unchanged for this many days are archived.
+ARCHIVE_AFTER_DAYS = float(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+ARCHIVE_INTERVAL = float(os.getenv("ARCHIVE_INTERVAL", "3600"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "50"))
+# Seconds between batches, leaving the database to other writers.
+ARCHIVE_BATCH_PAUSE = float(os.getenv("ARCHIVE_BATCH_PAUSE", "0.1"))
+# Seconds a workflow or node found not archived is not looked up again; a
+# workflow another process archives meanwhile answers 404 until then.
+ARCHIVE_LOOKUP_TTL = float(os.getenv("ARCHIVE_LOOKUP_TTL", "10"))
+
+
+""" Node search """
+
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", "50"))
+SEARCH_MAX_PAGE_SIZE = int(os.getenv("SEARCH_MAX_PAGE_SIZE", "500"))
+
+
+""" Bulk node status transitions """
+
+# Longest node ID list one transition request may name.
+NODE_STATUS_TRANSITION_MAX_IDS = int(
+    os.getenv("NODE_STATUS_TRANSITION_MAX_IDS", "10000")
+)
+
+
+""" Response compression """
+
+COMPRESSION_ENABLED = env_flag("COMPRESSION_ENABLED", True)
+# Smaller bodies are sent as they are: compressing them saves next to nothing.
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+# Used when the zstandard / brotli packages are installed.
+COMPRESSION_ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5"))
+
+
+""" Admission control """
+
+ADMISSION_ENABLED = env_flag("ADMISSION_ENABLED", True)
+# Requests are attributed to the peer address, or to this header's value when
+# set; only set it behind a proxy that overwrites the header, as clients
+# could otherwise get a fresh rate limit by sending a new value.
+ADMISSION_CLIENT_HEADER = os.getenv("ADMISSION_CLIENT_HEADER", "")
+# Graph endpoints (sequence, paths, analysis, publish, layout, simulation)
+# scale with workflow size.
+ADMISSION_GRAPH_CONCURRENCY = int(os.getenv("ADMISSION_GRAPH_CONCURRENCY", "8"))
+ADMISSION_GRAPH_RATE = float(os.getenv("ADMISSION_GRAPH_RATE", "5"))
+ADMISSION_GRAPH_BURST = float(os.getenv("ADMISSION_GRAPH_BURST", "20"))
+# A graph request costs one token plus one per this many nodes.
+ADMISSION_NODES_PER_TOKEN = int(os.getenv("ADMISSION_NODES_PER_TOKEN", "200"))
+ADMISSION_STREAM_CONCURRENCY = int(os.getenv("ADMISSION_STREAM_CONCURRENCY", "1000"))
+ADMISSION_DEFAULT_CONCURRENCY = int(os.getenv("ADMISSION_DEFAULT_CONCURRENCY", "256"))
+ADMISSION_DEFAULT_RATE = float(os.getenv("ADMISSION_DEFAULT_RATE", "100"))
+ADMISSION_DEFAULT_BURST = float(os.getenv("ADMISSION_DEFAULT_BURST", "200"))
+# Seconds a cached node count is used for cost estimates.
+ADMISSION_COUNT_TTL = float(os.getenv("ADMISSION_COUNT_TTL", "30"))
+# Retry-After sent with 503 responses when an endpoint class is saturated.
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "1"))
@@ -0,0 +1,63 @@
+import subprocess
+import sys
+
+from sqlalchemy import create_engine, inspect
+
+from database.migrations import migrate
+
+
+def test_migrate_creates_schema():
+    engine = create_engine("sqlite:///:memory:")
+
+    applied = migrate(engine)
+
+    assert "create table workflows" in applied
+    assert "workflow_runs" in inspect(engine).get_table_names()
+    assert migrate(engine) == []
+
+
+def test_migrate_adds_missing_columns():
+    engine = create_engine("sqlite:///:memory:")
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "CREATE TABLE workflows (id INTEGER PRIMARY KEY, name VARCHAR)"
+        )
+        connection.exec_driver_sql("INSERT INTO workflows (name) VALUES ('Old')")
+
+    applied = migrate(engine)
+
+    assert "add column workflows.revision" in applied
+    assert "create index ix_workflows_id" in applied
+    with engine.connect() as connection:
+        revision = connection.exec_driver_sql("SELECT revision FROM workflows").scalar()
+    assert revision == 0
+
+
+def test_migrate_backfills_search_index():
+    engine = create_engine("sqlite:///:memory:")
+    migrate(engine)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DROP TABLE node_search")
+        connection.exec_driver_sql(
+            "INSERT INTO nodes (id, node_type, workflow_id) VALUES (1, 'message', 1)"
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO message_nodes (id, message) VALUES (1, 'Old greeting')"
+        )
+
+    applied = migrate(engine)
+
+    assert applied == ["create search index"]
+    with engine.connect() as connection:
+        found = connection.exec_driver_sql(
+            "SELECT rowid FROM node_search WHERE node_search MATCH 'greeting'"
+        ).scalars()
+        assert list(found) == [1]
+
+
+def test_startup_does_not_import_networkx():
+    code = "import sys, main; print('networkx' in sys.modules)"
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == "False"
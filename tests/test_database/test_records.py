@@ -0,0 +1,64 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.config import Base
+from database.models import (
+    Workflow,
+    Node,
+    StartNode,
+    MessageNode,
+    ConditionNode,
+    EndNode,
+)
+from database.records import NodeRecord, get_node_record, load_node_records
+from schemas.node import MessageNodeResponseSchema, NodeStatus, NodeType
+
+engine = create_engine("sqlite:///:memory:")
+Base.metadata.create_all(bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def test_load_node_records():
+    with SessionLocal() as db:
+        workflow = Workflow(name="Records")
+        db.add(workflow)
+        db.flush()
+        end = EndNode(workflow_id=workflow.id)
+        db.add(end)
+        db.flush()
+        message = MessageNode(
+            workflow_id=workflow.id,
+            message="Hello",
+            status=NodeStatus.sent,
+            next_node_id=end.id,
+        )
+        db.add(message)
+        db.flush()
+        condition = ConditionNode(
+            workflow_id=workflow.id,
+            condition="Sent",
+            yes_node_id=end.id,
+            no_node_id=message.id,
+        )
+        start = StartNode(workflow_id=workflow.id, next_node_id=message.id)
+        db.add_all([condition, start])
+        db.commit()
+
+        records = load_node_records(db, Node.workflow_id == workflow.id)
+
+        assert [record.id for record in records] == sorted(
+            [end.id, message.id, condition.id, start.id]
+        )
+        by_type = {record.node_type: record for record in records}
+        assert by_type[NodeType.start].next_node_id == message.id
+        assert by_type[NodeType.message].status == NodeStatus.sent
+        assert by_type[NodeType.message].next_node_id == end.id
+        assert by_type[NodeType.condition].no_node_id == message.id
+        assert by_type[NodeType.end].next_node_id is None
+        assert not hasattr(records[0], "__dict__")
+        # Schemas read records like ORM objects.
+        response = MessageNodeResponseSchema.model_validate(by_type[NodeType.message])
+        assert response.message == "Hello"
+
+        assert isinstance(get_node_record(db, start.id), NodeRecord)
+        assert get_node_record(db, 0) is None
@@ -0,0 +1,143 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, select
+
+from database.migrations import migrate_databases
+from database.models import Node, Workflow
+from database.sharding import SHARD_ID_BITS, ShardRouter
+from schemas.node import MessageNodeSchema, NodeStatus, NodeType
+from schemas.workflow import WorkflowCreateSchema
+from services.node import NodeService
+from services.workflow import WorkflowService
+
+
+@pytest.fixture
+def router(tmp_path):
+    router = ShardRouter(
+        count=3,
+        url_template=f"sqlite:///{tmp_path}/shard_{{shard}}.db",
+        directory_url=f"sqlite:///{tmp_path}/directory.db",
+    )
+    migrate_databases(router)
+    return router
+
+
+def create_workflow(router: ShardRouter, name: str) -> tuple[int, int]:
+    """A workflow with one message node; returns their IDs."""
+    with router.session(None) as db:
+        workflow = WorkflowService().create_workflow(
+            WorkflowCreateSchema(name=name), db
+        )
+        node = NodeService().create_node(
+            NodeType.message,
+            MessageNodeSchema(
+                workflow_id=workflow.id,
+                message="Hello",
+                status=NodeStatus.pending,
+                next_node_id=0,
+            ),
+            db,
+        )
+        return workflow.id, node.id
+
+
+def test_workflows_are_placed_by_id(router):
+    created = [create_workflow(router, f"Tenant {i}") for i in range(6)]
+
+    for workflow_id, node_id in created:
+        shard = workflow_id % 3
+        assert node_id >> SHARD_ID_BITS == shard
+        assert router.shard_of_id(node_id) == shard
+        with router.session(shard) as db:
+            assert db.get(Workflow, workflow_id) is not None
+            assert db.get(Node, node_id) is not None
+    for shard in range(3):
+        with router.session(shard) as db:
+            assert db.scalar(select(func.count(Workflow.id))) == 2
+
+    router._placements.clear()
+    assert router.shard_of_workflow(created[4][0]) == created[4][0] % 3
+    assert router.shard_of_workflow(999) == 0
+
+
+def test_requests_are_routed_by_the_ids_they_name(router):
+    (workflow_id, node_id), (other_workflow_id, other_node_id) = [
+        create_workflow(router, name) for name in ("First", "Second")
+    ]
+
+    assert router.request_shard({"workflow_id": str(workflow_id)}, {}, None) == (
+        workflow_id % 3
+    )
+    assert router.request_shard({"node_id": str(node_id)}, {}, None) == (
+        workflow_id % 3
+    )
+    assert router.request_shard({}, {}, {"workflow_id": other_workflow_id}) == (
+        other_workflow_id % 3
+    )
+    assert router.request_shard({}, {}, {"node_ids": [node_id]}) == workflow_id % 3
+    assert router.request_shard({}, {}, {"name": "New"}) is None
+    with pytest.raises(HTTPException) as error:
+        router.request_shard({}, {}, {"node_ids": [node_id, other_node_id]})
+    assert error.value.status_code == 400
+    with pytest.raises(HTTPException):
+        router.session(None).get(Workflow, workflow_id)
+
+
+def test_sharded_application(tmp_path):
+    code = """
+import json
+from fastapi.testclient import TestClient
+from database.migrations import migrate_databases
+from main import app
+
+migrate_databases()
+client = TestClient(app)
+ids = [
+    client.post("/workflow/create/", json={"name": name}).json()["id"]
+    for name in ("First", "Second")
+]
+nodes = [
+    client.post(
+        "/node/create-end-node/", json={"workflow_id": workflow_id}
+    ).json()["id"]
+    for workflow_id in ids
+]
+print(json.dumps({
+    "ids": ids,
+    "nodes": nodes,
+    "workflows": [client.get(f"/workflow/get/{i}/").status_code for i in ids],
+    "node": [client.get(f"/node/{i}/").json()["workflow_id"] for i in nodes],
+}))
+"""
+    env = {
+        **os.environ,
+        "SHARD_COUNT": "2",
+        "DATABASE_URL": f"sqlite:///{tmp_path}/directory.db",
+        "SHARD_URL_TEMPLATE": f"sqlite:///{tmp_path}/shard_{{shard}}.db",
+        "PYTHONPATH": os.getcwd(),
+    }
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=env,
+        cwd=tmp_path,
+    )
+
+    output = json.loads(result.stdout)
+    assert output["workflows"] == [200, 200]
+    assert output["node"] == output["ids"]
+    assert [node_id >> SHARD_ID_BITS for node_id in output["nodes"]] == [
+        workflow_id % 2 for workflow_id in output["ids"]
+    ]
+    assert sorted(os.listdir(tmp_path)) == [
+        "directory.db",
+        "shard_0.db",
+        "shard_1.db",
+    ]
@@ -0,0 +1,9 @@
+import pytest
+
+from database.migrations import migrate
+
+
+@pytest.fixture(scope="session", autouse=True)
+def migrated_database():
+    """The application no longer creates its schema on startup."""
+    migrate()
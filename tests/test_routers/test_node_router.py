@@ -10,6 +10,7 @@ from schemas.node import (
     ConditionNodeSchema,
     MessageNodeSchema,
     NodeStatus,
+    NodeType,
 )
 from services.node import NodeService
 from services.workflow import WorkflowService
@@ -96,6 +97,41 @@ class TestGetNodeRouter(BaseTestConfig):
         assert response_get.status_code == 200
         assert response_get.json()["workflow_id"] == node_data.workflow_id
 
+    def test_get_node_moved_to_another_workflow(self):
+        create_url = app.url_path_for("create_workflow")
+        source_id = client.post(create_url, json={"name": "Source"}).json()["id"]
+        node_data = MessageNodeSchema(
+            workflow_id=source_id,
+            message="Message",
+            status=NodeStatus.pending,
+            next_node_id=0,
+        )
+        node = client.post(
+            app.url_path_for("create_message_node"), json=node_data.dict()
+        ).json()
+        get_url = app.url_path_for("get_node", node_id=node["id"])
+        etag = client.get(get_url).headers["etag"]
+        assert client.get(get_url, headers={"If-None-Match": etag}).status_code == 304
+
+        # The move bumps the target to the revision the source had.
+        target_id = client.post(create_url, json={"name": "Target"}).json()["id"]
+        node_data.workflow_id = target_id
+        update_url = app.url_path_for("update_message_node", node_id=node["id"])
+        client.put(update_url, json=node_data.dict())
+        response = client.get(get_url, headers={"If-None-Match": etag})
+
+        assert response.status_code == 200
+        assert response.json()["workflow_id"] == target_id
+        assert response.headers["etag"] != etag
+
+    def test_get_node_response_schema(self):
+        get_url = app.url_path_for("get_node", node_id=1)
+        response = client.get(get_url)
+
+        assert response.headers["content-type"] == "application/json"
+        assert response.json()["id"] == 1
+        assert response.json()["node_type"] == NodeType.start.value
+
 
 class TestUpdateNodeRouter(BaseTestConfig):
     def test_update_start_node(self, node_services, db_session):
@@ -176,3 +212,91 @@ class TestDeleteNode(BaseTestConfig):
         delete_url = app.url_path_for("delete_node", node_id=1)
         response = client.delete(delete_url)
         assert response.status_code == 204
+        assert response.content == b""
+
+
+class TestListNodesRouter(BaseTestConfig):
+    def test_list_workflow_nodes(self):
+        create_url = app.url_path_for("create_workflow")
+        workflow_id = client.post(create_url, json={"name": "Listed"}).json()["id"]
+        end = client.post(
+            app.url_path_for("create_end_node"), json={"workflow_id": workflow_id}
+        ).json()
+        message = client.post(
+            app.url_path_for("create_message_node"),
+            json=MessageNodeSchema(
+                workflow_id=workflow_id,
+                message="Message",
+                status=NodeStatus.open,
+                next_node_id=end["id"],
+            ).dict(),
+        ).json()
+
+        list_url = app.url_path_for("list_workflow_nodes", workflow_id=workflow_id)
+        response = client.get(list_url)
+
+        assert response.status_code == 200
+        assert response.json() == [end, message]
+        missing_url = app.url_path_for("list_workflow_nodes", workflow_id=0)
+        assert client.get(missing_url).status_code == 404
+
+    def test_search_nodes(self):
+        create_url = app.url_path_for("create_workflow")
+        workflow_id = client.post(create_url, json={"name": "Searched"}).json()["id"]
+        end = client.post(
+            app.url_path_for("create_end_node"), json={"workflow_id": workflow_id}
+        ).json()
+        message = client.post(
+            app.url_path_for("create_message_node"),
+            json=MessageNodeSchema(
+                workflow_id=workflow_id,
+                message="Router search phrase",
+                status=NodeStatus.open,
+                next_node_id=end["id"],
+            ).dict(),
+        ).json()
+
+        search_url = app.url_path_for("search_nodes")
+        response = client.get(
+            search_url,
+            params={"q": "search phrase", "workflow_id": workflow_id, "status": "Open"},
+        )
+
+        assert response.status_code == 200
+        assert [item["node_id"] for item in response.json()["items"]] == [message["id"]]
+        assert response.json()["next_after"] is None
+        assert client.get(search_url, params={"q": ""}).status_code == 422
+
+
+class TestTransitionMessageStatusRouter(BaseTestConfig):
+    def test_transition_message_node_status(self):
+        create_url = app.url_path_for("create_workflow")
+        workflow_id = client.post(create_url, json={"name": "Sent"}).json()["id"]
+        message = client.post(
+            app.url_path_for("create_message_node"),
+            json=MessageNodeSchema(
+                workflow_id=workflow_id,
+                message="Message",
+                status=NodeStatus.pending,
+                next_node_id=0,
+            ).dict(),
+        ).json()
+
+        transition_url = app.url_path_for("transition_message_node_status")
+        response = client.post(
+            transition_url,
+            json={
+                "workflow_id": workflow_id,
+                "from_status": "Pending",
+                "to_status": "Sent",
+            },
+        )
+
+        assert response.status_code == 200
+        assert response.json() == {"matched": 1, "updated": 1, "skipped": 0}
+        node_url = app.url_path_for("get_node", node_id=message["id"])
+        assert client.get(node_url).json()["status"] == "Sent"
+        response = client.post(
+            transition_url, json={"node_ids": [], "to_status": "Sent"}
+        )
+        assert response.status_code == 422
@@ -88,3 +88,163 @@ class TestWorkflowRouter:
         assert response.status_code == 204
         Base.metadata.drop_all(bind=engine)
 
+
+    def test_get_workflow_stats(self, workflow_services, db_session):
+        workflow_data = WorkflowCreateSchema(name="Test Workflow")
+        create_url = app.url_path_for("create_workflow")
+        created_workflow = client.post(create_url, json=workflow_data.dict())
+
+        stats_url = app.url_path_for(
+            "get_workflow_stats", workflow_id=created_workflow.json()["id"]
+        )
+        response = client.get(stats_url)
+
+        assert response.status_code == 200
+        assert response.json()["paths"] == 0
+        assert response.json()["average_path_length"] is None
+        missing_url = app.url_path_for("get_workflow_stats", workflow_id=0)
+        assert client.get(missing_url).status_code == 404
+
+    def test_stream_workflow_paths_requires_published_version(
+        self, workflow_services, db_session
+    ):
+        workflow_data = WorkflowCreateSchema(name="Test Workflow")
+        create_url = app.url_path_for("create_workflow")
+        created_workflow = client.post(create_url, json=workflow_data.dict())
+
+        paths_url = app.url_path_for(
+            "stream_workflow_paths", workflow_id=created_workflow.json()["id"]
+        )
+        response = client.get(paths_url)
+
+        assert response.status_code == 404
+        assert response.json()["detail"] == "Workflow has no published version"
+
+    def test_diff_workflow_requires_published_version(
+        self, workflow_services, db_session
+    ):
+        workflow_data = WorkflowCreateSchema(name="Test Workflow")
+        create_url = app.url_path_for("create_workflow")
+        created_workflow = client.post(create_url, json=workflow_data.dict())
+
+        diff_url = app.url_path_for(
+            "diff_workflow", workflow_id=created_workflow.json()["id"]
+        )
+        response = client.get(diff_url, params={"target": 2})
+
+        assert response.status_code == 404
+        assert response.json()["detail"] == "Workflow has no published version"
+
+    def test_get_workflow_layout(self, workflow_services, db_session):
+        create_url = app.url_path_for("create_workflow")
+        created_workflow = client.post(create_url, json={"name": "Drawn"}).json()
+        node_url = app.url_path_for("create_end_node")
+        end = client.post(node_url, json={"workflow_id": created_workflow["id"]}).json()
+
+        layout_url = app.url_path_for(
+            "get_workflow_layout", workflow_id=created_workflow["id"]
+        )
+        response = client.get(layout_url)
+
+        assert response.status_code == 200
+        assert response.json()["nodes"] == [end]
+        assert response.json()["positions"] == [
+            {"id": end["id"], "layer": 0, "order": 0, "x": 0.0, "y": 0.0}
+        ]
+        etag = response.headers["etag"]
+        response = client.get(layout_url, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        missing_url = app.url_path_for("get_workflow_layout", workflow_id=0)
+        assert client.get(missing_url).status_code == 404
+
+    def test_simulate_workflow(self, workflow_services, db_session):
+        create_url = app.url_path_for("create_workflow")
+        created_workflow = client.post(create_url, json={"name": "Dry run"}).json()
+        end = client.post(
+            app.url_path_for("create_end_node"),
+            json={"workflow_id": created_workflow["id"]},
+        ).json()
+        client.post(
+            app.url_path_for("create_start_node"),
+            json={"workflow_id": created_workflow["id"], "next_node_id": end["id"]},
+        )
+
+        simulate_url = app.url_path_for(
+            "simulate_workflow", workflow_id=created_workflow["id"]
+        )
+        response = client.post(simulate_url, json={"runs": 10})
+
+        assert response.status_code == 200
+        assert response.json()["method"] == "exact"
+        assert response.json()["completed"] == 1
+        assert response.json()["expected_messages"] == 0
+        response = client.post(simulate_url, json={"probabilities": {"1": 2}})
+        assert response.status_code == 422
+
+    def test_get_workflow_conditional(self, workflow_services, db_session):
+        from sqlalchemy import event
+
+        from database.config import engine as app_engine
+
+        create_url = app.url_path_for("create_workflow")
+        created_workflow = client.post(create_url, json={"name": "Tagged"}).json()
+        get_url = app.url_path_for("get_workflow", workflow_id=created_workflow["id"])
+        etag = client.get(get_url).headers["etag"]
+
+        statements = []
+        listener = lambda *args: statements.append(args[2])  # noqa: E731
+        event.listen(app_engine, "before_cursor_execute", listener)
+        try:
+            response = client.get(get_url, headers={"If-None-Match": etag})
+        finally:
+            event.remove(app_engine, "before_cursor_execute", listener)
+
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+        assert not any("workflows.name" in statement for statement in statements)
+        update_url = app.url_path_for(
+            "update_workflow", workflow_id=created_workflow["id"]
+        )
+        client.put(update_url, json={"name": "Renamed"})
+        response = client.get(get_url, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+        assert response.json()["name"] == "Renamed"
+
+    def test_clone_workflow(self, workflow_services, db_session):
+        workflow_data = WorkflowCreateSchema(name="Template")
+        create_url = app.url_path_for("create_workflow")
+        created_workflow = client.post(create_url, json=workflow_data.dict())
+
+        clone_url = app.url_path_for(
+            "clone_workflow", workflow_id=created_workflow.json()["id"]
+        )
+        response = client.post(clone_url, json={"params": {"customer": "Acme"}})
+
+        assert response.status_code == 201
+        assert response.json()["name"] == "Template (copy)"
+        assert response.json()["id"] != created_workflow.json()["id"]
+        missing_url = app.url_path_for("clone_workflow", workflow_id=0)
+        assert client.post(missing_url, json={}).status_code == 404
+
+    def test_archived_workflow_is_restored_on_access(
+        self, workflow_services, db_session, tmp_path, monkeypatch
+    ):
+        from services.archive import workflow_archive
+
+        monkeypatch.setattr(workflow_archive, "directory", str(tmp_path))
+        create_url = app.url_path_for("create_workflow")
+        created_workflow = client.post(create_url, json={"name": "Cold"}).json()
+
+        archive_url = app.url_path_for(
+            "archive_workflow", workflow_id=created_workflow["id"]
+        )
+        response = client.post(archive_url)
+
+        assert response.status_code == 201
+        assert response.json()["workflow_id"] == created_workflow["id"]
+        get_url = app.url_path_for("get_workflow", workflow_id=created_workflow["id"])
+        response = client.get(get_url)
+        assert response.status_code == 200
+        assert response.json() == created_workflow
+        assert list(tmp_path.iterdir()) == []
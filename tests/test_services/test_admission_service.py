@@ -0,0 +1,226 @@
+import asyncio
+import os
+import re
+import tempfile
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.config import Base
+from database.models import Workflow, MessageNode
+from schemas.node import NodeStatus
+from services.admission import (
+    AdmissionController,
+    AdmissionMiddleware,
+    EndpointClass,
+    TokenBucket,
+)
+
+# A file database: node counts are read from worker threads.
+DATABASE_URL = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'admission.db')}"
+
+engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+Base.metadata.create_all(bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture(scope="function")
+def db_session():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+def endpoint_classes(graph_concurrency: int = 2, graph_rate: float = 5) -> list:
+    return [
+        EndpointClass(
+            name="graph",
+            pattern=re.compile(r"^/workflow/get-sequence/(?P<workflow_id>\d+)"),
+            concurrency=graph_concurrency,
+            rate=graph_rate,
+            burst=10,
+            nodes_per_token=10,
+        ),
+        EndpointClass(
+            name="default",
+            pattern=re.compile(""),
+            concurrency=100,
+            rate=1000,
+            burst=1000,
+        ),
+    ]
+
+
+def create_app(controller: AdmissionController | None) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/workflow/get-sequence/{workflow_id}")
+    def get_sequence(workflow_id: int):
+        time.sleep(0.1)
+        return {"path": []}
+
+    @app.get("/workflow/get/{workflow_id}/")
+    def get_workflow(workflow_id: int):
+        return {"id": workflow_id}
+
+    if controller is not None:
+        app.add_middleware(AdmissionMiddleware, controller=controller)
+    return app
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=2, capacity=4, now=0)
+
+    assert bucket.take(3, now=0) == 0
+    assert bucket.take(3, now=0) == pytest.approx(1.0)
+    assert bucket.take(3, now=1) == 0
+    assert bucket.wait(1, now=1) == pytest.approx(0.5)
+    assert bucket.tokens == 0
+
+
+def test_cost_grows_with_workflow_size(db_session):
+    workflow = Workflow(name="Test Workflow")
+    db_session.add(workflow)
+    db_session.flush()
+    db_session.add_all(
+        MessageNode(workflow_id=workflow.id, message="Hi", status=NodeStatus.open)
+        for _ in range(45)
+    )
+    db_session.commit()
+    controller = AdmissionController(SessionLocal, classes=endpoint_classes())
+    graph, default = controller.classes
+
+    async def costs():
+        return (
+            await controller.estimate_cost(graph, workflow.id),
+            await controller.estimate_cost(graph, -1),
+            await controller.estimate_cost(default, None),
+        )
+
+    assert asyncio.run(costs()) == (5.5, 1.0, 1.0)
+
+
+def test_rejections_carry_retry_after():
+    controller = AdmissionController(
+        SessionLocal,
+        classes=endpoint_classes(graph_concurrency=1, graph_rate=0.5),
+        client_header="X-Client-Id",
+    )
+    app = create_app(controller)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            concurrent = await asyncio.gather(
+                *(client.get("/workflow/get-sequence/1") for _ in range(3))
+            )
+            # Workflow 999999 has no nodes, so each request costs one token.
+            sequential = [
+                await client.get(
+                    "/workflow/get-sequence/999999", headers={"x-client-id": "a"}
+                )
+                for _ in range(11)
+            ]
+            return concurrent, sequential
+
+    concurrent, sequential = asyncio.run(scenario())
+
+    assert sorted(r.status_code for r in concurrent) == [200, 503, 503]
+    assert all(
+        r.headers["retry-after"] == "1" for r in concurrent if r.status_code == 503
+    )
+    assert [r.status_code for r in sequential].count(200) == 10
+    assert sequential[-1].status_code == 429
+    assert 1 <= int(sequential[-1].headers["retry-after"]) <= 2
+    assert controller.active["graph"] == 0
+
+
+def test_cheap_endpoints_stay_fast_under_graph_flood():
+    async def measure(app: FastAPI) -> float:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+
+            async def flood():
+                await asyncio.gather(
+                    *(
+                        client.get(
+                            "/workflow/get-sequence/1", headers={"x-client-id": f"{i}"}
+                        )
+                        for i in range(200)
+                    )
+                )
+
+            async def cheap() -> float:
+                started = time.perf_counter()
+                response = await client.get("/workflow/get/1/")
+                assert response.status_code == 200
+                return time.perf_counter() - started
+
+            async def cheap_traffic() -> list[float]:
+                # Requests arrive at a steady pace, whether or not earlier
+                # ones have been answered.
+                requests = []
+                for _ in range(50):
+                    requests.append(asyncio.create_task(cheap()))
+                    await asyncio.sleep(0.005)
+                return await asyncio.gather(*requests)
+
+            flooding = asyncio.create_task(flood())
+            await asyncio.sleep(0.01)
+            latencies = sorted(await cheap_traffic())
+            await flooding
+            return latencies[int(len(latencies) * 0.99) - 1]
+
+    protected = AdmissionController(
+        SessionLocal, classes=endpoint_classes(), client_header="x-client-id"
+    )
+    unprotected_p99 = asyncio.run(measure(create_app(None)))
+    protected_p99 = asyncio.run(measure(create_app(protected)))
+
+    # 200 slow requests saturate the 40 worker threads without admission.
+    assert unprotected_p99 > 0.1
+    assert protected_p99 < 0.05
+    assert protected.stats["graph_overloaded"] > 150
+
+
+def test_client_header_is_only_trusted_when_configured(monkeypatch):
+    counted = []
+    controller = AdmissionController(
+        SessionLocal, classes=endpoint_classes(graph_rate=0.5), count_ttl=0
+    )
+
+    def count_nodes(workflow_id: int) -> int:
+        counted.append(workflow_id)
+        return 0
+
+    monkeypatch.setattr(controller, "count_nodes", count_nodes)
+    app = create_app(controller)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            # A new header value per request does not get a new bucket.
+            return [
+                await client.get(
+                    "/workflow/get-sequence/999999", headers={"x-client-id": f"{i}"}
+                )
+                for i in range(12)
+            ]
+
+    responses = asyncio.run(scenario())
+
+    assert [r.status_code for r in responses].count(200) == 10
+    assert responses[-1].status_code == 429
+    # Nodes are counted for every admitted request, never for rejected ones.
+    assert len(counted) == 10
+    assert controller.active["graph"] == 0
@@ -0,0 +1,149 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.config import Base
+from database.models import (
+    Workflow,
+    StartNode,
+    MessageNode,
+    ConditionNode,
+    EndNode,
+)
+from schemas.node import NodeStatus, NodeType
+from services.analysis import (
+    GraphStructure,
+    WorkflowAnalysisService,
+    analyze_structure,
+    strongly_connected_components,
+)
+
+DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(DATABASE_URL)
+Base.metadata.create_all(bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture(scope="function")
+def db_session():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def analysis_services():
+    return WorkflowAnalysisService()
+
+
+def message_node(workflow_id: int, text: str) -> MessageNode:
+    return MessageNode(workflow_id=workflow_id, message=text, status=NodeStatus.open)
+
+
+def test_analyze_valid_workflow(analysis_services, db_session):
+    workflow = Workflow(name="Test Workflow")
+    db_session.add(workflow)
+    db_session.flush()
+    start = StartNode(workflow_id=workflow.id)
+    message = message_node(workflow.id, "Pay please")
+    condition = ConditionNode(workflow_id=workflow.id, condition="paid")
+    end = EndNode(workflow_id=workflow.id)
+    db_session.add_all([start, message, condition, end])
+    db_session.flush()
+    start.next_node_id = message.id
+    message.next_node_id = condition.id
+    condition.yes_node_id = end.id
+    condition.no_node_id = message.id
+    db_session.commit()
+
+    report = analysis_services.analyze(workflow.id, db_session)
+
+    assert report.valid
+    assert report.issues == []
+    assert report.start_node == start.id
+    assert report.end_nodes == [end.id]
+    assert report.node_count == 4
+    assert report.edge_count == 4
+    assert [(c.node_ids, c.has_exit) for c in report.cycles] == [
+        (sorted([message.id, condition.id]), True)
+    ]
+
+
+def test_analyze_reports_every_problem(analysis_services, db_session):
+    workflow = Workflow(name="Test Workflow")
+    db_session.add(workflow)
+    db_session.flush()
+    start = StartNode(workflow_id=workflow.id)
+    first = message_node(workflow.id, "First")
+    condition = ConditionNode(workflow_id=workflow.id, condition="paid")
+    loop_a = message_node(workflow.id, "Loop A")
+    loop_b = message_node(workflow.id, "Loop B")
+    orphan = message_node(workflow.id, "Orphan")
+    end = EndNode(workflow_id=workflow.id)
+    db_session.add_all([start, first, condition, loop_a, loop_b, orphan, end])
+    db_session.flush()
+    start.next_node_id = first.id
+    first.next_node_id = condition.id
+    condition.yes_node_id = loop_a.id
+    condition.no_node_id = loop_a.id
+    loop_a.next_node_id = loop_b.id
+    loop_b.next_node_id = loop_a.id
+    db_session.commit()
+
+    report = analysis_services.analyze(workflow.id, db_session)
+
+    assert not report.valid
+    assert {issue.code for issue in report.issues} == {
+        "dangling_reference",
+        "unreachable",
+        "end_unreachable",
+        "dead_end",
+        "cycle_without_exit",
+        "converging_condition",
+    }
+    assert [(r.node_id, r.field, r.target_id) for r in report.dangling_references] == [
+        (orphan.id, "next_node_id", None)
+    ]
+    assert report.unreachable_nodes == sorted([orphan.id, end.id])
+    assert report.converging_conditions == [condition.id]
+    assert [(c.node_ids, c.has_exit) for c in report.cycles] == [
+        (sorted([loop_a.id, loop_b.id]), False)
+    ]
+    assert report.dead_end_nodes == sorted(
+        [start.id, first.id, condition.id, loop_a.id, loop_b.id]
+    )
+
+
+def test_analyze_missing_workflow(analysis_services, db_session):
+    with pytest.raises(HTTPException) as error:
+        analysis_services.analyze(-1, db_session)
+    assert error.value.status_code == 404
+
+
+def test_analysis_handles_deep_graphs():
+    size = 100_000
+    structure = GraphStructure(
+        node_types={
+            **{node_id: NodeType.message for node_id in range(size)},
+            0: NodeType.start,
+            size - 1: NodeType.end,
+        },
+        references={
+            **{node_id: [("next_node_id", node_id + 1)] for node_id in range(size - 1)},
+            size - 1: [],
+        },
+    )
+    # A back edge turns the chain after the start into one component.
+    structure.references[size - 2] = [("next_node_id", 1)]
+
+    components = strongly_connected_components(
+        structure.node_types,
+        {n: structure.successors(n) for n in structure.node_types},
+    )
+    report = analyze_structure(structure)
+
+    assert max(len(component) for component in components) == size - 2
+    assert report["cycles"][0]["has_exit"] is False
+    assert report["unreachable_nodes"] == [size - 1]
@@ -0,0 +1,180 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.config import Base
+from database.models import (
+    Workflow,
+    WorkflowRun,
+    StartNode,
+    MessageNode,
+    ConditionNode,
+    EndNode,
+)
+from schemas.node import NodeStatus
+from schemas.run import RunStatus
+from services.analytics import PathAnalytics
+from services.run import RunScheduler
+from services.version import WorkflowVersionService
+
+DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(DATABASE_URL)
+Base.metadata.create_all(bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture(scope="function")
+def db_session():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def analytics():
+    return PathAnalytics(enabled=True)
+
+
+@pytest.fixture
+def workflow(db_session) -> dict:
+    """start -> message -> condition(paid) -yes-> end, -no-> message."""
+    workflow = Workflow(name="Test Workflow")
+    db_session.add(workflow)
+    db_session.flush()
+    start = StartNode(workflow_id=workflow.id)
+    message = MessageNode(
+        workflow_id=workflow.id, message="Pay please", status=NodeStatus.pending
+    )
+    condition = ConditionNode(workflow_id=workflow.id, condition="paid")
+    end = EndNode(workflow_id=workflow.id)
+    db_session.add_all([start, message, condition, end])
+    db_session.flush()
+    start.next_node_id = message.id
+    message.next_node_id = condition.id
+    condition.yes_node_id = end.id
+    condition.no_node_id = message.id
+    db_session.commit()
+    return {
+        "workflow_id": workflow.id,
+        "start": start.id,
+        "message": message.id,
+        "condition": condition.id,
+        "end": end.id,
+    }
+
+
+def test_flush_upserts_counts(analytics, db_session, workflow):
+    ids = workflow
+    paid = (ids["start"], ids["message"], ids["condition"], ids["end"])
+    retried = (
+        ids["start"],
+        ids["message"],
+        ids["condition"],
+        ids["message"],
+        ids["condition"],
+        ids["end"],
+    )
+    analytics.record(ids["workflow_id"], paid)
+    analytics.flush(db_session)
+    analytics.record(ids["workflow_id"], paid)
+    analytics.record(ids["workflow_id"], retried)
+    analytics.flush(db_session)
+
+    stats = analytics.get_stats(ids["workflow_id"], db_session)
+
+    assert stats.paths == 3
+    assert stats.average_path_length == pytest.approx(14 / 3)
+    visits = {node.node_id: node.visits for node in stats.nodes}
+    assert visits[ids["message"]] == 4
+    assert [(b.node_id, b.yes, b.no) for b in stats.branches] == [
+        (ids["condition"], 3, 1)
+    ]
+    assert len(analytics.pending) == 0
+
+
+def test_stats_include_paths_not_flushed(analytics, db_session, workflow):
+    ids = workflow
+    paid = (ids["start"], ids["message"], ids["condition"], ids["end"])
+    analytics.record(ids["workflow_id"], paid)
+    analytics.flush(db_session)
+    analytics.record(ids["workflow_id"], paid)
+    analytics.record(-1, (ids["start"], ids["end"]))
+
+    stats = analytics.get_stats(ids["workflow_id"], db_session)
+
+    assert stats.paths == 2
+    assert {node.node_id: node.visits for node in stats.nodes} == dict.fromkeys(paid, 2)
+    assert [(b.yes, b.no) for b in stats.branches] == [(2, 0)]
+    # Reading the stats writes nothing and leaves the buffer as it was.
+    assert len(analytics.pending) == 2
+    assert analytics.flush(db_session) == 7 + 3
+
+
+def test_continued_path_counts_each_visit_once(analytics, db_session, workflow):
+    ids = workflow
+    analytics.record(
+        ids["workflow_id"], (ids["start"], ids["message"], ids["condition"]), False
+    )
+    analytics.record(ids["workflow_id"], (ids["condition"], ids["end"]))
+    analytics.flush(db_session)
+
+    stats = analytics.get_stats(ids["workflow_id"], db_session)
+
+    assert {node.node_id: node.visits for node in stats.nodes} == {
+        ids["start"]: 1,
+        ids["message"]: 1,
+        ids["condition"]: 1,
+        ids["end"]: 1,
+    }
+    assert {(e.source_id, e.target_id): e.traversals for e in stats.edges} == {
+        (ids["start"], ids["message"]): 1,
+        (ids["message"], ids["condition"]): 1,
+        (ids["condition"], ids["end"]): 1,
+    }
+
+
+def test_runs_are_recorded(analytics, db_session, workflow):
+    ids = workflow
+    versions = WorkflowVersionService()
+    versions.snapshots.clear()
+    published = versions.publish(ids["workflow_id"], db_session)
+    db_session.add_all(
+        WorkflowRun(
+            workflow_id=ids["workflow_id"],
+            version=published.version,
+            current_node_id=ids["start"],
+            status=RunStatus.pending,
+            context={"paid": paid},
+        )
+        for paid in (True, True, False)
+    )
+    db_session.commit()
+    scheduler = RunScheduler(
+        SessionLocal, versions=versions, analytics=analytics, max_steps=6
+    )
+
+    scheduler.advance_batch()
+    analytics.flush(db_session)
+    stats = analytics.get_stats(ids["workflow_id"], db_session)
+
+    assert stats.paths == 3
+    assert [(b.yes, b.no) for b in stats.branches] == [(2, 2)]
+    # The unpaid run yielded after 6 steps and continues at the message node.
+    visits = {node.node_id: node.visits for node in stats.nodes}
+    assert visits[ids["end"]] == 2
+    assert visits[ids["message"]] == 2 + 3
+
+
+def test_disabled_analytics_records_nothing(db_session, workflow):
+    analytics = PathAnalytics(enabled=False)
+    analytics.record(workflow["workflow_id"], (workflow["start"], workflow["end"]))
+
+    assert analytics.flush(db_session) == 0
+
+
+def test_stats_of_missing_workflow(analytics, db_session):
+    with pytest.raises(HTTPException) as error:
+        analytics.get_stats(-1, db_session)
+    assert error.value.status_code == 404
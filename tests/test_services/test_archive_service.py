@@ -0,0 +1,198 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, event, select, update
+from sqlalchemy.orm import sessionmaker
+
+from database.config import Base
+from database.models import (
+    Workflow,
+    WorkflowRun,
+    WorkflowVersion,
+    ArchivedWorkflow,
+    Node,
+    StartNode,
+    MessageNode,
+    ConditionNode,
+    EndNode,
+)
+from database.records import load_node_records
+from schemas.node import NodeStatus
+from schemas.run import RunStatus
+from schemas.workflow import WorkflowCloneSchema
+from services.archive import WorkflowArchive
+from services.search import NodeSearchService
+from services.version import WorkflowVersionService
+from services.workflow import WorkflowService
+
+DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(DATABASE_URL)
+Base.metadata.create_all(bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture(scope="function")
+def db_session():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return WorkflowArchive(directory=str(tmp_path), after_days=30, batch_size=2)
+
+
+def create_published_workflow(db_session) -> Workflow:
+    workflow = Workflow(name="Cold Workflow")
+    db_session.add(workflow)
+    db_session.flush()
+    start = StartNode(workflow_id=workflow.id)
+    message = MessageNode(
+        workflow_id=workflow.id, message="Archived hello", status=NodeStatus.sent
+    )
+    condition = ConditionNode(workflow_id=workflow.id, condition="Sent")
+    end = EndNode(workflow_id=workflow.id)
+    db_session.add_all([start, message, condition, end])
+    db_session.flush()
+    start.next_node_id = message.id
+    message.next_node_id = condition.id
+    condition.yes_node_id = end.id
+    condition.no_node_id = message.id
+    db_session.commit()
+    WorkflowVersionService().publish(workflow.id, db_session)
+    return workflow
+
+
+def age(db_session, workflow_id: int, days: int) -> None:
+    db_session.execute(
+        update(Workflow.__table__)
+        .where(Workflow.id == workflow_id)
+        .values(updated_at=datetime.utcnow() - timedelta(days=days))
+    )
+    db_session.commit()
+
+
+def test_archive_and_restore(archive, db_session):
+    workflow = create_published_workflow(db_session)
+    workflow_id, revision = workflow.id, workflow.revision
+    nodes = load_node_records(db_session, Node.workflow_id == workflow_id)
+    snapshot = db_session.scalar(
+        select(WorkflowVersion.snapshot).where(
+            WorkflowVersion.workflow_id == workflow_id
+        )
+    )
+
+    archived = archive.archive(workflow_id, db_session)
+
+    assert archived.node_count == 4
+    assert os.path.exists(archive.path(workflow_id))
+    assert db_session.get(Workflow, workflow_id) is None
+    assert load_node_records(db_session, Node.workflow_id == workflow_id) == []
+    assert NodeSearchService().search("archived hello", db_session).items == []
+    # New rows never take the archived IDs.
+    newcomer = Workflow(name="New")
+    db_session.add(newcomer)
+    db_session.flush()
+    db_session.add(EndNode(workflow_id=newcomer.id))
+    db_session.commit()
+    assert newcomer.id > workflow_id
+    assert min(node.id for node in newcomer.nodes) > archived.max_node_id
+
+    assert archive.restore(workflow_id, db_session) is True
+
+    restored = db_session.get(Workflow, workflow_id)
+    assert restored.name == "Cold Workflow" and restored.revision == revision
+    restored_nodes = load_node_records(db_session, Node.workflow_id == workflow_id)
+    assert [
+        {name: getattr(node, name) for name in node.__slots__}
+        for node in restored_nodes
+    ] == [{name: getattr(node, name) for name in node.__slots__} for node in nodes]
+    assert (
+        WorkflowVersionService().get_snapshot(workflow_id, db_session).model_dump_json()
+        == snapshot
+    )
+    assert [
+        item.node_id
+        for item in NodeSearchService().search("archived hello", db_session).items
+    ] == [node.id for node in nodes if node.message]
+    assert not os.path.exists(archive.path(workflow_id))
+    assert db_session.get(ArchivedWorkflow, workflow_id) is None
+    assert archive.restore(workflow_id, db_session) is False
+
+
+def test_restore_by_node(archive, db_session):
+    workflow = create_published_workflow(db_session)
+    node_id = workflow.nodes[1].id
+    archive.archive(workflow.id, db_session)
+
+    assert archive.restore_node(node_id, db_session) is True
+    assert db_session.get(Node, node_id).workflow_id == workflow.id
+    assert archive.restore_node(node_id, db_session) is False
+
+
+def test_clone_skips_archived_ids(archive, db_session):
+    template = create_published_workflow(db_session)
+    cold_id = create_published_workflow(db_session).id
+    archived = archive.archive(cold_id, db_session)
+
+    clone = WorkflowService().clone_workflow(
+        template.id, WorkflowCloneSchema(), db_session
+    )
+
+    assert min(node.id for node in clone.nodes) > archived.max_node_id
+    assert archive.restore(cold_id, db_session) is True
+    assert len(db_session.get(Workflow, cold_id).nodes) == 4
+
+
+def test_live_ids_are_not_looked_up_again(archive, db_session):
+    workflow = create_published_workflow(db_session)
+    workflow_id, node_id = workflow.id, workflow.nodes[1].id
+    assert archive.restore(workflow_id, db_session) is False
+    assert archive.restore_node(node_id, db_session) is False
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        assert archive.restore(workflow_id, db_session) is False
+        assert archive.restore_node(node_id, db_session) is False
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    assert statements == []
+
+    archive.archive(workflow_id, db_session)
+    assert archive.restore_node(node_id, db_session) is True
+
+
+def test_archive_inactive_in_batches(archive, db_session):
+    cold = [create_published_workflow(db_session).id for _ in range(3)]
+    busy = create_published_workflow(db_session).id
+    recent = create_published_workflow(db_session).id
+    for workflow_id in (*cold, busy):
+        age(db_session, workflow_id, days=31)
+    db_session.add(WorkflowRun(workflow_id=busy, version=1, status=RunStatus.waiting))
+    db_session.commit()
+
+    assert archive.archive_inactive(SessionLocal) == 3
+
+    archived = set(db_session.scalars(select(ArchivedWorkflow.workflow_id)))
+    assert set(cold) <= archived
+    assert busy not in archived and recent not in archived
+    with pytest.raises(HTTPException) as error:
+        archive.archive(busy, db_session)
+    assert error.value.status_code == 409
+
+
+def test_archive_needs_ids_never_reused(archive, tmp_path):
+    legacy = create_engine("sqlite:///:memory:")
+    with legacy.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE workflows (id INTEGER PRIMARY KEY)")
+        connection.exec_driver_sql("CREATE TABLE nodes (id INTEGER PRIMARY KEY)")
+    with sessionmaker(bind=legacy)() as db:
+        with pytest.raises(HTTPException) as error:
+            archive.archive(1, db)
+    assert error.value.status_code == 409
@@ -0,0 +1,123 @@
+import multiprocessing
+import os
+import tempfile
+
+from sqlalchemy import case, select, update
+
+from database.config import Base, SessionLocal
+from database.models import Workflow, StartNode, MessageNode, EndNode
+from database.revisions import bump_node_revisions
+from schemas.node import NodeStatus
+from services.cache import LRUCache
+from services.workflow import WorkflowService
+
+WORKERS = 4
+WRITES_PER_WORKER = 15
+
+
+def expected_path(revision: int, layout: dict) -> list[int]:
+    """Even revision offsets route message -> end, odd ones via second."""
+    if (revision - layout["revision"]) % 2 == 0:
+        return [layout["start"], layout["message"], layout["end"]]
+    return [layout["start"], layout["message"], layout["second"], layout["end"]]
+
+
+def read_revision(layout: dict) -> int:
+    with SessionLocal() as db:
+        return db.scalar(
+            select(Workflow.revision).where(Workflow.id == layout["workflow_id"])
+        )
+
+
+def create_workflow(path: str) -> dict:
+    """
+    Create the workflow on the production engine of a spawned process, which
+    DATABASE_URL points at path.
+    """
+    assert SessionLocal.kw["bind"].url.database == path
+    Base.metadata.create_all(bind=SessionLocal.kw["bind"])
+    with SessionLocal() as db:
+        workflow = Workflow(name="Test Workflow")
+        db.add(workflow)
+        db.flush()
+        start = StartNode(workflow_id=workflow.id)
+        message = MessageNode(
+            workflow_id=workflow.id, message="First", status=NodeStatus.open
+        )
+        second = MessageNode(
+            workflow_id=workflow.id, message="Second", status=NodeStatus.open
+        )
+        end = EndNode(workflow_id=workflow.id)
+        db.add_all([start, message, second, end])
+        db.flush()
+        start.next_node_id = message.id
+        message.next_node_id = end.id
+        second.next_node_id = end.id
+        db.commit()
+        return {
+            "workflow_id": workflow.id,
+            "start": start.id,
+            "message": message.id,
+            "second": second.id,
+            "end": end.id,
+            "revision": db.get(Workflow, workflow.id).revision,
+        }
+
+
+def worker(path: str, layout: dict) -> list[str]:
+    """
+    Toggle the route and check the cached sequence after every write. The
+    route is picked from the revision inside the writing transaction, so it
+    always matches the revision the write produces.
+    """
+    assert SessionLocal.kw["bind"].url.database == path
+    service = WorkflowService(sequences=LRUCache())
+    table = MessageNode.__table__
+    revision = (
+        select(Workflow.revision)
+        .where(Workflow.id == layout["workflow_id"])
+        .scalar_subquery()
+    )
+    odd = (revision + 1 - layout["revision"]) % 2 == 1
+    errors = []
+    for _ in range(WRITES_PER_WORKER):
+        with SessionLocal() as db:
+            db.execute(
+                update(table)
+                .where(table.c.id == layout["message"])
+                .values(next_node_id=case((odd, layout["second"]), else_=layout["end"]))
+            )
+            bump_node_revisions(db, [layout["message"]])
+            db.commit()
+        written = read_revision(layout)
+        for _ in range(3):
+            with SessionLocal() as db:
+                sequence = service.create_and_run_sequence(layout["workflow_id"], db)
+            # Nodes are read after the revision, so the path may come from
+            # any revision up to the one stored now, but never an older one.
+            latest = read_revision(layout)
+            if sequence["revision"] < written:
+                errors.append(f"stale revision {sequence['revision']} < {written}")
+            paths = [
+                expected_path(revision, layout)
+                for revision in range(sequence["revision"], latest + 1)
+            ]
+            if sequence["path"] not in paths:
+                errors.append(f"wrong path at revision {sequence['revision']}")
+    return errors
+
+
+def test_workers_never_serve_stale_sequences(monkeypatch):
+    path = os.path.join(tempfile.mkdtemp(), "coherence.db")
+    # Spawned workers import database.config, and with it the production
+    # engine and session factory, against this database.
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{path}")
+
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(WORKERS) as pool:
+        layout = pool.apply(create_workflow, (path,))
+        results = pool.starmap(worker, [(path, layout)] * WORKERS)
+        final_revision = pool.apply(read_revision, (layout,))
+
+    assert [error for errors in results for error in errors] == []
+    assert final_revision == layout["revision"] + WORKERS * WRITES_PER_WORKER
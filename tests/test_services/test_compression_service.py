@@ -0,0 +1,99 @@
+import gzip
+import zlib
+
+import orjson
+from starlette.applications import Starlette
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from services.compression import (
+    CompressionMiddleware,
+    available_codecs,
+    decoded_etag,
+    negotiate,
+)
+
+LARGE = orjson.dumps({"edges": [[node, node + 1] for node in range(2000)]})
+
+
+def json_response(request):
+    size = int(request.query_params.get("size", len(LARGE)))
+    return Response(
+        LARGE[:size], media_type="application/json", headers={"ETag": '"workflow-1-3"'}
+    )
+
+
+def ndjson_response(request):
+    lines = (orjson.dumps({"path": [index]}) + b"\n" for index in range(500))
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+
+def events_response(request):
+    return StreamingResponse(iter([b"data: 1\n\n"]), media_type="text/event-stream")
+
+
+app = Starlette(
+    routes=[
+        Route("/json", json_response),
+        Route("/ndjson", ndjson_response),
+        Route("/events", events_response),
+    ]
+)
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+client = TestClient(app)
+
+
+def raw_get(path: str, accept_encoding: str):
+    """Get a response without letting the client decode its body."""
+    with client.stream("GET", path, headers={"Accept-Encoding": accept_encoding}) as r:
+        return r, b"".join(r.iter_raw())
+
+
+def test_large_json_is_gzipped():
+    response, body = raw_get("/json", "gzip, deflate")
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) == len(body) < len(LARGE) / 2
+    assert response.headers["etag"] == '"workflow-1-3-gzip"'
+    assert decoded_etag(response.headers["etag"]) == '"workflow-1-3"'
+    assert gzip.decompress(body) == LARGE
+
+
+def test_small_or_unaccepted_bodies_are_not_compressed():
+    response, body = raw_get("/json?size=100", "gzip")
+    assert "content-encoding" not in response.headers
+    assert body == LARGE[:100]
+
+    for accept_encoding in ("identity", "gzip;q=0", "br"):
+        response, body = raw_get("/json", accept_encoding)
+        assert "content-encoding" not in response.headers
+        assert body == LARGE
+        assert response.headers["etag"] == '"workflow-1-3"'
+
+
+def test_streamed_body_is_compressed_chunk_by_chunk():
+    response, body = raw_get("/ndjson", "gzip")
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    lines = zlib.decompressobj(31).decompress(body).splitlines()
+    assert [orjson.loads(line)["path"] for line in lines] == [[i] for i in range(500)]
+
+
+def test_event_stream_is_not_compressed():
+    response, body = raw_get("/events", "gzip")
+
+    assert "content-encoding" not in response.headers
+    assert body == b"data: 1\n\n"
+
+
+def test_negotiation_follows_client_weights():
+    codecs = {"zstd": None, "br": None, "gzip": None}
+
+    assert negotiate("gzip, br", codecs) == "br"
+    assert negotiate("gzip;q=1, br;q=0.5", codecs) == "gzip"
+    assert negotiate("*;q=0.1, zstd;q=0", codecs) == "br"
+    assert negotiate("", codecs) is None
+    assert negotiate("gzip", available_codecs()) == "gzip"
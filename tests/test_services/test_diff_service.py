@@ -0,0 +1,178 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, event, update
+from sqlalchemy.orm import sessionmaker
+
+from database.config import Base
+from database.models import (
+    Workflow,
+    WorkflowVersion,
+    StartNode,
+    MessageNode,
+    ConditionNode,
+    EndNode,
+)
+from schemas.node import NodeStatus
+from services.diff import WorkflowDiffService
+from services.version import WorkflowVersionService
+
+DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(DATABASE_URL)
+Base.metadata.create_all(bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture(scope="function")
+def db_session():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def diff_services():
+    versions = WorkflowVersionService()
+    versions.snapshots.clear()
+    return WorkflowDiffService(versions=versions)
+
+
+def create_published_workflow(db_session, diff_services) -> dict:
+    """start -> message -> condition -yes-> end, -no-> message; published."""
+    workflow = Workflow(name="Test Workflow")
+    db_session.add(workflow)
+    db_session.flush()
+    start = StartNode(workflow_id=workflow.id)
+    message = MessageNode(
+        workflow_id=workflow.id, message="Hello", status=NodeStatus.pending
+    )
+    condition = ConditionNode(workflow_id=workflow.id, condition="Condition")
+    end = EndNode(workflow_id=workflow.id)
+    db_session.add_all([start, message, condition, end])
+    db_session.flush()
+    start.next_node_id = message.id
+    message.next_node_id = condition.id
+    condition.yes_node_id = end.id
+    condition.no_node_id = message.id
+    db_session.commit()
+    diff_services.versions.publish(workflow.id, db_session)
+    return {
+        "workflow": workflow,
+        "start": start,
+        "message": message,
+        "condition": condition,
+        "end": end,
+    }
+
+
+def insert_reminder(db_session, nodes: dict) -> MessageNode:
+    """Route the condition's yes branch through a new message."""
+    reminder = MessageNode(
+        workflow_id=nodes["workflow"].id,
+        message="Reminder",
+        status=NodeStatus.pending,
+        next_node_id=nodes["end"].id,
+    )
+    db_session.add(reminder)
+    db_session.flush()
+    nodes["condition"].yes_node_id = reminder.id
+    nodes["message"].message = "Hello again"
+    db_session.commit()
+    return reminder
+
+
+def test_diff_draft_against_published_version(diff_services, db_session):
+    nodes = create_published_workflow(db_session, diff_services)
+    reminder = insert_reminder(db_session, nodes)
+    ids = {name: node.id for name, node in nodes.items()}
+
+    diff = diff_services.diff(nodes["workflow"].id, db_session)
+
+    assert diff["incremental"] is True
+    assert (diff["base_version"], diff["target_version"]) == (1, None)
+    assert diff["added_nodes"] == [reminder.id]
+    assert diff["removed_nodes"] == []
+    assert diff["changed_nodes"] == [
+        {"id": ids["message"], "fields": ["message"]},
+        {"id": ids["condition"], "fields": ["yes_node_id"]},
+    ]
+    assert diff["added_edges"] == [
+        (ids["condition"], reminder.id),
+        (reminder.id, ids["end"]),
+    ]
+    assert diff["removed_edges"] == [(ids["condition"], ids["end"])]
+    base_path = [ids["start"], ids["message"], ids["condition"], ids["end"]]
+    assert diff["base_path"] == base_path
+    assert diff["target_path"] == [*base_path[:3], reminder.id, ids["end"]]
+    assert diff["removed_paths"] == [diff["base_path"]]
+    assert diff["added_paths"] == [diff["target_path"]]
+    assert diff["paths_complete"] is True
+
+
+def test_diff_reads_only_changed_nodes(diff_services, db_session):
+    nodes = create_published_workflow(db_session, diff_services)
+    reminder = insert_reminder(db_session, nodes)
+    diff_services.versions.publish(nodes["workflow"].id, db_session)
+    nodes["message"].message = "Hello"
+    db_session.delete(reminder)
+    nodes["condition"].yes_node_id = nodes["end"].id
+    db_session.commit()
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        diff = diff_services.diff(nodes["workflow"].id, db_session, base=2)
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    assert diff["removed_nodes"] == [reminder.id]
+    assert diff["removed_paths"] and diff["added_paths"]
+    node_reads = [statement for statement in statements if "FROM nodes" in statement]
+    assert len(node_reads) == 1
+    assert "node_changes" in node_reads[0]
+
+
+def test_incremental_diff_matches_full_comparison(diff_services, db_session):
+    nodes = create_published_workflow(db_session, diff_services)
+    insert_reminder(db_session, nodes)
+    diff_services.versions.publish(nodes["workflow"].id, db_session)
+    workflow_id = nodes["workflow"].id
+
+    diffs = [
+        diff_services.diff(workflow_id, db_session, base=1, target=2),
+        diff_services.diff(workflow_id, db_session, base=2, target=1),
+        diff_services.diff(workflow_id, db_session, base=1),
+    ]
+    db_session.execute(update(WorkflowVersion).values(change_id=None))
+    db_session.commit()
+    full = [
+        diff_services.diff(workflow_id, db_session, base=1, target=2),
+        diff_services.diff(workflow_id, db_session, base=2, target=1),
+        diff_services.diff(workflow_id, db_session, base=1),
+    ]
+
+    assert [diff.pop("incremental") for diff in diffs] == [True] * 3
+    assert [diff.pop("incremental") for diff in full] == [False] * 3
+    assert diffs == full
+    assert diffs[0]["added_nodes"] == diffs[1]["removed_nodes"]
+    assert diffs[0]["target_path"] == diffs[1]["base_path"]
+
+
+def test_diff_of_unchanged_draft(diff_services, db_session):
+    nodes = create_published_workflow(db_session, diff_services)
+
+    diff = diff_services.diff(nodes["workflow"].id, db_session)
+
+    assert diff["changed_nodes"] == diff["added_edges"] == diff["added_paths"] == []
+    assert diff["target_path"] == diff["base_path"]
+
+
+def test_diff_needs_a_published_version(diff_services, db_session):
+    workflow = Workflow(name="Draft")
+    db_session.add(workflow)
+    db_session.commit()
+
+    with pytest.raises(HTTPException) as error:
+        diff_services.diff(workflow.id, db_session)
+    assert error.value.status_code == 404
@@ -0,0 +1,233 @@
+import asyncio
+import os
+import tempfile
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.config import Base
+from database.models import (
+    Workflow,
+    StartNode,
+    MessageNode,
+    EndNode,
+)
+from schemas.node import NodeStatus
+from schemas.run import RunCreateSchema, RunStatus
+from services.dispatch import DispatchQueue, LocalStubSender, OutgoingMessage
+from services.events import event_bus, ChangeAction
+from services.run import RunService, RunScheduler
+from services.version import WorkflowVersionService
+
+DATABASE_URL = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'dispatch.db')}"
+
+engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+Base.metadata.create_all(bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture(scope="function")
+def db_session():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def versions_services():
+    service = WorkflowVersionService()
+    service.snapshots.clear()
+    return service
+
+
+@pytest.fixture
+def runs_services(versions_services):
+    return RunService(versions=versions_services)
+
+
+@pytest.fixture
+def run_with_message(db_session, versions_services, runs_services):
+    """A run of start -> message -> end, about to reach the message."""
+    workflow = Workflow(name="Test Workflow")
+    db_session.add(workflow)
+    db_session.flush()
+    start = StartNode(workflow_id=workflow.id)
+    message = MessageNode(
+        workflow_id=workflow.id, message="Hello", status=NodeStatus.pending
+    )
+    end = EndNode(workflow_id=workflow.id)
+    db_session.add_all([start, message, end])
+    db_session.flush()
+    start.next_node_id = message.id
+    message.next_node_id = end.id
+    db_session.commit()
+    versions_services.publish(workflow.id, db_session)
+    run = runs_services.create_run(workflow.id, RunCreateSchema(), db_session)
+    return run, message
+
+
+def message(index: int) -> OutgoingMessage:
+    return OutgoingMessage(
+        run_id=-index, node_id=-index, next_node_id=None, message=f"Message {index}"
+    )
+
+
+def test_run_message_is_sent(
+    runs_services, versions_services, db_session, run_with_message
+):
+    run, message_node = run_with_message
+    sender = LocalStubSender()
+    queue = DispatchQueue(sender, SessionLocal, runs=runs_services, linger=0)
+    scheduler = RunScheduler(
+        SessionLocal, versions=versions_services, dispatcher=queue.submit_threadsafe
+    )
+
+    workflow_id = message_node.workflow_id
+
+    async def scenario():
+        event_bus.bind()
+        subscription = event_bus.subscribe(workflow_id)
+        try:
+            queue.start()
+            await asyncio.to_thread(scheduler.advance_batch)
+            await queue.join()
+            await asyncio.to_thread(scheduler.advance_batch)
+            await queue.stop()
+            return await asyncio.wait_for(subscription.get(), 1)
+        finally:
+            event_bus.unsubscribe(subscription)
+            event_bus.unbind()
+
+    batch = asyncio.run(scenario())
+
+    db_session.refresh(run)
+    db_session.refresh(message_node)
+    assert [sent.run_id for sent in sender.sent] == [run.id]
+    assert message_node.status == NodeStatus.sent
+    assert run.status == RunStatus.completed
+    assert [(e["entity"], e["entity_id"], e["action"]) for e in batch["events"]] == [
+        ("node", message_node.id, ChangeAction.updated)
+    ]
+
+
+def test_messages_are_batched(runs_services):
+    sender = LocalStubSender()
+    queue = DispatchQueue(
+        sender, SessionLocal, runs=runs_services, concurrency=1, batch_size=100
+    )
+
+    async def scenario():
+        queue.start()
+        for index in range(250):
+            await queue.put(message(index))
+        await queue.stop()
+
+    asyncio.run(scenario())
+
+    assert len(sender.sent) == 250
+    assert queue.stats["batches"] == sender.calls == 3
+
+
+def test_failed_batch_is_retried(runs_services):
+    sender = LocalStubSender(fail_times=2)
+    queue = DispatchQueue(sender, SessionLocal, runs=runs_services, backoff_base=0.001)
+
+    async def scenario():
+        queue.start()
+        await queue.put(message(1))
+        await queue.stop()
+
+    asyncio.run(scenario())
+
+    assert len(sender.sent) == 1
+    assert queue.stats["retried"] == 2
+    assert queue.stats["sent"] == 1
+
+
+def test_exhausted_retries_fail_the_run(
+    runs_services, versions_services, db_session, run_with_message
+):
+    run, message_node = run_with_message
+    sender = LocalStubSender(fail_times=10)
+    queue = DispatchQueue(
+        sender,
+        SessionLocal,
+        runs=runs_services,
+        max_retries=1,
+        backoff_base=0.001,
+        linger=0,
+    )
+    scheduler = RunScheduler(
+        SessionLocal, versions=versions_services, dispatcher=queue.submit_threadsafe
+    )
+
+    async def scenario():
+        queue.start()
+        await asyncio.to_thread(scheduler.advance_batch)
+        await queue.stop()
+
+    asyncio.run(scenario())
+
+    db_session.refresh(run)
+    db_session.refresh(message_node)
+    assert run.status == RunStatus.failed
+    assert "Dispatch failed" in run.error
+    assert message_node.status == NodeStatus.pending
+
+
+def test_full_queue_applies_backpressure(runs_services):
+    queue = DispatchQueue(
+        LocalStubSender(), SessionLocal, runs=runs_services, concurrency=0, max_queue=2
+    )
+
+    async def scenario():
+        queue.start()
+        queue.put_nowait(message(1))
+        queue.put_nowait(message(2))
+        with pytest.raises(asyncio.QueueFull):
+            queue.put_nowait(message(3))
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(queue.put(message(3)), 0.05)
+        assert queue.size == 2
+
+    asyncio.run(scenario())
+
+
+def test_scheduler_stops_while_queue_is_full(
+    runs_services, versions_services, db_session, run_with_message
+):
+    run, _ = run_with_message
+    queue = DispatchQueue(
+        LocalStubSender(),
+        SessionLocal,
+        runs=runs_services,
+        concurrency=0,
+        max_queue=1,
+        submit_timeout=0.1,
+    )
+    scheduler = RunScheduler(
+        SessionLocal,
+        versions=versions_services,
+        dispatcher=queue.submit_threadsafe,
+        workers=1,
+    )
+
+    async def scenario():
+        queue.start()
+        queue.put_nowait(message(1))
+        scheduler.start()
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            db_session.refresh(run)
+            if run.status == RunStatus.waiting:
+                break
+        # The worker is blocked on the full queue, which needs the loop.
+        await asyncio.wait_for(scheduler.stop(), 5)
+        await queue.stop(timeout=0)
+
+    asyncio.run(scenario())
+
+    db_session.refresh(run)
+    assert run.status == RunStatus.waiting
+    assert queue.stats["queued"] == 1
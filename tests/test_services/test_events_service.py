@@ -0,0 +1,140 @@
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.config import Base
+from schemas.node import EndNodeSchema, NodeType
+from schemas.workflow import WorkflowCreateSchema
+from services.events import (
+    ChangeAction,
+    ChangeEvent,
+    ChangeEventBus,
+    coalesce,
+    event_bus,
+)
+from services.node import NodeService
+from services.workflow import WorkflowService
+
+DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(DATABASE_URL)
+Base.metadata.create_all(bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture(scope="function")
+def db_session():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+def event(entity_id: int, action: ChangeAction) -> ChangeEvent:
+    return ChangeEvent(1, "node", entity_id, action, 0.0)
+
+
+def test_coalesce():
+    events = coalesce(
+        [
+            event(1, ChangeAction.updated),
+            event(2, ChangeAction.created),
+            event(1, ChangeAction.updated),
+            event(2, ChangeAction.updated),
+            event(3, ChangeAction.created),
+            event(3, ChangeAction.deleted),
+            event(1, ChangeAction.deleted),
+        ]
+    )
+    assert [(e.entity_id, e.action) for e in events] == [
+        (1, ChangeAction.deleted),
+        (2, ChangeAction.created),
+    ]
+
+
+def test_burst_is_coalesced_per_workflow():
+    bus = ChangeEventBus(coalesce_window=0.02)
+
+    async def scenario():
+        bus.bind()
+        first = bus.subscribe(1)
+        second = bus.subscribe(2)
+
+        def burst():
+            for _ in range(50):
+                bus.publish(1, "node", 7, ChangeAction.updated)
+            bus.publish(1, "workflow", 1, ChangeAction.updated)
+
+        await asyncio.to_thread(burst)
+        batch = await asyncio.wait_for(first.get(), 1)
+        await asyncio.sleep(0.05)
+        return batch, first.queue.qsize(), second.queue.qsize()
+
+    batch, first_left, second_left = asyncio.run(scenario())
+
+    assert batch["workflow_id"] == 1
+    assert [(e["entity"], e["entity_id"]) for e in batch["events"]] == [
+        ("node", 7),
+        ("workflow", 1),
+    ]
+    assert first_left == 0
+    assert second_left == 0
+
+
+def test_slow_consumer_buffer_is_bounded():
+    bus = ChangeEventBus(coalesce_window=0.001, buffer_size=2)
+
+    async def scenario():
+        bus.bind()
+        subscription = bus.subscribe(1)
+        for node_id in range(3):
+            bus.publish(1, "node", node_id, ChangeAction.updated)
+            await asyncio.sleep(0.02)
+        return [subscription.queue.get_nowait() for _ in range(2)]
+
+    batches = asyncio.run(scenario())
+
+    assert [batch["events"][0]["entity_id"] for batch in batches] == [1, 2]
+    assert "overflow" not in batches[0]
+    assert batches[1]["overflow"] is True
+
+
+def test_unbound_bus_drops_events():
+    bus = ChangeEventBus()
+    bus.subscribe(1)
+    bus.publish(1, "node", 1, ChangeAction.created)
+
+
+def test_services_publish_changes(db_session):
+    async def scenario():
+        event_bus.bind()
+        try:
+            workflow = WorkflowService().create_workflow(
+                WorkflowCreateSchema(name="Test Workflow"), db_session
+            )
+            subscription = event_bus.subscribe(workflow.id)
+            node = NodeService().create_node(
+                node_type=NodeType.end,
+                node_data=EndNodeSchema(workflow_id=workflow.id),
+                db=db_session,
+            )
+            NodeService().delete_node(node_id=node.id, db=db_session)
+            WorkflowService().delete_workflow(workflow.id, db_session)
+            batch = await asyncio.wait_for(subscription.get(), 1)
+            event_bus.unsubscribe(subscription)
+            return workflow.id, batch
+        finally:
+            event_bus.unbind()
+
+    workflow_id, batch = asyncio.run(scenario())
+
+    assert batch["events"] == [
+        {
+            "workflow_id": workflow_id,
+            "entity": "workflow",
+            "entity_id": workflow_id,
+            "action": ChangeAction.deleted,
+            "at": batch["events"][0]["at"],
+        }
+    ]
@@ -0,0 +1,193 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import settings
+from database.config import Base
+from database.models import (
+    Workflow,
+    StartNode,
+    MessageNode,
+    ConditionNode,
+    EndNode,
+)
+from schemas.node import NodeStatus, NodeType
+from services.analysis import GraphStructure
+from services.cache import LRUCache
+from services.layout import WorkflowLayoutService, layered_layout
+
+DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(DATABASE_URL)
+Base.metadata.create_all(bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture(scope="function")
+def db_session():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def layout_services():
+    return WorkflowLayoutService(layouts=LRUCache())
+
+
+def create_workflow(db_session) -> dict:
+    """start -> message -> condition -yes-> end, -no-> message."""
+    workflow = Workflow(name="Test Workflow")
+    db_session.add(workflow)
+    db_session.flush()
+    start = StartNode(workflow_id=workflow.id)
+    message = MessageNode(
+        workflow_id=workflow.id, message="Hello", status=NodeStatus.pending
+    )
+    condition = ConditionNode(workflow_id=workflow.id, condition="Condition")
+    end = EndNode(workflow_id=workflow.id)
+    db_session.add_all([start, message, condition, end])
+    db_session.flush()
+    start.next_node_id = message.id
+    message.next_node_id = condition.id
+    condition.yes_node_id = end.id
+    condition.no_node_id = message.id
+    db_session.commit()
+    return {
+        "workflow": workflow,
+        "start": start,
+        "message": message,
+        "condition": condition,
+        "end": end,
+    }
+
+
+def test_cycles_are_drawn_with_reversed_edges():
+    structure = GraphStructure(
+        node_types={
+            1: NodeType.start,
+            2: NodeType.message,
+            3: NodeType.condition,
+            4: NodeType.end,
+        },
+        references={
+            1: [("next_node_id", 2)],
+            2: [("next_node_id", 3)],
+            3: [("yes_node_id", 4), ("no_node_id", 2)],
+            4: [],
+        },
+    )
+
+    layout = layered_layout(structure)
+
+    assert layout.layers == {1: 0, 2: 1, 3: 2, 4: 3}
+    assert layout.height == 4
+    edges = {(source, target): edge for source, target, *edge in layout.edges}
+    name, points, flipped = edges[3, 2]
+    assert (name, flipped) == ("no_node_id", True)
+    assert [y for _, y in points] == [2.0, 1.0]
+    assert not edges[1, 2][2]
+
+
+def test_long_edges_pass_through_dummies():
+    # start -> condition -yes-> a -> b -> end, -no-> end
+    structure = GraphStructure(
+        node_types={
+            1: NodeType.start,
+            2: NodeType.condition,
+            3: NodeType.message,
+            4: NodeType.message,
+            5: NodeType.end,
+        },
+        references={
+            1: [("next_node_id", 2)],
+            2: [("yes_node_id", 3), ("no_node_id", 5)],
+            3: [("next_node_id", 4)],
+            4: [("next_node_id", 5)],
+            5: [],
+        },
+    )
+
+    layout = layered_layout(structure)
+
+    edges = {(source, target): points for source, target, _, points, _ in layout.edges}
+    detour = edges[2, 5]
+    assert [y for _, y in detour] == [1.0, 2.0, 3.0, 4.0]
+    # The dummies sit beside the nodes of the layers they cross.
+    assert detour[1][0] != layout.x[3] and detour[2][0] != layout.x[4]
+    assert abs(detour[1][0] - layout.x[3]) >= 1
+    for layer in range(layout.height):
+        xs = sorted(x for node, x in layout.x.items() if layout.layers[node] == layer)
+        assert all(right - left >= 1 for left, right in zip(xs, xs[1:]))
+    straight = layered_layout(structure, max_span=1)
+    assert len(dict(((s, t), p) for s, t, _, p, _ in straight.edges)[2, 5]) == 2
+
+
+def test_layout_is_cached(db_session, layout_services):
+    nodes = create_workflow(db_session)
+    workflow_id = nodes["workflow"].id
+
+    layout = layout_services.get_layout(workflow_id, db_session)
+
+    assert not layout.incremental
+    assert [node.id for node in layout.nodes] == [
+        nodes[name].id for name in ("start", "message", "condition", "end")
+    ]
+    assert len(layout.edges) == 4
+    assert layout_services.get_layout(workflow_id, db_session) is layout
+
+
+def test_edits_are_laid_out_incrementally(db_session, layout_services):
+    nodes = create_workflow(db_session)
+    workflow_id = nodes["workflow"].id
+    before = layout_services.get_layout(workflow_id, db_session)
+
+    reminder = MessageNode(
+        workflow_id=workflow_id,
+        message="Reminder",
+        status=NodeStatus.pending,
+        next_node_id=nodes["end"].id,
+    )
+    db_session.add(reminder)
+    db_session.flush()
+    nodes["condition"].yes_node_id = reminder.id
+    db_session.commit()
+    after = layout_services.get_layout(workflow_id, db_session)
+
+    assert after.incremental
+    assert after.revision > before.revision
+    positions = {position.id: position for position in after.positions}
+    assert positions[reminder.id].layer == 3
+    assert positions[nodes["end"].id].layer == 4
+    # Nodes the edit did not touch stay where they were.
+    for position in before.positions[:3]:
+        assert positions[position.id] == position
+    layout_services.layouts.clear()
+    full = layout_services.get_layout(workflow_id, db_session)
+    assert not full.incremental
+    assert full.nodes == after.nodes
+    assert [edge.points[0][1] for edge in full.edges] == [
+        edge.points[0][1] for edge in after.edges
+    ]
+
+    db_session.delete(reminder)
+    nodes["condition"].yes_node_id = nodes["end"].id
+    db_session.commit()
+    restored = layout_services.get_layout(workflow_id, db_session)
+    assert restored.incremental
+    assert restored.positions == before.positions
+
+
+def test_big_edits_are_laid_out_anew(db_session, layout_services, monkeypatch):
+    nodes = create_workflow(db_session)
+    workflow_id = nodes["workflow"].id
+    layout_services.get_layout(workflow_id, db_session)
+    monkeypatch.setattr(settings, "LAYOUT_INCREMENTAL_MAX_CHANGES", 1)
+
+    nodes["message"].message = "Hello again"
+    nodes["condition"].condition = "Other"
+    db_session.commit()
+    layout = layout_services.get_layout(workflow_id, db_session)
+
+    assert not layout.incremental
+    assert layout.nodes[1].message == "Hello again"
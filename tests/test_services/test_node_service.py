@@ -1,10 +1,10 @@
 import pytest
-from fastapi import status
-from sqlalchemy import create_engine
+from fastapi import HTTPException, status
+from sqlalchemy import create_engine, select
 from sqlalchemy.orm import sessionmaker
 from starlette.testclient import TestClient
 
-from database.models import Base
+from database.models import Base, NodeChange, Workflow
 from main import app
 from schemas.node import (
     StartNodeSchema,
@@ -13,6 +13,7 @@ from schemas.node import (
     EndNodeSchema,
     NodeType,
     NodeStatus,
+    MessageNodeStatusTransitionSchema,
 )
 from schemas.workflow import WorkflowCreateSchema
 from services.node import NodeService
@@ -190,3 +191,94 @@ class TestDeleteNodeService(BaseTestConfig):
         delete_node = node_services.delete_node(node_id=created_node.id, db=db_session)
 
         assert delete_node == status.HTTP_204_NO_CONTENT
+
+
+class TestTransitionMessageStatusService(BaseTestConfig):
+    def create_messages(self, node_services, workflow_services, db_session, statuses):
+        workflow_data = WorkflowCreateSchema(name="Test Workflow")
+        workflow = workflow_services.create_workflow(workflow_data, db_session)
+        nodes = [
+            node_services.create_node(
+                node_data=MessageNodeSchema(
+                    workflow_id=workflow.id,
+                    message="Test Message",
+                    status=node_status,
+                    next_node_id=0,
+                ),
+                node_type=NodeType.message,
+                db=db_session,
+            )
+            for node_status in statuses
+        ]
+        return workflow, nodes
+
+    def test_transition_by_workflow(self, node_services, workflow_services, db_session):
+        workflow, nodes = self.create_messages(
+            node_services,
+            workflow_services,
+            db_session,
+            [NodeStatus.pending, NodeStatus.pending, NodeStatus.sent],
+        )
+        other, other_nodes = self.create_messages(
+            node_services, workflow_services, db_session, [NodeStatus.pending]
+        )
+        revision = workflow.revision
+
+        counts = node_services.transition_message_status(
+            MessageNodeStatusTransitionSchema(
+                workflow_id=workflow.id, to_status=NodeStatus.sent
+            ),
+            db_session,
+        )
+
+        assert counts == {"matched": 3, "updated": 2, "skipped": 1}
+        db_session.expire_all()
+        assert [node.status for node in nodes] == [NodeStatus.sent] * 3
+        assert other_nodes[0].status == NodeStatus.pending
+        assert db_session.get(Workflow, workflow.id).revision == revision + 1
+        logged = db_session.scalars(
+            select(NodeChange.node_id).where(NodeChange.workflow_id == workflow.id)
+        ).all()
+        assert {nodes[0].id, nodes[1].id} <= set(logged)
+
+    def test_transition_by_ids_and_status(
+        self, node_services, workflow_services, db_session
+    ):
+        _, nodes = self.create_messages(
+            node_services,
+            workflow_services,
+            db_session,
+            [NodeStatus.sent, NodeStatus.sent, NodeStatus.pending],
+        )
+
+        counts = node_services.transition_message_status(
+            MessageNodeStatusTransitionSchema(
+                node_ids=[node.id for node in nodes],
+                from_status=NodeStatus.sent,
+                to_status=NodeStatus.open,
+            ),
+            db_session,
+        )
+
+        assert counts == {"matched": 2, "updated": 2, "skipped": 0}
+        db_session.expire_all()
+        assert [node.status for node in nodes] == [
+            NodeStatus.open,
+            NodeStatus.open,
+            NodeStatus.pending,
+        ]
+
+    def test_transition_must_be_allowed(self, node_services, db_session):
+        invalid = [
+            MessageNodeStatusTransitionSchema(
+                from_status=NodeStatus.open, to_status=NodeStatus.pending
+            ),
+            MessageNodeStatusTransitionSchema(
+                from_status=NodeStatus.pending, to_status=NodeStatus.open
+            ),
+            MessageNodeStatusTransitionSchema(to_status=NodeStatus.sent),
+        ]
+        for data in invalid:
+            with pytest.raises(HTTPException) as error:
+                node_services.transition_message_status(data, db_session)
+            assert error.value.status_code == 400
@@ -0,0 +1,125 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.config import Base
+from database.models import (
+    Workflow,
+    StartNode,
+    MessageNode,
+    ConditionNode,
+    EndNode,
+)
+from schemas.node import NodeStatus, NodeType
+from services.analysis import GraphStructure
+from services.paths import WorkflowPathService, iter_paths
+from services.version import WorkflowVersionService
+
+DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(DATABASE_URL)
+Base.metadata.create_all(bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture(scope="function")
+def db_session():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def paths_services():
+    versions = WorkflowVersionService()
+    versions.snapshots.clear()
+    return WorkflowPathService(versions=versions)
+
+
+def diamonds(count: int) -> GraphStructure:
+    """start -> count conditions in series, both branches via a message -> end."""
+    structure = GraphStructure()
+    structure.node_types[0] = NodeType.start
+    structure.references[0] = [("next_node_id", 1)]
+    node_id = 1
+    for _ in range(count):
+        condition, yes, no, join = node_id, node_id + 1, node_id + 2, node_id + 3
+        structure.node_types[condition] = NodeType.condition
+        structure.references[condition] = [("yes_node_id", yes), ("no_node_id", no)]
+        for branch in (yes, no):
+            structure.node_types[branch] = NodeType.message
+            structure.references[branch] = [("next_node_id", join)]
+        node_id = join
+    structure.node_types[node_id] = NodeType.end
+    structure.references[node_id] = []
+    return structure
+
+
+def test_every_path_is_streamed(paths_services):
+    items = list(paths_services.iter_paths(diamonds(4)))
+
+    paths = [item["path"] for item in items[:-1]]
+    assert len(paths) == len(set(paths)) == 16
+    assert all(path[0] == 0 and path[-1] == 13 for path in paths)
+    assert items[-1]["summary"] == {
+        "paths": 16,
+        "complete": True,
+        "truncated": None,
+        "skipped_cycles": 0,
+        "depth_limited": 0,
+    }
+
+
+def test_limits_truncate_the_stream(paths_services):
+    by_count = list(paths_services.iter_paths(diamonds(10), max_paths=5))
+    by_depth = list(paths_services.iter_paths(diamonds(3), max_depth=5))
+    by_time = list(paths_services.iter_paths(diamonds(30), timeout=1e-9))
+
+    assert len(by_count) == 6
+    assert by_count[-1]["summary"]["truncated"] == "max_paths"
+    assert by_depth[-1]["summary"]["paths"] == 0
+    assert by_depth[-1]["summary"]["depth_limited"] > 0
+    assert by_depth[-1]["summary"]["complete"] is False
+    assert by_time[-1]["summary"]["truncated"] == "timeout"
+
+
+def test_paths_through_given_nodes():
+    paths = list(iter_paths(diamonds(4), 0, 100, {}, through={2, 11}))
+
+    assert len(paths) == len(set(paths)) == 12
+    assert all(2 in path or 11 in path for path in paths)
+
+
+def test_published_paths_skip_cycles(paths_services, db_session):
+    workflow = Workflow(name="Test Workflow")
+    db_session.add(workflow)
+    db_session.flush()
+    start = StartNode(workflow_id=workflow.id)
+    message = MessageNode(
+        workflow_id=workflow.id, message="Pay please", status=NodeStatus.pending
+    )
+    condition = ConditionNode(workflow_id=workflow.id, condition="paid")
+    end = EndNode(workflow_id=workflow.id)
+    db_session.add_all([start, message, condition, end])
+    db_session.flush()
+    start.next_node_id = message.id
+    message.next_node_id = condition.id
+    condition.yes_node_id = end.id
+    condition.no_node_id = message.id
+    db_session.commit()
+    paths_services.versions.publish(workflow.id, db_session)
+
+    for draft in (False, True):
+        structure = paths_services.load_structure(workflow.id, db_session, draft=draft)
+        items = list(paths_services.iter_paths(structure))
+
+        assert items[0] == {"path": (start.id, message.id, condition.id, end.id)}
+        assert items[-1]["summary"]["paths"] == 1
+        assert items[-1]["summary"]["skipped_cycles"] == 1
+
+
+def test_paths_of_missing_workflow(paths_services, db_session):
+    with pytest.raises(HTTPException) as error:
+        paths_services.load_structure(-1, db_session, draft=True)
+    assert error.value.status_code == 404
@@ -0,0 +1,262 @@
+import asyncio
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+
+from database.config import Base
+from database.models import (
+    Workflow,
+    WorkflowRun,
+    RunTransition,
+    StartNode,
+    MessageNode,
+    ConditionNode,
+    EndNode,
+)
+from schemas.node import NodeStatus
+from schemas.run import RunCreateSchema, RunStatus
+from services.run import RunService, RunScheduler
+from services.version import WorkflowVersionService
+
+# A file database: the scheduler's worker threads need their own connections.
+DATABASE_URL = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'runs.db')}"
+
+engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+Base.metadata.create_all(bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture(scope="function")
+def db_session():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def versions_services():
+    service = WorkflowVersionService()
+    service.snapshots.clear()
+    return service
+
+
+@pytest.fixture
+def runs_services(versions_services):
+    return RunService(versions=versions_services)
+
+
+@pytest.fixture
+def published_workflow(db_session, versions_services) -> dict:
+    """start -> message -> condition(paid) -yes-> end, -no-> message."""
+    db_session.query(RunTransition).delete()
+    db_session.query(WorkflowRun).delete()
+    workflow = Workflow(name="Test Workflow")
+    db_session.add(workflow)
+    db_session.flush()
+    start = StartNode(workflow_id=workflow.id)
+    message = MessageNode(
+        workflow_id=workflow.id, message="Pay please", status=NodeStatus.pending
+    )
+    condition = ConditionNode(workflow_id=workflow.id, condition="paid")
+    end = EndNode(workflow_id=workflow.id)
+    db_session.add_all([start, message, condition, end])
+    db_session.flush()
+    start.next_node_id = message.id
+    message.next_node_id = condition.id
+    condition.yes_node_id = end.id
+    condition.no_node_id = message.id
+    db_session.commit()
+    versions_services.publish(workflow.id, db_session)
+    return {
+        "workflow_id": workflow.id,
+        "message": message.id,
+        "condition": condition.id,
+        "end": end.id,
+    }
+
+
+def test_create_run(runs_services, db_session, published_workflow):
+    run = runs_services.create_run(
+        published_workflow["workflow_id"], RunCreateSchema(), db_session
+    )
+    assert run.status == RunStatus.pending
+    assert run.version == 1
+    assert [t.to_status for t in run.transitions] == [RunStatus.pending]
+
+
+def test_run_completes(
+    runs_services, versions_services, db_session, published_workflow
+):
+    run = runs_services.create_run(
+        published_workflow["workflow_id"],
+        RunCreateSchema(context={"paid": True}),
+        db_session,
+    )
+    scheduler = RunScheduler(SessionLocal, versions=versions_services)
+
+    assert scheduler.advance_batch() >= 1
+
+    db_session.refresh(run)
+    assert run.status == RunStatus.completed
+    assert run.current_node_id == published_workflow["end"]
+    assert run.transitions[-1].to_status == RunStatus.completed
+
+
+def test_run_yields_after_max_steps(
+    runs_services, versions_services, db_session, published_workflow
+):
+    run = runs_services.create_run(
+        published_workflow["workflow_id"],
+        RunCreateSchema(context={"paid": False}),
+        db_session,
+    )
+    scheduler = RunScheduler(SessionLocal, versions=versions_services, max_steps=10)
+    scheduler.advance_batch()
+
+    db_session.refresh(run)
+    assert run.status == RunStatus.pending
+    assert run.claimed_by is not None
+
+
+def test_run_waits_for_dispatch(
+    runs_services, versions_services, db_session, published_workflow
+):
+    dispatched = []
+    run = runs_services.create_run(
+        published_workflow["workflow_id"],
+        RunCreateSchema(context={"paid": True}),
+        db_session,
+    )
+    scheduler = RunScheduler(
+        SessionLocal,
+        versions=versions_services,
+        dispatcher=lambda run_id, node: dispatched.append((run_id, node)),
+    )
+    scheduler.advance_batch()
+
+    db_session.refresh(run)
+    assert run.status == RunStatus.waiting
+    assert run.current_node_id == published_workflow["message"]
+    assert dispatched[0][0] == run.id
+    assert scheduler.advance_batch() == 0
+
+    node = dispatched[0][1]
+    assert runs_services.resume_runs({run.id: node.next_node_id}, db_session) == 1
+    scheduler.advance_batch()
+
+    db_session.refresh(run)
+    assert run.status == RunStatus.completed
+    assert [t.to_status for t in run.transitions] == [
+        RunStatus.pending,
+        RunStatus.waiting,
+        RunStatus.pending,
+        RunStatus.completed,
+    ]
+
+
+def test_expired_lease_is_reclaimed(
+    runs_services, versions_services, db_session, published_workflow
+):
+    run = runs_services.create_run(
+        published_workflow["workflow_id"],
+        RunCreateSchema(context={"paid": True}),
+        db_session,
+    )
+    crashed = RunScheduler(SessionLocal, versions=versions_services)
+    _, claimed = crashed.claim(db_session, limit=10)
+    assert run.id in claimed
+
+    scheduler = RunScheduler(SessionLocal, versions=versions_services)
+    _, claimed_again = scheduler.claim(db_session, limit=10)
+    assert run.id not in claimed_again
+
+    db_session.execute(
+        update(WorkflowRun)
+        .where(WorkflowRun.id == run.id)
+        .values(lease_expires_at=datetime.utcnow() - timedelta(seconds=1))
+    )
+    db_session.commit()
+    scheduler.advance_batch()
+
+    db_session.refresh(run)
+    assert run.status == RunStatus.completed
+
+
+def test_lost_lease_drops_transitions_and_dispatches(
+    runs_services, versions_services, db_session, published_workflow
+):
+    dispatched = []
+    run = runs_services.create_run(
+        published_workflow["workflow_id"],
+        RunCreateSchema(context={"paid": True}),
+        db_session,
+    )
+    scheduler = RunScheduler(
+        SessionLocal,
+        versions=versions_services,
+        dispatcher=lambda run_id, node: dispatched.append(run_id),
+    )
+    advance = scheduler.advance
+
+    def advance_slowly(*args):
+        # The lease expires and another scheduler claims the run meanwhile.
+        with SessionLocal() as db:
+            db.execute(
+                update(WorkflowRun)
+                .where(WorkflowRun.id == run.id)
+                .values(claimed_by="other")
+            )
+            db.commit()
+        return advance(*args)
+
+    scheduler.advance = advance_slowly
+    assert scheduler.advance_batch() == 1
+
+    db_session.refresh(run)
+    assert run.status == RunStatus.running
+    assert [t.to_status for t in run.transitions] == [RunStatus.pending]
+    assert dispatched == []
+
+
+def test_scheduler_drains_many_runs(
+    runs_services, versions_services, db_session, published_workflow
+):
+    for _ in range(2000):
+        db_session.add(
+            WorkflowRun(
+                workflow_id=published_workflow["workflow_id"],
+                version=1,
+                current_node_id=published_workflow["message"],
+                status=RunStatus.pending,
+                context={"paid": True},
+            )
+        )
+    db_session.commit()
+    scheduler = RunScheduler(
+        SessionLocal,
+        versions=versions_services,
+        workers=2,
+        batch_size=300,
+        poll_interval=0.01,
+        max_steps=5,
+    )
+
+    async def drain():
+        scheduler.start()
+        for _ in range(200):
+            await asyncio.sleep(0.02)
+            if not runs_services.list_runs(
+                published_workflow["workflow_id"], db_session, RunStatus.pending
+            ):
+                break
+        await scheduler.stop()
+
+    asyncio.run(drain())
+    db_session.expire_all()
+    runs = runs_services.list_runs(published_workflow["workflow_id"], db_session)
+    assert len(runs) == 2000
+    assert all(run.status == RunStatus.completed for run in runs)
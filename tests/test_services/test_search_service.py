@@ -0,0 +1,167 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.config import Base
+from schemas.node import (
+    StartNodeSchema,
+    MessageNodeSchema,
+    ConditionNodeSchema,
+    EndNodeSchema,
+    NodeStatus,
+    NodeType,
+)
+from schemas.workflow import WorkflowCreateSchema, WorkflowCloneSchema
+from services import search
+from services.node import NodeService
+from services.search import NodeSearchService
+from services.workflow import WorkflowService
+
+DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(DATABASE_URL)
+Base.metadata.create_all(bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture(scope="function")
+def db_session():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def search_service():
+    return NodeSearchService()
+
+
+@pytest.fixture(params=["fts", "like"])
+def index_mode(request, monkeypatch):
+    if request.param == "like":
+        monkeypatch.setattr(search, "search_index_available", lambda connection: False)
+    return request.param
+
+
+def _workflow(db_session, greeting: str) -> tuple[int, dict]:
+    """start -> message -> condition(yes: end, no: message) with given text."""
+    workflows = WorkflowService()
+    nodes = NodeService()
+    workflow_id = workflows.create_workflow(
+        WorkflowCreateSchema(name="Searched"), db_session
+    ).id
+    end = nodes.create_node(
+        NodeType.end, EndNodeSchema(workflow_id=workflow_id), db_session
+    )
+    message = nodes.create_node(
+        NodeType.message,
+        MessageNodeSchema(
+            workflow_id=workflow_id,
+            message=greeting,
+            status=NodeStatus.pending,
+            next_node_id=end.id,
+        ),
+        db_session,
+    )
+    condition = nodes.create_node(
+        NodeType.condition,
+        ConditionNodeSchema(
+            workflow_id=workflow_id,
+            condition="score >= 10",
+            yes_node_id=end.id,
+            no_node_id=message.id,
+        ),
+        db_session,
+    )
+    start = nodes.create_node(
+        NodeType.start,
+        StartNodeSchema(workflow_id=workflow_id, next_node_id=message.id),
+        db_session,
+    )
+    return workflow_id, {
+        "end": end.id,
+        "message": message.id,
+        "condition": condition.id,
+        "start": start.id,
+    }
+
+
+def _found(page) -> list[int]:
+    return [item.node_id for item in page.items]
+
+
+def test_search_follows_node_writes(search_service, index_mode, db_session):
+    workflow_id, ids = _workflow(db_session, "Welcome to the spring sale")
+
+    page = search_service.search("spring sale", db_session, workflow_id=workflow_id)
+    assert _found(page) == [ids["message"]]
+    assert page.full_text is (index_mode == "fts")
+    assert page.items[0].text == "Welcome to the spring sale"
+    assert page.items[0].status == NodeStatus.pending
+
+    NodeService().update_node(
+        ids["message"],
+        MessageNodeSchema(
+            workflow_id=workflow_id,
+            message="Welcome to the autumn sale",
+            status=NodeStatus.sent,
+            next_node_id=ids["end"],
+        ),
+        db_session,
+    )
+    assert _found(search_service.search("spring", db_session, workflow_id)) == []
+    assert _found(search_service.search("autumn", db_session, workflow_id)) == [
+        ids["message"]
+    ]
+
+    NodeService().delete_node(ids["message"], db_session)
+    assert _found(search_service.search("autumn", db_session, workflow_id)) == []
+
+
+def test_search_filters(search_service, index_mode, db_session):
+    workflow_id, ids = _workflow(db_session, "Your score is ready")
+    other_id, other_ids = _workflow(db_session, "Your score is ready")
+
+    everywhere = search_service.search("score", db_session)
+    assert {ids["message"], ids["condition"], other_ids["condition"]} <= set(
+        _found(everywhere)
+    )
+    assert _found(search_service.search("score", db_session, workflow_id)) == [
+        ids["message"],
+        ids["condition"],
+    ]
+    assert _found(
+        search_service.search(
+            "score", db_session, workflow_id, node_type=NodeType.condition
+        )
+    ) == [ids["condition"]]
+    assert _found(
+        search_service.search(
+            "score", db_session, workflow_id, node_status=NodeStatus.pending
+        )
+    ) == [ids["message"]]
+    # Query syntax in the input is matched as text.
+    assert _found(search_service.search("score >= 10", db_session, other_id)) == [
+        other_ids["condition"]
+    ]
+    assert _found(search_service.search('"* OR NOT', db_session, other_id)) == []
+
+
+def test_search_pages(search_service, index_mode, db_session):
+    workflow_id, _ = _workflow(db_session, "Paged message")
+    clone = WorkflowService().clone_workflow(
+        workflow_id, WorkflowCloneSchema(), db_session
+    )
+    found = []
+    after = None
+    for _ in range(10):
+        page = search_service.search("paged", db_session, after=after, limit=1)
+        found += _found(page)
+        after = page.next_after
+        if after is None:
+            break
+    clone_message = next(
+        node.id for node in clone.nodes if node.node_type == NodeType.message
+    )
+    assert clone_message in found
+    assert found == sorted(found) and len(found) == len(set(found)) >= 2
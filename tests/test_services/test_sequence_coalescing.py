@@ -0,0 +1,123 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.config import Base
+from database.models import Workflow, StartNode, MessageNode, EndNode
+from schemas.node import NodeStatus
+from services.cache import LRUCache, SingleFlight
+from services.workflow import WorkflowService
+
+CALLERS = 20
+
+# A file database: callers run in their own threads.
+DATABASE_URL = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'coalescing.db')}"
+
+engine = create_engine(
+    DATABASE_URL, connect_args={"check_same_thread": False}, pool_size=CALLERS
+)
+Base.metadata.create_all(bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+class SlowWorkflowService(WorkflowService):
+    """Counts graph builds and keeps each one running for a while."""
+
+    def __init__(self):
+        super().__init__(sequences=LRUCache(), flights=SingleFlight())
+        self.builds = 0
+
+    def _build_sequence(self, workflow_id, revision, db):
+        self.builds += 1
+        time.sleep(0.1)
+        return super()._build_sequence(workflow_id, revision, db)
+
+
+@pytest.fixture
+def workflow_id() -> int:
+    with SessionLocal() as db:
+        workflow = Workflow(name="Test Workflow")
+        db.add(workflow)
+        db.flush()
+        start = StartNode(workflow_id=workflow.id)
+        message = MessageNode(
+            workflow_id=workflow.id, message="Hello", status=NodeStatus.open
+        )
+        end = EndNode(workflow_id=workflow.id)
+        db.add_all([start, message, end])
+        db.flush()
+        start.next_node_id = message.id
+        message.next_node_id = end.id
+        db.commit()
+        return workflow.id
+
+
+def test_concurrent_threads_share_one_build(workflow_id):
+    service = SlowWorkflowService()
+    barrier = threading.Barrier(CALLERS)
+
+    def request():
+        barrier.wait()
+        with SessionLocal() as db:
+            return service.create_and_run_sequence(workflow_id, db)
+
+    with ThreadPoolExecutor(CALLERS) as executor:
+        sequences = list(executor.map(lambda _: request(), range(CALLERS)))
+
+    assert service.builds == 1
+    assert service.flights.stats == {"executed": 1, "coalesced": CALLERS - 1}
+    assert all(sequence == sequences[0] for sequence in sequences)
+    assert len(sequences[0]["path"]) == 3
+
+
+def test_concurrent_coroutines_share_one_build(workflow_id):
+    service = SlowWorkflowService()
+
+    async def requests():
+        return await asyncio.gather(
+            *(
+                service.create_and_run_sequence_async(workflow_id, SessionLocal)
+                for _ in range(CALLERS)
+            )
+        )
+
+    sequences = asyncio.run(requests())
+
+    assert service.builds == 1
+    assert service.flights.stats == {"executed": 1, "coalesced": CALLERS - 1}
+    assert all(sequence == sequences[0] for sequence in sequences)
+    with SessionLocal() as db:
+        assert service.create_and_run_sequence(workflow_id, db) == sequences[0]
+    assert service.builds == 1
+
+
+def test_errors_reach_every_waiter():
+    flights = SingleFlight()
+    started = threading.Event()
+
+    def fail():
+        started.set()
+        time.sleep(0.1)
+        raise HTTPException(status_code=400, detail="Workflow has no end node")
+
+    def follow():
+        started.wait()
+        return flights.do("key", lambda: "not run")
+
+    with ThreadPoolExecutor(2) as executor:
+        leader = executor.submit(flights.do, "key", fail)
+        follower = executor.submit(follow)
+        for future in (leader, follower):
+            with pytest.raises(HTTPException):
+                future.result()
+
+    assert flights.stats == {"executed": 1, "coalesced": 1}
+    assert flights.do("key", lambda: "retried") == "retried"
@@ -0,0 +1,229 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import services.simulation
+import settings
+from database.config import Base
+from database.models import (
+    Workflow,
+    WorkflowRun,
+    StartNode,
+    MessageNode,
+    ConditionNode,
+    EndNode,
+)
+from schemas.node import NodeStatus
+from schemas.simulation import (
+    SimulationMethod,
+    SimulationRequestSchema,
+    SimulationSource,
+)
+from services.simulation import WorkflowSimulationService
+
+DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(DATABASE_URL)
+Base.metadata.create_all(bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture(scope="function")
+def db_session():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def simulation_services():
+    return WorkflowSimulationService()
+
+
+def create_workflow(db_session, loop: bool) -> dict:
+    """
+    start -> message -> condition(paid) -yes-> end, -no-> reminder, which
+    leads to the end or, with loop, back to the message.
+    """
+    workflow = Workflow(name="Test Workflow")
+    db_session.add(workflow)
+    db_session.flush()
+    start = StartNode(workflow_id=workflow.id)
+    message = MessageNode(
+        workflow_id=workflow.id, message="Pay please", status=NodeStatus.pending
+    )
+    condition = ConditionNode(workflow_id=workflow.id, condition="paid")
+    reminder = MessageNode(
+        workflow_id=workflow.id, message="Reminder", status=NodeStatus.pending
+    )
+    end = EndNode(workflow_id=workflow.id)
+    db_session.add_all([start, message, condition, reminder, end])
+    db_session.flush()
+    start.next_node_id = message.id
+    message.next_node_id = condition.id
+    condition.yes_node_id = end.id
+    condition.no_node_id = reminder.id
+    reminder.next_node_id = message.id if loop else end.id
+    db_session.commit()
+    return {
+        "workflow": workflow,
+        "start": start,
+        "message": message,
+        "condition": condition,
+        "reminder": reminder,
+        "end": end,
+    }
+
+
+def visits(simulation: dict) -> dict:
+    return {node["node_id"]: node["visits_per_run"] for node in simulation["nodes"]}
+
+
+def test_acyclic_workflow_is_propagated_exactly(db_session, simulation_services):
+    nodes = create_workflow(db_session, loop=False)
+
+    simulation = simulation_services.simulate(
+        nodes["workflow"].id,
+        SimulationRequestSchema(probabilities={nodes["condition"].id: 0.25}, runs=1000),
+        db_session,
+    )
+
+    assert simulation["method"] == SimulationMethod.exact
+    assert simulation["simulated_runs"] == 0
+    assert visits(simulation)[nodes["reminder"].id] == 0.75
+    assert simulation["expected_messages"] == 1750
+    assert simulation["completed"] == 1
+    assert simulation["failed"] == simulation["truncated"] == 0
+
+
+@pytest.mark.parametrize("vectorized", [True, False])
+def test_cycles_are_sampled(db_session, simulation_services, monkeypatch, vectorized):
+    if not vectorized:
+        monkeypatch.setattr(services.simulation, "load_numpy", lambda: None)
+    elif services.simulation.load_numpy() is None:
+        pytest.skip("NumPy is not installed")
+    nodes = create_workflow(db_session, loop=True)
+
+    simulation = simulation_services.simulate(
+        nodes["workflow"].id,
+        SimulationRequestSchema(
+            probabilities={nodes["condition"].id: 0.4}, runs=50000, seed=7
+        ),
+        db_session,
+    )
+
+    assert simulation["method"] == SimulationMethod.monte_carlo
+    # Geometric number of reminders: 1 / 0.4 messages and 0.6 / 0.4 reminders.
+    expected = visits(simulation)
+    assert expected[nodes["message"].id] == pytest.approx(2.5, rel=0.02)
+    assert expected[nodes["reminder"].id] == pytest.approx(1.5, rel=0.03)
+    assert simulation["expected_messages"] == pytest.approx(200000, rel=0.02)
+    assert 0 < simulation["messages_per_run_error"] < 0.02
+    assert simulation["completed"] == 1
+    assert simulation["complete"]
+    assert simulation["simulated_runs"] == 50000
+
+
+@pytest.mark.parametrize("vectorized", [True, False])
+def test_sampling_stops_at_the_time_limit(
+    db_session, simulation_services, monkeypatch, vectorized
+):
+    if not vectorized:
+        monkeypatch.setattr(services.simulation, "load_numpy", lambda: None)
+    elif services.simulation.load_numpy() is None:
+        pytest.skip("NumPy is not installed")
+    monkeypatch.setattr(settings, "SIMULATION_TIMEOUT", 0)
+    nodes = create_workflow(db_session, loop=True)
+
+    simulation = simulation_services.simulate(
+        nodes["workflow"].id,
+        SimulationRequestSchema(
+            probabilities={nodes["condition"].id: 0.4}, runs=1000000, seed=7
+        ),
+        db_session,
+    )
+
+    assert not simulation["complete"]
+    assert 0 < simulation["simulated_runs"] < 1000000
+    # The sample is scaled up to all runs.
+    assert simulation["expected_messages"] == pytest.approx(4000000, rel=0.1)
+
+
+def test_pure_python_sampling_is_capped(db_session, simulation_services, monkeypatch):
+    monkeypatch.setattr(services.simulation, "load_numpy", lambda: None)
+    monkeypatch.setattr(settings, "SIMULATION_PYTHON_MAX_VISITS", 20000)
+    nodes = create_workflow(db_session, loop=True)
+
+    simulation = simulation_services.simulate(
+        nodes["workflow"].id,
+        SimulationRequestSchema(
+            probabilities={nodes["condition"].id: 0.4}, runs=1000000, seed=7
+        ),
+        db_session,
+    )
+
+    assert not simulation["complete"]
+    # About 1 + 2.5 + 2.5 + 1.5 nodes per run.
+    assert simulation["simulated_runs"] == pytest.approx(20000 / 7.5, rel=0.1)
+    assert visits(simulation)[nodes["message"].id] == pytest.approx(2.5, rel=0.1)
+
+
+def test_runs_stop_after_max_steps(db_session, simulation_services):
+    nodes = create_workflow(db_session, loop=True)
+
+    simulation = simulation_services.simulate(
+        nodes["workflow"].id,
+        SimulationRequestSchema(
+            probabilities={nodes["condition"].id: 0}, runs=100, max_steps=10
+        ),
+        db_session,
+    )
+
+    assert simulation["truncated"] == 1
+    assert sum(visits(simulation).values()) == 10
+
+
+def test_probabilities_are_checked(db_session, simulation_services):
+    nodes = create_workflow(db_session, loop=False)
+    workflow_id = nodes["workflow"].id
+
+    with pytest.raises(HTTPException) as error:
+        simulation_services.simulate(workflow_id, SimulationRequestSchema(), db_session)
+    assert error.value.status_code == 400
+    assert str(nodes["condition"].id) in error.value.detail
+    with pytest.raises(HTTPException) as error:
+        simulation_services.simulate(
+            workflow_id,
+            SimulationRequestSchema(probabilities={nodes["message"].id: 0.5}),
+            db_session,
+        )
+    assert error.value.status_code == 400
+    with pytest.raises(ValueError):
+        SimulationRequestSchema(probabilities={1: 1.5})
+
+
+def test_history_contexts_are_walked(db_session, simulation_services):
+    nodes = create_workflow(db_session, loop=False)
+    workflow_id = nodes["workflow"].id
+    with pytest.raises(HTTPException) as error:
+        simulation_services.simulate(
+            workflow_id,
+            SimulationRequestSchema(source=SimulationSource.history),
+            db_session,
+        )
+    assert error.value.status_code == 400
+    for context in ({"paid": True}, {"paid": True}, {"paid": True}, {}):
+        db_session.add(WorkflowRun(workflow_id=workflow_id, version=1, context=context))
+    db_session.commit()
+
+    simulation = simulation_services.simulate(
+        workflow_id,
+        SimulationRequestSchema(source=SimulationSource.history, runs=100),
+        db_session,
+    )
+
+    assert simulation["method"] == SimulationMethod.exact
+    assert (simulation["contexts"], simulation["simulated_runs"]) == (4, 2)
+    assert visits(simulation)[nodes["reminder"].id] == 0.25
+    assert simulation["expected_messages"] == 125
@@ -0,0 +1,189 @@
+import asyncio
+import os
+import tempfile
+
+import orjson
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.config import Base
+from database.models import (
+    Workflow,
+    StartNode,
+    MessageNode,
+    ConditionNode,
+    EndNode,
+)
+from schemas.node import NodeStatus
+from schemas.run import RunCreateSchema
+from services.dispatch import DispatchQueue, LocalStubSender
+from services.run import RunService, RunScheduler
+from services.tracing import FileSpanExporter, Tracer, trace_id
+from services.version import WorkflowVersionService
+
+# A file database: the scheduler's worker threads need their own connections.
+DATABASE_URL = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'tracing.db')}"
+
+engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+Base.metadata.create_all(bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture(scope="function")
+def db_session():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def versions_services():
+    service = WorkflowVersionService()
+    service.snapshots.clear()
+    return service
+
+
+@pytest.fixture
+def runs_services(versions_services):
+    return RunService(versions=versions_services)
+
+
+@pytest.fixture
+def published_workflow(db_session, versions_services) -> int:
+    """start -> message -> condition(paid) -yes-> end, -no-> message."""
+    workflow = Workflow(name="Test Workflow")
+    db_session.add(workflow)
+    db_session.flush()
+    start = StartNode(workflow_id=workflow.id)
+    message = MessageNode(
+        workflow_id=workflow.id, message="Pay please", status=NodeStatus.pending
+    )
+    condition = ConditionNode(workflow_id=workflow.id, condition="paid")
+    end = EndNode(workflow_id=workflow.id)
+    db_session.add_all([start, message, condition, end])
+    db_session.flush()
+    start.next_node_id = message.id
+    message.next_node_id = condition.id
+    condition.yes_node_id = end.id
+    condition.no_node_id = message.id
+    db_session.commit()
+    versions_services.publish(workflow.id, db_session)
+    return workflow.id
+
+
+def spans_of(tracer: Tracer, run_id: int) -> list[dict]:
+    document = tracer.traces(run_id=run_id)
+    return document["resourceSpans"][0]["scopeSpans"][0]["spans"]
+
+
+def attributes(span: dict) -> dict:
+    return {
+        attribute["key"]: next(iter(attribute["value"].values()))
+        for attribute in span["attributes"]
+    }
+
+
+def test_run_step_is_traced_per_node(
+    runs_services, versions_services, db_session, published_workflow
+):
+    tracer = Tracer(sample_rate=1.0)
+    run = runs_services.create_run(
+        published_workflow, RunCreateSchema(context={"paid": True}), db_session
+    )
+    scheduler = RunScheduler(SessionLocal, versions=versions_services, tracer=tracer)
+
+    scheduler.advance_batch()
+
+    spans = spans_of(tracer, run.id)
+    root = spans[0]
+    assert root["name"] == "run.advance"
+    assert attributes(root)["run.status"] == "completed"
+    assert [span["name"] for span in spans[1:]] == [
+        "db.claim",
+        "db.load",
+        "db.snapshot",
+        "node.start",
+        "node.message",
+        "node.condition",
+        "node.end",
+        "db.persist",
+    ]
+    assert {span["traceId"] for span in spans} == {trace_id(run.id)}
+    assert {span["parentSpanId"] for span in spans[1:]} == {root["spanId"]}
+    assert attributes(spans[6])["condition.branch"] == "yes"
+    assert all(
+        int(span["startTimeUnixNano"]) <= int(span["endTimeUnixNano"]) for span in spans
+    )
+
+
+def test_dispatch_latency_is_traced(
+    runs_services, versions_services, db_session, published_workflow
+):
+    tracer = Tracer(sample_rate=1.0)
+    queue = DispatchQueue(
+        LocalStubSender(), SessionLocal, runs=runs_services, linger=0, tracer=tracer
+    )
+    scheduler = RunScheduler(
+        SessionLocal,
+        versions=versions_services,
+        dispatcher=queue.submit_threadsafe,
+        tracer=tracer,
+    )
+    run = runs_services.create_run(
+        published_workflow, RunCreateSchema(context={"paid": True}), db_session
+    )
+
+    async def scenario():
+        queue.start()
+        await asyncio.to_thread(scheduler.advance_batch)
+        await queue.join()
+        await queue.stop()
+
+    asyncio.run(scenario())
+
+    names = [span["name"] for span in spans_of(tracer, run.id)]
+    dispatch = names.index("dispatch")
+    assert names[dispatch:] == [
+        "dispatch",
+        "dispatch.queue",
+        "dispatch.send",
+        "db.complete",
+    ]
+
+
+def test_sampling_is_decided_per_run(
+    runs_services, versions_services, db_session, published_workflow
+):
+    assert not any(Tracer(sample_rate=0).sampled(run_id) for run_id in range(1000))
+    sampled = sum(Tracer(sample_rate=0.25).sampled(run_id) for run_id in range(10000))
+    assert 2300 < sampled < 2700
+
+    tracer = Tracer(sample_rate=0)
+    runs_services.create_run(published_workflow, RunCreateSchema(), db_session)
+    scheduler = RunScheduler(SessionLocal, versions=versions_services, tracer=tracer)
+    scheduler.advance_batch()
+
+    assert not tracer.enabled
+    assert tracer.stats["recorded"] == 0
+
+
+def test_ring_buffer_and_file_export(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(sample_rate=1.0, buffer_size=3, exporter=FileSpanExporter(path))
+    for run_id in range(1, 3):
+        trace = tracer.start_run(run_id, 1000)
+        trace.span("db.claim", 1000, 2000)
+        trace.finish(3000)
+
+    assert [span.trace_id for span in tracer.spans] == [
+        trace_id(1),
+        trace_id(2),
+        trace_id(2),
+    ]
+    assert tracer.export() == 3
+    assert tracer.export() == 0
+    document = orjson.loads(path.read_bytes().splitlines()[0])
+    resource = document["resourceSpans"][0]
+    assert resource["resource"]["attributes"][0]["key"] == "service.name"
+    assert len(resource["scopeSpans"][0]["spans"]) == 3
@@ -0,0 +1,140 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+
+from database.config import Base
+from database.models import (
+    Workflow,
+    WorkflowVersion,
+    StartNode,
+    MessageNode,
+    ConditionNode,
+    EndNode,
+)
+from schemas.node import NodeStatus
+from services.version import WorkflowVersionService
+from services.workflow import WorkflowGraph
+
+DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(DATABASE_URL)
+Base.metadata.create_all(bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture(scope="function")
+def db_session():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def version_services():
+    service = WorkflowVersionService()
+    service.snapshots.clear()
+    return service
+
+
+def create_valid_workflow(db_session) -> tuple[Workflow, MessageNode]:
+    workflow = Workflow(name="Test Workflow")
+    db_session.add(workflow)
+    db_session.flush()
+    start = StartNode(workflow_id=workflow.id)
+    message = MessageNode(
+        workflow_id=workflow.id, message="Hello", status=NodeStatus.pending
+    )
+    condition = ConditionNode(workflow_id=workflow.id, condition="Condition")
+    end = EndNode(workflow_id=workflow.id)
+    db_session.add_all([start, message, condition, end])
+    db_session.flush()
+    start.next_node_id = message.id
+    message.next_node_id = condition.id
+    condition.yes_node_id = end.id
+    condition.no_node_id = message.id
+    db_session.commit()
+    return workflow, message
+
+
+def test_publish_freezes_snapshot(version_services, db_session):
+    workflow, message = create_valid_workflow(db_session)
+
+    first = version_services.publish(workflow.id, db_session)
+    message.message = "Edited"
+    db_session.commit()
+    second = version_services.publish(workflow.id, db_session)
+
+    assert (first.version, second.version) == (1, 2)
+    snapshot = version_services.get_snapshot(workflow.id, db_session, version=1)
+    frozen_message = next(node for node in snapshot.nodes if node.id == message.id)
+    assert frozen_message.message == "Hello"
+    assert snapshot.path[0] == snapshot.start_node
+    assert snapshot.path[-1] == snapshot.end_node
+
+
+def test_concurrent_publish_conflicts(version_services, db_session, monkeypatch):
+    workflow, _ = create_valid_workflow(db_session)
+    snapshot = WorkflowGraph.snapshot
+
+    def publish_meanwhile(graph, version):
+        # Another publish takes the version number after it was read.
+        db_session.execute(
+            insert(WorkflowVersion).values(
+                workflow_id=workflow.id, version=version, snapshot="{}"
+            )
+        )
+        return snapshot(graph, version=version)
+
+    monkeypatch.setattr(WorkflowGraph, "snapshot", publish_meanwhile)
+
+    with pytest.raises(HTTPException) as error:
+        version_services.publish(workflow.id, db_session)
+    assert error.value.status_code == 409
+    monkeypatch.undo()
+    assert version_services.publish(workflow.id, db_session).version == 1
+
+
+def test_latest_published_version_is_default(version_services, db_session):
+    workflow, _ = create_valid_workflow(db_session)
+    version_services.publish(workflow.id, db_session)
+    version_services.publish(workflow.id, db_session)
+
+    assert version_services.get_snapshot(workflow.id, db_session).version == 2
+
+
+def test_cached_snapshot_does_not_touch_node_tables(version_services, db_session):
+    workflow, _ = create_valid_workflow(db_session)
+    version_services.publish(workflow.id, db_session)
+    version_services.snapshots.clear()
+    version_services.get_sequence(workflow.id, db_session)
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        sequence = version_services.get_sequence(workflow.id, db_session)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert sequence["path"]
+    assert len(statements) == 1
+    assert "nodes" not in statements[0]
+
+
+def test_unpublished_workflow(version_services, db_session):
+    workflow, _ = create_valid_workflow(db_session)
+    with pytest.raises(HTTPException) as error:
+        version_services.get_snapshot(workflow.id, db_session)
+    assert error.value.detail == "Workflow has no published version"
+
+
+def test_publish_invalid_workflow(version_services, db_session):
+    workflow = Workflow(name="Empty Workflow")
+    db_session.add(workflow)
+    db_session.commit()
+    with pytest.raises(HTTPException):
+        version_services.publish(workflow.id, db_session)
@@ -1,9 +1,24 @@
+import time
+
 import pytest
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, func, insert, select
 from sqlalchemy.orm import sessionmaker
 
 from database.config import Base
-from schemas.workflow import WorkflowCreateSchema, WorkflowUpdateSchema
+from database.models import (
+    Workflow,
+    Node,
+    StartNode,
+    MessageNode,
+    ConditionNode,
+    EndNode,
+)
+from schemas.node import NodeStatus, NodeType
+from schemas.workflow import (
+    WorkflowCreateSchema,
+    WorkflowUpdateSchema,
+    WorkflowCloneSchema,
+)
 from services.workflow import WorkflowService
 
 DATABASE_URL = "sqlite:///:memory:"
@@ -58,3 +73,126 @@ def test_delete_workflow(workflow_services, db_session):
     workflow = workflow_services.create_workflow(workflow_data, db_session)
     result = workflow_services.delete_workflow(workflow.id, db_session)
     assert result is True
+
+
+def _template(db_session, messages: int) -> Workflow:
+    """
+    start -> message... -> condition(yes: end, no: first message), inserted
+    in bulk so big templates seed quickly.
+    """
+    template = Workflow(name="Template")
+    db_session.add(template)
+    db_session.flush()
+    first_id = (db_session.scalar(select(func.max(Node.id))) or 0) + 1
+    start_id, condition_id, end_id = first_id, first_id + 1, first_id + 2
+    message_ids = list(range(first_id + 3, first_id + 3 + messages))
+    kinds = [NodeType.start, NodeType.condition, NodeType.end]
+    kinds += [NodeType.message] * messages
+    db_session.execute(
+        insert(Node),
+        [
+            {"id": start_id + index, "workflow_id": template.id, "node_type": kind}
+            for index, kind in enumerate(kinds)
+        ],
+    )
+    db_session.execute(
+        insert(StartNode.__table__), [{"id": start_id, "next_node_id": message_ids[0]}]
+    )
+    db_session.execute(
+        insert(ConditionNode.__table__),
+        [
+            {
+                "id": condition_id,
+                "condition": "Sent",
+                "yes_node_id": end_id,
+                "no_node_id": message_ids[0],
+            }
+        ],
+    )
+    db_session.execute(insert(EndNode.__table__), [{"id": end_id}])
+    db_session.execute(
+        insert(MessageNode.__table__),
+        [
+            {
+                "id": message_id,
+                "message": f"Hello {{{{customer}}}}, step {index} of {{{{plan}}}}",
+                "status": NodeStatus.pending,
+                "next_node_id": (message_ids[index + 1 :] or [condition_id])[0],
+            }
+            for index, message_id in enumerate(message_ids)
+        ],
+    )
+    db_session.commit()
+    return template
+
+
+def test_clone_workflow(workflow_services, db_session):
+    template = _template(db_session, messages=3)
+
+    clone = workflow_services.clone_workflow(
+        template.id,
+        WorkflowCloneSchema(params={"customer": "Acme", "plan": "Pro"}),
+        db_session,
+    )
+
+    assert clone.name == "Template (copy)"
+    assert clone.revision > 0
+    originals = {node.id: node for node in template.nodes}
+    copies = {node.id: node for node in clone.nodes}
+    assert len(copies) == len(originals) and not copies.keys() & originals.keys()
+    messages = sorted(
+        node.message for node in copies.values() if node.node_type == NodeType.message
+    )
+    assert messages == [f"Hello Acme, step {index} of Pro" for index in range(3)]
+    # Edges point into the copy and follow the same shape as the template.
+    offset = min(copies) - min(originals)
+    for node_id, node in originals.items():
+        copy = copies[node_id + offset]
+        assert copy.node_type == node.node_type
+        for name in ("next_node_id", "yes_node_id", "no_node_id"):
+            if hasattr(node, name):
+                assert getattr(copy, name) == getattr(node, name) + offset
+    assert workflow_services.create_and_run_sequence(clone.id, db_session)["path"] == [
+        node_id + offset
+        for node_id in workflow_services.create_and_run_sequence(
+            template.id, db_session
+        )["path"]
+    ]
+
+
+def test_clone_keeps_edges_to_other_workflows(workflow_services, db_session):
+    template = Workflow(name="Template")
+    other = Workflow(name="Other")
+    db_session.add_all([template, other])
+    db_session.flush()
+    end = EndNode(workflow_id=other.id)
+    db_session.add(end)
+    db_session.flush()
+    start = StartNode(workflow_id=template.id, next_node_id=end.id)
+    db_session.add(start)
+    db_session.commit()
+
+    clone = workflow_services.clone_workflow(
+        template.id, WorkflowCloneSchema(), db_session
+    )
+
+    assert [node.next_node_id for node in clone.nodes] == [end.id]
+
+
+def test_clone_large_workflow(workflow_services, db_session):
+    template = _template(db_session, messages=10000)
+
+    started = time.perf_counter()
+    clone = workflow_services.clone_workflow(
+        template.id, WorkflowCloneSchema(name="Customer"), db_session
+    )
+    elapsed = time.perf_counter() - started
+
+    assert clone.name == "Customer"
+    assert (
+        db_session.scalar(
+            select(func.count(Node.id)).where(Node.workflow_id == clone.id)
+        )
+        == 10003
+    )
+    assert elapsed < 1.0